@@ -19,12 +19,11 @@ import open3d as o3d  # pip install open3d
 import zipfile
 import pandas as pd
 import io
-import pickle
 import subprocess
 import shutil  # Ajout pour check Blender
 from sklearn.cluster import KMeans
 from sklearn.neighbors import NearestNeighbors  # Fallback pour FAISS
-from transformers import CLIPProcessor, CLIPModel
+from model_registry import get_clip, release_models
 try:
     import psutil  # pip install psutil pour monitoring CPU
     PSUTIL_AVAILABLE = True
@@ -87,6 +86,26 @@ except ImportError:
     TEXTURE_MANAGER_AVAILABLE = False
     print("⚠️ Module texture_download_manager non disponible")
 
+# Moteur RANSAC vectorisé (plan, cylindre, sphère)
+from shape_ransac import ransac_cylinder_detection, ransac_sphere_detection, extract_shapes
+
+# Échantillonnage rapide (grille de voxels vectorisée, farthest point sampling)
+from point_sampling import voxel_grid_indices, sample_farthest_points
+
+# Détection de changements M3C2 vectorisée
+from m3c2 import compute_m3c2, select_core_points
+
+# Service de plus proches voisins batché (post-traitement des maillages)
+from knn_service import NeighborService
+
+# Index persistant des embeddings de textures PBR
+from texture_index import TextureEmbeddingIndex
+TEXTURE_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'streamlit_textures')
+
+# Pré-sélection des paires d'images (top-k voisins + arbre couvrant) avant l'inférence
+from pair_selection import select_pairs, PAIR_TOP_K
+PAIR_STRATEGIES = ["Pré-sélection (top-k + arbre couvrant)", "Graphe complet"]
+
 # Imports spécifiques à DUSt3R (assurez-vous d'avoir installé : pip install git+https://github.com/naver/dust3r.git)
 from dust3r.inference import inference
 from dust3r.model import AsymmetricCroCo3DStereo
@@ -98,6 +117,8 @@ from dust3r.utils.geometry import xy_grid
 # Initialize variables to avoid Pylance possibly unbound errors
 batch_size = 1
 niter_align = 300
+pair_strategy = PAIR_STRATEGIES[0]
+pair_top_k = PAIR_TOP_K
 lr_align = 0.01
 threshold_conf = 0.5
 max_points_per_view = 20000
@@ -229,92 +250,6 @@ def ransac_plane_detection(pcd, distance_threshold=0.02, ransac_n=3, num_iterati
                                              num_iterations=num_iterations)
     return plane_model, inliers
 
-def ransac_cylinder_detection(points, distance_threshold=0.05, max_iterations=1000):
-    """
-    Détection de cylindre avec RANSAC personnalisé (utilisant numpy pour calculs scientifiques).
-    """
-    best_model = None
-    best_inliers = []
-    n_points = len(points)
-    
-    for _ in range(max_iterations):
-        # Échantillonner 2 points pour définir l'axe, 1 point pour le rayon
-        sample_indices = np.random.choice(n_points, 3, replace=False)
-        sample_points = points[sample_indices]
-        
-        # Calculer l'axe (vecteur entre les 2 premiers points)
-        axis = sample_points[1] - sample_points[0]
-        axis = axis / np.linalg.norm(axis)  # Normaliser
-        
-        # Point sur l'axe (milieu)
-        center = (sample_points[0] + sample_points[1]) / 2
-        
-        # Rayon : distance du 3ème point à l'axe
-        vec_to_point = sample_points[2] - center
-        radius = np.abs(np.dot(vec_to_point, axis))
-        
-        # Calculer inliers : points dont la distance à l'axe est proche du rayon
-        inliers = []
-        for i, point in enumerate(points):
-            vec = point - center
-            dist_to_axis = np.linalg.norm(vec - np.dot(vec, axis) * axis)
-            if np.abs(dist_to_axis - radius) < distance_threshold:
-                inliers.append(i)
-        
-        if len(inliers) > len(best_inliers):
-            best_inliers = inliers
-            best_model = {"axis": axis, "center": center, "radius": radius}
-    
-    return best_model, best_inliers
-
-def ransac_sphere_detection(points, distance_threshold=0.05, max_iterations=1000):
-    """
-    Détection de sphère avec RANSAC personnalisé (calculs scientifiques avec numpy).
-    """
-    best_model = None
-    best_inliers = []
-    n_points = len(points)
-    
-    for _ in range(max_iterations):
-        # Échantillonner 4 points pour définir la sphère
-        sample_indices = np.random.choice(n_points, 4, replace=False)
-        sample_points = points[sample_indices]
-        
-        # Calculer le centre et rayon à partir de 4 points (méthode déterministe)
-        # Utiliser la formule pour 4 points non coplanaires
-        try:
-            # Matrice pour résoudre le système
-            A = np.array([
-                [sample_points[0][0], sample_points[0][1], sample_points[0][2], 1],
-                [sample_points[1][0], sample_points[1][1], sample_points[1][2], 1],
-                [sample_points[2][0], sample_points[2][1], sample_points[2][2], 1],
-                [sample_points[3][0], sample_points[3][1], sample_points[3][2], 1]
-            ])
-            b = np.array([
-                -np.sum(sample_points[0]**2),
-                -np.sum(sample_points[1]**2),
-                -np.sum(sample_points[2]**2),
-                -np.sum(sample_points[3]**2)
-            ])
-            x = np.linalg.solve(A, b)
-            center = -0.5 * x[:3]
-            radius = np.sqrt(np.sum(center**2) - x[3])
-            
-            # Calculer inliers
-            inliers = []
-            for i, point in enumerate(points):
-                dist = np.linalg.norm(point - center)
-                if np.abs(dist - radius) < distance_threshold:
-                    inliers.append(i)
-            
-            if len(inliers) > len(best_inliers):
-                best_inliers = inliers
-                best_model = {"center": center, "radius": radius}
-        except np.linalg.LinAlgError:
-            continue  # Points coplanaires, ignorer
-    
-    return best_model, best_inliers
-
 def setup_ui():
     """Configure l'interface utilisateur principale"""
     st.title("📸 Application de Photogrammétrie Complète SETRAF GABON développée par NYUNDU FRANCIS ARNAUD")
@@ -328,50 +263,59 @@ def setup_ui():
 
     return device
 
-def perform_ransac_analysis(pcd, enable_auto_ransac, ransac_auto_threshold, ransac_auto_iterations):
-    """Effectue l'analyse RANSAC automatique"""
+def perform_ransac_analysis(pcd, enable_auto_ransac, ransac_auto_threshold, ransac_auto_iterations, max_shapes=6):
+    """Effectue l'analyse RANSAC automatique (extraction successive de plusieurs formes)"""
     detected_shapes = {}
     if enable_auto_ransac:
         st.info("🔬 Analyse géométrique automatique en cours...")
         points = np.asarray(pcd.points)
         modified_colors = np.array(pcd.colors)
 
-        # Détection plan
-        try:
-            plane_model, plane_inliers = ransac_plane_detection(pcd, distance_threshold=ransac_auto_threshold,
-                                                               num_iterations=ransac_auto_iterations)
-            if len(plane_inliers) > len(points) * 0.1:  # Au moins 10% des points
-                [a, b, c, d] = plane_model
-                detected_shapes['plan'] = {"model": [a, b, c, d], "inliers": len(plane_inliers)}
-                # Colorer inliers en rouge
-                modified_colors[plane_inliers] = [1.0, 0.0, 0.0]  # Rouge
-                st.success(f"Plan détecté automatiquement : {a:.3f}x + {b:.3f}y + {c:.3f}z + {d:.3f} = 0 ({len(plane_inliers)} points)")
-        except:
-            pass
-
-        # Détection cylindre
+        # Normales pour les hypothèses de cylindre à 2 points (estimées sur une copie si absentes)
+        normals = None
         try:
-            cyl_model, cyl_inliers = ransac_cylinder_detection(points, distance_threshold=ransac_auto_threshold,
-                                                              max_iterations=ransac_auto_iterations)
-            if cyl_model and len(cyl_inliers) > len(points) * 0.05:  # Au moins 5%
-                detected_shapes['cylindre'] = {"model": cyl_model, "inliers": len(cyl_inliers)}
-                # Colorer inliers en vert
-                modified_colors[cyl_inliers] = [0.0, 1.0, 0.0]  # Vert
-                st.success(f"Cylindre détecté : Rayon {cyl_model['radius']:.3f} ({len(cyl_inliers)} points)")
-        except:
-            pass
-
-        # Détection sphère
+            if not pcd.has_normals():
+                pcd_normals = o3d.geometry.PointCloud(pcd)
+                pcd_normals.estimate_normals(o3d.geometry.KDTreeSearchParamHybrid(radius=ransac_auto_threshold * 10, max_nn=30))
+                normals = np.asarray(pcd_normals.normals)
+            else:
+                normals = np.asarray(pcd.normals)
+        except Exception:
+            normals = None
+
         try:
-            sph_model, sph_inliers = ransac_sphere_detection(points, distance_threshold=ransac_auto_threshold,
-                                                            max_iterations=ransac_auto_iterations)
-            if sph_model and len(sph_inliers) > len(points) * 0.05:
-                detected_shapes['sphere'] = {"model": sph_model, "inliers": len(sph_inliers)}
-                # Colorer inliers en bleu
-                modified_colors[sph_inliers] = [0.0, 0.0, 1.0]  # Bleu
-                st.success(f"Sphère détectée : Rayon {sph_model['radius']:.3f} ({len(sph_inliers)} points)")
-        except:
-            pass
+            shapes = extract_shapes(points, distance_threshold=ransac_auto_threshold,
+                                    max_iterations=ransac_auto_iterations, max_shapes=max_shapes,
+                                    normals=normals)
+        except Exception as e:
+            st.warning(f"⚠️ Analyse RANSAC interrompue : {e}")
+            shapes = []
+
+        shape_names = {'plane': 'plan', 'cylinder': 'cylindre', 'sphere': 'sphere'}
+        shape_colors = {'plane': [1.0, 0.0, 0.0], 'cylinder': [0.0, 1.0, 0.0], 'sphere': [0.0, 0.0, 1.0]}
+        for shape in shapes:
+            # Clés 'plan', 'cylindre', 'sphere' pour la première forme de chaque type, puis suffixées
+            name = shape_names[shape['type']]
+            key = name
+            suffix = 2
+            while key in detected_shapes:
+                key = f"{name}_{suffix}"
+                suffix += 1
+
+            model = shape['model']
+            inliers = shape['inliers']
+            if shape['type'] == 'plane':
+                model = [float(v) for v in model]
+            detected_shapes[key] = {"model": model, "inliers": len(inliers)}
+            modified_colors[inliers] = shape_colors[shape['type']]
+
+            if shape['type'] == 'plane':
+                a, b, c, d = model
+                st.success(f"Plan détecté automatiquement : {a:.3f}x + {b:.3f}y + {c:.3f}z + {d:.3f} = 0 ({len(inliers)} points)")
+            elif shape['type'] == 'cylinder':
+                st.success(f"Cylindre détecté : Rayon {model['radius']:.3f} ({len(inliers)} points)")
+            else:
+                st.success(f"Sphère détectée : Rayon {model['radius']:.3f} ({len(inliers)} points)")
 
         # Mettre à jour les couleurs du nuage
         pcd.colors = o3d.utility.Vector3dVector(modified_colors)
@@ -379,7 +323,8 @@ def perform_ransac_analysis(pcd, enable_auto_ransac, ransac_auto_threshold, rans
 
     return detected_shapes
 
-def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='auto', preserve_colors=True, preserve_normals=False):
+def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='auto', preserve_colors=True, preserve_normals=False,
+                                        timings=None):
     """
     Pipeline de downsampling temps réel ultra-rapide inspiré par Sohail Saifi.
     
@@ -389,12 +334,22 @@ def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='au
         strategy: Stratégie ('auto', 'speed', 'quality', 'balanced')
         preserve_colors: Préserver les informations de couleur
         preserve_normals: Préserver les normales de surface
+        timings: Dictionnaire optionnel rempli avec la durée (ms) de chaque étape
         
     Returns:
         Point cloud downsamplé
     """
     import time
     start_time = time.time()
+    if timings is None:
+        timings = {}
+    stage_start = start_time
+
+    def end_stage(name):
+        nonlocal stage_start
+        now = time.time()
+        timings[name] = (now - stage_start) * 1000
+        stage_start = now
     
     # Nombre de points original
     original_points = len(np.asarray(pcd.points))
@@ -424,6 +379,7 @@ def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='au
         if current_points > target_points * 2:
             voxel_size *= 1.5
             pcd = pcd.voxel_down_sample(voxel_size=voxel_size)
+        end_stage('voxel')
     
     current_points = len(np.asarray(pcd.points))
     
@@ -437,27 +393,18 @@ def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='au
             random_indices = np.random.choice(current_points, int(current_points * random_ratio), replace=False)
             pcd = pcd.select_by_index(random_indices)
             current_points = len(np.asarray(pcd.points))
+            end_stage('random')
         
         # Uniform grid sampling pour couverture spatiale
         if current_points > target_points and strategy in ['balanced', 'quality']:
-            # Calcul de la taille de grille optimale
+            # Calcul de la taille de grille optimale (étendue nulle tolérée pour les nuages plans)
             points = np.asarray(pcd.points)
-            bbox = points.max(axis=0) - points.min(axis=0)
+            bbox = np.maximum(points.max(axis=0) - points.min(axis=0), 1e-9)
             grid_density = (target_points / np.prod(bbox)) ** (1/3)
             grid_size = 1.0 / grid_density
             
-            # Création de la grille uniforme
-            min_bounds = points.min(axis=0)
-            grid_indices = ((points - min_bounds) / grid_size).astype(int)
-            
-            # Sélection d'un point par cellule de grille
-            unique_grids = {}
-            for i, grid_idx in enumerate(grid_indices):
-                grid_key = tuple(grid_idx)
-                if grid_key not in unique_grids:
-                    unique_grids[grid_key] = i
-            
-            selected_indices = list(unique_grids.values())
+            # Sélection d'un point par cellule de grille (hachage vectorisé des voxels)
+            selected_indices = voxel_grid_indices(points, grid_size, mode='first')
             
             if len(selected_indices) > target_points:
                 # Si encore trop, sous-échantillonnage aléatoire
@@ -465,31 +412,14 @@ def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='au
             
             pcd = pcd.select_by_index(selected_indices)
             current_points = len(np.asarray(pcd.points))
+            end_stage('grid')
         
-        # Farthest point sampling pour qualité optimale
+        # Farthest point sampling pour qualité optimale (exact si petit, sinon graines de voxels + KD-tree)
         if current_points > target_points and strategy == 'quality':
-            # Implémentation simplifiée du farthest point sampling
             points = np.asarray(pcd.points)
-            n_points = len(points)
-            
-            # Sélection du premier point aléatoirement
-            selected_indices = [np.random.randint(0, n_points)]
-            distances = np.full(n_points, np.inf)
-            
-            for _ in range(min(target_points - 1, n_points - 1)):
-                # Mise à jour des distances
-                last_selected = points[selected_indices[-1]]
-                current_distances = np.linalg.norm(points - last_selected, axis=1)
-                distances = np.minimum(distances, current_distances)
-                
-                # Sélection du point le plus éloigné
-                farthest_idx = np.argmax(distances)
-                selected_indices.append(farthest_idx)
-                
-                # Marquer comme sélectionné
-                distances[farthest_idx] = 0
-            
+            selected_indices = sample_farthest_points(points, target_points)
             pcd = pcd.select_by_index(selected_indices)
+            end_stage('fps')
     
     # Étape 3: Préservation des attributs
     if preserve_colors and pcd.has_colors():
@@ -500,14 +430,102 @@ def apply_realtime_downsampling_pipeline(pcd, target_points=100000, strategy='au
         # Recalcul des normales si nécessaire après downsampling
         pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30))
         pcd.orient_normals_consistent_tangent_plane(k=15)
+        end_stage('normals')
     
     # Métriques finales
-    final_points = len(np.asarray(pcd.points))
-    processing_time = time.time() - start_time
+    timings['total'] = (time.time() - start_time) * 1000
     
     return pcd
 
-def apply_pointnet_classification(pcd, confidence_threshold=0.7):
+POINTNET_CLASS_COLORS = np.array([
+    [0.4, 0.8, 0.4],  # Terrain - Vert
+    [0.8, 0.4, 0.4],  # Bâtiments - Rouge
+    [0.4, 0.4, 0.8],  # Végétation - Bleu
+    [0.8, 0.8, 0.4],  # Véhicules - Jaune
+    [0.6, 0.6, 0.6],  # Autres - Gris
+])
+
+def compute_pointnet_features(points, normals, colors, n_neighbors=32, chunk_size=500000):
+    """
+    Caractéristiques géométriques par point (rugosité, verticalité, densité, luminosité, altitude relative).
+    
+    Les k plus proches voisins sont calculés par blocs de chunk_size points pour borner la mémoire
+    (seules les 5 caractéristiques sont conservées pour l'ensemble du nuage).
+    
+    Returns:
+        Tableau (N, 5) float32
+    """
+    n_points = len(points)
+    centroid = np.mean(points, axis=0)
+    points_centered = points - centroid
+    
+    from scipy.spatial import cKDTree
+    tree = cKDTree(points_centered)
+    k = min(n_neighbors, n_points)
+    
+    features = np.empty((n_points, 5), dtype=np.float32)
+    for start in range(0, n_points, chunk_size):
+        stop = min(start + chunk_size, n_points)
+        distances, _ = tree.query(points_centered[start:stop], k=k, workers=-1)
+        distances = distances.reshape(stop - start, k)
+        features[start:stop, 0] = distances.std(axis=1)  # Rugosité locale
+        features[start:stop, 2] = 1.0 / (distances.mean(axis=1) + 1e-6)  # Densité locale
+    
+    features[:, 1] = np.abs(normals[:, 2])  # Verticalité (composante Z de la normale)
+    features[:, 3] = colors.mean(axis=1) if colors.shape[1] > 0 else 0.5  # Luminosité
+    features[:, 4] = points_centered[:, 2]  # Altitude relative au centroïde
+    return features
+
+def classify_pointnet_features(features, chunk_size=500000):
+    """
+    Classification par règles sur les caractéristiques, évaluée par masques vectorisés.
+    
+    Les seuils (percentiles) sont calculés une seule fois sur tout le nuage.
+    
+    Returns:
+        Tuple (classes int8, confiances float32)
+    """
+    roughness_all, density_all, height_all = features[:, 0], features[:, 2], features[:, 4]
+    abs_height_all = np.abs(height_all)
+    thresholds = {
+        'height_p25': np.percentile(height_all, 25),
+        'height_p50': np.percentile(height_all, 50),
+        'height_max': np.max(height_all),
+        'roughness_p50': np.percentile(roughness_all, 50),
+        'roughness_p75': np.percentile(roughness_all, 75),
+        'abs_height_p50': np.percentile(abs_height_all, 50),
+        'abs_height_p75': np.percentile(abs_height_all, 75),
+        'density_p25': np.percentile(density_all, 25),
+        'density_max': np.max(density_all),
+    }
+    
+    n_points = len(features)
+    classes = np.empty(n_points, dtype=np.int8)
+    confidences = np.empty(n_points, dtype=np.float32)
+    
+    for start in range(0, n_points, chunk_size):
+        roughness, verticality, density, _, height = features[start:start + chunk_size].T
+        abs_height = np.abs(height)
+        
+        # Règles dans l'ordre de priorité : Terrain, Bâtiments, Végétation, Véhicules/Objets
+        conditions = [
+            (height < thresholds['height_p25']) & (verticality > 0.8) & (roughness < thresholds['roughness_p50']),
+            (verticality > 0.6) & (roughness < thresholds['roughness_p75']) & (abs_height < thresholds['abs_height_p75']),
+            (roughness > thresholds['roughness_p50']) & (height > thresholds['height_p50']),
+            (density < thresholds['density_p25']) & (abs_height < thresholds['abs_height_p50']),
+        ]
+        class_confidences = [
+            np.minimum(0.9, verticality * 0.8 + (1 - roughness) * 0.2),
+            np.minimum(0.85, verticality * 0.7 + (1 - roughness) * 0.3),
+            np.minimum(0.8, roughness * 0.6 + (height / (thresholds['height_max'] + 1e-6)) * 0.4),
+            np.minimum(0.75, (1 - density / thresholds['density_max']) * 0.6 + 0.4),
+        ]
+        classes[start:start + chunk_size] = np.select(conditions, [0, 1, 2, 3], default=4)
+        confidences[start:start + chunk_size] = np.select(conditions, class_confidences, default=0.5)
+    
+    return classes, confidences
+
+def apply_pointnet_classification(pcd, confidence_threshold=0.7, chunk_size=500000):
     """
     Classification simplifiée inspirée de PointNet pour nuages de points photogrammétriques.
     
@@ -520,6 +538,7 @@ def apply_pointnet_classification(pcd, confidence_threshold=0.7):
     Args:
         pcd: Point cloud Open3D
         confidence_threshold: Seuil de confiance minimum
+        chunk_size: Nombre de points traités par bloc (voisinages et règles)
         
     Returns:
         Tuple (pcd_classified, classification_stats)
@@ -533,108 +552,21 @@ def apply_pointnet_classification(pcd, confidence_threshold=0.7):
     
     n_points = len(points)
     
-    # Calcul des caractéristiques géométriques (inspiré de PointNet)
-    
-    # 1. Coordonnées normalisées (centrage - invariance translationnelle)
-    centroid = np.mean(points, axis=0)
-    points_centered = points - centroid
-    
-    # 2. Calcul des normales si pas présentes (pour caractéristiques géométriques)
+    # Calcul des normales si pas présentes (pour caractéristiques géométriques)
     if not pcd.has_normals():
         pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30))
     
     normals = np.asarray(pcd.normals)
     
-    # 3. Calcul des caractéristiques locales (k-NN comme dans PointNet++)
-    from sklearn.neighbors import NearestNeighbors
-    nbrs = NearestNeighbors(n_neighbors=min(32, n_points), algorithm='auto').fit(points_centered)
-    distances, indices = nbrs.kneighbors(points_centered)
-    
-    # Caractéristiques géométriques pour chaque point
-    features = []
-    
-    for i in range(n_points):
-        local_points = points_centered[indices[i]]
-        local_normals = normals[indices[i]]
-        
-        # Caractéristiques inspirées de PointNet :
-        # - Écart-type des positions locales (rugosité)
-        # - Verticalité (angle avec Z)
-        # - Densité locale
-        # - Couleur moyenne
-        
-        # Rugosité locale (écart-type des distances)
-        roughness = np.std(distances[i])
-        
-        # Verticalité (angle de la normale avec l'axe Z)
-        verticality = abs(normals[i][2])  # Composante Z de la normale
-        
-        # Densité locale (inverse de la distance moyenne)
-        local_density = 1.0 / (np.mean(distances[i]) + 1e-6)
-        
-        # Couleur (luminosité moyenne)
-        brightness = np.mean(colors[i]) if len(colors[i]) > 0 else 0.5
-        
-        # Altitude relative (par rapport au centroïde)
-        relative_height = points[i][2] - centroid[2]
-        
-        features.append([roughness, verticality, local_density, brightness, relative_height])
-    
-    features = np.array(features)
-    
-    # Classification basée sur des règles simples (version simplifiée de PointNet)
-    classifications = []
-    confidences = []
-    
-    for feat in features:
-        roughness, verticality, density, brightness, height = feat
-        
-        # Règles de classification inspirées de l'analyse géométrique
-        
-        # Terrain : bas, plat, haute densité
-        if height < np.percentile(features[:, 4], 25) and verticality > 0.8 and roughness < np.percentile(features[:, 0], 50):
-            class_id = 0  # Terrain
-            confidence = min(0.9, verticality * 0.8 + (1 - roughness) * 0.2)
-            
-        # Bâtiments : vertical, régulier, hauteur moyenne
-        elif verticality > 0.6 and roughness < np.percentile(features[:, 0], 75) and abs(height) < np.percentile(np.abs(features[:, 4]), 75):
-            class_id = 1  # Bâtiments
-            confidence = min(0.85, verticality * 0.7 + (1 - roughness) * 0.3)
-            
-        # Végétation : irrégulier, vertical variable, haute
-        elif roughness > np.percentile(features[:, 0], 50) and height > np.percentile(features[:, 4], 50):
-            class_id = 2  # Végétation
-            confidence = min(0.8, roughness * 0.6 + (height / (np.max(features[:, 4]) + 1e-6)) * 0.4)
-            
-        # Véhicules/Objets : petit, isolé, basse densité
-        elif density < np.percentile(features[:, 2], 25) and abs(height) < np.percentile(np.abs(features[:, 4]), 50):
-            class_id = 3  # Véhicules/Objets
-            confidence = min(0.75, (1 - density/np.max(features[:, 2])) * 0.6 + 0.4)
-            
-        else:
-            class_id = 4  # Autres
-            confidence = 0.5
-            
-        classifications.append(class_id)
-        confidences.append(confidence)
+    # Caractéristiques locales (k-NN comme dans PointNet++) puis classification par règles
+    features = compute_pointnet_features(points, normals, colors, chunk_size=chunk_size)
+    classifications, confidences = classify_pointnet_features(features, chunk_size=chunk_size)
     
     # Application des couleurs selon la classification (seulement si confiance suffisante)
+    confident = confidences >= confidence_threshold
     classified_colors = colors.copy()
-    
-    # Palette de couleurs pour chaque classe
-    class_colors = {
-        0: [0.4, 0.8, 0.4],  # Terrain - Vert
-        1: [0.8, 0.4, 0.4],  # Bâtiments - Rouge
-        2: [0.4, 0.4, 0.8],  # Végétation - Bleu
-        3: [0.8, 0.8, 0.4],  # Véhicules - Jaune
-        4: [0.6, 0.6, 0.6],  # Autres - Gris
-    }
-    
-    classified_count = 0
-    for i, (class_id, conf) in enumerate(zip(classifications, confidences)):
-        if conf >= confidence_threshold:
-            classified_colors[i] = class_colors[class_id]
-            classified_count += 1
+    classified_colors[confident] = POINTNET_CLASS_COLORS[classifications[confident]]
+    classified_count = int(np.count_nonzero(confident))
     
     # Mise à jour des couleurs du point cloud
     pcd.colors = o3d.utility.Vector3dVector(classified_colors)
@@ -643,15 +575,12 @@ def apply_pointnet_classification(pcd, confidence_threshold=0.7):
     processing_time = (time.time() - start_time) * 1000
     
     # Comptage par classe
-    class_counts = {}
-    for class_id in range(5):
-        count = sum(1 for c, conf in zip(classifications, confidences) 
-                   if c == class_id and conf >= confidence_threshold)
-        class_counts[class_id] = count
+    counts = np.bincount(classifications[confident], minlength=len(POINTNET_CLASS_COLORS))
+    class_counts = {class_id: int(count) for class_id, count in enumerate(counts)}
     
     stats = {
         'classified_objects': classified_count,
-        'avg_confidence': np.mean([c for c in confidences if c >= confidence_threshold]) if classified_count > 0 else 0,
+        'avg_confidence': float(confidences[confident].mean()) if classified_count > 0 else 0,
         'processing_time_ms': processing_time,
         'gpu_memory_mb': 0,  # Pas utilisé pour cette version simplifiée
         'class_distribution': class_counts,
@@ -692,6 +621,7 @@ def setup_sidebar_monitoring(device):
                 torch.cuda.synchronize()
                 mem_before = torch.cuda.memory_allocated() / 1024**3
                 models.clear()
+                release_models()
                 gc.collect()
                 torch.cuda.synchronize()
                 torch.cuda.empty_cache()
@@ -732,25 +662,8 @@ def load_dust3r_model():
 def load_clip_model():
     if 'clip' not in models:
         try:
-            # Chercher CLIP local d'abord
-            clip_path = Path(__file__).parent / "models--openai--clip-vit-base-patch32"
-            if clip_path.exists():
-                snapshots_dir = clip_path / "snapshots"
-                if snapshots_dir.exists():
-                    snapshot_dirs = list(snapshots_dir.iterdir())
-                    if snapshot_dirs:
-                        model = CLIPModel.from_pretrained(str(snapshot_dirs[0])).to(device)  # type: ignore
-                        processor = CLIPProcessor.from_pretrained(str(snapshot_dirs[0]))
-                    else:
-                        model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)  # type: ignore
-                        processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-                else:
-                    model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)  # type: ignore
-                    processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            else:
-                model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)  # type: ignore
-                processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            
+            # CLIP local d'abord, partagé avec TexturePBRAnalyzer et le moteur VFX
+            model, processor, _ = get_clip(device)
             models['clip'] = (model, processor)
         except Exception as e:
             st.error(f"Erreur lors du chargement de CLIP : {e}")
@@ -760,7 +673,8 @@ def load_clip_model():
 # Fonction de détection de changements 4D inspirée de Py4DGeo
 @st.cache_data(ttl=300)
 def apply_4d_change_detection(pcd1, pcd2, cylinder_radius=0.1, min_points=10, 
-                             confidence_threshold=0.95, max_distance=1.0):
+                             confidence_threshold=0.95, max_distance=1.0, core_spacing=None,
+                             normal_radius=None, registration_error=0.0, n_jobs=1):
     """
     Implémente l'algorithme M3C2 (Multiscale Model-to-Model Cloud Comparison) 
     pour détecter les changements entre deux nuages de points temporels.
@@ -772,6 +686,11 @@ def apply_4d_change_detection(pcd1, pcd2, cylinder_radius=0.1, min_points=10,
         min_points: Nombre minimum de points requis dans un cylindre
         confidence_threshold: Seuil de confiance pour la classification des changements
         max_distance: Distance maximale pour considérer un changement significatif
+            (demi-hauteur des cylindres de projection)
+        core_spacing: Espacement des points de calcul (défaut: cylinder_radius, 0 = tous les points)
+        normal_radius: Rayon d'estimation des normales (défaut: cylinder_radius)
+        registration_error: Erreur de recalage entre époques, ajoutée au niveau de détection
+        n_jobs: Nombre de processus pour le calcul par blocs
         
     Returns:
         pcd_diff: Nuage de points avec couleurs codant les changements
@@ -793,83 +712,39 @@ def apply_4d_change_detection(pcd1, pcd2, cylinder_radius=0.1, min_points=10,
         
         st.info(f"🔍 Analyse 4D en cours... Points référence: {len(points1)}, Points comparaison: {len(points2)}")
         
-        # Construire l'arbre KD pour le nuage de référence
-        from scipy.spatial import cKDTree
-        tree1 = cKDTree(points1)
-        tree2 = cKDTree(points2)
-        
-        # Calculer les distances signées pour chaque point du nuage 1
-        distances_signed = []
-        confidences = []
-        valid_points = []
+        # Points de calcul (core points) sous-échantillonnés sur le nuage de référence
+        if core_spacing is None:
+            core_spacing = cylinder_radius
+        core_indices = select_core_points(points1, core_spacing)
         
         progress_bar = st.progress(0)
-        total_points = len(points1)
-        
-        for i, point in enumerate(points1):
-            if i % 1000 == 0:
-                progress_bar.progress(i / total_points)
-            
-            # Trouver les voisins dans le cylindre pour le point de référence
-            indices1 = tree1.query_ball_point(point, cylinder_radius)
-            
-            if len(indices1) < min_points:
-                continue  # Pas assez de points locaux
-                
-            # Calculer le centroïde local et la normale approximative
-            local_points1 = points1[indices1]
-            centroid1 = np.mean(local_points1, axis=0)
-            
-            # Calculer la normale approximative via SVD
-            centered_points = local_points1 - centroid1
-            _, _, vh = np.linalg.svd(centered_points.T @ centered_points)
-            normal = vh[-1]  # Dernière colonne = direction de plus faible variance
-            
-            # Définir le cylindre le long de la normale
-            cylinder_height = cylinder_radius * 2
-            
-            # Calculer la distance signée moyenne dans le cylindre
-            distances_local = []
-            
-            for p in local_points1:
-                # Projeter sur la normale
-                vec = p - centroid1
-                proj_distance = np.dot(vec, normal)
-                
-                if abs(proj_distance) <= cylinder_height / 2:
-                    # Trouver le point le plus proche dans le nuage 2
-                    dist, idx = tree2.query(p)
-                    if dist <= max_distance:
-                        point2 = points2[idx]
-                        signed_dist = np.dot(point2 - p, normal)
-                        distances_local.append(signed_dist)
-            
-            if len(distances_local) >= min_points:
-                # Distance moyenne signée
-                mean_distance = np.mean(distances_local)
-                distances_signed.append(mean_distance)
-                valid_points.append(point)
-                
-                # Calculer la confiance basée sur la variance locale
-                if len(distances_local) > 1:
-                    std_distance = np.std(distances_local)
-                    confidence = 1.0 / (1.0 + std_distance)  # Confiance inversement proportionnelle à la variance
-                else:
-                    confidence = 0.5
-                confidences.append(confidence)
-        
+        m3c2_result = compute_m3c2(
+            points1, points2,
+            core_points=points1[core_indices],
+            normal_radius=normal_radius or cylinder_radius,
+            projection_radius=cylinder_radius,
+            max_depth=max_distance,
+            registration_error=registration_error,
+            n_jobs=n_jobs,
+            progress_callback=progress_bar.progress
+        )
         progress_bar.progress(1.0)
         progress_bar.empty()
         
+        # Points de calcul ayant assez de points dans les deux cylindres
+        valid = ((m3c2_result['n1'] >= min_points) & (m3c2_result['n2'] >= min_points)
+                 & np.isfinite(m3c2_result['distance']))
+        distances_signed = m3c2_result['distance'][valid]
+        valid_points = m3c2_result['core_points'][valid]
+        lod95 = m3c2_result['lod95'][valid]
+        
+        # Confiance inversement proportionnelle à la dispersion locale des deux époques
+        confidences = 1.0 / (1.0 + np.hypot(m3c2_result['std1'][valid], m3c2_result['std2'][valid]))
+        
         if len(distances_signed) == 0:
             st.warning("Aucun changement détectable trouvé avec les paramètres actuels")
             return pcd1, {'error': 'no_changes_detected'}
         
-        # Convertir en arrays numpy
-        distances_signed = np.array(distances_signed)
-        confidences = np.array(confidences)
-        valid_points = np.array(valid_points)
-        
         # Classification des changements avec seuillage statistique
         # Utiliser une approche robuste avec médiane et MAD (Median Absolute Deviation)
         median_dist = np.median(distances_signed)
@@ -937,6 +812,9 @@ def apply_4d_change_detection(pcd1, pcd2, cylinder_radius=0.1, min_points=10,
             'max_change_magnitude': float(np.max(np.abs(distances_signed))),
             'median_change': float(median_dist),
             'mad_threshold': float(mad_dist),
+            'core_points': len(core_indices),
+            'lod95_mean': float(np.mean(lod95)),
+            'significant_change_points': int(np.sum(np.abs(distances_signed) > lod95)),
             'processing_time_ms': processing_time,
             'confidence_stats': {
                 'mean': float(np.mean(confidences)),
@@ -1033,6 +911,9 @@ with col1:
         batch_size = st.slider("Taille du batch", min_value=1, max_value=8, value=1, key="batch_size", help="Nombre d'images traitées simultanément (plus petit = plus stable sur GPU ; max augmenté pour scalabilité)")
         niter_align = st.slider("Itérations d'alignement global", min_value=100, max_value=500, value=300, help="Nombre d'itérations pour l'optimisation globale")
         lr_align = st.slider("Taux d'apprentissage alignement", min_value=0.001, max_value=0.1, value=0.01, format="%.3f")
+        pair_strategy = st.radio("Paires d'images", PAIR_STRATEGIES, help="La pré-sélection ne garde que les k images les plus proches de chaque photo (descripteur global vérifié par ORB) plus un arbre couvrant pour la connexité ; le graphe complet traite toutes les paires (coût quadratique).")
+        if pair_strategy == PAIR_STRATEGIES[0]:
+            pair_top_k = st.slider("Voisins par image (k)", min_value=1, max_value=10, value=PAIR_TOP_K, help="Nombre de paires gardées par image")
     
     threshold_conf = st.slider("Seuil de confiance", min_value=0.0, max_value=1.0, value=0.5, format="%.2f", key="threshold_conf", help="Seuil pour filtrer les points de confiance")
     max_points_per_view = st.slider("Max points par vue (downsample)", min_value=1000, max_value=100000, value=20000, help="Nombre max de points par image pour visualisation HD")
@@ -1359,6 +1240,14 @@ with col1:
                 compression = stats.get('compression_ratio', 0)
                 st.metric("Compression", f"{compression:.1f}x" if compression > 0 else "N/A")
 
+            # Durée de chaque étape du pipeline
+            stage_times = stats.get('stage_times_ms') or {}
+            stage_labels = {'voxel': 'Voxels', 'random': 'Aléatoire', 'grid': 'Grille', 'fps': 'FPS', 'normals': 'Normales'}
+            stage_summary = " | ".join(f"{label}: {stage_times[key]:.1f} ms"
+                                       for key, label in stage_labels.items() if key in stage_times)
+            if stage_summary:
+                st.caption(f"⏱️ Étapes : {stage_summary}")
+
             # Indicateur de succès
             target_achieved = stats.get('target_achieved', False)
             if target_achieved:
@@ -2076,118 +1965,70 @@ with col1:
     st.header("🖌️ Textures PBR Manuelles")
     texture_zip = st.file_uploader("Upload ZIP de textures PBR (dossiers par catégorie e.g. rock/, water/)", type='zip', help="Les dossiers dans le ZIP définissent les catégories (ex: rock/albedo.png). Les textures sont intégrées dans une base FAISS pour correspondance dynamique.")
    
-    if texture_zip is not None:
-        with st.spinner("Traitement des textures PBR..."):
-            with tempfile.TemporaryDirectory() as tmp_dir:
-                zip_path = os.path.join(tmp_dir, 'textures.zip')
-                with open(zip_path, 'wb') as f:
-                    f.write(texture_zip.getbuffer())
-                textures_dir = os.path.join(tmp_dir, 'textures')
-                os.makedirs(textures_dir, exist_ok=True)
-                with zipfile.ZipFile(zip_path, 'r') as z:
-                    z.extractall(textures_dir)
-                
-                clip_model, clip_processor = load_clip_model()
-                embeddings_list = []
-                categories = []
-                avg_colors_list = []
-                db_path = os.path.join(tempfile.gettempdir(), 'streamlit_textures.db')
-                conn = sqlite3.connect(db_path)  # type: ignore
-                cur = conn.cursor()
-                cur.execute('''CREATE TABLE IF NOT EXISTS textures
-                               (category TEXT PRIMARY KEY, embedding BLOB, avg_color BLOB)''')
-                if clip_model is not None:
-                    for category in os.listdir(textures_dir):
-                        cat_dir = os.path.join(textures_dir, category)
-                        if os.path.isdir(cat_dir):
-                            cat_images = []
-                            for file in os.listdir(cat_dir):
-                                if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                                    img_path = os.path.join(cat_dir, file)
-                                    image = Image.open(img_path).convert('RGB')
-                                    cat_images.append(image)
-                            if cat_images:
-                                inputs = clip_processor(images=cat_images, return_tensors="pt").to(device)  # type: ignore
-                                with torch.no_grad():
-                                    embeddings = clip_model.get_image_features(**inputs)
-                                    avg_emb = torch.mean(embeddings, dim=0).cpu().numpy()
-                                all_pixels = []
-                                for img in cat_images:
-                                    img_np = np.array(img) / 255.0
-                                    all_pixels.append(img_np.reshape(-1, 3))
-                                if all_pixels:
-                                    avg_color = np.mean(np.vstack(all_pixels), axis=0)
-                                else:
-                                    avg_color = np.array([0.5, 0.5, 0.5])
-                                embeddings_list.append(avg_emb)
-                                categories.append(category)
-                                avg_colors_list.append(avg_color)
-                                emb_blob = pickle.dumps(avg_emb)
-                                color_blob = pickle.dumps(avg_color)
-                                cur.execute("INSERT OR REPLACE INTO textures VALUES (?, ?, ?)", (category, emb_blob, color_blob))
-                    
-                    conn.commit()
-                    
-                    if embeddings_list:
-                        # Amélioration : Seuil adaptatif basé sur variance des embeddings
-                        emb_array = np.array(embeddings_list)
-                        emb_std = np.std(emb_array)
-                        adaptive_threshold_factor = 1.5  # Facteur pour tolérance dynamique
-                        adaptive_max_dist = emb_std * adaptive_threshold_factor if emb_std > 0 else 2.0
-                        st.info(f"Seuil adaptatif pour textures : {adaptive_max_dist:.2f} (basé sur std des embeddings = {emb_std:.2f})")
-                        
-                        # Création de l'index avec fallback
-                        try:
-                            if FAISS_AVAILABLE:
-                                dim = len(embeddings_list[0])
-                                faiss_index = faiss.IndexFlatL2(dim)  # type: ignore
-                                faiss_index.add(emb_array)  # type: ignore
-                                st.session_state.search_index = faiss_index
-                                st.session_state.is_faiss = True
-                            else:
-                                raise ImportError("FAISS non disponible")
-                        except:
-                            # Fallback sklearn
-                            nn = NearestNeighbors(n_neighbors=1, metric='euclidean')
-                            nn.fit(emb_array)
-                            st.session_state.search_index = nn
-                            st.session_state.is_faiss = False
-                            st.info("Utilisation de scikit-learn NearestNeighbors comme fallback pour FAISS.")
-                        
-                        texture_metadata = [{'category': cat, 'avg_color': avg_col} for cat, avg_col in zip(categories, avg_colors_list)]
-                        st.session_state.texture_metadata = texture_metadata
-                        st.session_state.adaptive_max_dist = adaptive_max_dist
-                        st.success(f"Textures PBR chargées: {len(categories)} catégories intégrées (avec fallback si besoin) et sauvegardées en SQLite3.")
-                        
-                        # Affichage de la liste des types de textures dans un tableau depuis SQLite3
-                        cur.execute("SELECT category FROM textures")
-                        db_categories = [row[0] for row in cur.fetchall()]
-                        df = pd.DataFrame({'Types de Textures': db_categories})
-                        st.table(df)
-
-                        # Affichage compact des textures PBR avec miniatures
-                        if 'texture_metadata' in st.session_state and st.session_state.texture_metadata:
-                            st.header("🎨 Aperçu des Textures PBR")
-                            for tex in st.session_state.texture_metadata:
-                                category = tex['category']
-                                avg_color = (tex['avg_color'] * 255).astype(int)
-                                img_preview = Image.new('RGB', (50, 50), tuple(avg_color))
-                                
-                                col1, col2 = st.columns([1, 1])
-                                with col1:
-                                    st.markdown(f"**{category}**")
-                                with col2:
-                                    st.image(img_preview, width=50)
-                        
-                        # Bouton pour injecter les textures au rendu 3D
-                        if st.button("Injecter les Textures au Rendu 3D de la Visionneuse Open3D"):
-                            st.session_state.inject_textures = True
-                            st.rerun()
+    # Index persistant des textures: embeddings par fichier (chemin + date), index FAISS sur disque
+    with TextureEmbeddingIndex(TEXTURE_INDEX_DIR) as texture_index:
+        if texture_zip is not None:
+            with st.spinner("Traitement des textures PBR..."):
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    zip_path = os.path.join(tmp_dir, 'textures.zip')
+                    with open(zip_path, 'wb') as f:
+                        f.write(texture_zip.getbuffer())
+                    texture_index.extract_zip(zip_path)
+
+                    clip_model, clip_processor = load_clip_model()
+                    if clip_model is not None:
+                        # Seules les images nouvelles ou modifiées sont encodées, par lots
+                        progress = st.progress(0.0)
+                        refresh_stats = texture_index.refresh(clip_model, clip_processor, device,
+                                                              progress_callback=progress.progress)
+                        progress.empty()
+                        st.info(f"Textures : {refresh_stats['embedded']} image(s) encodée(s), "
+                                f"{refresh_stats['total'] - refresh_stats['embedded']} relue(s) depuis le cache")
+                        st.session_state.pop('search_index', None)  # Rechargement de l'index mis à jour
                     else:
-                        st.warning("Aucune catégorie de textures valide trouvée dans le ZIP.")
-                else:
-                    st.warning("Modèle CLIP non disponible pour le traitement des textures.")
-                conn.close()
+                        st.warning("Modèle CLIP non disponible pour le traitement des textures.")
+
+        # Chargement de l'index persistant (mémoire mappée) au démarrage ou après mise à jour
+        if 'search_index' not in st.session_state:
+            search_index, is_faiss = texture_index.load_search_index()
+            if search_index is not None:
+                st.session_state.search_index = search_index
+                st.session_state.is_faiss = is_faiss
+                st.session_state.texture_metadata = texture_index.categories()
+                st.session_state.adaptive_max_dist = texture_index.info('adaptive_max_dist', 2.0)
+                if not is_faiss:
+                    st.info("Utilisation de scikit-learn NearestNeighbors comme fallback pour FAISS.")
+
+        if texture_zip is not None:
+            if st.session_state.get('texture_metadata'):
+                adaptive_max_dist = st.session_state.adaptive_max_dist
+                emb_std = texture_index.info('embedding_std', 0.0)
+                st.info(f"Seuil adaptatif pour textures : {adaptive_max_dist:.2f} (basé sur std des embeddings = {emb_std:.2f})")
+                st.success(f"Textures PBR chargées: {len(st.session_state.texture_metadata)} catégories intégrées (avec fallback si besoin) et sauvegardées en SQLite3.")
+
+                # Affichage de la liste des types de textures dans un tableau depuis SQLite3
+                df = pd.DataFrame({'Types de Textures': [tex['category'] for tex in st.session_state.texture_metadata]})
+                st.table(df)
+
+                # Affichage compact des textures PBR avec miniatures
+                st.header("🎨 Aperçu des Textures PBR")
+                for tex in st.session_state.texture_metadata:
+                    category = tex['category']
+                    avg_color = (tex['avg_color'] * 255).astype(int)
+                    img_preview = Image.new('RGB', (50, 50), tuple(avg_color))
+
+                    col1, col2 = st.columns([1, 1])
+                    with col1:
+                        st.markdown(f"**{category}**")
+                    with col2:
+                        st.image(img_preview, width=50)
+
+                # Bouton pour injecter les textures au rendu 3D
+                if st.button("Injecter les Textures au Rendu 3D de la Visionneuse Open3D"):
+                    st.session_state.inject_textures = True
+                    st.rerun()
+            else:
+                st.warning("Aucune catégorie de textures valide trouvée dans le ZIP.")
    
     process_btn = st.button("🚀 Lancer la Reconstruction 3D", type="primary")
 
@@ -2232,8 +2073,19 @@ with col2:
                             status_text.text("Chargement des images DUSt3R...")
                             images = dust3r_load_images(img_paths, size=512)
                            
+                            if pair_strategy == PAIR_STRATEGIES[0] and len(images) == len(img_paths) and len(images) > 2:
+                                status_text.text("Pré-sélection des paires d'images...")
+                                selection = select_pairs(img_paths, k=pair_top_k)
+                                pairs = selection.dust3r_pairs(images)
+                                pair_report = selection.report()
+                                st.info(f"🔗 Paires retenues : {pair_report['selected_pairs']} / {pair_report['complete_pairs']} "
+                                        f"du graphe complet ({pair_report['saved_ratio']:.0%} d'inférences évitées, "
+                                        f"{pair_report['spanning_tree_edges']} arêtes d'arbre couvrant, "
+                                        f"{pair_report['orb_verified_pairs']} paires vérifiées par ORB)")
+                            else:
+                                pairs = make_pairs(images, scene_graph='complete', prefilter=None, symmetrize=True)
+
                             status_text.text("Inférence en cours...")
-                            pairs = make_pairs(images, scene_graph='complete', prefilter=None, symmetrize=True)
                             output = inference(
                                 pairs, model, device,
                                 batch_size=batch_size
@@ -2428,52 +2280,8 @@ with col2:
                         )
                         
                         # Analyse géométrique automatique RANSAC si activée (après fermeture de la fenêtre)
-                        detected_shapes = {}
-                        if enable_auto_ransac:
-                            st.info("🔬 Analyse géométrique automatique en cours...")
-                            points = np.asarray(pcd.points)
-                            modified_colors = merged_colors.copy()
-                            
-                            # Détection plan
-                            try:
-                                plane_model, plane_inliers = ransac_plane_detection(pcd, distance_threshold=ransac_auto_threshold, 
-                                                                                   num_iterations=ransac_auto_iterations)
-                                if len(plane_inliers) > len(points) * 0.1:  # Au moins 10% des points
-                                    [a, b, c, d] = plane_model
-                                    detected_shapes['plan'] = {"model": [a, b, c, d], "inliers": len(plane_inliers)}
-                                    # Colorer inliers en rouge
-                                    modified_colors[plane_inliers] = [1.0, 0.0, 0.0]  # Rouge
-                                    st.success(f"Plan détecté automatiquement : {a:.3f}x + {b:.3f}y + {c:.3f}z + {d:.3f} = 0 ({len(plane_inliers)} points)")
-                            except:
-                                pass
-                            
-                            # Détection cylindre
-                            try:
-                                cyl_model, cyl_inliers = ransac_cylinder_detection(points, distance_threshold=ransac_auto_threshold, 
-                                                                                  max_iterations=ransac_auto_iterations)
-                                if cyl_model and len(cyl_inliers) > len(points) * 0.05:  # Au moins 5%
-                                    detected_shapes['cylindre'] = {"model": cyl_model, "inliers": len(cyl_inliers)}
-                                    # Colorer inliers en vert
-                                    modified_colors[cyl_inliers] = [0.0, 1.0, 0.0]  # Vert
-                                    st.success(f"Cylindre détecté : Rayon {cyl_model['radius']:.3f} ({len(cyl_inliers)} points)")
-                            except:
-                                pass
-                            
-                            # Détection sphère
-                            try:
-                                sph_model, sph_inliers = ransac_sphere_detection(points, distance_threshold=ransac_auto_threshold, 
-                                                                                max_iterations=ransac_auto_iterations)
-                                if sph_model and len(sph_inliers) > len(points) * 0.05:
-                                    detected_shapes['sphere'] = {"model": sph_model, "inliers": len(sph_inliers)}
-                                    # Colorer inliers en bleu
-                                    modified_colors[sph_inliers] = [0.0, 0.0, 1.0]  # Bleu
-                                    st.success(f"Sphère détectée : Rayon {sph_model['radius']:.3f} ({len(sph_inliers)} points)")
-                            except:
-                                pass
-                            
-                            # Mettre à jour les couleurs du nuage
-                            pcd.colors = o3d.utility.Vector3dVector(modified_colors)
-                            st.info("🎨 Nuage coloré automatiquement : Rouge=Plans, Vert=Cylindres, Bleu=Sphères, Original=Autres")
+                        detected_shapes = perform_ransac_analysis(pcd, enable_auto_ransac, ransac_auto_threshold,
+                                                                  ransac_auto_iterations)
                         
                         # ============================================
                         # POST-TRAITEMENT DU NUAGE DE POINTS
@@ -2495,12 +2303,14 @@ with col2:
                                     preserve_normals = getattr(st.session_state, 'preserve_normals', False)
                                     
                                     # Application du pipeline de downsampling temps réel
+                                    stage_times = {}
                                     downsampled_pcd = apply_realtime_downsampling_pipeline(
                                         pcd, 
                                         target_points=target_points,
                                         strategy=downsampling_strategy,
                                         preserve_colors=preserve_colors,
-                                        preserve_normals=preserve_normals
+                                        preserve_normals=preserve_normals,
+                                        timings=stage_times
                                     )
                                     
                                     # Calcul des métriques
@@ -2514,7 +2324,8 @@ with col2:
                                         'final_points': final_points,
                                         'processing_time_ms': processing_time_ms,
                                         'compression_ratio': compression_ratio,
-                                        'target_achieved': final_points <= target_points * 1.1  # Tolérance 10%
+                                        'target_achieved': final_points <= target_points * 1.1,  # Tolérance 10%
+                                        'stage_times_ms': stage_times
                                     }
                                     
                                     # Mise à jour du point cloud
@@ -2885,7 +2696,8 @@ with col2:
                                 
                                 elif shape_type == "Cylindre":
                                     model, inliers = ransac_cylinder_detection(points, distance_threshold=ransac_distance_threshold, 
-                                                                              max_iterations=ransac_iterations)
+                                                                              max_iterations=ransac_iterations,
+                                                                              normals=np.asarray(pcd.normals) if pcd.has_normals() else None)
                                     if model and len(inliers) > 10:
                                         st.success(f"**Cylindre détecté** : Rayon = {model['radius']:.4f}, Axe = [{model['axis'][0]:.4f}, {model['axis'][1]:.4f}, {model['axis'][2]:.4f}], Centre = [{model['center'][0]:.4f}, {model['center'][1]:.4f}, {model['center'][2]:.4f}]")
                                         st.metric("📊 Inliers détectés", f"{len(inliers)} / {len(points)} points")
@@ -2951,23 +2763,17 @@ with col2:
                                         points = np.asarray(pcd.points)
                                         if len(points) > 10000:
                                             # Calcul de la densité locale pour optimisation adaptative
-                                            pcd_tree = o3d.geometry.KDTreeFlann(pcd)
-                                            densities = []
+                                            neighbor_service = NeighborService(points)
 
                                             # Échantillonnage pour performance (1 point sur 100)
                                             sample_indices = np.random.choice(len(points),
                                                                             min(1000, len(points)//100),
                                                                             replace=False)
 
-                                            for idx in sample_indices:
-                                                _, _, distances = pcd_tree.search_knn_vector_3d(points[idx], 50)
-                                                if len(distances) > 1:
-                                                    # Densité = 1 / distance moyenne au carré
-                                                    avg_distance = np.mean(distances[1:])  # Exclure le point lui-même
-                                                    density = 1.0 / (avg_distance ** 2) if avg_distance > 0 else 0
-                                                    densities.append(density)
+                                            # Densité = 1 / distance moyenne au carré (point lui-même exclu), requête groupée
+                                            densities = neighbor_service.local_density(50, sample_indices)
 
-                                            if densities:
+                                            if len(densities) > 0:
                                                 avg_density = np.mean(densities)
                                                 std_density = np.std(densities)
 
@@ -3002,24 +2808,12 @@ with col2:
                                         # Filtrage statistique supplémentaire pour qualité
                                         if mesh_clean_artifacts and len(pcd_down.points) > 1000:
                                             # Calcul des distances inter-points pour détecter les outliers
-                                            pcd_tree_down = o3d.geometry.KDTreeFlann(pcd_down)
-                                            distances = []
-
-                                            for i in range(len(pcd_down.points)):
-                                                _, _, dist = pcd_tree_down.search_knn_vector_3d(pcd_down.points[i], 10)
-                                                if len(dist) > 1:
-                                                    distances.append(np.mean(dist[1:]))  # Distance moyenne aux 9 plus proches voisins
-
-                                            if distances:
-                                                distances = np.array(distances)
-                                                mean_dist = np.mean(distances)
-                                                std_dist = np.std(distances)
-
-                                                # Seuil statistique pour filtrage des outliers (comme dans l'article)
-                                                outlier_threshold = mean_dist + 2 * std_dist
+                                            # Distance moyenne aux 9 plus proches voisins de tous les points en une requête
+                                            # Seuil statistique pour filtrage des outliers (comme dans l'article)
+                                            keep_mask, outlier_threshold = NeighborService(pcd_down).statistical_outlier_mask(10, std_ratio=2.0)
 
-                                                # Créer masque pour conserver seulement les points "normaux"
-                                                keep_mask = distances <= outlier_threshold
+                                            if len(keep_mask) > 0:
+                                                # Conserver seulement les points "normaux"
                                                 pcd_down = pcd_down.select_by_index(np.where(keep_mask)[0])
 
                                                 st.info(f"🧹 Filtrage statistique : conservé {np.sum(keep_mask)}/{len(keep_mask)} points (seuil: {outlier_threshold:.4f})")
@@ -3103,29 +2897,9 @@ with col2:
                                         # 3.3 Farthest Point Sampling (qualité optimale)
                                         current_points = len(pcd.points)
                                         if current_points > target_points:
-                                            # Implémentation optimisée du farthest point sampling
+                                            # Farthest point sampling exact si petit, sinon graines de voxels + KD-tree
                                             points_array = np.asarray(pcd.points)
-
-                                            # Initialisation avec un point aléatoire
-                                            selected_indices = [np.random.randint(0, current_points)]
-                                            min_distances = np.full(current_points, np.inf)
-
-                                            # Sélection itérative des points les plus éloignés
-                                            while len(selected_indices) < target_points and len(selected_indices) < current_points:
-                                                # Calculer distances au dernier point sélectionné
-                                                last_point = points_array[selected_indices[-1]]
-                                                distances = np.linalg.norm(points_array - last_point, axis=1)
-                                                min_distances = np.minimum(min_distances, distances)
-
-                                                # Sélectionner le point le plus éloigné
-                                                farthest_idx = np.argmax(min_distances)
-                                                selected_indices.append(farthest_idx)
-
-                                                # Mise à jour des distances minimales
-                                                if len(selected_indices) % 1000 == 0:  # Progress update
-                                                    progress = len(selected_indices) / target_points
-                                                    st.info(f"🎯 Farthest Point Sampling : {len(selected_indices)}/{target_points} points sélectionnés")
-
+                                            selected_indices = sample_farthest_points(points_array, target_points)
                                             pcd = pcd.select_by_index(selected_indices)
                                             st.info(f"🎯 Farthest Point Sampling terminé : {current_points:,} → {len(pcd.points):,} points")
 
@@ -3208,32 +2982,22 @@ with col2:
                                             st.info("🔍 Analyse de densité locale pour débruitage adaptatif...")
 
                                             # Calcul de la densité locale
-                                            pcd_tree = o3d.geometry.KDTreeFlann(pcd_down)
-                                            densities = []
+                                            neighbor_service = NeighborService(pcd_down)
 
-                                            # Échantillonnage pour performance
+                                            # Densités de tous les points en une requête groupée (l'échantillon n'est plus
+                                            # nécessaire: le seuil est calculé sur le même tableau)
+                                            all_densities = neighbor_service.local_density(20)
+
+                                            # Échantillonnage pour le seuil (même estimation qu'auparavant)
                                             sample_size = min(2000, len(pcd_down.points) // 10)
                                             sample_indices = np.random.choice(len(pcd_down.points), sample_size, replace=False)
+                                            densities = all_densities[sample_indices]
 
-                                            for idx in sample_indices:
-                                                _, _, distances = pcd_tree.search_knn_vector_3d(pcd_down.points[idx], 20)
-                                                if len(distances) > 1:
-                                                    local_density = 1.0 / np.mean(distances[1:])**2
-                                                    densities.append(local_density)
-
-                                            if densities:
-                                                densities = np.array(densities)
+                                            if len(densities) > 0:
                                                 density_threshold = np.percentile(densities, 10)  # 10ème percentile
 
                                                 # Identifier les régions de faible densité (potentiellement bruitées)
-                                                low_density_mask = []
-                                                for i in range(len(pcd_down.points)):
-                                                    _, _, distances = pcd_tree.search_knn_vector_3d(pcd_down.points[i], 20)
-                                                    if len(distances) > 1:
-                                                        local_density = 1.0 / np.mean(distances[1:])**2
-                                                        low_density_mask.append(local_density < density_threshold)
-
-                                                low_density_indices = np.where(low_density_mask)[0]
+                                                low_density_indices = np.where(all_densities < density_threshold)[0]
                                                 if len(low_density_indices) > 0:
                                                     # Appliquer un filtrage plus strict aux régions de faible densité
                                                     pcd_low_density = pcd_down.select_by_index(low_density_indices)
@@ -3301,15 +3065,8 @@ with col2:
                                             colors_array = np.asarray(pcd_down.colors)
 
                                             # Calcul de la médiane locale pour chaque canal de couleur
-                                            pcd_tree_colors = o3d.geometry.KDTreeFlann(pcd_down)
-                                            filtered_colors = colors_array.copy()
-
-                                            for i in range(len(colors_array)):
-                                                _, idx, _ = pcd_tree_colors.search_knn_vector_3d(pcd_down.points[i], 15)
-                                                if len(idx) > 1:
-                                                    # Médiane des couleurs voisines pour réduire le bruit
-                                                    neighbor_colors = colors_array[idx[1:]]  # Exclure le point lui-même
-                                                    filtered_colors[i] = np.median(neighbor_colors, axis=0)
+                                            # Médiane des couleurs des voisins (point lui-même exclu) pour réduire le bruit
+                                            filtered_colors = NeighborService(pcd_down).median_filter_colors(colors_array, 15)
 
                                             pcd_down.colors = o3d.utility.Vector3dVector(filtered_colors)
                                             st.info("🎨 Filtrage bilatéral des couleurs appliqué")
@@ -3438,19 +3195,14 @@ with col2:
 
                                     # Transfert de couleurs amélioré avec paramètres de qualité
                                     if len(mesh.vertices) > 0:
-                                        pcd_tree = o3d.geometry.KDTreeFlann(pcd)
                                         vertices = np.asarray(mesh.vertices)
                                         colors = np.asarray(pcd.colors)
 
                                         # Nombre de voisins adaptatif selon la qualité
                                         k_neighbors = 10 if mesh_quality_preset == "Ultra HD" else 5
-                                        mesh_colors = np.zeros((len(vertices), 3))
 
-                                        for i in range(len(vertices)):
-                                            _, idx, _ = pcd_tree.search_knn_vector_3d(vertices[i], k_neighbors)
-                                            if len(idx) > 0:
-                                                neighbor_colors = colors[idx]
-                                                mesh_colors[i] = np.mean(neighbor_colors, axis=0)
+                                        # Moyenne des couleurs des voisins pour tous les sommets en une requête groupée
+                                        mesh_colors = NeighborService(pcd).transfer_colors(vertices, colors, k_neighbors)
 
                                         mesh.vertex_colors = o3d.utility.Vector3dVector(mesh_colors)
                                         st.info(f"🎨 Couleurs transférées ({k_neighbors} voisins pour {mesh_quality_preset})")
@@ -3533,16 +3285,10 @@ with col2:
                                         uv_range[uv_range == 0] = 1  # Éviter division par zéro
                                         uv_normalized = (uv_coords - uv_min) / uv_range
                                         
-                                        # Appliquer damier
-                                        for i in range(len(vertices)):
-                                            u, v = uv_normalized[i]
-                                            checker_u = int(u * checker_size) % 2
-                                            checker_v = int(v * checker_size) % 2
-                                            
-                                            if checker_u == checker_v:
-                                                checker_texture[i] = [0.9, 0.9, 0.9]  # Blanc
-                                            else:
-                                                checker_texture[i] = [0.1, 0.1, 0.1]  # Noir
+                                        # Appliquer damier (blanc si les parités U et V coïncident, noir sinon)
+                                        checker_cells = (uv_normalized * checker_size).astype(np.int64) % 2
+                                        white = checker_cells[:, 0] == checker_cells[:, 1]
+                                        checker_texture[:] = np.where(white[:, None], 0.9, 0.1)  # Blanc / Noir
                                         
                                         mesh.vertex_colors = o3d.utility.Vector3dVector(checker_texture)
                                         st.success("✅ Checker pattern UV appliqué!")
@@ -3555,14 +3301,10 @@ with col2:
                                         st.info("🕸️ Génération du wireframe...")
                                         
                                         # Créer un LineSet pour le wireframe
-                                        lines = []
                                         triangles = np.asarray(mesh.triangles)
                                         
-                                        for tri in triangles:
-                                            # Ajouter les 3 arêtes du triangle
-                                            lines.append([tri[0], tri[1]])
-                                            lines.append([tri[1], tri[2]])
-                                            lines.append([tri[2], tri[0]])
+                                        # Les 3 arêtes de chaque triangle
+                                        lines = triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
                                         
                                         # Supprimer les doublons
                                         lines = np.unique(np.sort(lines, axis=1), axis=0)
@@ -41,15 +41,11 @@ try:
 except ImportError:
     PLOTLY_AVAILABLE = False
 
-# Imports pour CLIP (déjà disponible dans le projet)
-try:
-    from transformers import CLIPProcessor, CLIPModel
-    CLIP_AVAILABLE = True
+# Imports pour CLIP (modèle partagé par le registre du projet)
+from model_registry import CLIP_AVAILABLE, DEFAULT_DEVICE, get_clip, clip_image_features
+if CLIP_AVAILABLE:
     print("✅ CLIP disponible")
-except ImportError:
-    CLIP_AVAILABLE = False
-    CLIPProcessor = None  # type: ignore
-    CLIPModel = None  # type: ignore
+else:
     print("⚠️ CLIP non disponible")
 
 # Imports pour le monitoring système
@@ -67,6 +63,18 @@ except ImportError:
     NVML_AVAILABLE = False
 
 
+class MockPointCloud:
+    """Nuage de points minimal (points, couleurs) utilisé sans Open3D"""
+
+    def __init__(self, points, colors=None):
+        self.points = points
+        self.colors = colors if colors is not None else np.random.rand(len(points), 3)
+        self._has_colors = colors is not None
+
+    def has_colors(self):
+        return self._has_colors
+
+
 class Dust3DGenerator(QThread):
     """Thread pour la génération 3D en arrière-plan"""
 
@@ -135,42 +143,47 @@ class Dust3DGenerator(QThread):
         return images
 
     def _extract_clip_features(self, images: List[Image.Image]) -> np.ndarray:
-        """Extrait les features CLIP des images"""
-        if not CLIP_AVAILABLE or CLIPProcessor is None or CLIPModel is None:
+        """Extrait les features CLIP des images (modèle partagé, encodage par lots)"""
+        if not CLIP_AVAILABLE or not images:
             # Features fictives si CLIP non disponible
             return np.random.rand(len(images), 512)
 
         try:
-            processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-
-            features = []
-            for img in images:
-                # Utilisation du processor CLIP - approche alternative
-                try:
-                    inputs = processor(images=img, return_tensors="pt")  # type: ignore
-                except TypeError:
-                    # Fallback si return_tensors n'est pas supporté
-                    inputs = processor(img)
-                    if not isinstance(inputs, dict):
-                        inputs = {"pixel_values": inputs}
-
-                with torch.no_grad():
-                    outputs = model.get_image_features(**inputs)
-                    # outputs est un tensor PyTorch, conversion sécurisée
-                    if isinstance(outputs, torch.Tensor):
-                        features.append(outputs.detach().cpu().numpy())  # type: ignore
-                    elif hasattr(outputs, 'detach'):
-                        features.append(outputs.detach().cpu().numpy())  # type: ignore
-                    else:
-                        # Fallback si ce n'est pas un tensor
-                        features.append(np.array(outputs))
-
-            return np.stack(features)
+            model, processor, _ = get_clip(DEFAULT_DEVICE)
+            features = clip_image_features(model, processor, images, DEFAULT_DEVICE)
+            return features.cpu().numpy()
         except Exception as e:
             print(f"Erreur CLIP: {e}")
             return np.random.rand(len(images), 512)
 
+    @staticmethod
+    def _image_mean_colors(images: List[Image.Image], n_images: int) -> np.ndarray:
+        """Couleur moyenne (n_images, 3) de chaque image, gris si l'image est absente ou illisible"""
+        colors = np.full((n_images, 3), 0.5)
+        for i, img in enumerate(images[:n_images]):
+            if hasattr(img, 'getpixel'):
+                try:
+                    colors[i] = np.asarray(img).reshape(-1, 3).mean(axis=0) / 255.0
+                except Exception:
+                    pass
+        return colors
+
+    @staticmethod
+    def _feature_points(features: np.ndarray, points_per_image: int, columns: int, spacing: float,
+                        offset: Tuple[float, float], xy_std: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Grille de nuages de points, un par image (points_per_image points autour de chaque case)
+
+        Returns:
+            Tuple (positions xy (N, 2), indice de l'image de chaque point, features en 2D (n_images, D))
+        """
+        image_idx = np.repeat(np.arange(len(features)), points_per_image)
+        x = (image_idx % columns) * spacing + offset[0] + np.random.normal(0, xy_std, len(image_idx))
+        y = (image_idx // columns) * spacing + offset[1] + np.random.normal(0, xy_std, len(image_idx))
+        if features.ndim != 2:
+            features = features.reshape(len(features), -1)
+        return np.column_stack([x, y]), image_idx, features
+
     def _reconstruct_3d(self, features: np.ndarray, images: List[Image.Image]) -> Tuple[Any, Optional[Any]]:
         """Reconstruct la géométrie 3D"""
         # S'assurer que features est un array numpy
@@ -182,39 +195,9 @@ class Dust3DGenerator(QThread):
                 features = np.random.rand(len(images), 512)
 
         if not OPEN3D_AVAILABLE:
-            print("ℹ️ Mode fallback: génération de géométrie 3D sans Open3D")
-            # Créer une structure de données simple pour remplacer le point cloud
-            class MockPointCloud:
-                def __init__(self, points, colors=None):
-                    self.points = points
-                    self.colors = colors or np.random.rand(len(points), 3)
-                    self._has_colors = colors is not None
-
-                def has_colors(self):
-                    return self._has_colors
-
-            # Générer des points 3D fictifs basés sur les features
-            n_points = min(1000, len(features) * 50)
-            points = []
-
-            for i, feature in enumerate(features):
-                base_x = (i % 4) * 3.0 - 6.0
-                base_y = (i // 4) * 3.0 - 3.0
-
-                for j in range(min(50, n_points // len(features))):
-                    x = base_x + np.random.normal(0, 0.8)
-                    y = base_y + np.random.normal(0, 0.8)
-                    z = np.random.normal(0, 0.5)
-
-                    # Ajouter de la variation basée sur les features CLIP
-                    if j < len(feature):
-                        z += feature[j % len(feature)] * 0.5
-
-                    points.append([x, y, z])
-
-            points = np.array(points)
-            pcd = MockPointCloud(points)
-            return pcd, None
+            pcd, _ = self._reconstruct_3d_fallback(features, images)
+            # Pas de couleurs issues des images dans ce mode
+            return MockPointCloud(np.asarray(pcd.points)), None
 
         try:
             # Code Open3D original
@@ -226,40 +209,22 @@ class Dust3DGenerator(QThread):
             assert OPEN3D_AVAILABLE, "Open3D flag should be True"
 
             n_points = min(5000, len(features) * 100)
+            points_per_image = min(100, n_points // max(len(features), 1))
 
-            points = []
-            colors = []
-
-            for i, feature in enumerate(features):
-                # S'assurer que feature est un array numpy
-                if not isinstance(feature, np.ndarray):
-                    feature = np.array(feature)
-                    if feature.ndim == 0:  # Si c'est un scalaire
-                        feature = np.array([feature])
-
-                base_x = (i % 5) * 2.0
-                base_y = (i // 5) * 2.0
-
-                for j in range(min(100, n_points // len(features))):
-                    x = base_x + np.random.normal(0, 0.5)
-                    y = base_y + np.random.normal(0, 0.5)
-                    z = feature[j % len(feature)] * 2.0 if len(feature) > 0 and j < len(feature) else np.random.normal(0, 0.3)
+            xy, image_idx, features_2d = self._feature_points(features, points_per_image, 5, 2.0, (0.0, 0.0), 0.5)
+            j = np.tile(np.arange(points_per_image), len(features))
+            n_dims = features_2d.shape[1]
+            # Hauteur issue des features CLIP (composante j), bruit au-delà de la dimension des features
+            z = np.random.normal(0, 0.3, len(j))
+            if n_dims > 0:
+                z = np.where(j < n_dims, features_2d[image_idx, j % n_dims] * 2.0, z)
 
-                    points.append([x, y, z])
-
-                    if hasattr(images[i], 'getpixel'):
-                        try:
-                            img_array = np.array(images[i])
-                            avg_color = np.mean(img_array.reshape(-1, 3), axis=0) / 255.0
-                            colors.append(avg_color)
-                        except:
-                            colors.append([0.5, 0.5, 0.5])
-                    else:
-                        colors.append([0.5, 0.5, 0.5])
+            points = np.column_stack([xy, z])
+            colors = self._image_mean_colors(images, len(features))[image_idx]
 
             pcd = o3d.geometry.PointCloud()
-            pcd.points = o3d.utility.Vector3dVector(np.array(points))
-            pcd.colors = o3d.utility.Vector3dVector(np.array(colors))
+            pcd.points = o3d.utility.Vector3dVector(points)
+            pcd.colors = o3d.utility.Vector3dVector(colors)
 
             pcd, ind = pcd.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
             pcd = pcd.select_by_index(ind)
@@ -285,49 +250,22 @@ class Dust3DGenerator(QThread):
         """Reconstruction 3D en mode fallback (sans Open3D)"""
         print("ℹ️ Mode fallback: génération de géométrie 3D sans Open3D")
 
-        class MockPointCloud:
-            def __init__(self, points, colors=None):
-                self.points = points
-                self.colors = colors or np.random.rand(len(points), 3)
-                self._has_colors = colors is not None
-
-            def has_colors(self):
-                return self._has_colors
-
         # Générer des points 3D fictifs basés sur les features
         n_points = min(1000, len(features) * 50)
-        points = []
-        colors = []
-
-        for i, feature in enumerate(features):
-            base_x = (i % 4) * 3.0 - 6.0
-            base_y = (i // 4) * 3.0 - 3.0
-
-            for j in range(min(50, n_points // len(features))):
-                x = base_x + np.random.normal(0, 0.8)
-                y = base_y + np.random.normal(0, 0.8)
-                z = np.random.normal(0, 0.5)
-
-                # Ajouter de la variation basée sur les features CLIP
-                if j < len(feature):
-                    z += feature[j % len(feature)] * 0.5
-
-                points.append([x, y, z])
-
-                # Couleur basée sur l'image
-                if i < len(images) and hasattr(images[i], 'getpixel'):
-                    try:
-                        img_array = np.array(images[i])
-                        avg_color = np.mean(img_array.reshape(-1, 3), axis=0) / 255.0
-                        colors.append(avg_color)
-                    except:
-                        colors.append([0.5, 0.5, 0.5])
-                else:
-                    colors.append([0.5, 0.5, 0.5])
+        points_per_image = min(50, n_points // max(len(features), 1))
+
+        xy, image_idx, features_2d = self._feature_points(features, points_per_image, 4, 3.0, (-6.0, -3.0), 0.8)
+        j = np.tile(np.arange(points_per_image), len(features))
+        n_dims = features_2d.shape[1]
+        z = np.random.normal(0, 0.5, len(j))
+
+        # Ajouter de la variation basée sur les features CLIP
+        if n_dims > 0:
+            z += np.where(j < n_dims, features_2d[image_idx, j % n_dims] * 0.5, 0.0)
 
-        points = np.array(points)
-        colors = np.array(colors)
-        pcd = MockPointCloud(points, colors)
+        # Couleur basée sur l'image
+        colors = self._image_mean_colors(images, len(features))[image_idx]
+        pcd = MockPointCloud(np.column_stack([xy, z]), colors)
         return pcd, None
 
     def _create_model_json(self, point_cloud: Any,
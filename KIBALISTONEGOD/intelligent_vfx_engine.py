@@ -13,7 +13,6 @@ Ce module ajoute des effets VFX contextuels automatiques sur les scènes 3D :
 import numpy as np
 import torch
 from typing import Dict, List, Tuple, Optional
-from pathlib import Path
 from dataclasses import dataclass
 from enum import Enum
 
@@ -25,13 +24,7 @@ except ImportError:
     OPEN3D_AVAILABLE = False
     o3d = None  # type: ignore
 
-try:
-    from transformers import CLIPModel, CLIPProcessor
-    CLIP_AVAILABLE = True
-except ImportError:
-    CLIP_AVAILABLE = False
-    CLIPModel = None  # type: ignore
-    CLIPProcessor = None  # type: ignore
+from model_registry import CLIP_AVAILABLE, get_clip
 
 
 class VFXType(Enum):
@@ -112,26 +105,8 @@ class IntelligentVFXEngine:
     def _load_clip(self):
         """Charge CLIP pour détection de matériaux"""
         try:
-            clip_path = Path(__file__).parent / "models--openai--clip-vit-base-patch32"
-            if clip_path.exists():
-                # Chercher dans snapshots/ (structure cache HuggingFace)
-                snapshots_dir = clip_path / "snapshots"
-                if snapshots_dir.exists():
-                    snapshot_dirs = list(snapshots_dir.iterdir())
-                    if snapshot_dirs:
-                        clip_model_path = snapshot_dirs[0]
-                        self.clip_model = CLIPModel.from_pretrained(str(clip_model_path)).to(self.device)  # type: ignore
-                        self.clip_processor = CLIPProcessor.from_pretrained(str(clip_model_path))  # type: ignore
-                    else:
-                        raise FileNotFoundError("Aucun snapshot CLIP trouvé")
-                else:
-                    self.clip_model = CLIPModel.from_pretrained(str(clip_path)).to(self.device)  # type: ignore
-                    self.clip_processor = CLIPProcessor.from_pretrained(str(clip_path))  # type: ignore
-            else:
-                self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(self.device)  # type: ignore
-                self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")  # type: ignore
-            
-            self.clip_model.eval()  # type: ignore
+            # Instance partagée avec les autres modules (chargée une seule fois par processus)
+            self.clip_model, self.clip_processor, _ = get_clip(self.device)
             print("✅ CLIP chargé pour détection de matériaux")
         except Exception as e:
             print(f"⚠️ CLIP non disponible: {e}")
@@ -0,0 +1,115 @@
+"""
+Service de plus proches voisins batché pour le post-traitement des maillages.
+
+Remplace les boucles Python de KDTreeFlann.search_knn_vector_3d (une requête par point) par
+des requêtes cKDTree groupées sur des tableaux entiers, multi-threadées (workers=-1) et
+découpées en blocs pour borner la mémoire.
+
+Les distances sont renvoyées au carré, comme search_knn_vector_3d d'Open3D, afin que les
+seuils et densités calculés auparavant restent identiques.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Nombre de requêtes traitées par bloc
+QUERY_CHUNK_SIZE = 200000
+
+
+class NeighborService:
+    """
+    KD-tree construit une fois sur un nuage de référence, interrogé par lots.
+
+    Args:
+        points: Nuage de référence (N, 3) ou PointCloud Open3D
+        workers: Nombre de threads de requête (-1 = tous les cœurs)
+        chunk_size: Nombre de requêtes par bloc
+    """
+
+    def __init__(self, points, workers=-1, chunk_size=QUERY_CHUNK_SIZE):
+        if hasattr(points, 'points'):
+            points = points.points
+        self.points = np.asarray(points, dtype=np.float64)
+        self.tree = cKDTree(self.points)
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, queries, k):
+        """
+        k plus proches voisins de chaque requête.
+
+        Returns:
+            Tuple (distances au carré (M, k), indices (M, k)); k est borné par la taille du nuage
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        k = max(1, min(int(k), len(self.points)))
+        dist2 = np.empty((len(queries), k))
+        indices = np.empty((len(queries), k), dtype=np.int64)
+
+        for start in range(0, len(queries), self.chunk_size):
+            stop = start + self.chunk_size
+            dist, idx = self.tree.query(queries[start:stop], k=k, workers=self.workers)
+            dist2[start:stop] = np.reshape(dist, (-1, k)) ** 2
+            indices[start:stop] = np.reshape(idx, (-1, k))
+        return dist2, indices
+
+    def self_neighbors(self, k, indices=None):
+        """
+        Voisins des points du nuage lui-même (k voisins point compris, comme Open3D), sans le point.
+
+        Args:
+            k: Nombre de voisins demandés, point lui-même inclus
+            indices: Sous-ensemble de points à interroger (par défaut tous)
+
+        Returns:
+            Tuple (distances au carré (M, k-1), indices (M, k-1))
+        """
+        queries = self.points if indices is None else self.points[indices]
+        dist2, idx = self.query(queries, k)
+        return dist2[:, 1:], idx[:, 1:]
+
+    def mean_neighbor_distance(self, k, indices=None):
+        """Moyenne des distances au carré aux k-1 plus proches voisins (NaN si le nuage a un seul point)"""
+        dist2, _ = self.self_neighbors(k, indices)
+        if dist2.shape[1] == 0:
+            return np.full(len(dist2), np.nan)
+        return dist2.mean(axis=1)
+
+    def local_density(self, k, indices=None):
+        """Densité locale 1 / (distance moyenne aux voisins)², 0 pour les points confondus"""
+        mean_dist = self.mean_neighbor_distance(k, indices)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density = 1.0 / mean_dist ** 2
+        density[~np.isfinite(density)] = 0.0
+        return density
+
+    def statistical_outlier_mask(self, k, std_ratio=2.0):
+        """Masque des points conservés: distance moyenne aux voisins <= moyenne + std_ratio * écart-type"""
+        mean_dist = self.mean_neighbor_distance(k)
+        threshold = np.mean(mean_dist) + std_ratio * np.std(mean_dist)
+        return mean_dist <= threshold, threshold
+
+    def transfer_colors(self, targets, colors, k):
+        """Couleur de chaque cible = moyenne des couleurs de ses k plus proches voisins"""
+        colors = np.asarray(colors, dtype=np.float64)
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+        result = np.empty((len(targets), colors.shape[1]))
+        for start in range(0, len(targets), self.chunk_size):
+            _, idx = self.query(targets[start:start + self.chunk_size], k)
+            result[start:start + self.chunk_size] = colors[idx].mean(axis=1)
+        return result
+
+    def median_filter_colors(self, colors, k):
+        """Débruitage des couleurs du nuage: médiane des couleurs des k-1 voisins (point exclu)"""
+        colors = np.asarray(colors, dtype=np.float64)
+        if len(self.points) < 2:
+            return colors.copy()
+        result = np.empty_like(colors)
+        for start in range(0, len(colors), self.chunk_size):
+            block = np.arange(start, min(start + self.chunk_size, len(colors)))
+            _, idx = self.self_neighbors(k, block)
+            result[block] = np.median(colors[idx], axis=1)
+        return result
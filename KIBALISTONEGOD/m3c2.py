@@ -0,0 +1,226 @@
+"""
+Moteur M3C2 (Multiscale Model-to-Model Cloud Comparison, Lague et al. 2013) vectorisé.
+
+Pour chaque point de calcul (core point) : normale estimée par ACP des voisins de l'époque
+de référence, puis position moyenne de chaque époque le long de la normale dans un cylindre
+centré sur le point. La distance M3C2 est l'écart entre ces deux positions, accompagnée de
+son niveau de détection (LoD 95 %).
+
+Les voisinages sont obtenus par requêtes query_ball_point groupées, les covariances et les
+projections sont calculées sur des tableaux aplatis (bincount), et le calcul peut être
+réparti par blocs de points de calcul sur plusieurs processus. La mémoire est bornée par le
+nombre de voisins : chaque requête est découpée en lots de centres d'après le nombre de
+voisins compté au préalable (return_length), et les cylindres sont parcourus par tranches
+le long de la normale au lieu d'une seule sphère englobante.
+"""
+
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.spatial import cKDTree
+from point_sampling import voxel_grid_indices
+
+# Nombre de points de calcul traités par bloc
+CORE_CHUNK_SIZE = 20000
+
+# Nombre maximal de voisins aplatis en mémoire par requête
+MAX_NEIGHBORS_PER_QUERY = 2_000_000
+
+# État des processus de calcul (arbres KD construits une fois par processus)
+_WORKER_STATE = {}
+
+
+def _flatten_neighbors(tree, centers, radius, workers):
+    """Voisinages de plusieurs centres sous forme aplatie: (indice du centre, indice du voisin)"""
+    neighbors = tree.query_ball_point(centers, radius, workers=workers, return_sorted=False)
+    lengths = np.fromiter((len(n) for n in neighbors), dtype=np.int64, count=len(neighbors))
+    flat = np.fromiter(itertools.chain.from_iterable(neighbors), dtype=np.int64, count=int(lengths.sum()))
+    owner = np.repeat(np.arange(len(centers)), lengths)
+    return owner, flat, lengths
+
+
+def _neighbor_batches(tree, centers, radius, workers, max_neighbors=MAX_NEIGHBORS_PER_QUERY):
+    """
+    Voisinages aplatis par lots de centres consécutifs, chaque lot totalisant au plus
+    max_neighbors voisins (au moins un centre par lot)
+
+    Yields:
+        Tuple (début, fin, indice local du centre, indice du voisin)
+    """
+    lengths = tree.query_ball_point(centers, radius, workers=workers, return_length=True)
+    cumulative = np.cumsum(lengths)
+    start = 0
+    while start < len(centers):
+        base = cumulative[start - 1] if start else 0
+        stop = min(max(int(np.searchsorted(cumulative, base + max_neighbors, side='right')), start + 1),
+                   len(centers))
+        owner, flat, _ = _flatten_neighbors(tree, centers[start:stop], radius, workers)
+        yield start, stop, owner, flat
+        start = stop
+
+
+def estimate_normals(points, tree, centers, radius, workers=-1):
+    """
+    Normales aux centres par ACP des voisins dans une sphère (décomposition propre batchée).
+
+    Les normales sont orientées vers +Z pour que le signe des distances soit cohérent.
+
+    Returns:
+        Tuple (normales (M, 3), nombre de voisins (M,))
+    """
+    normals = np.empty((len(centers), 3))
+    counts = np.zeros(len(centers), dtype=np.int64)
+    for start, stop, owner, flat in _neighbor_batches(tree, centers, radius, workers):
+        n_centers = stop - start
+        batch_centers = centers[start:stop]
+        local = points[flat] - batch_centers[owner]  # Coordonnées locales (précision pour les grandes coordonnées)
+
+        batch_counts = np.bincount(owner, minlength=n_centers)
+        safe_counts = np.maximum(batch_counts, 1)
+        mean = np.stack([np.bincount(owner, weights=local[:, d], minlength=n_centers)
+                         for d in range(3)], axis=1) / safe_counts[:, None]
+
+        cov = np.empty((n_centers, 3, 3))
+        for i in range(3):
+            for j in range(i, 3):
+                moment = np.bincount(owner, weights=local[:, i] * local[:, j], minlength=n_centers) / safe_counts
+                cov[:, i, j] = cov[:, j, i] = moment - mean[:, i] * mean[:, j]
+
+        _, eigenvectors = np.linalg.eigh(cov)
+        normals[start:stop] = eigenvectors[:, :, 0]  # Direction de plus faible variance
+        counts[start:stop] = batch_counts
+    normals[normals[:, 2] < 0] *= -1
+    return normals, counts
+
+
+def cylinder_statistics(points, tree, centers, normals, radius, max_depth, workers=-1):
+    """
+    Statistiques des points d'une époque dans les cylindres (rayon radius, demi-hauteur max_depth)
+    orientés selon les normales.
+
+    Le cylindre est découpé en tranches de hauteur voisine de radius le long de la normale ;
+    chaque tranche est interrogée par une sphère à peine plus grande qu'elle, et un point
+    n'est compté que dans la tranche qui contient sa projection.
+
+    Returns:
+        Tuple (nombre de points, position moyenne le long de la normale, écart-type)
+    """
+    n_centers = len(centers)
+    n_slices = max(1, int(np.ceil(max_depth / radius)))  # Par demi-cylindre
+    edges = np.linspace(-max_depth, max_depth, 2 * n_slices + 1)
+    half_height = (edges[1] - edges[0]) / 2
+    slice_radius = np.hypot(radius, half_height) * (1 + 1e-9)
+
+    count = np.zeros(n_centers, dtype=np.int64)
+    total = np.zeros(n_centers)
+    total_sq = np.zeros(n_centers)
+    for k, (low, high) in enumerate(zip(edges[:-1], edges[1:])):
+        slice_centers = centers + normals * ((low + high) / 2)
+        last = k == len(edges) - 2
+        for start, stop, owner, flat in _neighbor_batches(tree, slice_centers, slice_radius, workers):
+            vec = points[flat] - centers[start:stop][owner]
+            along = np.einsum('ij,ij->i', vec, normals[start:stop][owner])
+            radial2 = np.einsum('ij,ij->i', vec, vec) - along ** 2
+
+            # Tranche [low, high[ (la dernière inclut max_depth)
+            keep = (radial2 <= radius ** 2) & (along >= low) & ((along < high) | (last & (along <= high)))
+            index, along = owner[keep] + start, along[keep]
+            count += np.bincount(index, minlength=n_centers)
+            total += np.bincount(index, weights=along, minlength=n_centers)
+            total_sq += np.bincount(index, weights=along ** 2, minlength=n_centers)
+
+    safe_count = np.maximum(count, 1)
+    mean = total / safe_count
+    sq_mean = total_sq / safe_count
+    variance = np.clip(sq_mean - mean ** 2, 0.0, None) * count / np.maximum(count - 1, 1)  # Variance corrigée
+    mean[count == 0] = np.nan
+    return count, mean, np.sqrt(variance)
+
+
+def _m3c2_chunk(state, cores, normal_radius, projection_radius, max_depth, registration_error, workers):
+    points1, points2 = state['points1'], state['points2']
+    tree1, tree2 = state['tree1'], state['tree2']
+
+    normals, normal_counts = estimate_normals(points1, tree1, cores, normal_radius, workers)
+    n1, mean1, std1 = cylinder_statistics(points1, tree1, cores, normals, projection_radius, max_depth, workers)
+    n2, mean2, std2 = cylinder_statistics(points2, tree2, cores, normals, projection_radius, max_depth, workers)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lod95 = 1.96 * np.sqrt(std1 ** 2 / n1 + std2 ** 2 / n2) + registration_error
+    normals[normal_counts < 3] = np.nan
+
+    return {
+        'normal': normals,
+        'distance': mean2 - mean1,
+        'lod95': lod95,
+        'n1': n1,
+        'n2': n2,
+        'std1': std1,
+        'std2': std2,
+    }
+
+
+def _init_worker(points1, points2):
+    _WORKER_STATE.update(points1=points1, points2=points2,
+                         tree1=cKDTree(points1), tree2=cKDTree(points2))
+
+
+def _worker_chunk(cores, *args):
+    return _m3c2_chunk(_WORKER_STATE, cores, *args)
+
+
+def select_core_points(points, spacing):
+    """Points de calcul: un point par voxel de taille spacing (le plus proche du barycentre)"""
+    if spacing is None or spacing <= 0:
+        return np.arange(len(points))
+    return voxel_grid_indices(points, spacing, mode='centroid')
+
+
+def compute_m3c2(points1, points2, core_points=None, normal_radius=0.1, projection_radius=0.1,
+                 max_depth=1.0, registration_error=0.0, n_jobs=1, chunk_size=CORE_CHUNK_SIZE,
+                 progress_callback=None):
+    """
+    Distances M3C2 entre deux époques.
+
+    Args:
+        points1: Nuage de référence (N1, 3)
+        points2: Nuage de comparaison (N2, 3)
+        core_points: Points de calcul (M, 3); par défaut tous les points de référence
+        normal_radius: Rayon de la sphère d'estimation des normales
+        projection_radius: Rayon des cylindres de projection
+        max_depth: Demi-hauteur maximale des cylindres (distance maximale détectable)
+        registration_error: Erreur de recalage ajoutée au niveau de détection
+        n_jobs: Nombre de processus (1 = calcul dans le processus courant)
+        chunk_size: Nombre de points de calcul par bloc
+        progress_callback: Appelée avec la fraction de blocs traités
+
+    Returns:
+        Dictionnaire de tableaux par point de calcul : 'core_points', 'normal', 'distance',
+        'lod95', 'n1', 'n2', 'std1', 'std2'
+    """
+    points1 = np.asarray(points1, dtype=np.float64)
+    points2 = np.asarray(points2, dtype=np.float64)
+    cores = points1 if core_points is None else np.asarray(core_points, dtype=np.float64)
+    chunks = [cores[start:start + chunk_size] for start in range(0, len(cores), chunk_size)]
+    results = []
+
+    if n_jobs == 1 or len(chunks) <= 1:
+        state = {'points1': points1, 'points2': points2, 'tree1': cKDTree(points1), 'tree2': cKDTree(points2)}
+        for i, chunk in enumerate(chunks, start=1):
+            results.append(_m3c2_chunk(state, chunk, normal_radius, projection_radius, max_depth,
+                                       registration_error, -1))
+            if progress_callback is not None:
+                progress_callback(i / len(chunks))
+    else:
+        args = (normal_radius, projection_radius, max_depth, registration_error, 1)
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(points1, points2)) as executor:
+            futures = [executor.submit(_worker_chunk, chunk, *args) for chunk in chunks]
+            for i, future in enumerate(futures, start=1):
+                results.append(future.result())
+                if progress_callback is not None:
+                    progress_callback(i / len(chunks))
+
+    merged = {key: np.concatenate([r[key] for r in results]) for key in results[0]} if results else {}
+    merged['core_points'] = cores
+    return merged
@@ -0,0 +1,121 @@
+"""
+Registre des modèles partagés dans le processus.
+
+Chaque modèle est chargé une seule fois, au premier appel, puis réutilisé par tous les
+modules (Dust3DGenerator, TexturePBRAnalyzer, IntelligentVFXEngine, application Dust3r).
+Le chargement est protégé par un verrou par modèle : deux threads qui demandent le même
+modèle en même temps ne le chargent qu'une fois, sans bloquer le chargement des autres.
+"""
+
+import gc
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+import torch
+
+try:
+    from transformers import CLIPModel, CLIPProcessor
+    CLIP_AVAILABLE = True
+except ImportError:
+    CLIP_AVAILABLE = False
+    CLIPModel = None  # type: ignore
+    CLIPProcessor = None  # type: ignore
+
+CLIP_HUB_ID = "openai/clip-vit-base-patch32"
+
+# Copie locale de CLIP (structure cache HuggingFace avec snapshots/)
+LOCAL_CLIP_DIR = Path(__file__).parent / "models--openai--clip-vit-base-patch32"
+
+DEFAULT_DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+# Nombre d'images encodées par CLIP en un seul passage
+CLIP_BATCH_SIZE = 16
+
+_models: Dict[Hashable, Any] = {}
+_load_locks: Dict[Hashable, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def get_model(key: Hashable, loader: Callable[[], Any]) -> Any:
+    """
+    Instance partagée pour key, créée par loader() au premier appel
+
+    Si loader() lève une exception, rien n'est enregistré et l'appel suivant réessaie.
+    """
+    with _registry_lock:
+        if key in _models:
+            return _models[key]
+        lock = _load_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        with _registry_lock:
+            if key in _models:
+                return _models[key]
+        instance = loader()
+        with _registry_lock:
+            _models[key] = instance
+        return instance
+
+
+def release_models() -> None:
+    """Oublie tous les modèles chargés (la mémoire est libérée quand plus aucun module ne les référence)"""
+    with _registry_lock:
+        _models.clear()
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def resolve_clip_source() -> str:
+    """Chemin du snapshot CLIP local s'il existe, sinon identifiant HuggingFace"""
+    if LOCAL_CLIP_DIR.exists():
+        snapshots_dir = LOCAL_CLIP_DIR / "snapshots"
+        if snapshots_dir.exists():
+            snapshot_dirs = sorted(snapshots_dir.iterdir())
+            if not snapshot_dirs:
+                raise FileNotFoundError("Aucun snapshot CLIP trouvé")
+            return str(snapshot_dirs[0])
+        return str(LOCAL_CLIP_DIR)
+    return CLIP_HUB_ID
+
+
+def get_clip(device: str = DEFAULT_DEVICE) -> Tuple[Any, Any, str]:
+    """
+    Modèle et processeur CLIP partagés pour device
+
+    Returns:
+        Tuple (modèle en mode eval, processeur, identifiant du modèle chargé)
+    """
+    if not CLIP_AVAILABLE:
+        raise ImportError("transformers non disponible - Installation requise: pip install transformers")
+    source = resolve_clip_source()
+
+    def load():
+        print(f"📦 Chargement CLIP depuis {source} ({device})")
+        model = CLIPModel.from_pretrained(source).to(device)  # type: ignore
+        model.eval()
+        processor = CLIPProcessor.from_pretrained(source)  # type: ignore
+        print("✅ CLIP chargé avec succès")
+        return model, processor, source
+
+    return get_model(('clip', source, str(device)), load)
+
+
+def clip_image_features(model: Any, processor: Any, images: List[Any], device: str = DEFAULT_DEVICE,
+                        batch_size: int = CLIP_BATCH_SIZE, normalize: bool = False) -> torch.Tensor:
+    """
+    Features image CLIP (N, D) calculées par mini-lots
+
+    Args:
+        normalize: Normaliser chaque feature (norme L2 = 1)
+    """
+    features = []
+    with torch.no_grad():
+        for start in range(0, len(images), batch_size):
+            inputs = processor(images=images[start:start + batch_size], return_tensors="pt").to(device)
+            batch = model.get_image_features(**inputs).float()
+            if normalize:
+                batch = batch / batch.norm(dim=-1, keepdim=True)
+            features.append(batch)
+    return torch.cat(features)
@@ -0,0 +1,370 @@
+"""
+Pré-sélection des paires d'images pour l'inférence DUSt3R.
+
+Le graphe complet fait croître le nombre de paires (et le temps d'inférence) avec le carré
+du nombre de photos. Chaque image est ici résumée par un descripteur global (histogrammes
+d'orientation des gradients par cellule, miniature en niveaux de gris, histogramme de
+couleurs) ; les plus proches voisins globaux de chaque
+image sont vérifiés par correspondances ORB et seules les k meilleures paires sont gardées.
+Un arbre couvrant de similarité maximale est ajouté pour que le graphe reste connexe,
+condition de l'alignement global initialisé par arbre couvrant (init='mst').
+"""
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse.csgraph import minimum_spanning_tree
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    cv2 = None  # type: ignore
+    CV2_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None  # type: ignore
+    PIL_AVAILABLE = False
+
+# Nombre de voisins gardés par image
+PAIR_TOP_K = 4
+
+# Nombre de candidats globaux vérifiés par ORB, en multiple de k
+CANDIDATE_FACTOR = 2
+
+# Descripteur global : grille et orientations des histogrammes de gradients, côté de la
+# miniature, nombre de classes par canal de couleur
+ORIENTATION_GRID = 4
+ORIENTATION_BINS = 8
+THUMBNAIL_SIZE = 8
+COLOR_BINS = 8
+
+# ORB : nombre de points, plus grand côté de l'image analysée, distance de Hamming maximale
+ORB_FEATURES = 1000
+ORB_MAX_SIDE = 1024
+ORB_MAX_DISTANCE = 50
+
+# Nombre minimal d'images à analyser pour justifier le démarrage d'un pool de processus
+PARALLEL_MIN_IMAGES = 8
+
+
+def _to_array(image) -> np.ndarray:
+    """Image PIL ou tableau (H, W[, 3]) -> tableau uint8 (H, W, 3)"""
+    if hasattr(image, 'convert'):
+        image = image.convert('RGB')
+    array = np.asarray(image)
+    if array.ndim == 2:
+        array = np.repeat(array[:, :, None], 3, axis=2)
+    return array[:, :, :3]
+
+
+def load_image(path: str, max_side: int = ORB_MAX_SIDE) -> np.ndarray:
+    """
+    Fichier image -> tableau uint8 (H, W, 3) dont le plus grand côté vaut au plus max_side
+
+    Avec PIL, le décodage JPEG se fait directement à une résolution réduite (draft) : l'image
+    pleine résolution n'est jamais entièrement en mémoire.
+    """
+    if PIL_AVAILABLE:
+        with Image.open(path) as img:
+            img.draft('RGB', (max_side, max_side))
+            img = img.convert('RGB')
+            img.thumbnail((max_side, max_side))
+            return np.asarray(img)
+    if not CV2_AVAILABLE:
+        raise ImportError("PIL ou OpenCV requis pour lire les images")
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Image illisible: {path}")
+    scale = max_side / max(img.shape[:2])
+    if scale < 1:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def _area_resize(array: np.ndarray, size: int) -> np.ndarray:
+    """
+    Grille (size, size) par moyenne de blocs de tailles quasi égales
+
+    Un côté plus petit que size est agrandi par répétition des lignes ou colonnes
+    (reduceat renvoie l'élément seul quand deux indices de début sont égaux).
+    """
+    h, w = array.shape[:2]
+    rows = np.arange(size) * h // size
+    cols = np.arange(size) * w // size
+    sums = np.add.reduceat(np.add.reduceat(array.astype(np.float64), rows, axis=0), cols, axis=1)
+    counts = np.outer(np.maximum(np.diff(np.append(rows, h)), 1), np.maximum(np.diff(np.append(cols, w)), 1))
+    return sums / counts.reshape(counts.shape + (1,) * (array.ndim - 2))
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    return vector / (np.linalg.norm(vector) + 1e-9)
+
+
+def global_descriptor(image, size: int = THUMBNAIL_SIZE, bins: int = COLOR_BINS,
+                      grid: int = ORIENTATION_GRID, orientations: int = ORIENTATION_BINS) -> np.ndarray:
+    """
+    Descripteur global normalisé (poids égal des trois parties) :
+    histogrammes d'orientation des gradients sur une grille grid x grid (tolérants aux
+    petits décalages de point de vue), miniature en niveaux de gris centrée-réduite
+    (disposition de la scène) et histogramme de couleurs par canal
+    """
+    rgb = _to_array(image)
+    gray = rgb.mean(axis=2)
+
+    grad_y, grad_x = np.gradient(gray)
+    magnitude = np.hypot(grad_x, grad_y)
+    orientation = np.minimum(((np.arctan2(grad_y, grad_x) % np.pi) / np.pi * orientations).astype(np.int64),
+                             orientations - 1)
+    h, w = gray.shape
+    cells = (np.arange(h) * grid // h)[:, None] * grid + (np.arange(w) * grid // w)[None, :]
+    gradients = np.bincount((cells * orientations + orientation).ravel(), weights=magnitude.ravel(),
+                            minlength=grid * grid * orientations)
+    gradients = _unit(np.sqrt(gradients))
+
+    thumbnail = _area_resize(gray, size).ravel()
+    thumbnail = _unit(thumbnail - thumbnail.mean())
+
+    hist = np.concatenate([np.bincount(rgb[:, :, c].ravel().astype(np.int64) * bins // 256, minlength=bins)
+                           for c in range(3)]).astype(np.float64)
+    hist = _unit(np.sqrt(hist / max(hist.sum(), 1)))  # Racine : similarité de Hellinger
+
+    return _unit(np.concatenate([gradients, thumbnail, hist]))
+
+
+def global_descriptor_size(size: int = THUMBNAIL_SIZE, bins: int = COLOR_BINS,
+                           grid: int = ORIENTATION_GRID, orientations: int = ORIENTATION_BINS) -> int:
+    """Longueur du vecteur renvoyé par global_descriptor"""
+    return grid * grid * orientations + size * size + 3 * bins
+
+
+def orb_descriptors(image, n_features: int = ORB_FEATURES, max_side: int = ORB_MAX_SIDE) -> Optional[np.ndarray]:
+    """Descripteurs ORB binaires (N, 32) de l'image réduite à max_side, None sans OpenCV"""
+    if not CV2_AVAILABLE:
+        return None
+    gray = np.ascontiguousarray(_to_array(image).mean(axis=2).astype(np.uint8))
+    scale = max_side / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, descriptors = cv2.ORB_create(n_features).detectAndCompute(gray, None)
+    return descriptors
+
+
+def hamming_bits(descriptors: np.ndarray) -> np.ndarray:
+    """Descripteurs binaires (N, B octets) -> bits (N, 8B) en float32 pour le calcul matriciel"""
+    return np.unpackbits(np.asarray(descriptors, dtype=np.uint8), axis=1).astype(np.float32)
+
+
+def hamming_match_count(bits1: np.ndarray, bits2: np.ndarray, max_distance: int = ORB_MAX_DISTANCE) -> int:
+    """
+    Nombre de correspondances croisées (plus proches voisins mutuels) de distance de
+    Hamming inférieure à max_distance, à partir de hamming_bits()
+
+    Les distances de toutes les paires sont obtenues par deux produits matriciels
+    (bits différents = b1·(1-b2) + (1-b1)·b2), équivalent vectorisé de
+    BFMatcher(NORM_HAMMING, crossCheck=True).
+    """
+    if len(bits1) == 0 or len(bits2) == 0:
+        return 0
+    distances = bits1 @ (1.0 - bits2).T + (1.0 - bits1) @ bits2.T
+    best_in_2 = distances.argmin(axis=1)
+    best_in_1 = distances.argmin(axis=0)
+    mutual = best_in_1[best_in_2] == np.arange(len(bits1))
+    return int(np.count_nonzero(mutual & (distances[np.arange(len(bits1)), best_in_2] < max_distance)))
+
+
+def orb_match_count(desc1: Optional[np.ndarray], desc2: Optional[np.ndarray],
+                    max_distance: int = ORB_MAX_DISTANCE) -> int:
+    """Nombre de correspondances ORB croisées de distance inférieure à max_distance"""
+    if desc1 is None or desc2 is None:
+        return 0
+    return hamming_match_count(hamming_bits(desc1), hamming_bits(desc2), max_distance)
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Empreinte SHA-1 du contenu d'un fichier"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _orb_file_descriptors(path: str, n_features: int) -> np.ndarray:
+    """Descripteurs ORB d'un fichier image en niveaux de gris (tableau vide si illisible)"""
+    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return np.empty((0, 32), dtype=np.uint8)
+    _, descriptors = cv2.ORB_create(n_features).detectAndCompute(img, None)
+    return descriptors if descriptors is not None else np.empty((0, 32), dtype=np.uint8)
+
+
+def cached_orb_descriptors(paths: Sequence[str], cache_dir: str, n_features: int = ORB_FEATURES,
+                           n_jobs: Optional[int] = None,
+                           progress_callback: Optional[Callable[[int, int], None]] = None) -> Dict[str, np.ndarray]:
+    """
+    Descripteurs ORB de fichiers images, mis en cache sur disque par empreinte du contenu
+
+    Seules les images absentes du cache sont analysées, sur un pool de processus lorsqu'il
+    y en a au moins PARALLEL_MIN_IMAGES.
+
+    Args:
+        paths: Fichiers images
+        cache_dir: Dossier du cache (un fichier .npy par image et nombre de points ORB)
+        n_features: Nombre maximal de points ORB par image
+        n_jobs: Nombre de processus (None = un par cœur, 1 = dans le processus courant)
+        progress_callback: Appelée avec (images traitées, total)
+
+    Returns:
+        {chemin: descripteurs (N, 32) uint8} (N = 0 si l'image est illisible ou sans point)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    descriptors, missing = {}, {}
+    for path in paths:
+        cache_path = os.path.join(cache_dir, f"{file_hash(path)}_{n_features}.npy")
+        if os.path.exists(cache_path):
+            descriptors[path] = np.load(cache_path)
+        else:
+            missing[path] = cache_path
+
+    done = len(descriptors)
+    if progress_callback is not None:
+        progress_callback(done, len(paths))
+
+    def store(path, result):
+        np.save(missing[path], result)
+        descriptors[path] = result
+
+    n_jobs = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+    if n_jobs == 1 or len(missing) < PARALLEL_MIN_IMAGES:
+        for path in missing:
+            store(path, _orb_file_descriptors(path, n_features))
+            done += 1
+            if progress_callback is not None:
+                progress_callback(done, len(paths))
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {executor.submit(_orb_file_descriptors, path, n_features): path for path in missing}
+            for future in as_completed(futures):
+                store(futures[future], future.result())
+                done += 1
+                if progress_callback is not None:
+                    progress_callback(done, len(paths))
+
+    return {path: descriptors[path] for path in paths}
+
+
+@dataclass
+class PairSelection:
+    """Paires retenues (i < j) et statistiques de la sélection"""
+    n_images: int
+    edges: List[Tuple[int, int]]
+    tree_edges: int
+    verified_pairs: int
+    scores: Dict[Tuple[int, int], float] = field(default_factory=dict)
+
+    @property
+    def complete_pairs(self) -> int:
+        """Nombre de paires (symétrisées) du graphe complet"""
+        return self.n_images * (self.n_images - 1)
+
+    @property
+    def selected_pairs(self) -> int:
+        """Nombre de paires (symétrisées) envoyées à l'inférence"""
+        return 2 * len(self.edges)
+
+    def report(self) -> Dict[str, Any]:
+        saved = self.complete_pairs - self.selected_pairs
+        return {
+            'images': self.n_images,
+            'complete_pairs': self.complete_pairs,
+            'selected_pairs': self.selected_pairs,
+            'saved_pairs': saved,
+            'saved_ratio': saved / self.complete_pairs if self.complete_pairs else 0.0,
+            'spanning_tree_edges': self.tree_edges,
+            'orb_verified_pairs': self.verified_pairs,
+        }
+
+    def dust3r_pairs(self, images: Sequence[Any], symmetrize: bool = True) -> List[Tuple[Any, Any]]:
+        """Liste de paires au format de dust3r.image_pairs.make_pairs"""
+        pairs = [(images[i], images[j]) for i, j in self.edges]
+        if symmetrize:
+            pairs += [(img2, img1) for img1, img2 in pairs]
+        return pairs
+
+
+def select_pairs(images: Sequence[Any], k: int = PAIR_TOP_K, use_orb: bool = True,
+                 candidate_factor: int = CANDIDATE_FACTOR) -> PairSelection:
+    """
+    Sélectionne un graphe de paires clairsemé et connexe
+
+    Args:
+        images: Chemins de fichiers (lus un à un, réduits à ORB_MAX_SIDE), images PIL ou tableaux (H, W, 3)
+        k: Nombre de voisins gardés par image
+        use_orb: Vérifier les candidats par correspondances ORB (si OpenCV est disponible)
+        candidate_factor: Nombre de candidats globaux vérifiés par image, en multiple de k
+
+    Returns:
+        PairSelection (paires i < j dans l'ordre des images)
+    """
+    n = len(images)
+    if n < 2:
+        return PairSelection(n, [], 0, 0)
+
+    # Une seule image décodée à la fois : seuls les descripteurs sont gardés
+    with_orb = use_orb and CV2_AVAILABLE
+    descriptors = np.empty((n, global_descriptor_size()))
+    bits = []
+    for i, image in enumerate(images):
+        rgb = load_image(image) if isinstance(image, (str, os.PathLike)) else _to_array(image)
+        descriptors[i] = global_descriptor(rgb)
+        if with_orb:
+            orb = orb_descriptors(rgb)
+            bits.append(hamming_bits(orb) if orb is not None else np.empty((0, 256), dtype=np.float32))
+        del rgb
+    similarity = descriptors @ descriptors.T
+    np.fill_diagonal(similarity, -np.inf)
+
+    # Candidats : plus proches voisins globaux de chaque image
+    n_candidates = min(n - 1, max(k, k * candidate_factor))
+    neighbors = np.argsort(-similarity, axis=1, kind='stable')[:, :n_candidates]
+    candidates = sorted({(min(i, j), max(i, j)) for i in range(n) for j in neighbors[i].tolist()})
+
+    # Score des candidats : correspondances ORB (ramenées à [0, 1]) ou similarité globale
+    verified = 0
+    scores = {pair: float(similarity[pair]) for pair in candidates}
+    if with_orb:
+        for i, j in candidates:
+            scores[(i, j)] = hamming_match_count(bits[i], bits[j]) / ORB_FEATURES
+            verified += 1
+
+    # k meilleurs candidats par image
+    per_image = [[] for _ in range(n)]
+    for (i, j), score in scores.items():
+        per_image[i].append((score, j))
+        per_image[j].append((score, i))
+    edges = set()
+    for i, ranked in enumerate(per_image):
+        for _, j in sorted(ranked, key=lambda item: -item[0])[:k]:
+            edges.add((min(i, j), max(i, j)))
+
+    # Arbre couvrant de poids maximal : candidats vérifiés prioritaires, puis similarité globale
+    weight = np.where(np.isfinite(similarity), similarity, 0.0)
+    for pair, score in scores.items():
+        weight[pair] = weight[pair[::-1]] = 2.0 + score
+    cost = weight.max() - weight + 1e-6  # Coût strictement positif (0 = arête absente)
+    np.fill_diagonal(cost, 0.0)
+    tree = minimum_spanning_tree(cost).tocoo()
+    tree_edges = {(min(i, j), max(i, j)) for i, j in zip(tree.row.tolist(), tree.col.tolist())}
+    edges |= tree_edges
+
+    edges = sorted(edges)
+    return PairSelection(n, edges, len(tree_edges), verified,
+                         {pair: scores.get(pair, float(similarity[pair])) for pair in edges})
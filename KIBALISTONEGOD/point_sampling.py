@@ -0,0 +1,158 @@
+"""
+Échantillonnage rapide de nuages de points: grille de voxels par hachage vectorisé
+et farthest point sampling (exact ou approché par graines de voxels + KD-tree).
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Au-delà de ce nombre d'opérations (points x échantillons), le FPS exact est remplacé par l'approximation
+EXACT_FPS_MAX_OPERATIONS = 2e9
+
+
+def voxel_keys(points, voxel_size, origin=None):
+    """
+    Identifiant entier de voxel pour chaque point (coordonnées de grille empaquetées sur 63 bits).
+
+    Returns:
+        Tableau int64 (N,) des clés de voxel
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if origin is None:
+        origin = points.min(axis=0)
+    grid = np.floor((points - origin) / voxel_size).astype(np.int64)
+    grid -= grid.min(axis=0)
+    dims = grid.max(axis=0) + 1
+
+    if np.prod(dims.astype(np.float64)) < 2 ** 62:
+        return (grid[:, 0] * dims[1] + grid[:, 1]) * dims[2] + grid[:, 2]
+
+    # Grille trop étendue pour l'empaquetage: clés par identification des lignes uniques
+    return np.unique(grid, axis=0, return_inverse=True)[1].ravel().astype(np.int64)
+
+
+def voxel_grid_indices(points, voxel_size, mode='first'):
+    """
+    Un point représentatif par voxel occupé.
+
+    Args:
+        points: Tableau (N, 3)
+        voxel_size: Taille de voxel
+        mode: 'first' (premier point de chaque voxel) ou 'centroid'
+            (point le plus proche du barycentre du voxel)
+
+    Returns:
+        Indices (triés) des points retenus
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Codes de voxel par hachage (numérotés dans l'ordre de première apparition)
+    inverse, uniques = pd.factorize(voxel_keys(points, voxel_size))
+    n_voxels = len(uniques)
+    if mode == 'first':
+        # Un code apparaît pour la première fois lorsqu'il dépasse tous les codes précédents
+        previous_max = np.maximum.accumulate(np.concatenate([[-1], inverse[:-1]]))
+        return np.flatnonzero(inverse > previous_max)
+
+    counts = np.bincount(inverse, minlength=n_voxels)
+    centroids = np.stack([np.bincount(inverse, weights=points[:, d], minlength=n_voxels)
+                          for d in range(3)], axis=1) / counts[:, None]
+    dist2 = np.sum((points - centroids[inverse]) ** 2, axis=1)
+
+    # Point le plus proche du barycentre dans chaque voxel (agrégation par hachage, sans tri global)
+    return np.sort(pd.Series(dist2).groupby(inverse, sort=False).idxmin().to_numpy())
+
+
+def voxel_size_for_count(points, target_count, tolerance=0.1, max_steps=10):
+    """Taille de voxel donnant environ target_count voxels occupés (recherche par dichotomie en échelle log)"""
+    points = np.asarray(points, dtype=np.float64)
+    extent = np.maximum(points.max(axis=0) - points.min(axis=0), 1e-9)
+    # Estimation initiale: surface équivalente pour un nuage photogrammétrique (~2D)
+    low, high = np.max(extent) / 1e5, np.max(extent)
+    size = np.sqrt(np.prod(np.sort(extent)[1:]) / max(target_count, 1))
+    size = min(max(size, low), high)
+
+    for _ in range(max_steps):
+        n_voxels = len(pd.unique(voxel_keys(points, size)))
+        if abs(n_voxels - target_count) <= tolerance * target_count:
+            break
+        if n_voxels > target_count:
+            low = size
+        else:
+            high = size
+        size = np.sqrt(low * high)
+    return size
+
+
+def farthest_point_sampling(points, n_samples, start_index=None, random_state=None):
+    """
+    Farthest point sampling exact (mise à jour vectorisée des distances, O(N·k)).
+
+    Returns:
+        Indices des points sélectionnés, dans l'ordre de sélection
+    """
+    points = np.asarray(points, dtype=np.float32)
+    n_points = len(points)
+    n_samples = min(n_samples, n_points)
+    if n_samples <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    rng = np.random.default_rng(random_state)
+    selected = np.empty(n_samples, dtype=np.int64)
+    selected[0] = rng.integers(n_points) if start_index is None else start_index
+    min_dist2 = np.full(n_points, np.inf, dtype=np.float32)
+    diff = np.empty_like(points)
+
+    for i in range(1, n_samples):
+        np.subtract(points, points[selected[i - 1]], out=diff)
+        np.minimum(min_dist2, np.einsum('ij,ij->i', diff, diff), out=min_dist2)
+        selected[i] = int(np.argmax(min_dist2))
+    return selected
+
+
+def approximate_farthest_point_sampling(points, n_samples):
+    """
+    Farthest point sampling approché: graines réparties par grille de voxels, puis ajustement au
+    nombre demandé par KD-tree (ajout des points les plus éloignés de la sélection, ou retrait
+    des points des zones les plus denses).
+
+    Returns:
+        Indices (triés) des points sélectionnés
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n_points = len(points)
+    n_samples = min(n_samples, n_points)
+    if n_samples <= 0:
+        return np.empty(0, dtype=np.int64)
+    if n_samples == n_points:
+        return np.arange(n_points)
+
+    selected = voxel_grid_indices(points, voxel_size_for_count(points, n_samples), mode='centroid')
+
+    if len(selected) < n_samples:
+        # Compléter avec les points les plus éloignés de la sélection
+        mask = np.ones(n_points, dtype=bool)
+        mask[selected] = False
+        candidates = np.flatnonzero(mask)
+        dist, _ = cKDTree(points[selected]).query(points[candidates], k=1, workers=-1)
+        extra = candidates[np.argsort(dist)[::-1][:n_samples - len(selected)]]
+        selected = np.concatenate([selected, extra])
+    elif len(selected) > n_samples:
+        # Retirer les points dont le plus proche voisin sélectionné est le plus proche (zones denses)
+        dist, _ = cKDTree(points[selected]).query(points[selected], k=2, workers=-1)
+        keep = np.argsort(dist[:, 1], kind='stable')[len(selected) - n_samples:]
+        selected = selected[keep]
+
+    return np.sort(selected)
+
+
+def sample_farthest_points(points, n_samples, exact=None, random_state=None):
+    """FPS exact pour les petits problèmes, approximation par voxels au-delà de EXACT_FPS_MAX_OPERATIONS"""
+    if exact is None:
+        exact = len(points) * n_samples <= EXACT_FPS_MAX_OPERATIONS
+    if exact:
+        return farthest_point_sampling(points, n_samples, random_state=random_state)
+    return approximate_farthest_point_sampling(points, n_samples)
@@ -71,6 +71,19 @@ class SpatialEdge:
     distance: float
     metadata: Dict[str, Any]
 
+# Ordre d'évaluation des relations (directionnelles, proximité, structurelles)
+RELATION_ORDER = [
+    SpatialRelation.ABOVE, SpatialRelation.BELOW,
+    SpatialRelation.RIGHT_OF, SpatialRelation.LEFT_OF,
+    SpatialRelation.FRONT_OF, SpatialRelation.BEHIND,
+    SpatialRelation.NEAR,
+    SpatialRelation.CONTAINS, SpatialRelation.INSIDE,
+    SpatialRelation.SUPPORTS, SpatialRelation.ADJACENT, SpatialRelation.TOUCHES,
+]
+
+# Nombre minimal d'objets ajoutés incrémentalement avant reconstruction de l'index spatial
+PENDING_REINDEX_MIN = 32
+
 class SceneGraphBuilder:
     """
     Constructeur de graphes de scènes 3D pour l'analyse spatiale
@@ -88,9 +101,17 @@ class SceneGraphBuilder:
         self.graph = nx.DiGraph()
         self.objects: Dict[str, SceneObject] = {}
         self.spatial_index: Optional[KDTree] = None
+        self._indexed_ids: List[str] = []  # Objets couverts par l'index spatial
+        self._pending_ids: List[str] = []  # Objets ajoutés depuis la construction de l'index
 
     def add_object(self, obj: SceneObject) -> None:
-        """Ajoute un objet à la scène"""
+        """
+        Ajoute un objet à la scène
+
+        Si les relations ont déjà été construites, seules les arêtes entre le nouvel
+        objet et ses voisins sont calculées (les autres arêtes sont inchangées)
+        """
+        replaced = obj.id in self.objects
         self.objects[obj.id] = obj
         self.graph.add_node(obj.id,
                           category=obj.category.value,
@@ -99,98 +120,174 @@ class SceneGraphBuilder:
                           confidence=obj.confidence,
                           semantic_label=obj.semantic_label)
 
+        if self.spatial_index is None:
+            return
+
+        if replaced:
+            # L'objet a pu bouger: ses anciennes arêtes et sa position indexée sont obsolètes
+            self.graph.remove_edges_from(list(self.graph.in_edges(obj.id)) + list(self.graph.out_edges(obj.id)))
+            self._rebuild_spatial_index(exclude=obj.id)
+
+        neighbors = self._find_spatial_neighbors(obj, spatial_threshold=self.spatial_threshold)
+        if neighbors:
+            neighbor_ids = [neighbor_id for neighbor_id, _ in neighbors]
+            distances = np.array([distance for _, distance in neighbors])
+            new = self._object_arrays([obj] * len(neighbors))
+            others = self._object_arrays([self.objects[neighbor_id] for neighbor_id in neighbor_ids])
+            self._add_relation_edges([obj.id] * len(neighbors), neighbor_ids, distances, new, others)
+            self._add_relation_edges(neighbor_ids, [obj.id] * len(neighbors), distances, others, new)
+
+        self._pending_ids.append(obj.id)
+        if len(self._pending_ids) > max(PENDING_REINDEX_MIN, np.sqrt(len(self._indexed_ids))):
+            self._rebuild_spatial_index()
+
     def build_spatial_relations(self) -> None:
         """Construit les relations spatiales entre tous les objets"""
         if len(self.objects) < 2:
             return
 
         # Créer l'index spatial pour les recherches efficaces
-        positions = np.array([obj.position for obj in self.objects.values()])
+        self._rebuild_spatial_index()
+        object_ids = self._indexed_ids
+        arrays = self._object_arrays([self.objects[obj_id] for obj_id in object_ids])
+
+        # Toutes les paires d'objets à moins de spatial_threshold en une seule requête (dans les deux sens)
+        pairs = self.spatial_index.query_pairs(self.spatial_threshold, output_type='ndarray')
+        source = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        target = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        distances = np.linalg.norm(arrays['position'][target] - arrays['position'][source], axis=1)
+
+        # Voisins strictement dans le rayon, par objet source puis par distance croissante
+        keep = distances < self.spatial_threshold
+        order = np.lexsort((distances[keep], source[keep]))
+        source, target, distances = source[keep][order], target[keep][order], distances[keep][order]
+
+        self._add_relation_edges([object_ids[i] for i in source], [object_ids[j] for j in target], distances,
+                                 {key: value[source] for key, value in arrays.items()},
+                                 {key: value[target] for key, value in arrays.items()})
+
+    def _rebuild_spatial_index(self, exclude: Optional[str] = None) -> None:
+        """Reconstruit l'index spatial sur tous les objets (hors exclude)"""
+        self._indexed_ids = [obj_id for obj_id in self.objects if obj_id != exclude]
+        positions = np.array([self.objects[obj_id].position for obj_id in self._indexed_ids]).reshape(-1, 3)
         self.spatial_index = KDTree(positions)
+        self._pending_ids = []
+
+    @staticmethod
+    def _object_arrays(objects: List[SceneObject]) -> Dict[str, np.ndarray]:
+        """Attributs géométriques d'une liste d'objets empilés en tableaux (N, 3)"""
+        def stack(values):
+            return np.array(values, dtype=float).reshape(-1, 3)
+        return {
+            'position': stack([obj.position for obj in objects]),
+            'dimensions': stack([obj.dimensions for obj in objects]),
+            'center': stack([obj.bounding_box.center for obj in objects]),
+            'extent': stack([obj.bounding_box.extent for obj in objects]),
+        }
 
-        object_ids = list(self.objects.keys())
-
-        for i, obj_id in enumerate(object_ids):
-            obj = self.objects[obj_id]
-
-            # Trouver les objets voisins
-            neighbors = self._find_spatial_neighbors(obj, spatial_threshold=self.spatial_threshold)
-
-            for neighbor_id, distance in neighbors:
-                if neighbor_id == obj_id:
-                    continue
+    def _score_relations(self, src: Dict[str, np.ndarray], dst: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Confiance de chaque relation (colonnes dans l'ordre RELATION_ORDER) pour des paires
+        d'objets alignées; 0 lorsque la relation n'est pas retenue.
+        Version vectorisée de _analyze_spatial_relations.
+        """
+        vector = dst['position'] - src['position']
+        distance = np.linalg.norm(vector, axis=1)
+        direction = np.tile([0.0, 0.0, 1.0], (len(vector), 1))  # Vecteur par défaut
+        moving = distance > 1e-6
+        direction[moving] = vector[moving] / distance[moving, None]
+
+        scores = np.zeros((len(vector), len(RELATION_ORDER)))
+        column = {relation: i for i, relation in enumerate(RELATION_ORDER)}
+
+        # Relations directionnelles: X → right/left, Y → front/behind, Z → above/below
+        cos_threshold = np.cos(np.radians(self.angle_threshold))
+        for axis, positive, negative in ((2, SpatialRelation.ABOVE, SpatialRelation.BELOW),
+                                         (0, SpatialRelation.RIGHT_OF, SpatialRelation.LEFT_OF),
+                                         (1, SpatialRelation.FRONT_OF, SpatialRelation.BEHIND)):
+            proj = direction[:, axis]
+            aligned = np.abs(proj) > cos_threshold
+            confidence = np.minimum(1.0, np.abs(proj) * 2)
+            scores[:, column[positive]] = np.where(aligned & (proj > 0), confidence, 0.0)
+            scores[:, column[negative]] = np.where(aligned & (proj <= 0), confidence, 0.0)
 
-                neighbor_obj = self.objects[neighbor_id]
+        # Relation de proximité
+        proximity = np.maximum(0, 1.0 - distance / self.spatial_threshold)
+        scores[:, column[SpatialRelation.NEAR]] = np.where(proximity > 0.5, proximity, 0.0)
+
+        # Relations structurelles (mêmes critères que les méthodes _box_* et _is_supporting)
+        center_distance = np.linalg.norm(dst['center'] - src['center'], axis=1)
+        contains = center_distance < np.min(src['extent'], axis=1) / 2
+        inside = ~contains & (center_distance < np.min(dst['extent'], axis=1) / 2)
+        vertical = np.abs(dst['position'][:, 2] - (src['position'][:, 2] + src['dimensions'][:, 2] / 2))
+        horizontal = np.linalg.norm(dst['position'][:, :2] - src['position'][:, :2], axis=1)
+        supports = (vertical < 0.5) & (horizontal < np.max(src['dimensions'][:, :2], axis=1) / 2)
+        adjacent = center_distance <= (np.mean(src['extent'], axis=1) + np.mean(dst['extent'], axis=1)) / 2 * 1.5
+        touches = center_distance <= (np.min(src['extent'], axis=1) + np.min(dst['extent'], axis=1)) / 2 * 1.1
+
+        scores[:, column[SpatialRelation.CONTAINS]] = np.where(contains, 0.9, 0.0)
+        scores[:, column[SpatialRelation.INSIDE]] = np.where(inside, 0.9, 0.0)
+        scores[:, column[SpatialRelation.SUPPORTS]] = np.where(supports, 0.8, 0.0)
+        scores[:, column[SpatialRelation.ADJACENT]] = np.where(adjacent, 0.7, 0.0)
+        scores[:, column[SpatialRelation.TOUCHES]] = np.where(touches, 0.6, 0.0)
+
+        scores[distance > self.spatial_threshold] = 0.0
+        return scores
+
+    def _add_relation_edges(self, source_ids: List[str], target_ids: List[str], distances: np.ndarray,
+                            src: Dict[str, np.ndarray], dst: Dict[str, np.ndarray]) -> None:
+        """
+        Ajoute les arêtes de paires d'objets à partir des scores vectorisés
 
-                # Déterminer les relations spatiales
-                relations = self._analyze_spatial_relations(obj, neighbor_obj)
+        Le graphe n'ayant qu'une arête par paire orientée, c'est la dernière relation retenue
+        (dans l'ordre RELATION_ORDER) qui la décrit.
+        """
+        if len(source_ids) == 0:
+            return
 
-                for relation, confidence in relations.items():
-                    if confidence > 0.3:  # Seuil de confiance minimal
-                        edge = SpatialEdge(
-                            source_id=obj_id,
-                            target_id=neighbor_id,
-                            relation=relation,
-                            confidence=confidence,
-                            distance=distance,
-                            metadata={
-                                'source_category': obj.category.value,
-                                'target_category': neighbor_obj.category.value,
-                                'spatial_distance': distance
-                            }
-                        )
+        scores = self._score_relations(src, dst)
+        retained = scores > 0.3  # Seuil de confiance minimal
+        last = len(RELATION_ORDER) - 1 - np.argmax(retained[:, ::-1], axis=1)
+        has_relation = retained.any(axis=1)
+
+        for k in np.flatnonzero(has_relation):
+            obj_id, neighbor_id = source_ids[k], target_ids[k]
+            relation = RELATION_ORDER[last[k]]
+            distance = float(distances[k])
+            edge = SpatialEdge(
+                source_id=obj_id,
+                target_id=neighbor_id,
+                relation=relation,
+                confidence=float(scores[k, last[k]]),
+                distance=distance,
+                metadata={
+                    'source_category': self.objects[obj_id].category.value,
+                    'target_category': self.objects[neighbor_id].category.value,
+                    'spatial_distance': distance
+                }
+            )
 
-                        self.graph.add_edge(obj_id, neighbor_id,
-                                          relation=relation.value,
-                                          confidence=confidence,
-                                          distance=distance,
-                                          **edge.metadata)
+            self.graph.add_edge(obj_id, neighbor_id,
+                              relation=relation.value,
+                              confidence=edge.confidence,
+                              distance=distance,
+                              **edge.metadata)
 
     def _find_spatial_neighbors(self, obj: SceneObject, spatial_threshold: float) -> List[Tuple[str, float]]:
-        """Trouve les voisins spatiaux d'un objet"""
+        """Trouve les voisins spatiaux d'un objet (objets indexés et ajoutés depuis), par distance croissante"""
         if self.spatial_index is None:
             return []
 
-        # Recherche des voisins dans le rayon spécifié
-        query_result = self.spatial_index.query(
-            obj.position.reshape(1, -1),
-            k=len(self.objects),
-            distance_upper_bound=spatial_threshold
-        )
+        candidate_ids = [self._indexed_ids[i] for i in self.spatial_index.query_ball_point(obj.position, spatial_threshold)]
+        candidate_ids += self._pending_ids
+        candidate_ids = [candidate_id for candidate_id in candidate_ids if candidate_id != obj.id]
+        if not candidate_ids:
+            return []
 
-        # KDTree.query peut retourner différents formats selon les paramètres
-        if len(query_result) == 2:
-            distances, indices = query_result
-        else:
-            # Cas où un seul résultat
-            distances, indices = query_result[0], query_result[1]
-
-        neighbors = []
-        object_ids = list(self.objects.keys())
-
-        # Convertir en listes pour itération sécurisée
-        try:
-            # Convertir en numpy arrays pour manipulation sécurisée
-            indices_array = np.asarray(indices).flatten()
-            distances_array = np.asarray(distances).flatten()
-
-            # Itérer sur les résultats
-            for i in range(len(indices_array)):
-                idx = indices_array[i]
-                dist = distances_array[i]
-
-                idx_int = int(idx)
-                if not np.isinf(dist) and 0 <= idx_int < len(object_ids):
-                    neighbor_id = object_ids[idx_int]
-                    neighbors.append((neighbor_id, float(dist)))
-        except (TypeError, ValueError, IndexError) as e:
-            # Fallback en cas d'erreur de format
-            print(f"Warning: Error parsing KDTree results: {e}")
-            pass
-
-        return neighbors
-
-        return neighbors
+        positions = np.array([self.objects[candidate_id].position for candidate_id in candidate_ids]).reshape(-1, 3)
+        distances = np.linalg.norm(positions - obj.position, axis=1)
+        return [(candidate_ids[i], float(distances[i])) for i in np.argsort(distances, kind='stable')
+                if distances[i] < spatial_threshold]
 
     def _analyze_spatial_relations(self, obj1: SceneObject, obj2: SceneObject) -> Dict[SpatialRelation, float]:
         """Analyse les relations spatiales entre deux objets"""
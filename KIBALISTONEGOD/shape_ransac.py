@@ -0,0 +1,373 @@
+"""
+Moteur RANSAC vectorisé pour la détection de primitives (plan, cylindre, sphère)
+dans des nuages de points de grande taille.
+
+Les hypothèses sont générées et évaluées par lots avec des opérations matricielles
+numpy, le nombre d'itérations est adapté au meilleur taux d'inliers trouvé, et les
+hypothèses peuvent être pré-évaluées sur un sous-échantillon avant vérification
+sur le nuage complet.
+
+Les hypothèses de cylindre sont toujours construites à partir de normales (2 points) :
+si elles ne sont pas fournies, elles sont estimées par ACP des plus proches voisins.
+"""
+
+import numpy as np
+
+from knn_service import NeighborService
+
+# Nombre maximal d'éléments (points x hypothèses) évalués en une fois
+RESIDUAL_BLOCK_SIZE = 4_000_000
+
+# Fraction minimale d'inliers par type de forme pour accepter une détection automatique
+SHAPE_MIN_INLIER_RATIO = {'plane': 0.10, 'cylinder': 0.05, 'sphere': 0.05}
+
+# Nombre de voisins (point compris) pour l'estimation des normales par ACP
+NORMAL_NEIGHBORS = 20
+
+# Sinus minimal de l'angle entre les normales (unitaires) d'une hypothèse de cylindre: en
+# dessous, l'axe n0 x n1 est mal conditionné (deux points d'un même plan donnent un cylindre géant)
+CYLINDER_MIN_NORMAL_SINE = 0.1
+
+_EPS = 1e-12
+
+
+def estimate_normals(points, k=NORMAL_NEIGHBORS, workers=-1):
+    """
+    Normales (N, 3) par ACP des k plus proches voisins de chaque point.
+
+    Requêtes et décompositions propres sont faites par blocs de la taille de ceux de
+    NeighborService; l'orientation des normales est arbitraire.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    service = NeighborService(points, workers)
+    normals = np.empty_like(points)
+    for start in range(0, len(points), service.chunk_size):
+        stop = start + service.chunk_size
+        _, idx = service.query(points[start:stop], k)
+        local = points[idx]
+        local -= local.mean(axis=1, keepdims=True)
+        cov = np.einsum('mki,mkj->mij', local, local)
+        normals[start:stop] = np.linalg.eigh(cov)[1][:, :, 0]  # Direction de plus faible variance
+    return normals
+
+
+def _fit_plane(samples, normals=None):
+    """Plans passant par 3 points: normales (B, 3) et décalages (B,)"""
+    normal = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+    norm = np.linalg.norm(normal, axis=1)
+    valid = norm > _EPS
+    normal = normal / np.where(valid, norm, 1.0)[:, None]
+    d = -np.einsum('ij,ij->i', normal, samples[:, 0])
+    return {'normal': normal, 'd': d}, valid
+
+
+def _fit_cylinder(samples, normals):
+    """
+    Cylindres à partir de 2 points et de leurs normales: axe = n0 x n1, centre à
+    l'intersection des droites normales projetées dans le plan orthogonal à l'axe.
+    Les paires de normales presque parallèles sont rejetées.
+    """
+    axis = np.cross(normals[:, 0], normals[:, 1])
+    axis_norm = np.linalg.norm(axis, axis=1)
+    axis = axis / np.where(axis_norm > _EPS, axis_norm, 1.0)[:, None]
+
+    def project(v):
+        return v - np.einsum('ij,ij->i', v, axis)[:, None] * axis
+
+    p0 = samples[:, 0]
+    p1 = p0 + project(samples[:, 1] - p0)
+    d0, d1 = project(normals[:, 0]), project(normals[:, 1])
+
+    # Point le plus proche entre les droites p0 + t*d0 et p1 + s*d1
+    w = p0 - p1
+    a = np.einsum('ij,ij->i', d0, d0)
+    b = np.einsum('ij,ij->i', d0, d1)
+    c = np.einsum('ij,ij->i', d1, d1)
+    d = np.einsum('ij,ij->i', d0, w)
+    e = np.einsum('ij,ij->i', d1, w)
+    denom = a * c - b * b
+    t = (b * e - c * d) / np.where(np.abs(denom) > _EPS, denom, 1.0)
+    center = p0 + t[:, None] * d0
+    radius = np.linalg.norm(p0 - center, axis=1)
+    valid = (axis_norm > CYLINDER_MIN_NORMAL_SINE) & (np.abs(denom) > _EPS) & (radius > _EPS)
+    return {'axis': axis, 'center': center, 'radius': radius}, valid
+
+
+def _refine_cylinder(points, normals, inliers):
+    """
+    Réajustement d'un cylindre sur ses inliers: axe = direction la plus orthogonale aux
+    normales (plus petit vecteur propre de leur matrice de dispersion), puis cercle ajusté
+    par moindres carrés algébriques dans le plan orthogonal à l'axe.
+    """
+    inlier_normals = normals[inliers]
+    axis = np.linalg.eigh(inlier_normals.T @ inlier_normals)[1][:, 0]
+    origin = points[inliers].mean(axis=0)
+    local = points[inliers] - origin
+    u = np.cross(axis, [1.0, 0.0, 0.0] if abs(axis[0]) < 0.9 else [0.0, 1.0, 0.0])
+    u /= np.linalg.norm(u)
+    v = np.cross(axis, u)
+    x, y = local @ u, local @ v
+    A = np.column_stack([2 * x, 2 * y, np.ones_like(x)])
+    (cx, cy, c), *_ = np.linalg.lstsq(A, x ** 2 + y ** 2, rcond=None)
+    radius = np.sqrt(max(c + cx ** 2 + cy ** 2, 0.0))
+    center = origin + cx * u + cy * v
+    return {'axis': axis[None], 'center': center[None], 'radius': np.array([radius])}
+
+
+def _fit_sphere(samples, normals=None):
+    """Sphères passant par 4 points (résolution batchée des systèmes 4x4)"""
+    n_hyp = len(samples)
+    A = np.concatenate([samples, np.ones((n_hyp, 4, 1))], axis=2)
+    b = -np.sum(samples ** 2, axis=2)
+
+    # Rejeter les échantillons (quasi) coplanaires: déterminant normalisé (ratio d'Hadamard)
+    row_norms = np.prod(np.linalg.norm(A, axis=2), axis=1)
+    valid = np.abs(np.linalg.det(A)) > 1e-9 * row_norms
+
+    center = np.zeros((n_hyp, 3))
+    radius = np.zeros(n_hyp)
+    if valid.any():
+        x = np.linalg.solve(A[valid], b[valid][..., None])[..., 0]
+        c = -0.5 * x[:, :3]
+        r2 = np.sum(c ** 2, axis=1) - x[:, 3]
+        center[valid] = c
+        radius[valid] = np.sqrt(np.clip(r2, 0.0, None))
+        valid[valid] = r2 > 0
+    return {'center': center, 'radius': radius}, valid
+
+
+def _plane_residuals(points, sq_norms, params):
+    return np.abs(points @ params['normal'].T + params['d'])
+
+
+def _sphere_residuals(points, sq_norms, params):
+    center = params['center']
+    dist2 = sq_norms[:, None] - 2.0 * (points @ center.T) + np.sum(center ** 2, axis=1)
+    return np.abs(np.sqrt(np.clip(dist2, 0.0, None)) - params['radius'])
+
+
+def _cylinder_residuals(points, sq_norms, params):
+    center, axis = params['center'], params['axis']
+    # |v|² - (v.a)² avec v = p - c, développé pour rester en produits matriciels
+    along = points @ axis.T - np.einsum('ij,ij->i', center, axis)
+    dist2 = (sq_norms[:, None] - 2.0 * (points @ center.T) + np.sum(center ** 2, axis=1)) - along ** 2
+    return np.abs(np.sqrt(np.clip(dist2, 0.0, None)) - params['radius'])
+
+
+# Type de forme -> (taille d'échantillon minimal, normales requises, ajustement, résidus,
+# réajustement sur les inliers ou None)
+_SHAPES = {
+    'plane': (3, False, _fit_plane, _plane_residuals, None),
+    'cylinder': (2, True, _fit_cylinder, _cylinder_residuals, _refine_cylinder),
+    'sphere': (4, False, _fit_sphere, _sphere_residuals, None),
+}
+
+# Nombre maximal de réajustements successifs du meilleur modèle sur ses inliers
+REFINE_ITERATIONS = 3
+
+
+def _select(params, mask):
+    return {key: value[mask] for key, value in params.items()}
+
+
+def _count_inliers(points, sq_norms, params, residuals, distance_threshold):
+    """Nombre d'inliers de chaque hypothèse, par blocs de points pour borner la mémoire"""
+    n_hyp = len(next(iter(params.values())))
+    counts = np.zeros(n_hyp, dtype=np.int64)
+    block = max(1, RESIDUAL_BLOCK_SIZE // n_hyp)
+    for start in range(0, len(points), block):
+        res = residuals(points[start:start + block], sq_norms[start:start + block], params)
+        counts += np.count_nonzero(res < distance_threshold, axis=0)
+    return counts
+
+
+def _inlier_indices(points, sq_norms, params, residuals, distance_threshold):
+    """Indices des inliers d'une hypothèse unique"""
+    chunks = []
+    for start in range(0, len(points), RESIDUAL_BLOCK_SIZE):
+        res = residuals(points[start:start + RESIDUAL_BLOCK_SIZE], sq_norms[start:start + RESIDUAL_BLOCK_SIZE], params)
+        chunks.append(np.flatnonzero(res[:, 0] < distance_threshold) + start)
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+
+def required_iterations(inlier_ratio, sample_size, confidence=0.99, max_iterations=1000):
+    """Nombre d'itérations garantissant un échantillon sans outlier avec la confiance demandée"""
+    if inlier_ratio <= 0:
+        return max_iterations
+    p_good = inlier_ratio ** sample_size
+    if p_good >= 1.0:
+        return 1
+    return int(min(max_iterations, np.ceil(np.log(1.0 - confidence) / np.log(1.0 - p_good))))
+
+
+def ransac_shape(points, shape, distance_threshold=0.05, max_iterations=1000, batch_size=64,
+                 confidence=0.99, prescore_size=20000, random_state=None, normals=None):
+    """
+    Détection RANSAC vectorisée d'une primitive géométrique.
+
+    Args:
+        points: Tableau (N, 3) des points
+        shape: 'plane', 'cylinder' ou 'sphere'
+        distance_threshold: Distance maximale d'un inlier à la surface
+        max_iterations: Nombre maximal d'hypothèses évaluées
+        batch_size: Nombre d'hypothèses générées et évaluées par lot
+        confidence: Probabilité visée d'avoir tiré un échantillon sans outlier (arrêt anticipé)
+        prescore_size: Taille du sous-échantillon de pré-évaluation (None pour évaluer sur tout le nuage)
+        random_state: Graine du générateur aléatoire
+        normals: Normales (N, 3) des hypothèses de cylindre, estimées par estimate_normals si absentes
+
+    Returns:
+        Tuple (modèle ou None, indices des inliers)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n_points = len(points)
+    sample_size, needs_normals, fit, residuals, refine = _SHAPES[shape]
+    if n_points < sample_size:
+        return None, np.empty(0, dtype=np.int64)
+    if not needs_normals:
+        normals = None
+    elif normals is None:
+        normals = estimate_normals(points, min(NORMAL_NEIGHBORS, n_points))
+    else:
+        normals = np.asarray(normals, dtype=np.float64)
+
+    rng = np.random.default_rng(random_state)
+    sq_norms = np.einsum('ij,ij->i', points, points)
+
+    use_prescore = prescore_size is not None and n_points > 2 * prescore_size
+    if use_prescore:
+        subset = rng.choice(n_points, prescore_size, replace=False)
+        sub_points, sub_sq = points[subset], sq_norms[subset]
+
+    best_params = None
+    best_count = 0
+    iterations = 0
+    needed = max_iterations
+
+    while iterations < needed:
+        n_hyp = min(batch_size, needed - iterations)
+        iterations += n_hyp
+
+        # Échantillons minimaux, en rejetant ceux qui contiennent un point en double
+        idx = rng.integers(0, n_points, size=(n_hyp, sample_size))
+        idx_sorted = np.sort(idx, axis=1)
+        distinct = np.all(idx_sorted[:, 1:] != idx_sorted[:, :-1], axis=1)
+
+        params, valid = fit(points[idx], None if normals is None else normals[idx])
+        valid &= distinct
+        if not valid.any():
+            continue
+        params = _select(params, valid)
+
+        if use_prescore:
+            sub_counts = _count_inliers(sub_points, sub_sq, params, residuals, distance_threshold)
+            candidate = int(np.argmax(sub_counts))
+            # Vérifier sur le nuage complet seulement si le candidat peut battre le meilleur
+            if sub_counts[candidate] / prescore_size <= best_count / n_points:
+                continue
+            candidate_params = _select(params, [candidate])
+            count = _count_inliers(points, sq_norms, candidate_params, residuals, distance_threshold)[0]
+        else:
+            counts = _count_inliers(points, sq_norms, params, residuals, distance_threshold)
+            candidate = int(np.argmax(counts))
+            candidate_params = _select(params, [candidate])
+            count = counts[candidate]
+
+        if count > best_count:
+            best_count = int(count)
+            best_params = candidate_params
+            needed = required_iterations(best_count / n_points, sample_size, confidence, max_iterations)
+
+    if best_params is None:
+        return None, np.empty(0, dtype=np.int64)
+
+    inliers = _inlier_indices(points, sq_norms, best_params, residuals, distance_threshold)
+
+    # Réajustement tant qu'il augmente le nombre d'inliers (hypothèses minimales bruitées)
+    for _ in range(REFINE_ITERATIONS if refine is not None else 0):
+        params = refine(points, normals, inliers)
+        refined = _inlier_indices(points, sq_norms, params, residuals, distance_threshold)
+        if len(refined) <= len(inliers):
+            break
+        best_params, inliers = params, refined
+    return _to_model(shape, best_params), inliers
+
+
+def _to_model(shape, params):
+    """Convertit les paramètres d'une hypothèse en modèle lisible"""
+    if shape == 'plane':
+        a, b, c = params['normal'][0]
+        return np.array([a, b, c, params['d'][0]])
+    if shape == 'cylinder':
+        return {"axis": params['axis'][0], "center": params['center'][0], "radius": float(params['radius'][0])}
+    return {"center": params['center'][0], "radius": float(params['radius'][0])}
+
+
+def ransac_cylinder_detection(points, distance_threshold=0.05, max_iterations=1000, **kwargs):
+    """
+    Détection de cylindre avec RANSAC vectorisé.
+    """
+    return ransac_shape(points, 'cylinder', distance_threshold, max_iterations, **kwargs)
+
+
+def ransac_sphere_detection(points, distance_threshold=0.05, max_iterations=1000, **kwargs):
+    """
+    Détection de sphère avec RANSAC vectorisé.
+    """
+    return ransac_shape(points, 'sphere', distance_threshold, max_iterations, **kwargs)
+
+
+def extract_shapes(points, shapes=('plane', 'cylinder', 'sphere'), distance_threshold=0.05,
+                   max_iterations=1000, min_inlier_ratio=SHAPE_MIN_INLIER_RATIO, max_shapes=6, **kwargs):
+    """
+    Extraction de plusieurs primitives: détecte la meilleure forme, retire ses inliers et recommence.
+
+    Args:
+        points: Tableau (N, 3) des points
+        shapes: Types de formes recherchés
+        distance_threshold: Distance maximale d'un inlier à la surface
+        max_iterations: Itérations RANSAC maximales par forme
+        min_inlier_ratio: Fraction minimale (du nuage initial) d'inliers pour accepter une forme,
+            valeur unique ou dictionnaire par type de forme
+        max_shapes: Nombre maximal de formes extraites
+        **kwargs: Options transmises à ransac_shape (normals: estimées une seule fois sur le
+            nuage initial si absentes et si des cylindres sont recherchés)
+
+    Returns:
+        Liste de dictionnaires {'type', 'model', 'inliers'} avec les indices dans le nuage initial
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n_points = len(points)
+    remaining = np.arange(n_points)
+    detected = []
+
+    def min_count(shape):
+        ratio = min_inlier_ratio.get(shape, 0.05) if isinstance(min_inlier_ratio, dict) else min_inlier_ratio
+        return ratio * n_points
+
+    normals = kwargs.pop('normals', None)
+    if normals is not None:
+        normals = np.asarray(normals, dtype=np.float64)
+    elif any(_SHAPES[shape][1] for shape in shapes) and n_points >= 4:
+        normals = estimate_normals(points, min(NORMAL_NEIGHBORS, n_points))
+
+    while len(detected) < max_shapes and len(remaining) >= 4:
+        best = None
+        for shape in shapes:
+            model, inliers = ransac_shape(points[remaining], shape, distance_threshold, max_iterations,
+                                          normals=None if normals is None else normals[remaining], **kwargs)
+            if model is None or len(inliers) <= min_count(shape):
+                continue
+            if best is None or len(inliers) > len(best[2]):
+                best = (shape, model, inliers)
+
+        if best is None:
+            break
+
+        shape, model, inliers = best
+        detected.append({'type': shape, 'model': model, 'inliers': remaining[inliers]})
+        keep = np.ones(len(remaining), dtype=bool)
+        keep[inliers] = False
+        remaining = remaining[keep]
+
+    return detected
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test de non-régression du moteur M3C2 à densité réaliste (mémoire et exactitude)
+
+Deux époques de 300 000 points sur 10 x 10 m, paramètres par défaut de
+apply_4d_change_detection (cylindres de rayon 0.1 m, demi-hauteur 1 m, points de
+calcul espacés de 0.1 m). La moitié nord de la seconde époque est surélevée de 0.3 m.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+import time
+import tracemalloc
+import numpy as np
+
+from m3c2 import compute_m3c2, select_core_points
+
+N_POINTS = 300000
+SHIFT = 0.3
+CYLINDER_RADIUS = 0.1
+MAX_DISTANCE = 1.0
+MAX_PEAK_BYTES = 1024 ** 3
+
+
+def create_epoch(rng, n_points, shift=0.0):
+    """Terrain ondulé de 10 x 10 m avec bruit de mesure, surélevé de shift pour y > 5"""
+    xy = rng.random((n_points, 2)) * 10
+    z = 0.2 * np.sin(xy[:, 0]) + 0.1 * np.cos(0.7 * xy[:, 1]) + rng.normal(0, 0.005, n_points)
+    z += shift * (xy[:, 1] > 5)
+    return np.column_stack([xy, z])
+
+
+def test_m3c2_realistic_density():
+    print("🚀 Test M3C2 à densité réaliste")
+    print("=" * 60)
+    rng = np.random.default_rng(0)
+    points1 = create_epoch(rng, N_POINTS)
+    points2 = create_epoch(rng, N_POINTS, SHIFT)
+    cores = points1[select_core_points(points1, CYLINDER_RADIUS)]
+    print(f"📊 {N_POINTS:,} points par époque, {len(cores):,} points de calcul")
+
+    tracemalloc.start()
+    start = time.time()
+    result = compute_m3c2(points1, points2, core_points=cores, normal_radius=CYLINDER_RADIUS,
+                          projection_radius=CYLINDER_RADIUS, max_depth=MAX_DISTANCE)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"⏱️ {elapsed:.1f} s, pic mémoire {peak / 1024 ** 2:.0f} Mo")
+
+    # Loin de la marche (|y - 5| > 0.5 m) : distance nulle au sud, SHIFT au nord
+    y = result['core_points'][:, 1]
+    south = result['distance'][y < 4.5]
+    north = result['distance'][y > 5.5]
+    print(f"📐 Distance médiane sud {np.nanmedian(south):.3f} m, nord {np.nanmedian(north):.3f} m")
+
+    assert peak < MAX_PEAK_BYTES, f"Pic mémoire trop élevé: {peak / 1024 ** 2:.0f} Mo"
+    assert abs(np.nanmedian(south)) < 0.01
+    assert abs(np.nanmedian(north) - SHIFT) < 0.01
+    assert np.all(result['n1'][np.isfinite(result['distance'])] > 0)
+    print("✅ Test réussi")
+
+
+if __name__ == "__main__":
+    test_m3c2_realistic_density()
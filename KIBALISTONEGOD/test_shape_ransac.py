@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test de non-régression de la détection RANSAC de primitives
+
+Scène synthétique : cylindre vertical de rayon 1.5 m (200 000 points) posé sur un sol
+plan de 10 x 10 m, bruit de mesure de 5 mm, sans normales fournies.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(__file__))
+
+import time
+import numpy as np
+
+from shape_ransac import estimate_normals, extract_shapes, ransac_cylinder_detection
+
+RADIUS = 1.5
+CENTER = np.array([2.0, -1.0])
+N_CYLINDER = 200000
+N_GROUND = 100000
+NOISE = 0.005
+
+
+def create_scene(rng):
+    theta = rng.random(N_CYLINDER) * 2 * np.pi
+    cylinder = np.column_stack([CENTER[0] + RADIUS * np.cos(theta), CENTER[1] + RADIUS * np.sin(theta),
+                                rng.random(N_CYLINDER) * 4.0])
+    ground = np.column_stack([rng.random((N_GROUND, 2)) * 10 - 5, np.zeros(N_GROUND)])
+    points = np.vstack([cylinder, ground])
+    return points + rng.normal(0, NOISE, points.shape)
+
+
+def check_cylinder(model):
+    print(f"   rayon {model['radius']:.3f} m, centre {model['center'][:2].round(3)}, axe {model['axis'].round(3)}")
+    assert abs(model['radius'] - RADIUS) < 0.05, f"Rayon faux: {model['radius']:.3f}"
+    assert abs(abs(model['axis'][2]) - 1.0) < 0.01, "Axe non vertical"
+    # Distance de l'axe au centre attendu (le centre peut être n'importe où sur l'axe)
+    offset = np.append(CENTER, 0.0) - model['center']
+    offset -= offset.dot(model['axis']) * model['axis']
+    assert np.linalg.norm(offset) < 0.05, "Axe mal placé"
+
+
+def test_shape_ransac():
+    print("🚀 Test RANSAC sur un cylindre de rayon 1.5 m")
+    print("=" * 60)
+    rng = np.random.default_rng(0)
+    points = create_scene(rng)
+
+    start = time.time()
+    normals = estimate_normals(points)
+    radial = np.column_stack([points[:N_CYLINDER, :2] - CENTER, np.zeros(N_CYLINDER)])
+    radial /= np.linalg.norm(radial, axis=1, keepdims=True)
+    alignment = np.median(np.abs(np.einsum('ij,ij->i', normals[:N_CYLINDER], radial)))
+    print(f"⏱️ Normales estimées en {time.time() - start:.1f} s, alignement médian {alignment:.3f}")
+    assert alignment > 0.99
+
+    print("📐 Cylindre seul, sans normales fournies")
+    model, inliers = ransac_cylinder_detection(points[:N_CYLINDER], distance_threshold=0.02, random_state=0)
+    check_cylinder(model)
+    assert len(inliers) > 0.9 * N_CYLINDER
+
+    print("📐 Extraction automatique (sol + cylindre)")
+    start = time.time()
+    shapes = extract_shapes(points, distance_threshold=0.02, random_state=0)
+    print(f"⏱️ {time.time() - start:.1f} s : {[(s['type'], len(s['inliers'])) for s in shapes]}")
+    cylinders = [s for s in shapes if s['type'] == 'cylinder']
+    assert cylinders, "Cylindre non détecté"
+    check_cylinder(cylinders[0]['model'])
+    assert any(s['type'] == 'plane' for s in shapes), "Sol non détecté"
+    print("✅ Test réussi")
+
+
+if __name__ == "__main__":
+    test_shape_ransac()
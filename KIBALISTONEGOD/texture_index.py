@@ -0,0 +1,214 @@
+"""
+Index persistant des embeddings CLIP des textures PBR.
+
+Chaque image est identifiée par son chemin relatif et sa date de modification : seules les
+images nouvelles ou modifiées sont ré-encodées (par lots bornés), les autres embeddings sont
+relus depuis SQLite (float32 bruts, sans pickle). L'index de recherche par catégorie est
+écrit sur disque et rouvert en mémoire mappée aux sessions suivantes.
+"""
+
+import os
+import sqlite3
+import time
+import zipfile
+import numpy as np
+import torch
+from PIL import Image
+from sklearn.neighbors import NearestNeighbors
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+TEXTURE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Nombre d'images encodées par CLIP en un seul passage
+EMBEDDING_BATCH_SIZE = 16
+
+# Facteur du seuil adaptatif (écart-type des embeddings de catégories)
+ADAPTIVE_THRESHOLD_FACTOR = 1.5
+
+
+def _to_blob(array):
+    return np.ascontiguousarray(array, dtype=np.float32).tobytes()
+
+
+def _from_blob(blob):
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+class TextureEmbeddingIndex:
+    """
+    Bibliothèque de textures par catégorie (un dossier par catégorie) et son index CLIP.
+
+    Args:
+        cache_dir: Dossier contenant la bibliothèque extraite, la base SQLite et l'index
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.library_dir = os.path.join(cache_dir, 'library')
+        self.db_path = os.path.join(cache_dir, 'textures.db')
+        self.index_path = os.path.join(cache_dir, 'categories.faiss')
+        os.makedirs(self.library_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS texture_files
+                             (path TEXT PRIMARY KEY, category TEXT, mtime REAL,
+                              embedding BLOB, color_sum BLOB, pixel_count INTEGER)''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS categories
+                             (position INTEGER PRIMARY KEY, category TEXT, embedding BLOB, avg_color BLOB)''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS index_info (key TEXT PRIMARY KEY, value REAL)''')
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Fermé aussi quand st.rerun() interrompt le script (il lève une exception)
+        self.close()
+        return False
+
+    def extract_zip(self, zip_path):
+        """
+        Extrait une archive dans la bibliothèque en conservant les dates de l'archive,
+        afin qu'un fichier inchangé garde la même clé (chemin + date) d'un envoi à l'autre.
+
+        Returns:
+            Nombre de fichiers écrits
+        """
+        written = 0
+        with zipfile.ZipFile(zip_path, 'r') as z:
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                target = os.path.join(self.library_dir, *info.filename.split('/'))
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                if (os.path.exists(target) and os.path.getsize(target) == info.file_size
+                        and abs(os.path.getmtime(target) - mtime) < 1):
+                    continue
+                target = z.extract(info, self.library_dir)
+                os.utime(target, (mtime, mtime))
+                written += 1
+        return written
+
+    def _scan_library(self):
+        """Images de la bibliothèque: {chemin relatif: (catégorie, date de modification)}"""
+        files = {}
+        for category in sorted(os.listdir(self.library_dir)):
+            cat_dir = os.path.join(self.library_dir, category)
+            if not os.path.isdir(cat_dir):
+                continue
+            for file in sorted(os.listdir(cat_dir)):
+                if file.lower().endswith(TEXTURE_EXTENSIONS):
+                    rel_path = f"{category}/{file}"
+                    files[rel_path] = (category, os.path.getmtime(os.path.join(cat_dir, file)))
+        return files
+
+    def refresh(self, clip_model, clip_processor, device, batch_size=EMBEDDING_BATCH_SIZE,
+                progress_callback=None):
+        """
+        Met à jour les embeddings des images nouvelles ou modifiées et, si nécessaire,
+        l'index des catégories.
+
+        Returns:
+            Dictionnaire {'embedded', 'removed', 'total'} (nombre d'images)
+        """
+        files = self._scan_library()
+        stored = dict(self.conn.execute("SELECT path, mtime FROM texture_files").fetchall())
+
+        removed = [path for path in stored if path not in files]
+        stale = [path for path, (_, mtime) in files.items() if stored.get(path) != mtime]
+        self.conn.executemany("DELETE FROM texture_files WHERE path = ?", [(p,) for p in removed])
+
+        for start in range(0, len(stale), batch_size):
+            batch = stale[start:start + batch_size]
+            images = [Image.open(os.path.join(self.library_dir, *path.split('/'))).convert('RGB')
+                      for path in batch]
+            inputs = clip_processor(images=images, return_tensors="pt").to(device)
+            with torch.no_grad():
+                embeddings = clip_model.get_image_features(**inputs).cpu().numpy()
+
+            rows = []
+            for path, image, embedding in zip(batch, images, embeddings):
+                pixels = np.asarray(image, dtype=np.float64).reshape(-1, 3) / 255.0
+                category, mtime = files[path]
+                rows.append((path, category, mtime, _to_blob(embedding),
+                             _to_blob(pixels.sum(axis=0)), len(pixels)))
+            self.conn.executemany("INSERT OR REPLACE INTO texture_files VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+            if progress_callback is not None:
+                progress_callback(min(start + batch_size, len(stale)) / len(stale))
+
+        if removed or stale or not os.path.exists(self.index_path):
+            self._rebuild_categories()
+        self.conn.commit()
+        return {'embedded': len(stale), 'removed': len(removed), 'total': len(files)}
+
+    def _rebuild_categories(self):
+        """Agrège les embeddings par catégorie (moyenne) et réécrit l'index sur disque"""
+        sums, colors, counts, pixels = {}, {}, {}, {}
+        for category, emb_blob, color_blob, pixel_count in self.conn.execute(
+                "SELECT category, embedding, color_sum, pixel_count FROM texture_files ORDER BY path"):
+            emb = _from_blob(emb_blob).astype(np.float64)
+            sums[category] = sums.get(category, 0) + emb
+            colors[category] = colors.get(category, 0) + _from_blob(color_blob).astype(np.float64)
+            counts[category] = counts.get(category, 0) + 1
+            pixels[category] = pixels.get(category, 0) + pixel_count
+
+        categories = sorted(sums)
+        self.conn.execute("DELETE FROM categories")
+        self.conn.executemany("INSERT INTO categories VALUES (?, ?, ?, ?)", [
+            (position, cat, _to_blob(sums[cat] / counts[cat]), _to_blob(colors[cat] / max(pixels[cat], 1)))
+            for position, cat in enumerate(categories)])
+
+        embeddings = np.array([sums[cat] / counts[cat] for cat in categories], dtype=np.float32)
+        emb_std = float(np.std(embeddings)) if len(embeddings) else 0.0
+        adaptive_max_dist = emb_std * ADAPTIVE_THRESHOLD_FACTOR if emb_std > 0 else 2.0
+        self.conn.execute("INSERT OR REPLACE INTO index_info VALUES ('adaptive_max_dist', ?)", (adaptive_max_dist,))
+        self.conn.execute("INSERT OR REPLACE INTO index_info VALUES ('embedding_std', ?)", (emb_std,))
+
+        if FAISS_AVAILABLE and len(embeddings):
+            faiss_index = faiss.IndexFlatL2(embeddings.shape[1])
+            faiss_index.add(embeddings)
+            faiss.write_index(faiss_index, self.index_path)
+        elif os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    def categories(self):
+        """Métadonnées des catégories indexées, dans l'ordre de l'index"""
+        return [{'category': category, 'avg_color': _from_blob(color).astype(np.float64)}
+                for category, color in self.conn.execute(
+                    "SELECT category, avg_color FROM categories ORDER BY position")]
+
+    def info(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM index_info WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def load_search_index(self):
+        """
+        Index de recherche des catégories: FAISS relu en mémoire mappée si disponible,
+        sinon NearestNeighbors reconstruit à partir des embeddings stockés.
+
+        Returns:
+            Tuple (index, is_faiss), ou (None, False) si la bibliothèque est vide
+        """
+        if FAISS_AVAILABLE and os.path.exists(self.index_path):
+            try:
+                return faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY), True
+            except RuntimeError:
+                # Type d'index non mappable par cette version de FAISS: lecture complète
+                return faiss.read_index(self.index_path), True
+
+        embeddings = [_from_blob(blob) for (blob,) in self.conn.execute(
+            "SELECT embedding FROM categories ORDER BY position")]
+        if not embeddings:
+            return None, False
+        nn = NearestNeighbors(n_neighbors=1, metric='euclidean')
+        nn.fit(np.array(embeddings))
+        return nn, False
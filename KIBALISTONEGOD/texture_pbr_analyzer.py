@@ -8,22 +8,27 @@ import torch
 import numpy as np
 from PIL import Image
 from pathlib import Path
+import hashlib
 import json
+import re
 from typing import List, Dict, Tuple
 from collections import Counter
 
 # Imports conditionnels avec types par défaut
 try:
-    from transformers import CLIPProcessor, CLIPModel, AutoTokenizer, AutoModelForCausalLM
+    from transformers import AutoTokenizer, AutoModelForCausalLM
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
-    CLIPProcessor = None  # type: ignore
-    CLIPModel = None  # type: ignore
     AutoTokenizer = None  # type: ignore
     AutoModelForCausalLM = None  # type: ignore
     print("⚠️ transformers non disponible - Installation requise: pip install transformers")
 
+from model_registry import get_clip, get_model, clip_image_features, CLIP_BATCH_SIZE
+
+# Cache disque des embeddings texte des labels (un fichier par modèle et liste de labels)
+TEXT_EMBEDDING_CACHE_DIR = Path(__file__).parent / "cache" / "clip_text_embeddings"
+
 class TexturePBRAnalyzer:
     """
     Analyseur intelligent de scènes 3D pour recommandations de textures PBR
@@ -116,6 +121,8 @@ class TexturePBRAnalyzer:
         self.device = device
         self.clip_model = None
         self.clip_processor = None
+        self.clip_model_id = None
+        self._text_embeddings_cache = {}  # {tuple(labels): embeddings normalisés (L, D)}
         self.phi_model = None
         self.phi_tokenizer = None
         
@@ -129,54 +136,121 @@ class TexturePBRAnalyzer:
     def _load_models(self):
         """Charge les modèles CLIP et Phi-1.5"""
         try:
-            # Chargement CLIP (structure HuggingFace cache avec snapshots)
-            clip_path = Path(__file__).parent / "models--openai--clip-vit-base-patch32"
-            if clip_path.exists():
-                # Chercher dans snapshots/ (structure cache HuggingFace)
-                snapshots_dir = clip_path / "snapshots"
-                if snapshots_dir.exists():
-                    # Prendre le premier snapshot disponible
-                    snapshot_dirs = list(snapshots_dir.iterdir())
-                    if snapshot_dirs:
-                        clip_model_path = snapshot_dirs[0]
-                        print(f"📦 Chargement CLIP depuis {clip_model_path}")
-                        self.clip_model = CLIPModel.from_pretrained(str(clip_model_path)).to(self.device)  # type: ignore
-                        self.clip_processor = CLIPProcessor.from_pretrained(str(clip_model_path))  # type: ignore
-                        self.clip_model.eval()
-                        print("✅ CLIP chargé avec succès")
-                    else:
-                        raise FileNotFoundError("Aucun snapshot CLIP trouvé")
-                else:
-                    # Essayer le chemin direct
-                    print(f"📦 Chargement CLIP depuis {clip_path}")
-                    self.clip_model = CLIPModel.from_pretrained(str(clip_path)).to(self.device)  # type: ignore
-                    self.clip_processor = CLIPProcessor.from_pretrained(str(clip_path))  # type: ignore
-                    self.clip_model.eval()
-                    print("✅ CLIP chargé avec succès")
-            else:
-                print("⚠️ CLIP local non trouvé - Téléchargement depuis HuggingFace...")
-                self.clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(self.device)  # type: ignore
-                self.clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")  # type: ignore
-                self.clip_model.eval()
+            # Chargement CLIP (partagé avec les autres modules via le registre)
+            self.clip_model, self.clip_processor, self.clip_model_id = get_clip(self.device)
             
             # Chargement Phi-1.5 (petit modèle de langage)
             phi_path = Path(__file__).parent / "phi-1_5"
             if phi_path.exists():
-                print(f"📦 Chargement Phi-1.5 depuis {phi_path}")
-                self.phi_tokenizer = AutoTokenizer.from_pretrained(str(phi_path), trust_remote_code=True)  # type: ignore
-                self.phi_model = AutoModelForCausalLM.from_pretrained(  # type: ignore
-                    str(phi_path),
-                    torch_dtype=torch.float16 if self.device == 'cuda' else torch.float32,
-                    trust_remote_code=True
-                ).to(self.device)  # type: ignore
-                self.phi_model.eval()
-                print("✅ Phi-1.5 chargé avec succès")
+                def load_phi():
+                    print(f"📦 Chargement Phi-1.5 depuis {phi_path}")
+                    tokenizer = AutoTokenizer.from_pretrained(str(phi_path), trust_remote_code=True)  # type: ignore
+                    model = AutoModelForCausalLM.from_pretrained(  # type: ignore
+                        str(phi_path),
+                        torch_dtype=torch.float16 if self.device == 'cuda' else torch.float32,
+                        trust_remote_code=True
+                    ).to(self.device)  # type: ignore
+                    model.eval()
+                    print("✅ Phi-1.5 chargé avec succès")
+                    return model, tokenizer
+                
+                self.phi_model, self.phi_tokenizer = get_model(('phi-1_5', str(phi_path), self.device), load_phi)
             else:
                 print("⚠️ Phi-1.5 non trouvé - Fonctionnalité de génération désactivée")
                 
         except Exception as e:
             print(f"❌ Erreur chargement modèles: {e}")
     
+    def _text_embedding_cache_path(self, labels: List[str]) -> Path:
+        """Fichier du cache disque pour une liste de labels (clé: identifiant du modèle + labels)"""
+        key = hashlib.sha1("\n".join([str(self.clip_model_id)] + list(labels)).encode('utf-8')).hexdigest()[:16]
+        model_slug = re.sub(r'[^A-Za-z0-9._-]+', '_', str(self.clip_model_id))[-60:]
+        return TEXT_EMBEDDING_CACHE_DIR / f"{model_slug}_{key}.npy"
+    
+    def get_text_embeddings(self, labels: List[str]) -> torch.Tensor:
+        """
+        Embeddings texte normalisés des labels, calculés une seule fois
+        
+        Cache mémoire par liste de labels, et cache disque par modèle pour les
+        sessions suivantes.
+        
+        Args:
+            labels: Prompts texte à encoder
+            
+        Returns:
+            Tenseur (L, D) sur self.device
+        """
+        key = tuple(labels)
+        if key in self._text_embeddings_cache:
+            return self._text_embeddings_cache[key]
+        
+        cache_path = self._text_embedding_cache_path(labels)
+        embeddings = None
+        if cache_path.exists():
+            try:
+                embeddings = torch.from_numpy(np.load(cache_path))
+                if embeddings.shape[0] != len(labels):
+                    embeddings = None
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Cache embeddings texte illisible ({cache_path.name}): {e}")
+                embeddings = None
+        
+        if embeddings is None:
+            with torch.no_grad():
+                inputs = self.clip_processor(  # type: ignore
+                    text=list(labels),
+                    return_tensors="pt",  # type: ignore
+                    padding=True  # type: ignore
+                ).to(self.device)
+                embeddings = self.clip_model.get_text_features(**inputs).float()  # type: ignore
+                embeddings = embeddings / embeddings.norm(dim=-1, keepdim=True)
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                np.save(cache_path, embeddings.cpu().numpy().astype(np.float32))
+            except OSError as e:
+                print(f"⚠️ Impossible d'écrire le cache embeddings texte: {e}")
+        
+        embeddings = embeddings.to(self.device)
+        self._text_embeddings_cache[key] = embeddings
+        return embeddings
+    
+    def encode_images(self, images: List[Image.Image], batch_size: int = CLIP_BATCH_SIZE) -> torch.Tensor:
+        """
+        Encode les images avec CLIP par mini-lots
+        
+        Args:
+            images: Images PIL
+            batch_size: Nombre d'images par passage du modèle
+            
+        Returns:
+            Embeddings image normalisés (N, D) sur self.device
+        """
+        return clip_image_features(self.clip_model, self.clip_processor, images, self.device,
+                                   batch_size=batch_size, normalize=True)
+    
+    def label_probabilities(self, image_embeddings: torch.Tensor, labels: List[str]) -> np.ndarray:
+        """
+        Probabilités (N, L) des labels pour des embeddings image déjà calculés
+        
+        Même calcul que logits_per_image de CLIPModel (produit scalaire normalisé x logit_scale).
+        """
+        with torch.no_grad():
+            logit_scale = self.clip_model.logit_scale.exp().float()  # type: ignore
+            logits = logit_scale * image_embeddings @ self.get_text_embeddings(labels).T
+            return logits.softmax(dim=1).cpu().numpy()
+    
+    def score_images(self, images: List[Image.Image],
+                     batch_size: int = CLIP_BATCH_SIZE) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Probabilités de scène et de matériaux à partir d'un seul encodage des images
+        
+        Returns:
+            Tuple (scènes (N, len(SCENE_LABELS)), matériaux (N, len(MATERIAL_LABELS)))
+        """
+        image_embeddings = self.encode_images(images, batch_size)
+        return (self.label_probabilities(image_embeddings, self.SCENE_LABELS),
+                self.label_probabilities(image_embeddings, self.MATERIAL_LABELS))
+    
     def analyze_image_clip(self, image: Image.Image) -> Dict[str, float]:
         """
         Analyse une image avec CLIP pour classifier la scène
@@ -191,24 +265,12 @@ class TexturePBRAnalyzer:
             return {}
         
         try:
-            with torch.no_grad():
-                # Préparation de l'image et des labels
-                inputs = self.clip_processor(  # type: ignore
-                    text=self.SCENE_LABELS,
-                    images=image,
-                    return_tensors="pt",  # type: ignore
-                    padding=True  # type: ignore
-                ).to(self.device)
-                
-                # Prédiction
-                outputs = self.clip_model(**inputs)
-                logits_per_image = outputs.logits_per_image
-                probs = logits_per_image.softmax(dim=1).cpu().numpy()[0]
-                
-                # Création du dictionnaire de résultats
-                results = {label: float(prob) for label, prob in zip(self.SCENE_LABELS, probs)}
-                
-                return results
+            probs = self.label_probabilities(self.encode_images([image]), self.SCENE_LABELS)[0]
+            
+            # Création du dictionnaire de résultats
+            results = {label: float(prob) for label, prob in zip(self.SCENE_LABELS, probs)}
+            
+            return results
                 
         except Exception as e:
             print(f"❌ Erreur analyse CLIP: {e}")
@@ -228,21 +290,11 @@ class TexturePBRAnalyzer:
             return {}
         
         try:
-            with torch.no_grad():
-                inputs = self.clip_processor(  # type: ignore
-                    text=self.MATERIAL_LABELS,
-                    images=image,
-                    return_tensors="pt",  # type: ignore
-                    padding=True  # type: ignore
-                ).to(self.device)
-                
-                outputs = self.clip_model(**inputs)
-                logits_per_image = outputs.logits_per_image
-                probs = logits_per_image.softmax(dim=1).cpu().numpy()[0]
-                
-                results = {label: float(prob) for label, prob in zip(self.MATERIAL_LABELS, probs)}
-                
-                return results
+            probs = self.label_probabilities(self.encode_images([image]), self.MATERIAL_LABELS)[0]
+            
+            results = {label: float(prob) for label, prob in zip(self.MATERIAL_LABELS, probs)}
+            
+            return results
                 
         except Exception as e:
             print(f"❌ Erreur analyse matériaux: {e}")
@@ -345,35 +397,34 @@ Textures:"""
             "raw_response": response
         }
     
-    def analyze_scene_batch(self, images: List[Image.Image]) -> Dict:
+    def analyze_scene_batch(self, images: List[Image.Image], batch_size: int = CLIP_BATCH_SIZE) -> Dict:
         """
         Analyse un lot d'images pour générer un rapport complet
         
+        Chaque image est encodée une seule fois (par mini-lots); les scores de scène
+        et de matériaux sont dérivés du même embedding.
+        
         Args:
             images: Liste d'images PIL
+            batch_size: Nombre d'images par passage CLIP
             
         Returns:
             Rapport complet avec recommandations de textures
         """
         print(f"🔍 Analyse de {len(images)} images...")
         
-        all_scene_scores = []
-        all_material_scores = []
-        
-        for i, img in enumerate(images):
-            print(f"  📸 Image {i+1}/{len(images)}")
-            
-            # Analyse scène
-            scene_scores = self.analyze_image_clip(img)
-            all_scene_scores.append(scene_scores)
-            
-            # Analyse matériaux
-            material_scores = self.analyze_materials_clip(img)
-            all_material_scores.append(material_scores)
+        avg_scene_scores = {}
+        avg_material_scores = {}
         
-        # Agrégation des résultats
-        avg_scene_scores = self._average_scores(all_scene_scores)
-        avg_material_scores = self._average_scores(all_material_scores)
+        if self.clip_model is not None and self.clip_processor is not None and images:
+            try:
+                scene_probs, material_probs = self.score_images(images, batch_size)
+                
+                # Agrégation des résultats
+                avg_scene_scores = dict(zip(self.SCENE_LABELS, scene_probs.mean(axis=0)))
+                avg_material_scores = dict(zip(self.MATERIAL_LABELS, material_probs.mean(axis=0)))
+            except Exception as e:
+                print(f"❌ Erreur analyse CLIP: {e}")
         
         # Identification du type de scène dominant
         dominant_scene = max(avg_scene_scores.items(), key=lambda x: x[1])[0]
@@ -399,20 +450,6 @@ Textures:"""
         
         return report
     
-    def _average_scores(self, scores_list: List[Dict[str, float]]) -> Dict[str, float]:
-        """Calcule la moyenne des scores"""
-        if not scores_list:
-            return {}
-        
-        all_keys = scores_list[0].keys()
-        averaged = {}
-        
-        for key in all_keys:
-            values = [scores[key] for scores in scores_list if key in scores]
-            averaged[key] = np.mean(values) if values else 0.0
-        
-        return averaged
-    
     def _generate_download_links(self, recommendations: Dict) -> List[Dict]:
         """
         Génère des liens vers des bibliothèques de textures PBR gratuites
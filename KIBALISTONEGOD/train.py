@@ -10,6 +10,8 @@ import tempfile
 import shutil
 import zipfile
 
+from pair_selection import cached_orb_descriptors, hamming_bits, hamming_match_count
+
 # --- CONFIGURATION ---
 st.set_page_config(page_title="🛰️ Sélecteur d’Images Drone", layout="wide")
 st.title("🛰️ Sélecteur intelligent d’images drone")
@@ -35,23 +37,24 @@ for file in uploaded_files:
     with open(file_path, "wb") as f:
         f.write(file.getbuffer())
 
-# --- Extraction de features ---
-@st.cache_data(show_spinner=False)
-def extract_features(img_path):
-    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        return None, None
-    orb = cv2.ORB_create(2000)
-    keypoints, descriptors = orb.detectAndCompute(img, None)
-    return keypoints, descriptors
+# --- Extraction de features (pool de processus, cache disque par empreinte du fichier) ---
+DESCRIPTOR_CACHE_DIR = os.path.join(tempfile.gettempdir(), "orb_descriptor_cache")
+ORB_FEATURES = 2000
+
+
+def extract_features(img_paths):
+    progress = st.progress(0.0)
+    descriptors = cached_orb_descriptors(
+        img_paths, DESCRIPTOR_CACHE_DIR, n_features=ORB_FEATURES,
+        progress_callback=lambda done, total: progress.progress(done / max(total, 1))
+    )
+    progress.empty()
+    return descriptors
 
 
-# --- Matching entre deux images ---
-def match_images(desc1, desc2):
-    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
-    matches = bf.match(desc1, desc2)
-    matches = sorted(matches, key=lambda x: x.distance)
-    return len([m for m in matches if m.distance < 50])
+# --- Matching entre deux images (distances de Hamming vectorisées) ---
+def match_images(bits1, bits2):
+    return hamming_match_count(bits1, bits2, max_distance=50)
 
 
 # --- Analyse principale ---
@@ -64,22 +67,25 @@ def analyze_folder(folder, step, min_matches):
     ])
 
     st.info(f"Extraction des features de {len(images)} images...")
-    features = {}
-    for img_path in tqdm(images):
-        kp, desc = extract_features(img_path)
-        if desc is not None:
-            features[img_path] = desc
+    features = {path: desc for path, desc in extract_features(images).items() if len(desc)}
 
     st.info("Calcul des correspondances entre images...")
     connectivity = defaultdict(set)
+    # Bits des descripteurs gardés seulement pour la fenêtre glissante de step images
+    bits = {}
     for i, img1 in enumerate(tqdm(images)):
+        if i > 0:
+            bits.pop(images[i - 1], None)
         if img1 not in features:
             continue
         for j in range(i + 1, min(i + step + 1, len(images))):
             img2 = images[j]
             if img2 not in features:
                 continue
-            n_matches = match_images(features[img1], features[img2])
+            for path in (img1, img2):
+                if path not in bits:
+                    bits[path] = hamming_bits(features[path])
+            n_matches = match_images(bits[img1], bits[img2])
             if n_matches > min_matches:
                 connectivity[img1].add(img2)
                 connectivity[img2].add(img1)
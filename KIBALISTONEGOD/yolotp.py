@@ -1,15 +1,25 @@
+import io
 import os
-import shutil
 import tempfile
 import streamlit as st
 from ultralytics import YOLO
 from PIL import Image, ImageOps, ExifTags
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import zipfile
 import math  # Ajout pour le calcul angulaire
 from datetime import datetime  # Ajout pour le parsing des timestamps EXIF
 
+# Nombre d'images par passage YOLO, côté des miniatures d'aperçu
+YOLO_BATCH_SIZE = 16
+PREVIEW_SIZE = 512
+
+# Taille maximale de l'archive proposée au téléchargement dans le navigateur
+# (st.download_button garde le fichier entier en mémoire pour chaque session)
+DOWNLOAD_MAX_BYTES = 200 * 1024 ** 2
+
+# Sous-IFD EXIF contenant DateTimeOriginal
+EXIF_IFD = 0x8769
+
 # -------------------------------
 # CONFIGURATION STREAMLIT
 # -------------------------------
@@ -63,28 +73,44 @@ for file in uploaded_files:
     image_paths.append(file_path)
 
 # -------------------------------
-# EXTRACTION DE FEATURES LÉGÈRE
+# EXTRACTION DE FEATURES LÉGÈRE (+ EXIF, sans décodage complet)
 # -------------------------------
+def read_capture_time(img):
+    """DateTimeOriginal lu dans les en-têtes EXIF (IFD principal puis sous-IFD Exif)"""
+    exif = img.getexif()
+    if not exif:
+        return None
+    for ifd in (exif, exif.get_ifd(EXIF_IFD)):
+        for tag, value in ifd.items():
+            if ExifTags.TAGS.get(tag, tag) == 'DateTimeOriginal':
+                return value
+    return None
+
+
 st.write("🔧 Extraction des vecteurs d’images...")
-features = []
+features = np.empty((len(image_paths), 3 * math.ceil(resize_dim / 8) ** 2), dtype=np.float32)
+capture_times = []
 
 progress = st.progress(0)
 for i, path in enumerate(image_paths):
-    img = Image.open(path).convert("RGB").resize((resize_dim, resize_dim))
-    np_img = np.array(img, dtype=np.float32) / 255.0
+    with Image.open(path) as img:
+        capture_times.append(read_capture_time(img))
+        # JPEG : décodage directement à l'échelle réduite (DCT), sans image pleine résolution
+        img.draft("RGB", (resize_dim, resize_dim))
+        small_img = img.convert("RGB").resize((resize_dim, resize_dim))
+    np_img = np.asarray(small_img, dtype=np.float32) / 255.0
     small = np_img[::8, ::8, :].flatten()
-    small /= np.linalg.norm(small) + 1e-8
-    features.append(small)
+    features[i] = small / (np.linalg.norm(small) + 1e-8)
     progress.progress((i + 1) / len(image_paths))
 
-features = np.vstack(features)
-
 # -------------------------------
 # CALCUL DE SIMILARITÉ
 # -------------------------------
 st.subheader("🧠 Calcul des similarités entre images...")
-similarity_matrix = cosine_similarity(features)
-uniqueness_scores = 1 - np.mean(similarity_matrix, axis=1)
+# Vecteurs normalisés : la similarité cosinus moyenne de chaque image est un produit avec la
+# somme des vecteurs (pas de matrice N x N)
+mean_similarity = features @ features.sum(axis=0) / len(features)
+uniqueness_scores = 1 - mean_similarity
 sorted_indices = np.argsort(-uniqueness_scores)
 keep_count = max(1, int(len(image_paths) * keep_ratio / 100))
 selected_indices = sorted_indices[:keep_count]
@@ -96,97 +122,112 @@ st.subheader("📐 Réorganisation et rotation des images...")
 
 image_positions = []
 
-for idx in selected_indices:
-    img_path = image_paths[idx]
-    img = Image.open(img_path).convert("RGB")
-    width = img.width
-    height = img.height
-    results = model(img_path)[0]
-
-    # Extraction du timestamp EXIF pour tri drone-like
-    exif = img.getexif()
-    datetime_original = None
-    if exif:
-        for tag, value in exif.items():
-            tagname = ExifTags.TAGS.get(tag, tag)
-            if tagname == 'DateTimeOriginal':
-                datetime_original = value
-                break
-
-    if len(results.boxes) > 0:
-        confs = results.boxes.conf.cpu().numpy()
-        valid_boxes = results.boxes[confs > min_conf]
-        if len(valid_boxes) > 0:
-            boxes = valid_boxes.xyxy.cpu().numpy()
-            areas = (boxes[:,2]-boxes[:,0]) * (boxes[:,3]-boxes[:,1])
-            main_box = boxes[np.argmax(areas)]
-            x1, y1, x2, y2 = main_box
-            cx = (x1 + x2) / 2
-            cy = (y1 + y2) / 2
-
-            # Mirroir horizontal pour uniformiser la direction (objets vers la droite)
-            if cx < width / 2:
-                img = ImageOps.mirror(img)
-                cx = width - cx  # Mise à jour de cx après mirroir pour alignement correct
+progress = st.progress(0)
+for start in range(0, len(selected_indices), YOLO_BATCH_SIZE):
+    batch = [int(idx) for idx in selected_indices[start:start + YOLO_BATCH_SIZE]]
+    batch_results = model([image_paths[idx] for idx in batch], verbose=False)
+
+    for idx, results in zip(batch, batch_results):
+        img_path = image_paths[idx]
+        height, width = results.orig_shape
+        mirror = False
+
+        if len(results.boxes) > 0:
+            confs = results.boxes.conf.cpu().numpy()
+            valid_boxes = results.boxes[confs > min_conf]
+            if len(valid_boxes) > 0:
+                boxes = valid_boxes.xyxy.cpu().numpy()
+                areas = (boxes[:,2]-boxes[:,0]) * (boxes[:,3]-boxes[:,1])
+                main_box = boxes[np.argmax(areas)]
+                x1, y1, x2, y2 = main_box
+                cx = (x1 + x2) / 2
+                cy = (y1 + y2) / 2
+
+                # Mirroir horizontal pour uniformiser la direction (objets vers la droite),
+                # appliqué seulement à l'écriture de l'export
+                if cx < width / 2:
+                    mirror = True
+                    cx = width - cx  # Mise à jour de cx après mirroir pour alignement correct
+            else:
+                cx = width / 2
+                cy = height / 2
         else:
             cx = width / 2
             cy = height / 2
-    else:
-        cx = width / 2
-        cy = height / 2
 
-    # Sauvegarde temporaire pour tri
-    temp_path = os.path.join(tmp_dir, f"tmp_{os.path.basename(img_path)}")
-    img.save(temp_path)
-    image_positions.append((cx, cy, temp_path, width, height, datetime_original))  # Ajout du timestamp
+        image_positions.append((cx, cy, img_path, width, height, capture_times[idx], mirror))
+    progress.progress(min(start + YOLO_BATCH_SIZE, len(selected_indices)) / len(selected_indices))
 
 # Tri par timestamp EXIF pour organisation comme des images de drone (ordre de capture), fallback sur position
+# (images horodatées d'abord : clés (0, date) et (1, position) comparables entre elles)
 def time_key(pos):
-    cx, cy, _, width, height, dt_str = pos
+    cx, cy, _, width, height, dt_str, _ = pos
     if dt_str is not None:
         try:
-            return datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S')
+            return (0, datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S'))
         except ValueError:
             pass
     # Fallback : tri par position normalisée (haut-gauche vers bas-droite, comme grille drone)
     norm_cy = cy / height
     norm_cx = cx / width
-    return (norm_cy, norm_cx)
+    return (1, norm_cy, norm_cx)
 
 image_positions.sort(key=time_key)
 
 # -------------------------------
-# EXPORT FINAL
+# EXPORT FINAL (écriture directe dans le ZIP)
 # -------------------------------
-sorted_output_dir = os.path.join(tmp_dir, "sorted_images")
-os.makedirs(sorted_output_dir, exist_ok=True)
+def write_to_zip(zipf, img_path, name, mirror):
+    """Copie le fichier tel quel dans le ZIP, ou l'écrit en miroir (EXIF conservé)"""
+    if not mirror:
+        zipf.write(img_path, name)
+        return
+    with Image.open(img_path) as img:
+        img_format = img.format
+        exif = img.info.get("exif")
+        mirrored = ImageOps.mirror(img.convert("RGB"))
+    save_args = {"exif": exif} if exif and img_format in ("JPEG", "PNG", "WEBP") else {}
+    buffer = io.BytesIO()  # Une seule image en mémoire à la fois
+    mirrored.save(buffer, format=img_format or "PNG", **save_args)
+    zipf.writestr(name, buffer.getvalue())
 
-for i, (cx, cy, img_path, width, height, dt_str) in enumerate(image_positions):
-    pair_idx = i // 2
-    side = 'left' if i % 2 == 0 else 'right'  # Paires correspondantes : vues adjacentes
-    new_name = f"pair_{pair_idx+1:03d}_{side}_{os.path.basename(img_path)}"
-    shutil.copy(img_path, os.path.join(sorted_output_dir, new_name))
+
+zip_path = os.path.join(tmp_dir, "sorted_images.zip")
+with zipfile.ZipFile(zip_path, "w", allowZip64=True) as zipf:
+    for i, (cx, cy, img_path, width, height, dt_str, mirror) in enumerate(image_positions):
+        pair_idx = i // 2
+        side = 'left' if i % 2 == 0 else 'right'  # Paires correspondantes : vues adjacentes
+        new_name = f"pair_{pair_idx+1:03d}_{side}_{os.path.basename(img_path)}"
+        write_to_zip(zipf, img_path, new_name, mirror)
 
 st.success(f"✅ {len(image_positions)} images filtrées, triées comme des captures drone (par timestamp ou position) et organisées par paires correspondantes.")
 
-# Affichage
+# Affichage (miniatures, miroir appliqué en mémoire)
 st.subheader("🖼️ Aperçu des images triées (premières 10)")
 cols = st.columns(min(5, len(image_positions)))
 for i, pos in enumerate(image_positions[:10]):
     with cols[i % len(cols)]:
-        st.image(pos[2], caption=os.path.basename(pos[2]), use_container_width=True)
-
-# Création ZIP final
-zip_path = os.path.join(tmp_dir, "sorted_images.zip")
-with zipfile.ZipFile(zip_path, "w") as zipf:
-    for img_name in os.listdir(sorted_output_dir):
-        zipf.write(os.path.join(sorted_output_dir, img_name), img_name)
-
-st.download_button(
-    label="📦 Télécharger les images triées (organisées par paires)",
-    data=open(zip_path, "rb").read(),
-    file_name="sorted_images.zip",
-    mime="application/zip"
-)
-
-st.caption("💾 Traitement terminé. Les fichiers temporaires seront supprimés automatiquement.")
\ No newline at end of file
+        with Image.open(pos[2]) as img:
+            img.draft("RGB", (PREVIEW_SIZE, PREVIEW_SIZE))
+            preview = img.convert("RGB")
+            preview.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+        if pos[6]:
+            preview = ImageOps.mirror(preview)
+        st.image(preview, caption=os.path.basename(pos[2]), use_container_width=True)
+
+# Téléchargement : st.download_button lit le ZIP (.read()) et conserve ses octets dans le
+# stockage média de Streamlit, soit jusqu'à DOWNLOAD_MAX_BYTES en RAM par session ;
+# au-delà, le fichier est seulement indiqué sur le disque
+zip_size = os.path.getsize(zip_path)
+if zip_size <= DOWNLOAD_MAX_BYTES:
+    with open(zip_path, "rb") as zip_file:
+        st.download_button(
+            label="📦 Télécharger les images triées (organisées par paires)",
+            data=zip_file,
+            file_name="sorted_images.zip",
+            mime="application/zip"
+        )
+else:
+    st.info(f"📦 Archive de {zip_size / 1024**2:.0f} Mo trop volumineuse pour le navigateur : récupérez-la sur le disque : {zip_path}")
+
+st.caption("💾 Traitement terminé. Les fichiers temporaires seront supprimés automatiquement.")
@@ -4,6 +4,12 @@ Fonctions d'analyse géotechnique avancées pour CPT/CPTU
 Analyse 3D des couches, classification détaillée des sols, géolocalisation
 """
 
+import hashlib
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
 import pandas as pd
 import numpy as np
 import streamlit as st
@@ -18,6 +24,8 @@ from scipy import stats
 from scipy.signal import find_peaks, savgol_filter
 from scipy.spatial import Delaunay
 from scipy.interpolate import griddata
+from analysis.liquefaction import (LIQUEFACTION_COLUMNS, liquefaction_profile,
+                                   ensure_liquefaction_columns)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -30,113 +38,171 @@ except ImportError:
     GEOPANDAS_AVAILABLE = False
     st.warning("⚠️ GeoPandas non installé. Géolocalisation limitée.")
 
-def estimate_soil_type(df):
-    """Classification détaillée des sols basée sur Robertson (1990) et Schmertmann (1978)"""
-    def classify_soil_detailed(qc, fs, depth):
-        if pd.isna(qc) or pd.isna(fs) or qc <= 0 or fs < 0:
-            return 'Inconnu', 'Unknown', 0, 0, 0
-
-        # Calcul des indices de Robertson
-        fr = (fs / qc) * 100  # Friction ratio (%)
-        Ic = ((3.47 - np.log10(qc))**2 + (np.log10(fr) + 1.22)**2)**0.5  # Soil Behavior Type Index
-
-        # Classification détaillée selon Robertson (1986)
-        if Ic < 1.31:
-            if fr < 0.5:
-                soil_type = 'Sable graveleux très dense'
-                soil_class = 'Gravel'
-                color = '#8B4513'  # Brown
-            else:
-                soil_type = 'Sable silteux dense'
-                soil_class = 'Sand'
-                color = '#DAA520'  # Goldenrod
-        elif Ic < 2.05:
-            if fr < 1:
-                soil_type = 'Sable dense à très dense'
-                soil_class = 'Sand'
-                color = '#FFD700'  # Gold
-            else:
-                soil_type = 'Sable silteux'
-                soil_class = 'Sandy Silt'
-                color = '#F0E68C'  # Khaki
-        elif Ic < 2.60:
-            if fr < 2:
-                soil_type = 'Sable lâche à compact'
-                soil_class = 'Sand'
-                color = '#FFE4B5'  # Moccasin
-            else:
-                soil_type = 'Silt sableux'
-                soil_class = 'Silty Sand'
-                color = '#DEB887'  # Burlywood
-        elif Ic < 2.95:
-            if fr < 4:
-                soil_type = 'Silt argileux'
-                soil_class = 'Clayey Silt'
-                color = '#D2B48C'  # Tan
-            else:
-                soil_type = 'Argile silteuse'
-                soil_class = 'Silty Clay'
-                color = '#BC8F8F'  # Rosy Brown
-        elif Ic < 3.60:
-            soil_type = 'Argile'
-            soil_class = 'Clay'
-            color = '#CD853F'  # Peru
-        else:
-            soil_type = 'Argile organique/molte'
-            soil_class = 'Organic Clay'
-            color = '#A0522D'  # Sienna
+# Seuils de l'indice Ic (Robertson 1986) délimitant les zones de comportement
+SOIL_IC_THRESHOLDS = np.array([1.31, 2.05, 2.60, 2.95, 3.60])
+
+# Par zone Ic: seuil de Fr (%) puis (type, classe, couleur) pour Fr < seuil et Fr >= seuil
+SOIL_ZONES = [
+    (0.5, ('Sable graveleux très dense', 'Gravel', '#8B4513'),
+          ('Sable silteux dense', 'Sand', '#DAA520')),
+    (1.0, ('Sable dense à très dense', 'Sand', '#FFD700'),
+          ('Sable silteux', 'Sandy Silt', '#F0E68C')),
+    (2.0, ('Sable lâche à compact', 'Sand', '#FFE4B5'),
+          ('Silt sableux', 'Silty Sand', '#DEB887')),
+    (4.0, ('Silt argileux', 'Clayey Silt', '#D2B48C'),
+          ('Argile silteuse', 'Silty Clay', '#BC8F8F')),
+    (np.inf, ('Argile', 'Clay', '#CD853F'),
+             ('Argile', 'Clay', '#CD853F')),
+    (np.inf, ('Argile organique/molte', 'Organic Clay', '#A0522D'),
+             ('Argile organique/molte', 'Organic Clay', '#A0522D')),
+]
+
+# Classification simplifiée pour compatibilité
+SOIL_TYPE_SIMPLIFIED = {
+    'Sable graveleux très dense': 'Sable dense',
+    'Sable silteux dense': 'Sable dense',
+    'Sable dense à très dense': 'Sable dense',
+    'Sable silteux': 'Sable',
+    'Sable lâche à compact': 'Sable',
+    'Silt sableux': 'Sable',
+    'Silt argileux': 'Limon',
+    'Argile silteuse': 'Argile',
+    'Argile': 'Argile',
+    'Argile organique/molte': 'Argile molle'
+}
+
+
+def _build_soil_lookup():
+    """Construit les tables de correspondance code -> (type, classe, couleur) du moteur vectorisé"""
+    entries = [entry for _, low, high in SOIL_ZONES for entry in (low, high)]
+    n_base = len(entries)
+    cemented = np.arange(n_base)
+    consolidated = np.arange(n_base)
+
+    # Variantes profondes (diagenèse): sables cimentés et argiles consolidées
+    for code in range(n_base):
+        soil_type, soil_class, color = entries[code]
+        if 'Sable' in soil_type:
+            cemented[code] = len(entries)
+            entries.append((soil_type + ' (cimenté)', soil_class, color))
+        elif 'Argile' in soil_type:
+            consolidated[code] = len(entries)
+            entries.append((soil_type + ' (consolidée)', soil_class, color))
+
+    entries.append(('Inconnu', 'Unknown', 0))
+    return {
+        'entries': entries,
+        'fr_thresholds': np.array([zone[0] for zone in SOIL_ZONES]),
+        'is_sand': np.array(['Sable' in e[0] for e in entries[:n_base]]),
+        'is_clay': np.array(['Argile' in e[0] for e in entries[:n_base]]),
+        'cemented': cemented,
+        'consolidated': consolidated,
+        'unknown': len(entries) - 1,
+    }
+
+
+_SOIL_LOOKUP = _build_soil_lookup()
+
+
+def classify_soil_arrays(qc, fs, depth):
+    """Classification Robertson vectorisée: retourne (codes de zone, Ic, Fr) pour des tableaux qc/fs/profondeur"""
+    lookup = _SOIL_LOOKUP
+    qc = np.asarray(qc, dtype=float)
+    fs = np.asarray(fs, dtype=float)
+    depth = np.asarray(depth, dtype=float)
+
+    valid = ~np.isnan(qc) & ~np.isnan(fs) & (qc > 0) & (fs >= 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fr = np.where(valid, fs / qc * 100, 0.0)  # Friction ratio (%)
+        ic = np.sqrt((3.47 - np.log10(qc))**2 + (np.log10(fr) + 1.22)**2)  # Soil Behavior Type Index
+    ic = np.where(valid, ic, 0.0)
+
+    # Zone Ic puis sous-zone selon Fr
+    zone = np.searchsorted(SOIL_IC_THRESHOLDS, ic, side='right')
+    codes = zone * 2 + (fr >= lookup['fr_thresholds'][zone])
+
+    # Ajustements basés sur la profondeur (diagenèse)
+    deep = depth > 20
+    codes = np.select(
+        [deep & lookup['is_sand'][codes] & (qc > 15),
+         deep & lookup['is_clay'][codes] & (qc > 8)],
+        [lookup['cemented'][codes], lookup['consolidated'][codes]],
+        default=codes
+    )
+    codes = np.where(valid, codes, lookup['unknown'])
+
+    return codes, ic, fr
 
-        # Ajustements basés sur la profondeur (diagenèse)
-        if depth > 20:  # Sols profonds plus consolidés
-            if 'Sable' in soil_type and qc > 15:
-                soil_type += ' (cimenté)'
-            elif 'Argile' in soil_type and qc > 8:
-                soil_type += ' (consolidée)'
 
-        return soil_type, soil_class, Ic, fr, color
+def _codes_to_categorical(codes, values, index=None):
+    """Convertit des codes de zone en Series catégorielle à partir d'une table de valeurs"""
+    categories = list(dict.fromkeys(values))
+    positions = np.array([categories.index(v) for v in values])
+    cat = pd.Categorical.from_codes(positions[codes], categories=categories)
+    return pd.Series(cat, index=index).cat.remove_unused_categories()
 
+
+def estimate_soil_type(df):
+    """Classification détaillée des sols basée sur Robertson (1990) et Schmertmann (1978)"""
     df_copy = df.copy()
-    results = df_copy.apply(lambda row: classify_soil_detailed(row['qc'], row['fs'], row['Depth']), axis=1)
+    codes, ic, fr = classify_soil_arrays(
+        pd.to_numeric(df_copy['qc'], errors='coerce'),
+        pd.to_numeric(df_copy['fs'], errors='coerce'),
+        pd.to_numeric(df_copy['Depth'], errors='coerce')
+    )
 
-    df_copy['Soil_Type_Detailed'] = [r[0] for r in results]
-    df_copy['Soil_Class'] = [r[1] for r in results]
-    df_copy['Ic'] = [r[2] for r in results]
-    df_copy['Fr'] = [r[3] for r in results]
-    df_copy['Soil_Color'] = [r[4] for r in results]
+    entries = _SOIL_LOOKUP['entries']
+    detailed = [e[0] for e in entries]
+    df_copy['Soil_Type_Detailed'] = _codes_to_categorical(codes, detailed, df_copy.index)
+    df_copy['Soil_Class'] = _codes_to_categorical(codes, [e[1] for e in entries], df_copy.index)
+    df_copy['Ic'] = ic
+    df_copy['Fr'] = fr
+    df_copy['Soil_Color'] = _codes_to_categorical(codes, [e[2] for e in entries], df_copy.index)
 
     # Classification simplifiée pour compatibilité
-    df_copy['Soil_Type'] = df_copy['Soil_Type_Detailed'].map({
-        'Sable graveleux très dense': 'Sable dense',
-        'Sable silteux dense': 'Sable dense',
-        'Sable dense à très dense': 'Sable dense',
-        'Sable silteux': 'Sable',
-        'Sable lâche à compact': 'Sable',
-        'Silt sableux': 'Sable',
-        'Silt argileux': 'Limon',
-        'Argile silteuse': 'Argile',
-        'Argile': 'Argile',
-        'Argile organique/molte': 'Argile molle'
-    }).fillna('Inconnu')
+    simplified = [SOIL_TYPE_SIMPLIFIED.get(label, 'Inconnu') for label in detailed]
+    df_copy['Soil_Type'] = _codes_to_categorical(codes, simplified, df_copy.index)
 
     return df_copy
 
-def calculate_crr(df):
-    """Calcule le Cyclic Resistance Ratio (CRR) avec analyse avancée"""
-    df_copy = df.copy()
 
-    # Estimation de la contrainte verticale effective
-    gamma = 18  # Poids volumique moyen (kN/m³)
-    sigma_v = df_copy['Depth'] * gamma  # Contrainte verticale totale
-    sigma_vo = sigma_v * 0.5  # Estimation simplifiée de la contrainte effective
+def classify_fused_soundings(data, sounding_column='Sondage'):
+    """
+    Classifie en une seule passe un jeu fusionné multi-sondages (sortie de core.cpt_fusion.fuse_cpt_files)
+
+    Args:
+        data: DataFrame fusionné ou liste de DataFrames par sondage
+        sounding_column: Colonne identifiant le sondage, convertie en catégorie
+
+    Returns:
+        DataFrame avec les colonnes de estimate_soil_type (copie inchangée si qc, fs ou Depth manque)
+    """
+    if isinstance(data, pd.DataFrame):
+        fused = data
+    else:
+        frames = [frame for frame in data if frame is not None and not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        fused = pd.concat(frames, ignore_index=True)
 
-    # Normalisation qc1N selon Robertson & Wride (1998)
-    df_copy['qc1N'] = df_copy['qc'] * (100 / sigma_vo)**0.5
+    if fused.empty or not {'qc', 'fs', 'Depth'}.issubset(fused.columns):
+        return fused.copy()
 
-    # CRR selon Idriss & Boulanger (2008) pour magnitude 7.5
-    df_copy['CRR'] = np.exp(df_copy['qc1N']/113 + (df_copy['qc1N']/1000)**2 - 3.5) / 2.36
+    df_classified = estimate_soil_type(fused)
+    if sounding_column in df_classified.columns:
+        df_classified[sounding_column] = df_classified[sounding_column].astype('category')
 
-    # Facteur de sécurité contre la liquéfaction
-    df_copy['FS_Liquefaction'] = df_copy['CRR'] / 0.3  # CSR = 0.3 pour M=7.5
+    return df_classified
+
+def calculate_crr(df, groundwater_level=2.0, amax_g=0.25):
+    """Calcule le Cyclic Resistance Ratio (CRR) avec analyse avancée"""
+    df_copy = df.copy()
+
+    # Profil de contraintes effectives, qc1N, CRR, CSR et FS (moteur vectorisé partagé)
+    profile = liquefaction_profile(df_copy, groundwater_level=groundwater_level, amax_g=amax_g)
+    for col in LIQUEFACTION_COLUMNS:
+        df_copy[col] = profile[col]
 
     # Classification du risque de liquéfaction
     df_copy['Liquefaction_Risk'] = pd.cut(df_copy['FS_Liquefaction'],
@@ -145,49 +211,57 @@ def calculate_crr(df):
 
     return df_copy
 
-def identify_soil_layers_3d(df, min_thickness=0.5):
-    """Identifie les couches géologiques en 3D avec épaisseurs et transitions"""
-    layers = []
-    current_layer_start = df['Depth'].min()
-    current_soil_type = df.iloc[0]['Soil_Type_Detailed']
-    current_color = df.iloc[0]['Soil_Color']
-
-    for i in range(1, len(df)):
-        if df.iloc[i]['Soil_Type_Detailed'] != current_soil_type:
-            # Fin de couche détectée
-            thickness = df.iloc[i-1]['Depth'] - current_layer_start
-            if thickness >= min_thickness:
-                layers.append({
-                    'start_depth': current_layer_start,
-                    'end_depth': df.iloc[i-1]['Depth'],
-                    'thickness': thickness,
-                    'soil_type': current_soil_type,
-                    'soil_class': df.iloc[i-1]['Soil_Class'],
-                    'color': current_color,
-                    'avg_qc': df.iloc[i-1]['qc'],
-                    'avg_fs': df.iloc[i-1]['fs'],
-                    'avg_Ic': df.iloc[i-1]['Ic']
-                })
-            current_layer_start = df.iloc[i]['Depth']
-            current_soil_type = df.iloc[i]['Soil_Type_Detailed']
-            current_color = df.iloc[i]['Soil_Color']
-
-    # Dernière couche
-    thickness = df.iloc[-1]['Depth'] - current_layer_start
-    if thickness >= min_thickness:
-        layers.append({
-            'start_depth': current_layer_start,
-            'end_depth': df.iloc[-1]['Depth'],
-            'thickness': thickness,
-            'soil_type': current_soil_type,
-            'soil_class': df.iloc[-1]['Soil_Class'],
-            'color': current_color,
-            'avg_qc': df.iloc[-1]['qc'],
-            'avg_fs': df.iloc[-1]['fs'],
-            'avg_Ic': df.iloc[-1]['Ic']
-        })
-
-    return pd.DataFrame(layers)
+LAYER_COLUMNS = ['start_depth', 'end_depth', 'thickness', 'soil_type', 'soil_class', 'color',
+                 'avg_qc', 'avg_fs', 'avg_Ic', 'min_qc', 'max_qc', 'min_fs', 'max_fs',
+                 'min_Ic', 'max_Ic', 'n_points']
+
+
+def identify_soil_layers_3d(df, min_thickness=0.5, sounding_column='Sondage'):
+    """Identifie les couches géologiques en 3D avec épaisseurs et transitions (segmentation par plages)"""
+    by_sounding = sounding_column is not None and sounding_column in df.columns
+    columns = ([sounding_column] if by_sounding else []) + LAYER_COLUMNS
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Regrouper les lignes de chaque sondage sans changer leur ordre interne
+    data = df.sort_values(sounding_column, kind='stable') if by_sounding else df
+
+    # Masque de changement: nouveau type de sol ou nouveau sondage
+    soil_codes = pd.factorize(data['Soil_Type_Detailed'])[0]
+    change = np.ones(len(data), dtype=bool)
+    change[1:] = soil_codes[1:] != soil_codes[:-1]
+    if by_sounding:
+        sounding_codes = pd.factorize(data[sounding_column])[0]
+        change[1:] |= sounding_codes[1:] != sounding_codes[:-1]
+    run_ids = np.cumsum(change) - 1
+
+    aggregations = {
+        'start_depth': ('Depth', 'first'),
+        'end_depth': ('Depth', 'last'),
+        'soil_type': ('Soil_Type_Detailed', 'first'),
+        'soil_class': ('Soil_Class', 'last'),
+        'color': ('Soil_Color', 'first'),
+        'avg_qc': ('qc', 'mean'),
+        'avg_fs': ('fs', 'mean'),
+        'avg_Ic': ('Ic', 'mean'),
+        'min_qc': ('qc', 'min'),
+        'max_qc': ('qc', 'max'),
+        'min_fs': ('fs', 'min'),
+        'max_fs': ('fs', 'max'),
+        'min_Ic': ('Ic', 'min'),
+        'max_Ic': ('Ic', 'max'),
+        'n_points': ('Depth', 'size'),
+    }
+    if by_sounding:
+        aggregations = {sounding_column: (sounding_column, 'first'), **aggregations}
+
+    layers = data.groupby(run_ids, sort=False).agg(**aggregations)
+    layers['thickness'] = layers['end_depth'] - layers['start_depth']
+    for col in ['soil_type', 'soil_class', 'color'] + ([sounding_column] if by_sounding else []):
+        layers[col] = layers[col].astype(object)
+
+    layers = layers[layers['thickness'] >= min_thickness]
+    return layers[columns].reset_index(drop=True)
 
 def create_geospatial_analysis(df, lat=48.8566, lon=2.3522):
     """Crée une analyse géospatiale avec GeoPandas"""
@@ -219,41 +293,215 @@ def create_geospatial_analysis(df, lat=48.8566, lon=2.3522):
         st.error(f"Erreur lors de l'analyse géospatiale: {e}")
         return None
 
-def create_advanced_visualizations(df, layers_df=None, gdf=None):
-    """Crée 10+ graphiques et tableaux avancés pour l'analyse géotechnique"""
+FIGURE_POINT_BUDGET = 5000  # Nombre maximal de points envoyés au navigateur par figure
+
+
+def lttb_indices(x, y, n_out):
+    """Indices retenus par l'algorithme Largest-Triangle-Three-Buckets (Steinarsson 2013)"""
+    x = np.nan_to_num(np.asarray(x, dtype=float))
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Point du bucket formant le plus grand triangle avec le point précédent et la moyenne suivante
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def decimate_profile(df, max_points=FIGURE_POINT_BUDGET, x='Depth', y='qc'):
+    """Réduit un profil à max_points lignes par LTTB sur (x, y), sans changer les profils courts"""
+    if max_points is None or len(df) <= max_points:
+        return df
+    return df.iloc[lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)]
+
+
+class _FigureContext:
+    """Données partagées entre les figures, calculées une seule fois et à la demande"""
+
+    def __init__(self, df, layers_df, gdf, max_points):
+        self.df = df
+        self.layers_df = layers_df
+        self.gdf = gdf
+        self.max_points = max_points
+        self._plot_df = None
+        self._zones = None
+        self._grid = None
+
+    @property
+    def plot_df(self):
+        """Profil décimé envoyé aux figures de points"""
+        if self._plot_df is None:
+            self._plot_df = decimate_profile(self.df, self.max_points)
+        return self._plot_df
+
+    @property
+    def zones(self):
+        """Zones CPTU simulées: (centres, DataFrame avec zone par point, nombre de zones)"""
+        if self._zones is None:
+            df = self.df
+            np.random.seed(42)
+            n_zones = min(10, len(df))  # Maximum 10 zones
+            zone_centers = []
+
+            # Créer des centres de zones distribués
+            for i in range(n_zones):
+                angle = 2 * np.pi * i / n_zones
+                radius = 50 + np.random.uniform(-20, 20)
+                zone_centers.append((radius * np.cos(angle), radius * np.sin(angle)))
+
+            # Assigner chaque point à une zone
+            df_zones = df.copy()
+            df_zones['zone_id'] = np.random.randint(0, n_zones, len(df))
+            df_zones['zone_x'] = df_zones['zone_id'].map(lambda i: zone_centers[i][0])
+            df_zones['zone_y'] = df_zones['zone_id'].map(lambda i: zone_centers[i][1])
+            self._zones = (zone_centers, df_zones, n_zones)
+        return self._zones
+
+    @property
+    def grid(self):
+        """Grille régulière (profondeur x position latérale) et sa triangulation: (X, Y, tri)"""
+        if self._grid is None:
+            df = self.df
+            x_grid = np.linspace(df['Depth'].min(), df['Depth'].max(), 20)
+            y_grid = np.linspace(0, 100, 20)  # Position latérale simulée
+            X, Y = np.meshgrid(x_grid, y_grid)
+            X = X.flatten()
+            Y = Y.flatten()
+            tri = Delaunay(np.column_stack([X, Y]))
+            self._grid = (X, Y, tri)
+        return self._grid
+
+    def interpolate_on_grid(self, values):
+        """Interpole des valeurs (alignées sur df) sur la grille, à partir du profil décimé"""
+        X, Y, _ = self.grid
+        plot_df = self.plot_df
+        values = pd.Series(np.asarray(values), index=self.df.index).loc[plot_df.index]
+        return griddata(
+            (plot_df['Depth'], np.random.uniform(0, 100, len(plot_df))),
+            values,
+            (X, Y),
+            method='linear'
+        )
 
-    visualizations = {}
 
-    # 1. Profil 3D des couches géologiques
-    if layers_df is not None:
-        fig_3d_layers = go.Figure()
+# Registre des figures: nom -> (constructeur, condition de disponibilité)
+_FIGURE_BUILDERS = {}
 
-        for _, layer in layers_df.iterrows():
-            fig_3d_layers.add_trace(go.Scatter3d(
-                x=[0, 1, 1, 0, 0],
-                y=[layer['start_depth'], layer['start_depth'], layer['end_depth'], layer['end_depth'], layer['start_depth']],
-                z=[0, 0, 0, 0, 0],
-                mode='lines',
-                line=dict(color=layer['color'], width=10),
-                name=f"{layer['soil_type']} ({layer['thickness']:.1f}m)",
-                showlegend=True
-            ))
 
-        fig_3d_layers.update_layout(
-            title="Profil 3D des Couches Géologiques",
-            scene=dict(
-                xaxis_title="Position X",
-                yaxis_title="Profondeur (m)",
-                zaxis_title="Position Z"
-            )
+def _figure(name, condition=None):
+    """Enregistre un constructeur de figure dans le registre paresseux"""
+    def decorator(builder):
+        _FIGURE_BUILDERS[name] = (builder, condition)
+        return builder
+    return decorator
+
+
+def _has_layers(ctx):
+    return ctx.layers_df is not None
+
+
+def _has_liquefaction(ctx):
+    return 'FS_Liquefaction' in ctx.df.columns
+
+
+class LazyFigureRegistry(Mapping):
+    """
+    Dictionnaire de figures construites uniquement au premier accès
+
+    Les noms disponibles sont connus immédiatement; chaque figure est construite
+    lors de sa première lecture (ex. ouverture de l'onglet) puis mémorisée.
+    Une figure dont la construction échoue vaut None.
+    """
+
+    def __init__(self, df, layers_df=None, gdf=None, max_points=FIGURE_POINT_BUDGET):
+        self._ctx = _FigureContext(df, layers_df, gdf, max_points)
+        self._names = [name for name, (_, condition) in _FIGURE_BUILDERS.items()
+                       if condition is None or condition(self._ctx)]
+        self._built = {}
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._built:
+            builder, _ = _FIGURE_BUILDERS[name]
+            try:
+                self._built[name] = builder(self._ctx)
+            except Exception as e:
+                st.warning(f"Erreur lors de la création de la figure '{name}': {e}")
+                self._built[name] = None
+        return self._built[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def is_built(self, name):
+        """Indique si une figure a déjà été construite"""
+        return name in self._built
+
+    def build_all(self):
+        """Construit toutes les figures (export complet) et retourne un dict classique"""
+        return {name: figure for name, figure in self.items() if figure is not None}
+
+
+def create_advanced_visualizations(df, layers_df=None, gdf=None, max_points=FIGURE_POINT_BUDGET):
+    """Crée 10+ graphiques et tableaux avancés pour l'analyse géotechnique (construits à la demande)"""
+    return LazyFigureRegistry(df, layers_df, gdf, max_points)
+
+
+# 1. Profil 3D des couches géologiques
+@_figure('3d_layers', _has_layers)
+def _figure_3d_layers(ctx):
+    fig_3d_layers = go.Figure()
+
+    for _, layer in ctx.layers_df.iterrows():
+        fig_3d_layers.add_trace(go.Scatter3d(
+            x=[0, 1, 1, 0, 0],
+            y=[layer['start_depth'], layer['start_depth'], layer['end_depth'], layer['end_depth'], layer['start_depth']],
+            z=[0, 0, 0, 0, 0],
+            mode='lines',
+            line=dict(color=layer['color'], width=10),
+            name=f"{layer['soil_type']} ({layer['thickness']:.1f}m)",
+            showlegend=True
+        ))
+
+    fig_3d_layers.update_layout(
+        title="Profil 3D des Couches Géologiques",
+        scene=dict(
+            xaxis_title="Position X",
+            yaxis_title="Profondeur (m)",
+            zaxis_title="Position Z"
         )
-        visualizations['3d_layers'] = fig_3d_layers
+    )
+    return fig_3d_layers
+
 
-    # 2. Carte de chaleur Ic vs Profondeur
+# 2. Carte de chaleur Ic vs Profondeur
+@_figure('ic_heatmap')
+def _figure_ic_heatmap(ctx):
+    plot_df = ctx.plot_df
     fig_ic_heatmap = go.Figure(data=go.Heatmap(
-        z=df['Ic'],
-        x=df['Depth'],
-        y=df['qc'],
+        z=plot_df['Ic'],
+        x=plot_df['Depth'],
+        y=plot_df['qc'],
         colorscale='Viridis',
         name='Indice Ic'
     ))
@@ -262,10 +510,13 @@ def create_advanced_visualizations(df, layers_df=None, gdf=None):
         xaxis_title="Profondeur (m)",
         yaxis_title="qc (MPa)"
     )
-    visualizations['ic_heatmap'] = fig_ic_heatmap
+    return fig_ic_heatmap
+
 
-    # 3. Histogramme des types de sols avec distribution
-    soil_counts = df['Soil_Type_Detailed'].value_counts()
+# 3. Histogramme des types de sols avec distribution
+@_figure('soil_distribution')
+def _figure_soil_distribution(ctx):
+    soil_counts = ctx.df['Soil_Type_Detailed'].value_counts()
     fig_soil_dist = px.bar(
         x=soil_counts.index,
         y=soil_counts.values,
@@ -273,665 +524,636 @@ def create_advanced_visualizations(df, layers_df=None, gdf=None):
         title="Distribution des Types de Sols Détaillés"
     )
     fig_soil_dist.update_layout(xaxis_title="Type de Sol", yaxis_title="Nombre d'échantillons")
-    visualizations['soil_distribution'] = fig_soil_dist
-
-    # 4. Graphique radar des propriétés moyennes par couche
-    if layers_df is not None:
-        categories = ['Épaisseur', 'qc moyen', 'fs moyen', 'Ic moyen']
-
-        fig_radar = go.Figure()
-
-        for _, layer in layers_df.iterrows():
-            values = [
-                layer['thickness'],
-                layer['avg_qc'],
-                layer['avg_fs'],
-                layer['avg_Ic']
-            ]
-            fig_radar.add_trace(go.Scatterpolar(
-                r=values,
-                theta=categories,
-                fill='toself',
-                name=f"{layer['soil_type'][:20]}..."
-            ))
+    return fig_soil_dist
+
+
+# 4. Graphique radar des propriétés moyennes par couche
+@_figure('radar_properties', _has_layers)
+def _figure_radar_properties(ctx):
+    categories = ['Épaisseur', 'qc moyen', 'fs moyen', 'Ic moyen']
+
+    fig_radar = go.Figure()
+
+    for _, layer in ctx.layers_df.iterrows():
+        values = [
+            layer['thickness'],
+            layer['avg_qc'],
+            layer['avg_fs'],
+            layer['avg_Ic']
+        ]
+        fig_radar.add_trace(go.Scatterpolar(
+            r=values,
+            theta=categories,
+            fill='toself',
+            name=f"{layer['soil_type'][:20]}..."
+        ))
 
-        fig_radar.update_layout(
-            polar=dict(radialaxis=dict(visible=True)),
-            title="Propriétés Moyennes par Couche Géologique"
-        )
-        visualizations['radar_properties'] = fig_radar
+    fig_radar.update_layout(
+        polar=dict(radialaxis=dict(visible=True)),
+        title="Propriétés Moyennes par Couche Géologique"
+    )
+    return fig_radar
 
-    # 5. Analyse de tendance avec lissage
+
+# 5. Analyse de tendance avec lissage
+@_figure('trend_analysis')
+def _figure_trend_analysis(ctx):
+    df = ctx.df
     window_size = min(21, len(df) // 2 * 2 + 1)  # Taille impaire
     df_smooth = df.copy()
     df_smooth['qc_smooth'] = savgol_filter(df['qc'], window_size, 3)
     df_smooth['fs_smooth'] = savgol_filter(df['fs'], window_size, 3)
 
+    # Lissage sur le profil complet, affichage sur le profil décimé
+    plot_df = ctx.plot_df
+    df_smooth = df_smooth.loc[plot_df.index]
+
     fig_trends = make_subplots(rows=2, cols=1, shared_xaxes=True,
                               subplot_titles=['Résistance de Pointe (qc)', 'Frottement de Manche (fs)'])
 
-    fig_trends.add_trace(go.Scatter(x=df['Depth'], y=df['qc'], mode='markers', name='qc brut',
+    fig_trends.add_trace(go.Scatter(x=plot_df['Depth'], y=plot_df['qc'], mode='markers', name='qc brut',
                                    marker=dict(size=3, color='lightblue')), row=1, col=1)
     fig_trends.add_trace(go.Scatter(x=df_smooth['Depth'], y=df_smooth['qc_smooth'],
                                    mode='lines', name='qc lissé', line=dict(color='blue', width=2)), row=1, col=1)
 
-    fig_trends.add_trace(go.Scatter(x=df['Depth'], y=df['fs'], mode='markers', name='fs brut',
+    fig_trends.add_trace(go.Scatter(x=plot_df['Depth'], y=plot_df['fs'], mode='markers', name='fs brut',
                                    marker=dict(size=3, color='lightcoral')), row=2, col=1)
     fig_trends.add_trace(go.Scatter(x=df_smooth['Depth'], y=df_smooth['fs_smooth'],
                                    mode='lines', name='fs lissé', line=dict(color='red', width=2)), row=2, col=1)
 
     fig_trends.update_layout(title="Analyse de Tendance avec Lissage Savitzky-Golay")
-    visualizations['trend_analysis'] = fig_trends
+    return fig_trends
 
-    # 6. Diagramme de dispersion qc/fs coloré par type de sol
-    fig_scatter = px.scatter(df, x='qc', y='fs', color='Soil_Type_Detailed',
-                            title="Corrélation qc/fs par Type de Sol",
-                            labels={'qc': 'Résistance de Pointe (MPa)', 'fs': 'Frottement de Manche (MPa)'})
-    visualizations['correlation_scatter'] = fig_scatter
 
-    # 7. Profil de risque de liquéfaction
-    if 'FS_Liquefaction' in df.columns:
-        fig_liq = make_subplots(rows=1, cols=2,
-                               subplot_titles=['Facteur de Sécurité', 'Risque de Liquéfaction'])
-
-        fig_liq.add_trace(go.Scatter(x=df['FS_Liquefaction'], y=df['Depth'], mode='lines+markers',
-                                    name='FS', line=dict(color='red')), row=1, col=1)
-
-        risk_colors = {'Très élevé': 'darkred', 'Élevé': 'red', 'Modéré': 'orange', 'Faible': 'green'}
-        for risk in df['Liquefaction_Risk'].unique():
-            mask = df['Liquefaction_Risk'] == risk
-            fig_liq.add_trace(go.Scatter(
-                x=df[mask]['Depth'],
-                y=[1] * mask.sum(),
-                mode='markers',
-                marker=dict(color=risk_colors.get(risk, 'gray'), size=10),
-                name=risk
-            ), row=1, col=2)
-
-        fig_liq.update_layout(title="Analyse du Risque de Liquéfaction")
-        visualizations['liquefaction_profile'] = fig_liq
-
-    # 8. Statistiques descriptives par couche
-    if layers_df is not None:
-        stats_data = []
-        for _, layer in layers_df.iterrows():
-            mask = (df['Depth'] >= layer['start_depth']) & (df['Depth'] <= layer['end_depth'])
-            layer_data = df[mask]
-
-            stats_data.append({
-                'Couche': layer['soil_type'][:30],
-                'Épaisseur (m)': f"{layer['thickness']:.1f}",
-                'Profondeur (m)': f"{layer['start_depth']:.1f}-{layer['end_depth']:.1f}",
-                'qc moyen (MPa)': f"{layer_data['qc'].mean():.1f}",
-                'qc min-max (MPa)': f"{layer_data['qc'].min():.1f}-{layer_data['qc'].max():.1f}",
-                'fs moyen (MPa)': f"{layer_data['fs'].mean():.1f}",
-                'Ic moyen': f"{layer_data['Ic'].mean():.2f}",
-                'Échantillons': len(layer_data)
-            })
-
-        stats_df = pd.DataFrame(stats_data)
-        visualizations['layer_statistics'] = stats_df
-
-    # 9. Analyse fréquentielle (FFT) des variations
-    if len(df) > 32:  # Minimum pour FFT
-        qc_fft = np.fft.fft(df['qc'].values)
-        freqs = np.fft.fftfreq(len(df), d=(df['Depth'].diff().mean()))
-
-        fig_fft = make_subplots(rows=1, cols=2,
-                               subplot_titles=['Spectre de Fréquence qc', 'Périodogramme'])
-
-        fig_fft.add_trace(go.Scatter(x=freqs[:len(freqs)//2], y=np.abs(qc_fft)[:len(qc_fft)//2],
-                                    mode='lines', name='Amplitude'), row=1, col=1)
-
-        fig_fft.add_trace(go.Scatter(x=df['Depth'], y=df['qc'], mode='lines', name='Signal original'), row=1, col=2)
-        fig_fft.add_trace(go.Scatter(x=df['Depth'], y=savgol_filter(df['qc'], 11, 3),
-                                    mode='lines', name='Tendance', line=dict(dash='dash')), row=1, col=2)
-
-        fig_fft.update_layout(title="Analyse Fréquentielle des Variations de qc")
-        visualizations['frequency_analysis'] = fig_fft
-
-    # 10. Remplacement de la carte géographique par analyse de zones CPTU
-    try:
-        # Créer des coordonnées simulées pour les zones CPTU
-        np.random.seed(42)
-        n_zones = min(10, len(df))  # Maximum 10 zones
-        zone_centers = []
-
-        # Créer des centres de zones distribués
-        for i in range(n_zones):
-            angle = 2 * np.pi * i / n_zones
-            radius = 50 + np.random.uniform(-20, 20)
-            x = radius * np.cos(angle)
-            y = radius * np.sin(angle)
-            zone_centers.append((x, y))
-
-        # Assigner chaque point à une zone
-        df_zones = df.copy()
-        df_zones['zone_id'] = np.random.randint(0, n_zones, len(df))
-        df_zones['zone_x'] = df_zones['zone_id'].map(lambda i: zone_centers[i][0])
-        df_zones['zone_y'] = df_zones['zone_id'].map(lambda i: zone_centers[i][1])
-
-        # Graphique 3D des zones CPTU
-        fig_zones_3d = go.Figure()
-
-        for zone_id in range(n_zones):
-            zone_data = df_zones[df_zones['zone_id'] == zone_id]
-            if not zone_data.empty:
-                fig_zones_3d.add_trace(go.Scatter3d(
-                    x=zone_data['zone_x'],
-                    y=zone_data['zone_y'],
-                    z=zone_data['Depth'],
-                    mode='markers',
-                    name=f'Zone {zone_id + 1}',
-                    marker=dict(
-                        size=6,
-                        color=zone_data['qc'],
-                        colorscale='Viridis',
-                        showscale=True,
-                        colorbar=dict(title="qc (MPa)")
-                    ),
-                    text=[f"Zone {zone_id + 1}<br>Profondeur: {d:.1f}m<br>qc: {q:.1f}MPa"
-                          for d, q in zip(zone_data['Depth'], zone_data['qc'])]
-                ))
+# 6. Diagramme de dispersion qc/fs coloré par type de sol
+@_figure('correlation_scatter')
+def _figure_correlation_scatter(ctx):
+    return px.scatter(ctx.plot_df, x='qc', y='fs', color='Soil_Type_Detailed',
+                      title="Corrélation qc/fs par Type de Sol",
+                      labels={'qc': 'Résistance de Pointe (MPa)', 'fs': 'Frottement de Manche (MPa)'})
 
-        fig_zones_3d.update_layout(
-            title="Zones CPTU 3D avec Distribution Spatiale",
-            scene=dict(
-                xaxis_title="Position X (m)",
-                yaxis_title="Position Y (m)",
-                zaxis_title="Profondeur (m)",
-                zaxis=dict(autorange="reversed")
-            )
-        )
-        visualizations['cptu_zones_3d'] = fig_zones_3d
 
-    except Exception as e:
-        st.warning(f"Erreur lors de la création des zones CPTU: {e}")
+# 7. Profil de risque de liquéfaction
+@_figure('liquefaction_profile', _has_liquefaction)
+def _figure_liquefaction_profile(ctx):
+    df = ctx.plot_df
+    fig_liq = make_subplots(rows=1, cols=2,
+                           subplot_titles=['Facteur de Sécurité', 'Risque de Liquéfaction'])
 
-    # === 10 NOUVEAUX GRAPHIQUES 3D AVEC TRIANGULATION ===
+    fig_liq.add_trace(go.Scatter(x=df['FS_Liquefaction'], y=df['Depth'], mode='lines+markers',
+                                name='FS', line=dict(color='red')), row=1, col=1)
 
-    # 11. Surface triangulée 3D des types de sol
-    try:
-        from scipy.spatial import Delaunay
-
-        # Créer une grille de points pour la triangulation
-        x_grid = np.linspace(df['Depth'].min(), df['Depth'].max(), 20)
-        y_grid = np.linspace(0, 100, 20)  # Position latérale simulée
-        X, Y = np.meshgrid(x_grid, y_grid)
-        X = X.flatten()
-        Y = Y.flatten()
-
-        # Interpoler les valeurs de qc sur la grille
-        from scipy.interpolate import griddata
-        qc_interp = griddata(
-            (df['Depth'], np.random.uniform(0, 100, len(df))),
-            df['qc'],
-            (X, Y),
-            method='linear'
-        )
-
-        # Triangulation
-        points = np.column_stack([X, Y])
-        tri = Delaunay(points)
-
-        # Créer la surface 3D triangulée
-        fig_triangulated = go.Figure()
-
-        fig_triangulated.add_trace(go.Mesh3d(
-            x=X,
-            y=Y,
-            z=qc_interp,
-            i=tri.simplices[:, 0],
-            j=tri.simplices[:, 1],
-            k=tri.simplices[:, 2],
-            opacity=0.8,
-            color='lightblue',
-            name='Surface qc'
-        ))
-
-        # Ajouter les points de données réels
-        fig_triangulated.add_trace(go.Scatter3d(
-            x=df['Depth'],
-            y=np.random.uniform(0, 100, len(df)),
-            z=df['qc'],
+    risk_colors = {'Très élevé': 'darkred', 'Élevé': 'red', 'Modéré': 'orange', 'Faible': 'green'}
+    for risk in df['Liquefaction_Risk'].unique():
+        mask = df['Liquefaction_Risk'] == risk
+        fig_liq.add_trace(go.Scatter(
+            x=df[mask]['Depth'],
+            y=[1] * mask.sum(),
             mode='markers',
-            marker=dict(size=4, color='red', opacity=0.7),
-            name='Points réels'
-        ))
+            marker=dict(color=risk_colors.get(risk, 'gray'), size=10),
+            name=risk
+        ), row=1, col=2)
+
+    fig_liq.update_layout(title="Analyse du Risque de Liquéfaction")
+    return fig_liq
+
+
+# 8. Statistiques descriptives par couche
+@_figure('layer_statistics', _has_layers)
+def _figure_layer_statistics(ctx):
+    df = ctx.df
+    stats_data = []
+    for _, layer in ctx.layers_df.iterrows():
+        mask = (df['Depth'] >= layer['start_depth']) & (df['Depth'] <= layer['end_depth'])
+        layer_data = df[mask]
+
+        stats_data.append({
+            'Couche': layer['soil_type'][:30],
+            'Épaisseur (m)': f"{layer['thickness']:.1f}",
+            'Profondeur (m)': f"{layer['start_depth']:.1f}-{layer['end_depth']:.1f}",
+            'qc moyen (MPa)': f"{layer_data['qc'].mean():.1f}",
+            'qc min-max (MPa)': f"{layer_data['qc'].min():.1f}-{layer_data['qc'].max():.1f}",
+            'fs moyen (MPa)': f"{layer_data['fs'].mean():.1f}",
+            'Ic moyen': f"{layer_data['Ic'].mean():.2f}",
+            'Échantillons': len(layer_data)
+        })
 
-        fig_triangulated.update_layout(
-            title="Surface Triangulée 3D - Résistance de Pointe (qc)",
-            scene=dict(
-                xaxis_title="Profondeur (m)",
-                yaxis_title="Position Latérale (m)",
-                zaxis_title="qc (MPa)"
-            )
-        )
-        visualizations['triangulated_surface_qc'] = fig_triangulated
+    return pd.DataFrame(stats_data)
 
-    except Exception as e:
-        st.warning(f"Erreur lors de la triangulation qc: {e}")
 
-    # 12. Surface triangulée Ic vs Profondeur
-    try:
-        ic_interp = griddata(
-            (df['Depth'], np.random.uniform(0, 100, len(df))),
-            df['Ic'],
-            (X, Y),
-            method='linear'
-        )
+# 9. Analyse fréquentielle (FFT) des variations
+@_figure('frequency_analysis', lambda ctx: len(ctx.df) > 32)  # Minimum pour FFT
+def _figure_frequency_analysis(ctx):
+    df = ctx.df
+    qc_fft = np.fft.fft(df['qc'].values)
+    freqs = np.fft.fftfreq(len(df), d=(df['Depth'].diff().mean()))
+    trend = pd.Series(savgol_filter(df['qc'], 11, 3), index=df.index)
 
-        fig_triangulated_ic = go.Figure()
-
-        fig_triangulated_ic.add_trace(go.Mesh3d(
-            x=X,
-            y=Y,
-            z=ic_interp,
-            i=tri.simplices[:, 0],
-            j=tri.simplices[:, 1],
-            k=tri.simplices[:, 2],
-            opacity=0.8,
-            colorscale='Viridis',
-            intensity=ic_interp,
-            name='Surface Ic'
-        ))
+    # Spectre décimé sur le même budget de points que les profils
+    half = len(freqs) // 2
+    spectrum_idx = lttb_indices(freqs[:half], np.abs(qc_fft)[:half], ctx.max_points or half)
+    plot_df = ctx.plot_df
 
-        fig_triangulated_ic.add_trace(go.Scatter3d(
-            x=df['Depth'],
-            y=np.random.uniform(0, 100, len(df)),
-            z=df['Ic'],
-            mode='markers',
-            marker=dict(size=4, color='red', opacity=0.7),
-            name='Points réels'
-        ))
+    fig_fft = make_subplots(rows=1, cols=2,
+                           subplot_titles=['Spectre de Fréquence qc', 'Périodogramme'])
 
-        fig_triangulated_ic.update_layout(
-            title="Surface Triangulée 3D - Indice Ic (Soil Behavior Type)",
-            scene=dict(
-                xaxis_title="Profondeur (m)",
-                yaxis_title="Position Latérale (m)",
-                zaxis_title="Indice Ic"
-            )
-        )
-        visualizations['triangulated_surface_ic'] = fig_triangulated_ic
+    fig_fft.add_trace(go.Scatter(x=freqs[spectrum_idx], y=np.abs(qc_fft)[spectrum_idx],
+                                mode='lines', name='Amplitude'), row=1, col=1)
 
-    except Exception as e:
-        st.warning(f"Erreur lors de la triangulation Ic: {e}")
+    fig_fft.add_trace(go.Scatter(x=plot_df['Depth'], y=plot_df['qc'], mode='lines', name='Signal original'), row=1, col=2)
+    fig_fft.add_trace(go.Scatter(x=plot_df['Depth'], y=trend.loc[plot_df.index],
+                                mode='lines', name='Tendance', line=dict(dash='dash')), row=1, col=2)
 
-    # 13. Volume 3D des couches géologiques avec triangulation
-    try:
-        if layers_df is not None and not layers_df.empty:
-            fig_layers_volume = go.Figure()
-
-            colors = ['#8B4513', '#DAA520', '#F4A460', '#DEB887', '#D2B48C', '#BC8F8F']
-
-            for idx, layer in layers_df.iterrows():
-                # Créer une surface pour chaque couche
-                layer_mask = (df['Depth'] >= layer['start_depth']) & (df['Depth'] <= layer['end_depth'])
-                layer_data = df[layer_mask]
-
-                if not layer_data.empty:
-                    # Points pour la couche
-                    x_layer = np.random.uniform(0, 100, len(layer_data))
-                    y_layer = layer_data['Depth']
-                    z_layer = np.random.uniform(0, 50, len(layer_data))  # Épaisseur simulée
-
-                    # Triangulation pour la couche
-                    if len(layer_data) >= 3:
-                        points_layer = np.column_stack([x_layer, y_layer])
-                        tri_layer = Delaunay(points_layer)
-
-                        fig_layers_volume.add_trace(go.Mesh3d(
-                            x=x_layer,
-                            y=y_layer,
-                            z=z_layer,
-                            i=tri_layer.simplices[:, 0],
-                            j=tri_layer.simplices[:, 1],
-                            k=tri_layer.simplices[:, 2],
-                            opacity=0.7,
-                            color=colors[idx % len(colors)],
-                            name=f"{layer['soil_type'][:20]}..."
-                        ))
-
-            fig_layers_volume.update_layout(
-                title="Volume 3D Triangulé des Couches Géologiques",
-                scene=dict(
-                    xaxis_title="Position X (m)",
-                    yaxis_title="Profondeur (m)",
-                    zaxis_title="Épaisseur (m)"
-                )
-            )
-            visualizations['layers_volume_3d'] = fig_layers_volume
+    fig_fft.update_layout(title="Analyse Fréquentielle des Variations de qc")
+    return fig_fft
 
-    except Exception as e:
-        st.warning(f"Erreur lors de la création du volume 3D: {e}")
 
-    # 14. Surface 3D des risques de liquéfaction
-    try:
-        if 'FS_Liquefaction' in df.columns:
-            fs_interp = griddata(
-                (df['Depth'], np.random.uniform(0, 100, len(df))),
-                df['FS_Liquefaction'],
-                (X, Y),
-                method='linear'
-            )
+# 10. Remplacement de la carte géographique par analyse de zones CPTU
+@_figure('cptu_zones_3d')
+def _figure_cptu_zones_3d(ctx):
+    _, df_zones, n_zones = ctx.zones
+    df_zones = df_zones.loc[ctx.plot_df.index]
 
-            fig_liquefaction_3d = go.Figure()
-
-            fig_liquefaction_3d.add_trace(go.Mesh3d(
-                x=X,
-                y=Y,
-                z=fs_interp,
-                i=tri.simplices[:, 0],
-                j=tri.simplices[:, 1],
-                k=tri.simplices[:, 2],
-                opacity=0.8,
-                colorscale='RdYlGn',
-                intensity=fs_interp,
-                name='FS Liquefaction'
-            ))
-
-            # Colorer selon le risque
-            risk_colors = []
-            for fs in df['FS_Liquefaction']:
-                if fs < 1.2:
-                    risk_colors.append('red')
-                elif fs < 1.5:
-                    risk_colors.append('orange')
-                else:
-                    risk_colors.append('green')
+    # Graphique 3D des zones CPTU
+    fig_zones_3d = go.Figure()
 
-            fig_liquefaction_3d.add_trace(go.Scatter3d(
-                x=df['Depth'],
-                y=np.random.uniform(0, 100, len(df)),
-                z=df['FS_Liquefaction'],
+    for zone_id in range(n_zones):
+        zone_data = df_zones[df_zones['zone_id'] == zone_id]
+        if not zone_data.empty:
+            fig_zones_3d.add_trace(go.Scatter3d(
+                x=zone_data['zone_x'],
+                y=zone_data['zone_y'],
+                z=zone_data['Depth'],
                 mode='markers',
-                marker=dict(size=6, color=risk_colors, opacity=0.8),
-                name='Points de risque'
+                name=f'Zone {zone_id + 1}',
+                marker=dict(
+                    size=6,
+                    color=zone_data['qc'],
+                    colorscale='Viridis',
+                    showscale=True,
+                    colorbar=dict(title="qc (MPa)")
+                ),
+                text=[f"Zone {zone_id + 1}<br>Profondeur: {d:.1f}m<br>qc: {q:.1f}MPa"
+                      for d, q in zip(zone_data['Depth'], zone_data['qc'])]
             ))
 
-            fig_liquefaction_3d.update_layout(
-                title="Surface 3D Triangulée - Risque de Liquéfaction",
-                scene=dict(
-                    xaxis_title="Profondeur (m)",
-                    yaxis_title="Position Latérale (m)",
-                    zaxis_title="FS Liquefaction"
-                )
-            )
-            visualizations['liquefaction_surface_3d'] = fig_liquefaction_3d
+    fig_zones_3d.update_layout(
+        title="Zones CPTU 3D avec Distribution Spatiale",
+        scene=dict(
+            xaxis_title="Position X (m)",
+            yaxis_title="Position Y (m)",
+            zaxis_title="Profondeur (m)",
+            zaxis=dict(autorange="reversed")
+        )
+    )
+    return fig_zones_3d
 
-    except Exception as e:
-        st.warning(f"Erreur lors de la surface de liquéfaction: {e}")
 
-    # 15. Topographie 3D des clusters
-    try:
-        if 'Cluster' in df.columns:
-            n_clusters = df['Cluster'].max() + 1
-            fig_clusters_3d = go.Figure()
-
-            for cluster_id in range(n_clusters):
-                cluster_data = df[df['Cluster'] == cluster_id]
-
-                if not cluster_data.empty:
-                    # Triangulation par cluster
-                    x_cluster = np.random.uniform(0, 100, len(cluster_data))
-                    y_cluster = cluster_data['Depth']
-                    z_cluster = cluster_data['qc']
-
-                    if len(cluster_data) >= 3:
-                        points_cluster = np.column_stack([x_cluster, y_cluster])
-                        tri_cluster = Delaunay(points_cluster)
-
-                        fig_clusters_3d.add_trace(go.Mesh3d(
-                            x=x_cluster,
-                            y=y_cluster,
-                            z=z_cluster,
-                            i=tri_cluster.simplices[:, 0],
-                            j=tri_cluster.simplices[:, 1],
-                            k=tri_cluster.simplices[:, 2],
-                            opacity=0.6,
-                            name=f'Cluster {cluster_id}'
-                        ))
-
-            fig_clusters_3d.update_layout(
-                title="Topographie 3D Triangulée par Clusters",
-                scene=dict(
-                    xaxis_title="Position X (m)",
-                    yaxis_title="Profondeur (m)",
-                    zaxis_title="qc (MPa)"
-                )
-            )
-            visualizations['clusters_topography_3d'] = fig_clusters_3d
+# === 10 NOUVEAUX GRAPHIQUES 3D AVEC TRIANGULATION ===
 
-    except Exception as e:
-        st.warning(f"Erreur lors de la topographie des clusters: {e}")
+# 11. Surface triangulée 3D des types de sol
+@_figure('triangulated_surface_qc')
+def _figure_triangulated_surface_qc(ctx):
+    X, Y, tri = ctx.grid
+    plot_df = ctx.plot_df
 
-    # 16. Structure 3D des types de sol détaillés
-    try:
-        fig_soil_structure = go.Figure()
+    # Interpoler les valeurs de qc sur la grille
+    qc_interp = ctx.interpolate_on_grid(ctx.df['qc'])
 
-        soil_types = df['Soil_Type_Detailed'].unique()
-        colors_soil = px.colors.qualitative.Set3
+    # Créer la surface 3D triangulée
+    fig_triangulated = go.Figure()
 
-        for idx, soil_type in enumerate(soil_types):
-            soil_data = df[df['Soil_Type_Detailed'] == soil_type]
+    fig_triangulated.add_trace(go.Mesh3d(
+        x=X,
+        y=Y,
+        z=qc_interp,
+        i=tri.simplices[:, 0],
+        j=tri.simplices[:, 1],
+        k=tri.simplices[:, 2],
+        opacity=0.8,
+        color='lightblue',
+        name='Surface qc'
+    ))
 
-            if not soil_data.empty and len(soil_data) >= 3:
-                x_soil = np.random.uniform(0, 100, len(soil_data))
-                y_soil = soil_data['Depth']
-                z_soil = soil_data['qc']
+    # Ajouter les points de données réels
+    fig_triangulated.add_trace(go.Scatter3d(
+        x=plot_df['Depth'],
+        y=np.random.uniform(0, 100, len(plot_df)),
+        z=plot_df['qc'],
+        mode='markers',
+        marker=dict(size=4, color='red', opacity=0.7),
+        name='Points réels'
+    ))
 
-                points_soil = np.column_stack([x_soil, y_soil])
-                tri_soil = Delaunay(points_soil)
+    fig_triangulated.update_layout(
+        title="Surface Triangulée 3D - Résistance de Pointe (qc)",
+        scene=dict(
+            xaxis_title="Profondeur (m)",
+            yaxis_title="Position Latérale (m)",
+            zaxis_title="qc (MPa)"
+        )
+    )
+    return fig_triangulated
+
+
+# 12. Surface triangulée Ic vs Profondeur
+@_figure('triangulated_surface_ic')
+def _figure_triangulated_surface_ic(ctx):
+    X, Y, tri = ctx.grid
+    plot_df = ctx.plot_df
+    ic_interp = ctx.interpolate_on_grid(ctx.df['Ic'])
+
+    fig_triangulated_ic = go.Figure()
+
+    fig_triangulated_ic.add_trace(go.Mesh3d(
+        x=X,
+        y=Y,
+        z=ic_interp,
+        i=tri.simplices[:, 0],
+        j=tri.simplices[:, 1],
+        k=tri.simplices[:, 2],
+        opacity=0.8,
+        colorscale='Viridis',
+        intensity=ic_interp,
+        name='Surface Ic'
+    ))
 
-                fig_soil_structure.add_trace(go.Mesh3d(
-                    x=x_soil,
-                    y=y_soil,
-                    z=z_soil,
-                    i=tri_soil.simplices[:, 0],
-                    j=tri_soil.simplices[:, 1],
-                    k=tri_soil.simplices[:, 2],
+    fig_triangulated_ic.add_trace(go.Scatter3d(
+        x=plot_df['Depth'],
+        y=np.random.uniform(0, 100, len(plot_df)),
+        z=plot_df['Ic'],
+        mode='markers',
+        marker=dict(size=4, color='red', opacity=0.7),
+        name='Points réels'
+    ))
+
+    fig_triangulated_ic.update_layout(
+        title="Surface Triangulée 3D - Indice Ic (Soil Behavior Type)",
+        scene=dict(
+            xaxis_title="Profondeur (m)",
+            yaxis_title="Position Latérale (m)",
+            zaxis_title="Indice Ic"
+        )
+    )
+    return fig_triangulated_ic
+
+
+# 13. Volume 3D des couches géologiques avec triangulation
+@_figure('layers_volume_3d', lambda ctx: ctx.layers_df is not None and not ctx.layers_df.empty)
+def _figure_layers_volume_3d(ctx):
+    df = ctx.plot_df
+    fig_layers_volume = go.Figure()
+
+    colors = ['#8B4513', '#DAA520', '#F4A460', '#DEB887', '#D2B48C', '#BC8F8F']
+
+    for idx, layer in ctx.layers_df.iterrows():
+        # Créer une surface pour chaque couche
+        layer_mask = (df['Depth'] >= layer['start_depth']) & (df['Depth'] <= layer['end_depth'])
+        layer_data = df[layer_mask]
+
+        if not layer_data.empty:
+            # Points pour la couche
+            x_layer = np.random.uniform(0, 100, len(layer_data))
+            y_layer = layer_data['Depth']
+            z_layer = np.random.uniform(0, 50, len(layer_data))  # Épaisseur simulée
+
+            # Triangulation pour la couche
+            if len(layer_data) >= 3:
+                points_layer = np.column_stack([x_layer, y_layer])
+                tri_layer = Delaunay(points_layer)
+
+                fig_layers_volume.add_trace(go.Mesh3d(
+                    x=x_layer,
+                    y=y_layer,
+                    z=z_layer,
+                    i=tri_layer.simplices[:, 0],
+                    j=tri_layer.simplices[:, 1],
+                    k=tri_layer.simplices[:, 2],
                     opacity=0.7,
-                    color=colors_soil[idx % len(colors_soil)],
-                    name=f"{soil_type[:15]}..."
+                    color=colors[idx % len(colors)],
+                    name=f"{layer['soil_type'][:20]}..."
                 ))
 
-        fig_soil_structure.update_layout(
-            title="Structure 3D Triangulée des Types de Sol Détaillés",
-            scene=dict(
-                xaxis_title="Position X (m)",
-                yaxis_title="Profondeur (m)",
-                zaxis_title="qc (MPa)"
-            )
+    fig_layers_volume.update_layout(
+        title="Volume 3D Triangulé des Couches Géologiques",
+        scene=dict(
+            xaxis_title="Position X (m)",
+            yaxis_title="Profondeur (m)",
+            zaxis_title="Épaisseur (m)"
         )
-        visualizations['soil_structure_3d'] = fig_soil_structure
-
-    except Exception as e:
-        st.warning(f"Erreur lors de la structure des sols: {e}")
+    )
+    return fig_layers_volume
+
+
+# 14. Surface 3D des risques de liquéfaction
+@_figure('liquefaction_surface_3d', _has_liquefaction)
+def _figure_liquefaction_surface_3d(ctx):
+    X, Y, tri = ctx.grid
+    plot_df = ctx.plot_df
+    fs_interp = ctx.interpolate_on_grid(ctx.df['FS_Liquefaction'])
+
+    fig_liquefaction_3d = go.Figure()
+
+    fig_liquefaction_3d.add_trace(go.Mesh3d(
+        x=X,
+        y=Y,
+        z=fs_interp,
+        i=tri.simplices[:, 0],
+        j=tri.simplices[:, 1],
+        k=tri.simplices[:, 2],
+        opacity=0.8,
+        colorscale='RdYlGn',
+        intensity=fs_interp,
+        name='FS Liquefaction'
+    ))
 
-    # 17. Gradient 3D de propriétés mécaniques
-    try:
-        fig_gradient_3d = go.Figure()
+    # Colorer selon le risque
+    risk_colors = np.select(
+        [plot_df['FS_Liquefaction'] < 1.2, plot_df['FS_Liquefaction'] < 1.5],
+        ['red', 'orange'],
+        default='green'
+    )
 
-        # Calculer le gradient de qc
-        qc_gradient = np.gradient(df['qc'].values, df['Depth'].values)
+    fig_liquefaction_3d.add_trace(go.Scatter3d(
+        x=plot_df['Depth'],
+        y=np.random.uniform(0, 100, len(plot_df)),
+        z=plot_df['FS_Liquefaction'],
+        mode='markers',
+        marker=dict(size=6, color=risk_colors, opacity=0.8),
+        name='Points de risque'
+    ))
 
-        gradient_interp = griddata(
-            (df['Depth'], np.random.uniform(0, 100, len(df))),
-            qc_gradient,
-            (X, Y),
-            method='linear'
+    fig_liquefaction_3d.update_layout(
+        title="Surface 3D Triangulée - Risque de Liquéfaction",
+        scene=dict(
+            xaxis_title="Profondeur (m)",
+            yaxis_title="Position Latérale (m)",
+            zaxis_title="FS Liquefaction"
         )
+    )
+    return fig_liquefaction_3d
+
+
+# 15. Topographie 3D des clusters
+@_figure('clusters_topography_3d', lambda ctx: 'Cluster' in ctx.df.columns)
+def _figure_clusters_topography_3d(ctx):
+    df = ctx.plot_df
+    n_clusters = ctx.df['Cluster'].max() + 1
+    fig_clusters_3d = go.Figure()
+
+    for cluster_id in range(n_clusters):
+        cluster_data = df[df['Cluster'] == cluster_id]
+
+        if not cluster_data.empty:
+            # Triangulation par cluster
+            x_cluster = np.random.uniform(0, 100, len(cluster_data))
+            y_cluster = cluster_data['Depth']
+            z_cluster = cluster_data['qc']
+
+            if len(cluster_data) >= 3:
+                points_cluster = np.column_stack([x_cluster, y_cluster])
+                tri_cluster = Delaunay(points_cluster)
+
+                fig_clusters_3d.add_trace(go.Mesh3d(
+                    x=x_cluster,
+                    y=y_cluster,
+                    z=z_cluster,
+                    i=tri_cluster.simplices[:, 0],
+                    j=tri_cluster.simplices[:, 1],
+                    k=tri_cluster.simplices[:, 2],
+                    opacity=0.6,
+                    name=f'Cluster {cluster_id}'
+                ))
 
-        fig_gradient_3d.add_trace(go.Mesh3d(
-            x=X,
-            y=Y,
-            z=gradient_interp,
-            i=tri.simplices[:, 0],
-            j=tri.simplices[:, 1],
-            k=tri.simplices[:, 2],
-            opacity=0.8,
-            colorscale='RdBu',
-            intensity=gradient_interp,
-            name='Gradient qc'
-        ))
-
-        fig_gradient_3d.update_layout(
-            title="Gradient 3D Triangulé des Propriétés Mécaniques",
-            scene=dict(
-                xaxis_title="Profondeur (m)",
-                yaxis_title="Position Latérale (m)",
-                zaxis_title="Gradient qc (MPa/m)"
-            )
+    fig_clusters_3d.update_layout(
+        title="Topographie 3D Triangulée par Clusters",
+        scene=dict(
+            xaxis_title="Position X (m)",
+            yaxis_title="Profondeur (m)",
+            zaxis_title="qc (MPa)"
         )
-        visualizations['gradient_3d'] = fig_gradient_3d
+    )
+    return fig_clusters_3d
+
+
+# 16. Structure 3D des types de sol détaillés
+@_figure('soil_structure_3d')
+def _figure_soil_structure_3d(ctx):
+    df = ctx.plot_df
+    fig_soil_structure = go.Figure()
+
+    soil_types = df['Soil_Type_Detailed'].unique()
+    colors_soil = px.colors.qualitative.Set3
+
+    for idx, soil_type in enumerate(soil_types):
+        soil_data = df[df['Soil_Type_Detailed'] == soil_type]
+
+        if not soil_data.empty and len(soil_data) >= 3:
+            x_soil = np.random.uniform(0, 100, len(soil_data))
+            y_soil = soil_data['Depth']
+            z_soil = soil_data['qc']
+
+            points_soil = np.column_stack([x_soil, y_soil])
+            tri_soil = Delaunay(points_soil)
+
+            fig_soil_structure.add_trace(go.Mesh3d(
+                x=x_soil,
+                y=y_soil,
+                z=z_soil,
+                i=tri_soil.simplices[:, 0],
+                j=tri_soil.simplices[:, 1],
+                k=tri_soil.simplices[:, 2],
+                opacity=0.7,
+                color=colors_soil[idx % len(colors_soil)],
+                name=f"{soil_type[:15]}..."
+            ))
 
-    except Exception as e:
-        st.warning(f"Erreur lors du gradient 3D: {e}")
+    fig_soil_structure.update_layout(
+        title="Structure 3D Triangulée des Types de Sol Détaillés",
+        scene=dict(
+            xaxis_title="Position X (m)",
+            yaxis_title="Profondeur (m)",
+            zaxis_title="qc (MPa)"
+        )
+    )
+    return fig_soil_structure
+
+
+# 17. Gradient 3D de propriétés mécaniques
+@_figure('gradient_3d')
+def _figure_gradient_3d(ctx):
+    X, Y, tri = ctx.grid
+    fig_gradient_3d = go.Figure()
+
+    # Calculer le gradient de qc sur le profil complet
+    qc_gradient = np.gradient(ctx.df['qc'].values, ctx.df['Depth'].values)
+    gradient_interp = ctx.interpolate_on_grid(qc_gradient)
+
+    fig_gradient_3d.add_trace(go.Mesh3d(
+        x=X,
+        y=Y,
+        z=gradient_interp,
+        i=tri.simplices[:, 0],
+        j=tri.simplices[:, 1],
+        k=tri.simplices[:, 2],
+        opacity=0.8,
+        colorscale='RdBu',
+        intensity=gradient_interp,
+        name='Gradient qc'
+    ))
 
-    # 18. Iso-surfaces 3D des paramètres géotechniques
-    try:
-        fig_isosurface = go.Figure()
-
-        # Créer des isosurfaces pour différentes valeurs de qc
-        qc_values = np.linspace(df['qc'].min(), df['qc'].max(), 5)
-
-        for qc_val in qc_values:
-            mask = df['qc'] >= qc_val
-            if mask.sum() >= 4:  # Assez de points pour triangulation
-                iso_data = df[mask]
-                x_iso = np.random.uniform(0, 100, len(iso_data))
-                y_iso = iso_data['Depth']
-                z_iso = np.full(len(iso_data), qc_val)
-
-                if len(iso_data) >= 3:
-                    points_iso = np.column_stack([x_iso, y_iso])
-                    tri_iso = Delaunay(points_iso)
-
-                    fig_isosurface.add_trace(go.Mesh3d(
-                        x=x_iso,
-                        y=y_iso,
-                        z=z_iso,
-                        i=tri_iso.simplices[:, 0],
-                        j=tri_iso.simplices[:, 1],
-                        k=tri_iso.simplices[:, 2],
-                        opacity=0.3,
-                        name=f'qc ≥ {qc_val:.1f} MPa'
-                    ))
-
-        fig_isosurface.update_layout(
-            title="Iso-surfaces 3D Triangulées des Paramètres Géotechniques",
-            scene=dict(
-                xaxis_title="Position X (m)",
-                yaxis_title="Profondeur (m)",
-                zaxis_title="qc (MPa)"
-            )
+    fig_gradient_3d.update_layout(
+        title="Gradient 3D Triangulé des Propriétés Mécaniques",
+        scene=dict(
+            xaxis_title="Profondeur (m)",
+            yaxis_title="Position Latérale (m)",
+            zaxis_title="Gradient qc (MPa/m)"
         )
-        visualizations['isosurface_3d'] = fig_isosurface
+    )
+    return fig_gradient_3d
+
+
+# 18. Iso-surfaces 3D des paramètres géotechniques
+@_figure('isosurface_3d')
+def _figure_isosurface_3d(ctx):
+    df = ctx.plot_df
+    fig_isosurface = go.Figure()
+
+    # Créer des isosurfaces pour différentes valeurs de qc
+    qc_values = np.linspace(df['qc'].min(), df['qc'].max(), 5)
+
+    for qc_val in qc_values:
+        mask = df['qc'] >= qc_val
+        if mask.sum() >= 4:  # Assez de points pour triangulation
+            iso_data = df[mask]
+            x_iso = np.random.uniform(0, 100, len(iso_data))
+            y_iso = iso_data['Depth']
+            z_iso = np.full(len(iso_data), qc_val)
+
+            if len(iso_data) >= 3:
+                points_iso = np.column_stack([x_iso, y_iso])
+                tri_iso = Delaunay(points_iso)
+
+                fig_isosurface.add_trace(go.Mesh3d(
+                    x=x_iso,
+                    y=y_iso,
+                    z=z_iso,
+                    i=tri_iso.simplices[:, 0],
+                    j=tri_iso.simplices[:, 1],
+                    k=tri_iso.simplices[:, 2],
+                    opacity=0.3,
+                    name=f'qc ≥ {qc_val:.1f} MPa'
+                ))
 
-    except Exception as e:
-        st.warning(f"Erreur lors des isosurfaces: {e}")
+    fig_isosurface.update_layout(
+        title="Iso-surfaces 3D Triangulées des Paramètres Géotechniques",
+        scene=dict(
+            xaxis_title="Position X (m)",
+            yaxis_title="Profondeur (m)",
+            zaxis_title="qc (MPa)"
+        )
+    )
+    return fig_isosurface
+
+
+# 19. Réseau 3D interconnecté des zones
+@_figure('network_zones_3d')
+def _figure_network_zones_3d(ctx):
+    zone_centers, df_zones, _ = ctx.zones
+    fig_network_3d = go.Figure()
+
+    # Créer des connexions entre zones proches
+    for i in range(len(zone_centers)):
+        for j in range(i+1, len(zone_centers)):
+            dist = np.sqrt((zone_centers[i][0] - zone_centers[j][0])**2 +
+                          (zone_centers[i][1] - zone_centers[j][1])**2)
+            if dist < 80:  # Distance maximale pour connexion
+                fig_network_3d.add_trace(go.Scatter3d(
+                    x=[zone_centers[i][0], zone_centers[j][0]],
+                    y=[zone_centers[i][1], zone_centers[j][1]],
+                    z=[0, 0],  # À la surface
+                    mode='lines',
+                    line=dict(color='gray', width=2),
+                    name=f'Connexion {i+1}-{j+1}'
+                ))
 
-    # 19. Réseau 3D interconnecté des zones
-    try:
-        fig_network_3d = go.Figure()
-
-        # Créer des connexions entre zones proches
-        for i in range(len(zone_centers)):
-            for j in range(i+1, len(zone_centers)):
-                dist = np.sqrt((zone_centers[i][0] - zone_centers[j][0])**2 +
-                              (zone_centers[i][1] - zone_centers[j][1])**2)
-                if dist < 80:  # Distance maximale pour connexion
-                    fig_network_3d.add_trace(go.Scatter3d(
-                        x=[zone_centers[i][0], zone_centers[j][0]],
-                        y=[zone_centers[i][1], zone_centers[j][1]],
-                        z=[0, 0],  # À la surface
-                        mode='lines',
-                        line=dict(color='gray', width=2),
-                        name=f'Connexion {i+1}-{j+1}'
-                    ))
-
-        # Ajouter les zones comme points
-        for idx, (x, y) in enumerate(zone_centers):
-            zone_data = df_zones[df_zones['zone_id'] == idx]
-            avg_qc = zone_data['qc'].mean() if not zone_data.empty else 0
-
-            fig_network_3d.add_trace(go.Scatter3d(
-                x=[x],
-                y=[y],
-                z=[0],
-                mode='markers+text',
-                marker=dict(size=15, color=avg_qc, colorscale='Viridis', showscale=True),
-                text=[f'Zone {idx+1}'],
-                textposition="top center",
-                name=f'Zone {idx+1}'
-            ))
+    # Ajouter les zones comme points
+    zone_qc = df_zones.groupby('zone_id')['qc'].mean()
+    for idx, (x, y) in enumerate(zone_centers):
+        avg_qc = zone_qc.get(idx, 0)
+
+        fig_network_3d.add_trace(go.Scatter3d(
+            x=[x],
+            y=[y],
+            z=[0],
+            mode='markers+text',
+            marker=dict(size=15, color=avg_qc, colorscale='Viridis', showscale=True),
+            text=[f'Zone {idx+1}'],
+            textposition="top center",
+            name=f'Zone {idx+1}'
+        ))
 
-        fig_network_3d.update_layout(
-            title="Réseau 3D Interconnecté des Zones CPTU",
-            scene=dict(
-                xaxis_title="Position X (m)",
-                yaxis_title="Position Y (m)",
-                zaxis_title="Surface"
-            )
+    fig_network_3d.update_layout(
+        title="Réseau 3D Interconnecté des Zones CPTU",
+        scene=dict(
+            xaxis_title="Position X (m)",
+            yaxis_title="Position Y (m)",
+            zaxis_title="Surface"
         )
-        visualizations['network_zones_3d'] = fig_network_3d
+    )
+    return fig_network_3d
 
-    except Exception as e:
-        st.warning(f"Erreur lors du réseau 3D: {e}")
 
-    # 20. Toiles d'araignée (Spider plots) pour les propriétés par zone
-    try:
-        fig_spider_zones = go.Figure()
-
-        # Propriétés à analyser
-        properties = ['qc', 'fs', 'Ic', 'Fr']
-        if 'FS_Liquefaction' in df.columns:
-            properties.append('FS_Liquefaction')
-
-        # Normaliser les valeurs pour chaque propriété
-        normalized_data = {}
-        for prop in properties:
-            if prop in df.columns:
-                values = df[prop].values
-                normalized_data[prop] = (values - values.min()) / (values.max() - values.min())
-
-        # Créer une toile par zone
-        for zone_id in range(min(5, n_zones)):  # Maximum 5 toiles pour lisibilité
-            zone_data = df_zones[df_zones['zone_id'] == zone_id]
-
-            if not zone_data.empty:
-                r_values = []
-                for prop in properties:
-                    if prop in normalized_data:
-                        zone_values = normalized_data[prop][zone_data.index]
-                        r_values.append(zone_values.mean())
-                    else:
-                        r_values.append(0)
-
-                # Ajouter les valeurs de début et fin pour fermer la toile
-                r_values.append(r_values[0])
-                theta_values = properties + [properties[0]]
-
-                fig_spider_zones.add_trace(go.Scatterpolar(
-                    r=r_values,
-                    theta=theta_values,
-                    fill='toself',
-                    name=f'Zone {zone_id + 1}',
-                    opacity=0.7
-                ))
+# 20. Toiles d'araignée (Spider plots) pour les propriétés par zone
+@_figure('spider_zones')
+def _figure_spider_zones(ctx):
+    df = ctx.df
+    _, df_zones, n_zones = ctx.zones
+    fig_spider_zones = go.Figure()
 
-        fig_spider_zones.update_layout(
-            title="Toiles d'Araignée des Propriétés Géotechniques par Zone",
-            polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
-            showlegend=True
-        )
-        visualizations['spider_zones'] = fig_spider_zones
+    # Propriétés à analyser
+    properties = ['qc', 'fs', 'Ic', 'Fr']
+    if 'FS_Liquefaction' in df.columns:
+        properties.append('FS_Liquefaction')
+
+    # Normaliser les valeurs pour chaque propriété
+    normalized_data = {}
+    for prop in properties:
+        if prop in df.columns:
+            values = df[prop].values
+            normalized_data[prop] = (values - values.min()) / (values.max() - values.min())
+
+    # Créer une toile par zone
+    for zone_id in range(min(5, n_zones)):  # Maximum 5 toiles pour lisibilité
+        zone_data = df_zones[df_zones['zone_id'] == zone_id]
+
+        if not zone_data.empty:
+            r_values = []
+            for prop in properties:
+                if prop in normalized_data:
+                    zone_values = normalized_data[prop][zone_data.index]
+                    r_values.append(zone_values.mean())
+                else:
+                    r_values.append(0)
 
-    except Exception as e:
-        st.warning(f"Erreur lors des toiles d'araignée: {e}")
+            # Ajouter les valeurs de début et fin pour fermer la toile
+            r_values.append(r_values[0])
+            theta_values = properties + [properties[0]]
 
-    return visualizations
+            fig_spider_zones.add_trace(go.Scatterpolar(
+                r=r_values,
+                theta=theta_values,
+                fill='toself',
+                name=f'Zone {zone_id + 1}',
+                opacity=0.7
+            ))
+
+    fig_spider_zones.update_layout(
+        title="Toiles d'Araignée des Propriétés Géotechniques par Zone",
+        polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+        showlegend=True
+    )
+    return fig_spider_zones
 
 
 class GeotechnicalAnalyzer:
@@ -954,7 +1176,7 @@ class GeotechnicalAnalyzer:
             results['soil_classification'] = df_soil
 
             # Analyse de liquéfaction
-            df_crr = calculate_crr(df_soil.copy())
+            df_crr = calculate_crr(df_soil, groundwater_level=groundwater_level)
             results['liquefaction_analysis'] = df_crr
 
             # Clustering (sans composants Streamlit)
@@ -974,7 +1196,7 @@ class GeotechnicalAnalyzer:
 
             # Métriques générales
             results['dominant_soil_type'] = df_clustered['Soil_Type'].mode().iloc[0] if 'Soil_Type' in df_clustered.columns else 'Unknown'
-            results['liquefaction_risk'] = self._assess_liquefaction_risk(df_clustered)
+            results['liquefaction_risk'] = self._assess_liquefaction_risk(df_clustered, groundwater_level)
             results['critical_depth'] = df_clustered['Depth'].max()
             results['safety_factor'] = self._calculate_safety_factor(df_clustered)
 
@@ -987,10 +1209,12 @@ class GeotechnicalAnalyzer:
         except Exception as e:
             raise ValueError(f"Erreur lors de l'analyse géotechnique: {str(e)}")
 
-    def _assess_liquefaction_risk(self, df):
+    def _assess_liquefaction_risk(self, df, groundwater_level=2.0):
         """Évalue le risque de liquéfaction global"""
         if 'CRR' not in df.columns:
-            return 'Non évalué'
+            if not {'Depth', 'qc'}.issubset(df.columns):
+                return 'Non évalué'
+            df = ensure_liquefaction_columns(df, groundwater_level=groundwater_level)
 
         crr_values = df['CRR'].dropna()
         if len(crr_values) == 0:
@@ -1160,22 +1384,164 @@ def create_correlation_matrix(df):
         return None
 
 
-def perform_complete_analysis(df, n_clusters=3, use_streamlit=True):
+# Taille maximale du cache d'analyse (octets, estimée par memory_usage(deep=True) des DataFrames)
+ANALYSIS_CACHE_MAX_BYTES = 512 * 1024 ** 2
+
+
+def estimate_nbytes(value, seen=None):
+    """
+    Taille mémoire approximative d'un résultat d'étape (DataFrames, tableaux, conteneurs)
+
+    Les figures paresseuses ne sont pas parcourues (ce qui les construirait): seules les
+    données de leur contexte sont comptées. Un objet présent plusieurs fois n'est compté qu'une fois.
+    """
+    seen = set() if seen is None else seen
+    if value is None or id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, LazyFigureRegistry):
+        return estimate_nbytes(vars(value._ctx), seen)
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(item, seen) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(item, seen) for item in value)
+    return sys.getsizeof(value)
+
+
+class AnalysisStageCache:
+    """
+    Cache mémoire des étapes de l'analyse complète, indexé par empreinte des entrées et paramètres
+
+    Partagé par tous les appelants du processus (sessions Streamlit, threads de l'application):
+    les accès sont protégés par un verrou, les étapes sont calculées hors verrou, et les entrées
+    les moins récemment utilisées sont évincées dès que leur taille totale dépasse max_bytes.
+    """
+
+    def __init__(self, max_bytes=ANALYSIS_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.stage_stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def frame_key(df):
+        """Empreinte du contenu d'un DataFrame (valeurs, index, colonnes et types)"""
+        digest = hashlib.sha1()
+        try:
+            digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+        except TypeError:
+            # Colonnes non hachables: pas de réutilisation possible
+            digest.update(uuid.uuid4().bytes)
+        digest.update(repr([(str(col), str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def stage_key(stage, *parent_keys, **params):
+        """Clé d'une étape à partir des clés des étapes amont et de ses paramètres"""
+        return hashlib.sha1(repr((stage, parent_keys, sorted(params.items()))).encode()).hexdigest()
+
+    def run(self, stage, key, func, last_run=None):
+        """
+        Retourne le résultat en cache de l'étape, ou l'exécute et le mémorise
+
+        Args:
+            last_run: Dictionnaire de l'appelant où noter 'cache' ou 'calcul' pour l'étape
+        """
+        with self._lock:
+            stats = self.stage_stats.setdefault(stage, {'hits': 0, 'misses': 0})
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                stats['hits'] += 1
+                if last_run is not None:
+                    last_run[stage] = 'cache'
+                return self.entries[key]
+
+        value = func()
+        size = estimate_nbytes(value) if value is not None else 0
+        with self._lock:
+            stats['misses'] += 1
+            if last_run is not None:
+                last_run[stage] = 'calcul'
+            # Résultat trop gros pour le cache ou déjà mémorisé par un appel concurrent: non stocké
+            if value is not None and size <= self.max_bytes and key not in self.entries:
+                self.entries[key] = value
+                self.sizes[key] = size
+                self.total_bytes += size
+                while self.total_bytes > self.max_bytes:
+                    old_key, _ = self.entries.popitem(last=False)
+                    self.total_bytes -= self.sizes.pop(old_key)
+        return value
+
+    def get_stats(self):
+        """Statistiques globales et par étape"""
+        with self._lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'hits': sum(s['hits'] for s in self.stage_stats.values()),
+                'misses': sum(s['misses'] for s in self.stage_stats.values()),
+                'stages': {stage: dict(s) for stage, s in self.stage_stats.items()}
+            }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+            self.stage_stats.clear()
+
+
+# Cache partagé entre les appels successifs (ex. changement du nombre de clusters dans l'UI)
+ANALYSIS_CACHE = AnalysisStageCache()
+
+
+def _run_clustering(df_crr, n_clusters):
+    from models.clustering import perform_clustering
+    result = perform_clustering(df_crr, n_clusters)
+    return None if result[0] is None else result
+
+
+def perform_complete_analysis(df, n_clusters=3, use_streamlit=True, cache=None):
     """Effectue une analyse complète et avancée CPTU avec 3D et géolocalisation"""
     try:
+        cache = ANALYSIS_CACHE if cache is None else cache
+        # Étapes réutilisées ou calculées par cet appel seulement (le cache est partagé)
+        last_run = {}
+
+        def run_stage(stage, key, func):
+            return cache.run(stage, key, func, last_run)
+
         if use_streamlit:
             st.info("🔄 Analyse complète avancée en cours...")
 
+        # Clés chaînées: chaque étape dépend des clés des étapes amont et de ses paramètres
+        data_key = cache.frame_key(df)
+        soil_key = cache.stage_key('classification', data_key)
+        crr_key = cache.stage_key('liquefaction', soil_key)
+        layers_key = cache.stage_key('layers', crr_key)
+        geo_key = cache.stage_key('geospatial', crr_key)
+        cluster_key = cache.stage_key('clustering', crr_key, n_clusters=n_clusters)
+        viz_key = cache.stage_key('visualizations', cluster_key, layers_key, geo_key)
+        corr_key = cache.stage_key('correlation', cluster_key)
+
         # Étape 1: Classification détaillée des sols
         if use_streamlit:
             with st.spinner("🌱 Étape 1/5: Classification détaillée des sols..."):
-                df_analyzed = estimate_soil_type(df)
+                df_analyzed = run_stage('classification', soil_key, lambda: estimate_soil_type(df))
                 if df_analyzed is None:
                     raise ValueError("Échec de la classification des sols")
                 progress_bar = st.progress(20)
                 st.success("✅ Classification détaillée des sols terminée!")
         else:
-            df_analyzed = estimate_soil_type(df)
+            df_analyzed = run_stage('classification', soil_key, lambda: estimate_soil_type(df))
             if df_analyzed is None:
                 raise ValueError("Échec de la classification des sols")
 
@@ -1183,69 +1549,73 @@ def perform_complete_analysis(df, n_clusters=3, use_streamlit=True):
         # Étape 2: Calcul avancé du CRR et liquéfaction
         if use_streamlit:
             with st.spinner("🌊 Étape 2/5: Analyse de liquéfaction avancée..."):
-                df_crr = calculate_crr(df_analyzed)
+                df_crr = run_stage('liquefaction', crr_key, lambda: calculate_crr(df_analyzed))
                 if df_crr is None:
                     raise ValueError("Échec du calcul du CRR")
                 progress_bar.progress(40)
                 st.success("✅ Analyse de liquéfaction terminée!")
         else:
-            df_crr = calculate_crr(df_analyzed)
+            df_crr = run_stage('liquefaction', crr_key, lambda: calculate_crr(df_analyzed))
             if df_crr is None:
                 raise ValueError("Échec du calcul du CRR")
 
         # Étape 3: Identification des couches 3D
         if use_streamlit:
             with st.spinner("🏔️ Étape 3/5: Identification des couches géologiques 3D..."):
-                layers_df = identify_soil_layers_3d(df_crr)
+                layers_df = run_stage('layers', layers_key, lambda: identify_soil_layers_3d(df_crr))
                 progress_bar.progress(60)
                 st.success(f"✅ {len(layers_df)} couches géologiques identifiées!")
         else:
-            layers_df = identify_soil_layers_3d(df_crr)
+            layers_df = run_stage('layers', layers_key, lambda: identify_soil_layers_3d(df_crr))
 
         # Étape 4: Analyse géospatiale
         if use_streamlit:
             with st.spinner("🌍 Étape 4/5: Géolocalisation des points..."):
-                gdf = create_geospatial_analysis(df_crr)
+                gdf = run_stage('geospatial', geo_key, lambda: create_geospatial_analysis(df_crr))
                 progress_bar.progress(80)
                 if gdf is not None:
                     st.success("✅ Géolocalisation terminée!")
                 else:
                     st.warning("⚠️ Géolocalisation limitée (GeoPandas non disponible)")
         else:
-            gdf = create_geospatial_analysis(df_crr)
+            gdf = run_stage('geospatial', geo_key, lambda: create_geospatial_analysis(df_crr))
 
         # Étape 5: Clustering avancé
         if use_streamlit:
             with st.spinner("🎯 Étape 5/5: Clustering automatique avancé..."):
-                from models.clustering import perform_clustering
-                df_clustered, kmeans, scaler, pca = perform_clustering(df_crr, n_clusters)
-                if df_clustered is None:
+                clustering = run_stage('clustering', cluster_key, lambda: _run_clustering(df_crr, n_clusters))
+                if clustering is None:
                     raise ValueError("Échec du clustering")
+                df_clustered, kmeans, scaler, pca = clustering
                 progress_bar.progress(100)
                 st.success("✅ Clustering avancé terminé!")
         else:
-            from models.clustering import perform_clustering
-            df_clustered, kmeans, scaler, pca = perform_clustering(df_crr, n_clusters)
-            if df_clustered is None:
+            clustering = run_stage('clustering', cluster_key, lambda: _run_clustering(df_crr, n_clusters))
+            if clustering is None:
                 raise ValueError("Échec du clustering")
+            df_clustered, kmeans, scaler, pca = clustering
 
         # Création des visualisations avancées
         if use_streamlit:
             with st.spinner("📊 Génération des graphiques avancés..."):
-                visualizations = create_advanced_visualizations(df_clustered, layers_df, gdf)
+                visualizations = run_stage('visualizations', viz_key,
+                                           lambda: create_advanced_visualizations(df_clustered, layers_df, gdf))
         else:
-            visualizations = create_advanced_visualizations(df_clustered, layers_df, gdf)
+            visualizations = run_stage('visualizations', viz_key,
+                                       lambda: create_advanced_visualizations(df_clustered, layers_df, gdf))
 
         # Création du tableau de corrélation complet
         if use_streamlit:
             with st.spinner("📈 Calcul du tableau de corrélation complet..."):
-                correlation_results = create_correlation_matrix(df_clustered)
+                correlation_results = run_stage('correlation', corr_key,
+                                                lambda: create_correlation_matrix(df_clustered))
                 if correlation_results:
                     st.success("✅ Tableau de corrélation généré!")
                 else:
                     st.warning("⚠️ Impossible de générer le tableau de corrélation")
         else:
-            correlation_results = create_correlation_matrix(df_clustered)
+            correlation_results = run_stage('correlation', corr_key,
+                                            lambda: create_correlation_matrix(df_clustered))
 
         # Sauvegarder les modèles et résultats
         models = {
@@ -1254,19 +1624,29 @@ def perform_complete_analysis(df, n_clusters=3, use_streamlit=True):
             'pca': pca
         }
 
+        # Copie pour que les modifications de l'appelant n'altèrent pas le cache
+        df_clustered = df_clustered.copy()
+        cache_stats = cache.get_stats()
+        cache_stats['last_run'] = last_run
+
         results = {
             'data': df_clustered,
             'layers': layers_df,
             'geospatial': gdf,
             'models': models,
             'visualizations': visualizations,
-            'correlation_analysis': correlation_results
+            'correlation_analysis': correlation_results,
+            'cache_stats': cache_stats
         }
 
         if use_streamlit:
             progress_bar.empty()
             st.success("🎉 Analyse complète avancée terminée avec succès!")
             st.info(f"📊 {len(visualizations)} graphiques avancés générés")
+            reused = [stage for stage, status in cache_stats['last_run'].items() if status == 'cache']
+            st.caption(f"♻️ Cache d'analyse: {len(reused)}/{len(cache_stats['last_run'])} étapes réutilisées "
+                       f"({', '.join(reused) if reused else 'aucune'}) — "
+                       f"{cache_stats['hits']} succès / {cache_stats['misses']} calculs depuis le démarrage")
 
         return df_clustered, models, results
 
@@ -1274,4 +1654,4 @@ def perform_complete_analysis(df, n_clusters=3, use_streamlit=True):
         if use_streamlit:
             st.error(f"❌ Erreur lors de l'analyse complète: {str(e)}")
             st.error("Retour aux données brutes...")
-        return df, None, None
\ No newline at end of file
+        return df, None, None
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Moteur vectorisé d'analyse de liquéfaction pour CPT/CPTU
+Profil de contraintes effectives (poids volumiques + nappe), qc1N, CRR, CSR et FS en une passe
+"""
+
+import numpy as np
+import pandas as pd
+
+GAMMA_WATER = 9.81  # Poids volumique de l'eau (kN/m³)
+DEFAULT_UNIT_WEIGHT = 18.0  # Poids volumique moyen (kN/m³)
+MAX_CN = 1.7  # Plafond du facteur de normalisation par la contrainte (Robertson & Wride 1998)
+PA_MPA = 0.1  # Pression atmosphérique (MPa), normalisation de qc
+MIN_EFFECTIVE_STRESS = 1.0  # kPa, évite les divisions par zéro en surface
+MAX_QC1N = 211.0  # Borne d'application de la courbe CRR d'Idriss & Boulanger (2008)
+MAX_FS = 5.0  # Plafond du facteur de sécurité (sols non liquéfiables, surface)
+
+# Poids volumiques typiques par classe de sol (kN/m³), utilisés en l'absence de colonne 'gamma'
+SOIL_UNIT_WEIGHTS = {
+    'Gravel': 20.0,
+    'Sand': 19.0,
+    'Sandy Silt': 18.5,
+    'Silty Sand': 18.5,
+    'Clayey Silt': 18.0,
+    'Silty Clay': 17.5,
+    'Clay': 17.0,
+    'Organic Clay': 15.0,
+    'Unknown': DEFAULT_UNIT_WEIGHT
+}
+
+LIQUEFACTION_COLUMNS = ['sigma_v', 'u0', 'sigma_v_eff', 'qc1N', 'CRR', 'CSR', 'FS_Liquefaction']
+
+
+def unit_weight_profile(df):
+    """Poids volumique par point: colonne 'gamma', sinon classe de sol, sinon valeur moyenne"""
+    if 'gamma' in df.columns:
+        gamma = pd.to_numeric(df['gamma'], errors='coerce').to_numpy(dtype=float)
+    elif 'Soil_Class' in df.columns:
+        gamma = df['Soil_Class'].astype(object).map(SOIL_UNIT_WEIGHTS).to_numpy(dtype=float)
+    else:
+        gamma = np.full(len(df), DEFAULT_UNIT_WEIGHT)
+    # Valeurs absentes ou aberrantes remplacées par la moyenne
+    return np.where(np.isfinite(gamma) & (gamma > 0), gamma, DEFAULT_UNIT_WEIGHT)
+
+
+def stress_recovery_coefficient(depth):
+    """Coefficient de réduction rd de Liao & Whitman (1986), vectorisé"""
+    depth = np.asarray(depth, dtype=float)
+    return np.select(
+        [depth <= 9.15, depth <= 23.0, depth <= 30.0],
+        [1.0 - 0.00765 * depth, 1.174 - 0.0267 * depth, 0.744 - 0.008 * depth],
+        default=0.5
+    )
+
+
+def effective_stress_profile(depth, unit_weight, groundwater_level=2.0, sounding=None):
+    """
+    Contraintes verticales totale, interstitielle et effective (kPa) par intégration des poids volumiques
+
+    Args:
+        depth: Profondeurs (m)
+        unit_weight: Poids volumiques par point (kN/m³)
+        groundwater_level: Profondeur de la nappe (m)
+        sounding: Identifiant de sondage par point pour intégrer chaque sondage séparément
+
+    Returns:
+        Tuple (sigma_v, u0, sigma_v_eff) de tableaux alignés sur l'entrée
+    """
+    depth = np.asarray(depth, dtype=float)
+    unit_weight = np.broadcast_to(np.asarray(unit_weight, dtype=float), depth.shape)
+    n = len(depth)
+
+    sounding_codes = np.zeros(n, dtype=np.int64) if sounding is None else pd.factorize(sounding)[0]
+    order = np.lexsort((depth, sounding_codes))
+    z = depth[order]
+    g = unit_weight[order]
+    codes = sounding_codes[order]
+
+    # Épaisseur de chaque tranche: depuis la surface pour le premier point de chaque sondage
+    first = np.ones(n, dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    dz = np.empty(n)
+    dz[first] = z[first]
+    dz[~first] = np.diff(z)[~first[1:]]
+    dz = np.nan_to_num(np.clip(dz, 0.0, None))
+
+    # Poids de chaque tranche: moyenne des poids volumiques aux deux bornes
+    g_mid = g.copy()
+    g_mid[~first] = 0.5 * (g[1:] + g[:-1])[~first[1:]]
+    increments = g_mid * dz
+
+    sigma_sorted = pd.Series(increments).groupby(codes).cumsum().to_numpy()
+
+    sigma_v = np.empty(n)
+    sigma_v[order] = sigma_sorted
+    u0 = GAMMA_WATER * np.clip(depth - groundwater_level, 0.0, None)
+    sigma_v_eff = np.maximum(sigma_v - u0, MIN_EFFECTIVE_STRESS)
+    return sigma_v, u0, sigma_v_eff
+
+
+def liquefaction_profile(df, groundwater_level=2.0, amax_g=0.25, sounding_column='Sondage'):
+    """
+    Calcule qc1N, CRR, CSR et FS pour toutes les profondeurs en une passe
+
+    Args:
+        df: DataFrame avec au moins 'Depth' et 'qc' (MPa)
+        groundwater_level: Profondeur de la nappe (m)
+        amax_g: Accélération maximale en surface (fraction de g)
+        sounding_column: Colonne identifiant les sondages d'un jeu fusionné
+
+    Returns:
+        DataFrame (même index que df) avec les colonnes LIQUEFACTION_COLUMNS
+    """
+    depth = pd.to_numeric(df['Depth'], errors='coerce').to_numpy(dtype=float)
+    qc = pd.to_numeric(df['qc'], errors='coerce').to_numpy(dtype=float)
+    sounding = df[sounding_column] if sounding_column in df.columns else None
+
+    sigma_v, u0, sigma_v_eff = effective_stress_profile(
+        depth, unit_weight_profile(df), groundwater_level, sounding
+    )
+
+    # Normalisation qc1N = (qc / Pa) * CN selon Robertson & Wride (1998), qc en MPa
+    cn = np.minimum((100.0 / sigma_v_eff) ** 0.5, MAX_CN)
+    qc1n = (qc / PA_MPA) * cn
+
+    # CRR selon Idriss & Boulanger (2008) pour magnitude 7.5, qc1N borné au domaine de la courbe
+    q = np.minimum(qc1n, MAX_QC1N)
+    crr = np.exp(q / 113 + (q / 1000) ** 2 - (q / 140) ** 3 + (q / 137) ** 4 - 2.80)
+
+    # CSR selon Seed & Idriss (1971)
+    csr = 0.65 * amax_g * (sigma_v / sigma_v_eff) * stress_recovery_coefficient(depth)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fs = np.where(csr > 0, np.minimum(crr / csr, MAX_FS), MAX_FS)
+
+    return pd.DataFrame({
+        'sigma_v': sigma_v,
+        'u0': u0,
+        'sigma_v_eff': sigma_v_eff,
+        'qc1N': qc1n,
+        'CRR': crr,
+        'CSR': csr,
+        'FS_Liquefaction': fs
+    }, index=df.index)
+
+
+def ensure_liquefaction_columns(df, groundwater_level=2.0, amax_g=0.25):
+    """Retourne df avec les colonnes de liquéfaction, calculées seulement si elles manquent"""
+    if all(col in df.columns for col in ['CRR', 'CSR', 'FS_Liquefaction']):
+        return df
+    profile = liquefaction_profile(df, groundwater_level, amax_g)
+    df_copy = df.copy()
+    for col in LIQUEFACTION_COLUMNS:
+        df_copy[col] = profile[col]
+    return df_copy
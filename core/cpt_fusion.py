@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Fusion parallèle de fichiers CPT/CPTU multi-sondages
+Parse les fichiers dans un pool de processus et assemble un DataFrame unique
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from core.cpt_parser import CPTParser
+from core.parse_cache import ParsedCPTCache
+
+
+def parse_sounding(file_path: str, coordinates: Optional[Tuple[float, float]] = None,
+                   cache_dir: Optional[str] = None) -> Tuple[str, Optional[pd.DataFrame], str]:
+    """
+    Parse un fichier de sondage et ajoute ses métadonnées de fusion
+
+    Fonction de niveau module pour pouvoir être exécutée dans un processus séparé.
+
+    Args:
+        file_path: Chemin vers le fichier CPTU
+        coordinates: Coordonnées (X, Y) du sondage, ou None pour ne pas les ajouter
+        cache_dir: Répertoire du cache de parsing partagé (optionnel)
+
+    Returns:
+        Tuple (chemin, DataFrame or None, message)
+    """
+    try:
+        cache = ParsedCPTCache(cache_dir) if cache_dir else None
+        df, message = CPTParser(cache=cache).parse_file(file_path)
+    except Exception as e:
+        return file_path, None, f"Erreur lors du parsing: {str(e)}"
+
+    if df is None or df.empty:
+        return file_path, None, message
+
+    # Normaliser les noms de colonnes
+    df = df.rename(columns={'depth': 'Depth'})
+    if coordinates is not None:
+        df['X'] = float(coordinates[0])
+        df['Y'] = float(coordinates[1])
+    return file_path, df, message
+
+
+def concat_soundings(frames: List[pd.DataFrame], names: List[str],
+                     sounding_column: str = 'Sondage') -> pd.DataFrame:
+    """Concatène des sondages dans des colonnes pré-allouées, avec une colonne catégorielle de sondage"""
+    if not frames:
+        return pd.DataFrame()
+
+    lengths = np.array([len(df) for df in frames])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    total = int(offsets[-1])
+
+    columns = list(dict.fromkeys(col for df in frames for col in df.columns if col != sounding_column))
+    data = {}
+    for col in columns:
+        dtypes = [df[col].dtype for df in frames if col in df.columns]
+        if all(pd.api.types.is_numeric_dtype(dtype) for dtype in dtypes):
+            out = np.full(total, np.nan, dtype=np.result_type(np.float64, *dtypes))
+        else:
+            out = np.full(total, None, dtype=object)
+        for df, start, stop in zip(frames, offsets[:-1], offsets[1:]):
+            if col in df.columns:
+                out[start:stop] = df[col].to_numpy()
+        data[col] = out
+
+    categories = list(dict.fromkeys(names))
+    name_codes = np.array([categories.index(name) for name in names])
+    data[sounding_column] = pd.Categorical.from_codes(np.repeat(name_codes, lengths), categories=categories)
+
+    return pd.DataFrame(data)
+
+
+def fuse_cpt_files(file_paths: List[str], coordinates: Optional[Dict[str, Tuple[float, float]]] = None,
+                   max_workers: Optional[int] = None, cache_dir: Optional[str] = None,
+                   progress_callback: Optional[Callable[[int, int, str, bool, str], None]] = None,
+                   sort: bool = True) -> pd.DataFrame:
+    """
+    Fusionne plusieurs fichiers CPTU en parsant chaque fichier dans un pool de processus
+
+    Utilisable depuis l'interface Qt (callback émettant un signal) comme depuis
+    Streamlit (callback mettant à jour st.progress).
+
+    Args:
+        file_paths: Liste des fichiers CPTU
+        coordinates: Dictionnaire {nom de fichier: (X, Y)}; None pour ne pas ajouter X/Y
+        max_workers: Nombre de processus (défaut: nombre de CPU)
+        cache_dir: Répertoire du cache de parsing partagé entre processus
+        progress_callback: Appelée après chaque fichier avec
+            (fichiers traités, total, nom du fichier, succès, message)
+        sort: Trier le résultat par X, Y et profondeur
+
+    Returns:
+        DataFrame fusionné (vide si aucun fichier n'a pu être parsé)
+    """
+    file_paths = list(file_paths)
+    total = len(file_paths)
+    results = {}
+
+    def job_args(file_path):
+        filename = os.path.basename(file_path)
+        if coordinates is None:
+            coords = None
+        else:
+            coords = coordinates.get(filename, (0.0, 0.0))
+        return file_path, coords, cache_dir
+
+    def collect(done, file_path, df, message):
+        results[file_path] = df
+        if progress_callback is not None:
+            progress_callback(done, total, os.path.basename(file_path), df is not None, message)
+
+    if max_workers == 1 or total <= 1:
+        for done, file_path in enumerate(file_paths, start=1):
+            collect(done, *parse_sounding(*job_args(file_path)))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(parse_sounding, *job_args(fp)): fp for fp in file_paths}
+            for done, future in enumerate(as_completed(futures), start=1):
+                file_path = futures[future]
+                try:
+                    collect(done, *future.result())
+                except Exception as e:
+                    collect(done, file_path, None, f"Erreur lors du parsing: {str(e)}")
+
+    # Conserver l'ordre des fichiers d'entrée
+    frames = [results[fp] for fp in file_paths if results.get(fp) is not None]
+    names = [os.path.basename(fp) for fp in file_paths if results.get(fp) is not None]
+    if not frames:
+        return pd.DataFrame()
+
+    combined_df = concat_soundings(frames, names)
+
+    if sort and 'Depth' in combined_df.columns:
+        sort_columns = [col for col in ['X', 'Y'] if col in combined_df.columns] + ['Depth']
+        combined_df = combined_df.sort_values(sort_columns, kind='stable').reset_index(drop=True)
+
+    return combined_df
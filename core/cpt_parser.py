@@ -7,22 +7,34 @@ Supporte les formats .txt, .xlsx, .csv, .xls, .cal
 import pandas as pd
 import numpy as np
 import os
+import re
 import charset_normalizer
-from typing import Optional, Tuple
+from typing import Iterator, Optional, Tuple
 
 class CPTParser:
     """Parser spécialisé pour les fichiers CPT/CPTU"""
 
-    def __init__(self):
+    # Séparateurs testés (priorité aux tabulations)
+    separators = ['\t', ';', ',', ' ', '|']
+
+    def __init__(self, streaming_threshold_mb: float = 20.0, chunk_size: int = 200_000,
+                 sniff_bytes: int = 64 * 1024, cache=None):
         self.supported_formats = ['.txt', '.xlsx', '.csv', '.xls', '.cal']
         self.cpt_columns = ['depth', 'qc', 'fs', 'u', 'u2', 'Rf', 'gamma', 'Vs', 'qt', 'Bq']
-
-    def parse_file(self, file_path: str) -> Tuple[Optional[pd.DataFrame], str]:
+        # Au-delà de ce seuil les fichiers texte sont lus en flux par blocs (moteur C)
+        self.streaming_threshold_mb = streaming_threshold_mb
+        self.chunk_size = chunk_size
+        self.sniff_bytes = sniff_bytes
+        # Cache optionnel des fichiers déjà parsés (core.parse_cache.ParsedCPTCache)
+        self.cache = cache
+
+    def parse_file(self, file_path: str, file_hash: Optional[str] = None) -> Tuple[Optional[pd.DataFrame], str]:
         """
         Parse un fichier CPT et retourne les données et un message de statut
 
         Args:
             file_path: Chemin vers le fichier à parser
+            file_hash: Hash SHA256 du fichier si déjà calculé (clé du cache)
 
         Returns:
             Tuple (DataFrame or None, message)
@@ -35,6 +47,24 @@ class CPTParser:
         if file_ext not in self.supported_formats:
             return None, f"Format non supporté: {file_ext}"
 
+        if self.cache is None:
+            return self._parse_by_format(file_path, file_ext)
+
+        if file_hash is None:
+            file_hash = self.cache.file_hash(file_path)
+
+        cached = self.cache.get(file_hash)
+        if cached is not None:
+            df, message = cached
+            return df, f"{message} (cache)"
+
+        df, message = self._parse_by_format(file_path, file_ext)
+        if df is not None:
+            self.cache.put(file_hash, df, message)
+        return df, message
+
+    def _parse_by_format(self, file_path: str, file_ext: str) -> Tuple[Optional[pd.DataFrame], str]:
+        """Sélectionne le parseur selon l'extension du fichier"""
         try:
             if file_ext in ['.xlsx', '.xls']:
                 return self._parse_excel(file_path)
@@ -42,6 +72,8 @@ class CPTParser:
                 return self._parse_csv(file_path)
             elif file_ext == '.cal':
                 return self._parse_cal(file_path)
+            elif self._use_streaming(file_path):
+                return self._parse_text_streaming(file_path)
             else:  # .txt
                 return self._parse_text(file_path)
         except Exception as e:
@@ -91,7 +123,7 @@ class CPTParser:
             header_line = lines[0]
 
             # Essayer différents séparateurs (priorité aux tabulations)
-            separators = ['\t', ';', ',', ' ', '|']
+            separators = self.separators
             best_df = None
             best_score = 0
             best_sep = None
@@ -103,45 +135,10 @@ class CPTParser:
                     df_test = pd.read_csv(pd.io.common.StringIO(test_content),
                                         sep=sep, engine='python', header=0)
 
-                    # Vérifier que le DataFrame n'est pas vide
-                    if df_test.empty or len(df_test.columns) < 2:
+                    score = self._score_separator(df_test, sep)
+                    if score is None:
                         continue
 
-                    # Calculer un score basé sur plusieurs critères
-                    score = 0
-
-                    # Nombre de colonnes numériques
-                    numeric_cols = 0
-                    for col in df_test.columns:
-                        try:
-                            numeric_series = pd.to_numeric(df_test[col], errors='coerce')
-                            if not numeric_series.isna().all():
-                                numeric_cols += 1
-                        except:
-                            pass
-
-                    # Ratio de colonnes numériques
-                    numeric_ratio = numeric_cols / len(df_test.columns) if df_test.columns.size > 0 else 0
-
-                    # Bonus pour les séparateurs qui donnent plus de colonnes numériques
-                    score += numeric_cols * 2
-
-                    # Bonus si la plupart des colonnes sont numériques (sauf la première qui peut être depth)
-                    if numeric_ratio >= 0.6:
-                        score += 10
-
-                    # Bonus pour les tabulations (format CPT standard)
-                    if sep == '\t':
-                        score += 5
-
-                    # Pénalité pour les espaces (peuvent créer trop de colonnes)
-                    if sep == ' ' and len(df_test.columns) > 10:
-                        score -= 10
-
-                    # Vérifier que les données semblent cohérentes (pas que des NaN)
-                    if not df_test.dropna(how='all').empty:
-                        score += 5
-
                     if score > best_score:
                         best_score = score
                         best_df = df_test
@@ -196,11 +193,190 @@ class CPTParser:
         except Exception as e:
             return None, f"Erreur texte: {str(e)}"
 
+    def _score_separator(self, df_test: pd.DataFrame, sep: str) -> Optional[int]:
+        """Score un séparateur candidat à partir d'un DataFrame d'essai (None si inutilisable)"""
+        # Vérifier que le DataFrame n'est pas vide
+        if df_test.empty or len(df_test.columns) < 2:
+            return None
+
+        # Calculer un score basé sur plusieurs critères
+        score = 0
+
+        # Nombre de colonnes numériques
+        numeric_cols = 0
+        for col in df_test.columns:
+            try:
+                numeric_series = pd.to_numeric(df_test[col], errors='coerce')
+                if not numeric_series.isna().all():
+                    numeric_cols += 1
+            except:
+                pass
+
+        # Ratio de colonnes numériques
+        numeric_ratio = numeric_cols / len(df_test.columns) if df_test.columns.size > 0 else 0
+
+        # Bonus pour les séparateurs qui donnent plus de colonnes numériques
+        score += numeric_cols * 2
+
+        # Bonus si la plupart des colonnes sont numériques (sauf la première qui peut être depth)
+        if numeric_ratio >= 0.6:
+            score += 10
+
+        # Bonus pour les tabulations (format CPT standard)
+        if sep == '\t':
+            score += 5
+
+        # Pénalité pour les espaces (peuvent créer trop de colonnes)
+        if sep == ' ' and len(df_test.columns) > 10:
+            score -= 10
+
+        # Vérifier que les données semblent cohérentes (pas que des NaN)
+        if not df_test.dropna(how='all').empty:
+            score += 5
+
+        return score
+
+    def _use_streaming(self, file_path: str) -> bool:
+        """Indique si un fichier texte doit être lu en flux"""
+        threshold = self.streaming_threshold_mb
+        return threshold is not None and os.path.getsize(file_path) >= threshold * 1024 * 1024
+
+    def _sniff_text_format(self, file_path: str) -> Optional[dict]:
+        """Détecte encoding, séparateur, en-tête et décimale sur un préfixe borné du fichier"""
+        with open(file_path, 'rb') as f:
+            prefix = f.read(self.sniff_bytes)
+            truncated = bool(f.read(1))
+
+        detected = charset_normalizer.detect(prefix)
+        encoding = detected.get('encoding') or 'utf-8'
+
+        text = prefix.decode(encoding, errors='replace')
+        lines = text.splitlines()
+        if truncated and lines:
+            lines = lines[:-1]  # Dernière ligne potentiellement coupée
+        lines = [line.strip() for line in lines if line.strip()]
+        if not lines:
+            return None
+
+        sample = '\n'.join(lines[:10])
+        best_sep = None
+        best_score = 0
+        for sep in self.separators:
+            try:
+                df_test = pd.read_csv(pd.io.common.StringIO(sample), sep=sep, engine='python', header=0)
+                score = self._score_separator(df_test, sep)
+            except Exception:
+                continue
+            if score is not None and score > best_score:
+                best_score = score
+                best_sep = sep
+
+        if best_sep is None:
+            return None
+
+        # Même règle que le parseur complet: première ligne majoritairement numérique = données
+        first_row_values = lines[0].split(best_sep)
+        numeric_count = 0
+        for val in first_row_values[:3]:
+            try:
+                float(val.replace(',', '.'))
+                numeric_count += 1
+            except ValueError:
+                pass
+        has_header = len(lines) > 1 and numeric_count < len(first_row_values) * 0.5
+
+        # Virgule décimale (ex. exports européens séparés par ';' ou tabulations)
+        body = lines[1:] if has_header else lines
+        decimal = ','
+        if best_sep == ',' or not any(re.search(r'\d,\d', line) for line in body[:50]):
+            decimal = '.'
+
+        return {'encoding': encoding, 'sep': best_sep, 'has_header': has_header, 'decimal': decimal}
+
+    def _prepare_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Conversion numérique et mapping des colonnes d'un bloc lu en flux"""
+        chunk.columns = [' '.join(str(col).strip().split()) for col in chunk.columns]
+        for col in chunk.columns:
+            if not pd.api.types.is_numeric_dtype(chunk[col]):
+                chunk[col] = chunk[col].astype(str).str.replace(',', '.', regex=False)
+            chunk[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64')
+        return self._map_columns(chunk)
+
+    def iter_text_chunks(self, file_path: str, chunk_size: Optional[int] = None,
+                         text_format: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+        """
+        Lit un fichier texte CPT en flux et produit des blocs de DataFrame
+
+        Le format (encoding, séparateur, en-tête) est détecté sur un préfixe borné,
+        puis le fichier est lu par le moteur C de pandas bloc par bloc.
+
+        Args:
+            file_path: Chemin vers le fichier à lire
+            chunk_size: Nombre de lignes par bloc (défaut: self.chunk_size)
+            text_format: Format déjà détecté par _sniff_text_format (optionnel)
+
+        Yields:
+            DataFrame nettoyé (colonnes numériques et noms standard) pour chaque bloc
+        """
+        if text_format is None:
+            text_format = self._sniff_text_format(file_path)
+        if text_format is None:
+            raise ValueError("Impossible de déterminer le séparateur approprié")
+
+        sep = text_format['sep']
+        read_kwargs = {
+            'encoding': text_format['encoding'],
+            'encoding_errors': 'replace',
+            'decimal': text_format['decimal'],
+            'engine': 'c',
+            'chunksize': chunk_size or self.chunk_size,
+            'skip_blank_lines': True,
+        }
+        if sep == ' ':
+            read_kwargs['sep'] = r'\s+'
+        else:
+            read_kwargs['sep'] = sep
+            read_kwargs['skipinitialspace'] = True
+
+        if text_format['has_header']:
+            read_kwargs['header'] = 0
+        else:
+            read_kwargs['header'] = None
+
+        with pd.read_csv(file_path, **read_kwargs) as reader:
+            for chunk in reader:
+                if not text_format['has_header']:
+                    chunk.columns = self.cpt_columns[:len(chunk.columns)] + \
+                        list(chunk.columns[len(self.cpt_columns):])
+                yield self._prepare_chunk(chunk)
+
+    def _parse_text_streaming(self, file_path: str) -> Tuple[Optional[pd.DataFrame], str]:
+        """Parse un fichier texte volumineux en flux, par blocs, avec mémoire bornée"""
+        try:
+            text_format = self._sniff_text_format(file_path)
+            if text_format is None:
+                return None, "Impossible de déterminer le séparateur approprié"
+
+            chunks = list(self.iter_text_chunks(file_path, text_format=text_format))
+            if not chunks:
+                return None, "Fichier vide"
+
+            df = pd.concat(chunks, ignore_index=True)
+            del chunks
+            df = self._clean_and_validate(df)
+            return df, (f"Fichier texte parsé en flux avec succès (encoding: {text_format['encoding']}, "
+                        f"séparateur: '{text_format['sep']}')")
+
+        except Exception as e:
+            return None, f"Erreur texte: {str(e)}"
+
     def _parse_cal(self, file_path: str) -> Tuple[Optional[pd.DataFrame], str]:
         """Parse un fichier .cal (format binaire ou texte)"""
         try:
             # Pour l'instant, traiter comme texte
             # TODO: Implémenter parsing binaire si nécessaire
+            if self._use_streaming(file_path):
+                return self._parse_text_streaming(file_path)
             return self._parse_text(file_path)
         except Exception as e:
             return None, f"Erreur CAL: {str(e)}"
@@ -14,8 +14,8 @@ from core.cpt_parser import CPTParser
 class DataIntegrityChecker:
     """Vérificateur d'intégrité des données CPT"""
 
-    def __init__(self):
-        self.parser = CPTParser()
+    def __init__(self, cache=None):
+        self.parser = CPTParser(cache=cache)
         self.check_results = {}
 
     def verify_file_integrity(self, file_path: str) -> Dict[str, Any]:
@@ -55,7 +55,7 @@ class DataIntegrityChecker:
             results['raw_data_hash'] = raw_hash
 
             # 2. Parser le fichier
-            parsed_df, parse_message = self.parser.parse_file(file_path)
+            parsed_df, parse_message = self.parser.parse_file(file_path, file_hash=raw_hash)
 
             if parsed_df is None:
                 results['parsing_errors'].append(f"Échec du parsing: {parse_message}")
@@ -89,11 +89,12 @@ class DataIntegrityChecker:
 
         return results
 
-    def _calculate_file_hash(self, file_path: str) -> str:
+    @staticmethod
+    def _calculate_file_hash(file_path: str) -> str:
         """Calcule le hash SHA256 du fichier"""
         hash_sha256 = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 hash_sha256.update(chunk)
         return hash_sha256.hexdigest()
 
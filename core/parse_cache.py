@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Cache persistant des fichiers CPT/CPTU parsés
+Les DataFrames nettoyés sont stockés en format colonnaire (.npz) indexés par le hash SHA256 du fichier
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple, Dict, Any
+from core.data_integrity_checker import DataIntegrityChecker
+
+# Incrémenter lorsque le parsing change pour invalider les entrées existantes
+CACHE_FORMAT_VERSION = 1
+
+
+class ParsedCPTCache:
+    """Cache disque des DataFrames CPT parsés avec éviction LRU par taille totale"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: float = 512.0):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.cpt_analysis', 'parse_cache')
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def file_hash(self, file_path: str) -> str:
+        """Hash du contenu du fichier (même clé que la vérification d'intégrité)"""
+        return DataIntegrityChecker._calculate_file_hash(file_path)
+
+    def _entry_path(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{file_hash}_v{CACHE_FORMAT_VERSION}.npz")
+
+    def get(self, file_hash: str) -> Optional[Tuple[pd.DataFrame, str]]:
+        """
+        Récupère un DataFrame parsé depuis le cache
+
+        Args:
+            file_hash: Hash SHA256 du fichier source
+
+        Returns:
+            Tuple (DataFrame, message) ou None si absent
+        """
+        path = self._entry_path(file_hash)
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                columns = [str(c) for c in data['__columns__']]
+                df = pd.DataFrame(
+                    {col: data[f'c{i}'] for i, col in enumerate(columns)},
+                    index=data['__index__']
+                )
+                message = str(data['__message__'])
+        except Exception:
+            # Entrée corrompue: la supprimer et reparser
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Mettre à jour la date d'accès pour l'éviction LRU
+        os.utime(path, None)
+        self.hits += 1
+        return df, message
+
+    def put(self, file_hash: str, df: pd.DataFrame, message: str) -> bool:
+        """
+        Stocke un DataFrame parsé dans le cache
+
+        Seuls les DataFrames entièrement numériques sont mis en cache.
+
+        Returns:
+            True si l'entrée a été écrite
+        """
+        if df is None or not all(pd.api.types.is_numeric_dtype(dtype) for dtype in df.dtypes):
+            return False
+        if not pd.api.types.is_integer_dtype(df.index):
+            return False
+
+        path = self._entry_path(file_hash)
+        tmp_path = f"{path}.{os.getpid()}.tmp"  # Écritures concurrentes depuis le pool de fusion
+        arrays = {f'c{i}': df[col].to_numpy() for i, col in enumerate(df.columns)}
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    __columns__=np.array([str(c) for c in df.columns]),
+                    __index__=df.index.to_numpy(dtype=np.int64),
+                    __message__=np.array(message),
+                    **arrays
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            self._remove(tmp_path)
+            return False
+
+        self._evict()
+        return True
+
+    def _entries(self):
+        """Liste (chemin, taille, date d'accès) des entrées du cache"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale"""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_size_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Vide complètement le cache"""
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques d'utilisation du cache"""
+        entries = self._entries()
+        return {
+            'entries': len(entries),
+            'size_mb': sum(size for _, size, _ in entries) / (1024 * 1024),
+            'max_size_mb': self.max_size_bytes / (1024 * 1024),
+            'hits': self.hits,
+            'misses': self.misses
+        }
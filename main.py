@@ -4,7 +4,7 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, Q
                              QTableWidget, QTableWidgetItem, QTextEdit, QFileDialog, QMessageBox, QScrollArea, 
                              QGridLayout, QSplitter, QPushButton, QDial, QLCDNumber, QProgressBar, QStatusBar,
                              QGroupBox, QFrame, QLineEdit, QComboBox, QMenu, QDialog)
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QThread, Signal
 from PySide6.QtWebEngineWidgets import QWebEngineView
 from PySide6.QtGui import QPalette, QColor, QIcon, QFont, QActionGroup
 from PySide6.QtCore import Qt, QTimer
@@ -29,7 +29,7 @@ warnings.filterwarnings("ignore", message=".*to view this Streamlit app.*")
 warnings.filterwarnings("ignore", message=".*Thread 'MainThread': missing ScriptRunContext.*")
 
 # Import des fonctions d'analyse
-from analysis.geotechnical_analysis import perform_complete_analysis
+from analysis.geotechnical_analysis import perform_complete_analysis, classify_fused_soundings
 
 # Import conditionnel du système RAG (pour éviter les erreurs de dépendances)
 try:
@@ -44,6 +44,33 @@ except ImportError as e:
 # Import des nouveaux modules de parsing et vérification
 from core.cpt_parser import CPTParser
 from core.data_integrity_checker import DataIntegrityChecker
+from core.parse_cache import ParsedCPTCache
+from core.cpt_fusion import fuse_cpt_files
+from visualization.plotly_web import PlotlyWebRenderer
+
+
+class CPTFusionThread(QThread):
+    """Fusion des fichiers CPTU en arrière-plan (parsing dans un pool de processus, puis classification des sols)"""
+    progress = Signal(int, int, str, bool, str)  # traités, total, fichier, succès, message
+    completed = Signal(object)  # DataFrame fusionné et classifié
+    failed = Signal(str)
+
+    def __init__(self, file_paths, coordinates=None, cache_dir=None, sort=True):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        self.coordinates = coordinates
+        self.cache_dir = cache_dir
+        self.sort = sort
+
+    def run(self):
+        try:
+            fused = fuse_cpt_files(self.file_paths, self.coordinates, cache_dir=self.cache_dir,
+                                   progress_callback=self.progress.emit, sort=self.sort)
+            # Classification de tous les sondages en une passe, hors du thread de l'interface
+            self.completed.emit(classify_fused_soundings(fused))
+        except Exception as e:
+            self.failed.emit(str(e))
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -76,7 +103,8 @@ class MainWindow(QMainWindow):
             self.ai_explainer = None
             print("ℹ️ Fonctionnalités d'IA désactivées (RAG system non disponible)")
 
-        self.data_checker = DataIntegrityChecker()  # Vérificateur d'intégrité des données
+        self.parse_cache = ParsedCPTCache()  # Cache des fichiers CPT déjà parsés
+        self.data_checker = DataIntegrityChecker(cache=self.parse_cache)  # Vérificateur d'intégrité des données
         self.setOffWhiteTheme()  # Default to off-white
         self.initUI()
 
@@ -1238,6 +1266,7 @@ class MainWindow(QMainWindow):
         # Zone de visualisation 3D complète
         self.fusion2DView = QWebEngineView()
         self.fusion2DView.setMinimumHeight(400)
+        self.fusion2DRenderer = PlotlyWebRenderer(self.fusion2DView)
         fusion_layout.addWidget(QLabel("🗺️ Contours 3D - Graphiques qc de chaque CPTU"))
         fusion_layout.addWidget(self.fusion2DView)
         
@@ -1424,6 +1453,10 @@ class MainWindow(QMainWindow):
         self.webView2 = QWebEngineView()
         self.webView3 = QWebEngineView()
         self.webView4 = QWebEngineView()
+
+        # Rendu hors-ligne: plotly.js chargé une fois par page, puis mises à jour via Plotly.react
+        self.plot3DRenderers = [PlotlyWebRenderer(view) for view in
+                                [self.webView1, self.webView2, self.webView3, self.webView4]]
         
         # Add labels and views to grid
         grid.addWidget(QLabel("3D Scatter: Depth vs qc vs fs"), 0, 0)
@@ -1795,7 +1828,7 @@ class MainWindow(QMainWindow):
                 integrity_report = self.data_checker.generate_integrity_report(fileName)
 
                 # Parser le fichier avec le nouveau CPTParser
-                parser = CPTParser()
+                parser = CPTParser(cache=self.parse_cache)
                 df, parse_message = parser.parse_file(fileName)
 
                 if df is None:
@@ -1929,7 +1962,7 @@ class MainWindow(QMainWindow):
 
     def update3D(self):
         # Vérifier que les webView existent
-        webviews = ['webView1', 'webView2', 'webView3', 'webView4']
+        webviews = ['webView1', 'webView2', 'webView3', 'webView4', 'plot3DRenderers']
         for wv_name in webviews:
             if not hasattr(self, wv_name):
                 print(f"⚠️ {wv_name} n'existe pas encore")
@@ -1943,18 +1976,16 @@ class MainWindow(QMainWindow):
                 if missing_cols:
                     error_msg = f"Colonnes manquantes pour les graphiques 3D: {', '.join(missing_cols)}"
                     error_html = f"<h2>Erreur 3D</h2><p>{error_msg}</p><p>Colonnes disponibles: {', '.join(self.df.columns)}</p>"
-                    for webview in [self.webView1, self.webView2, self.webView3, self.webView4]:
-                        if hasattr(self, webview.__name__):
-                            webview.setHtml(error_html)
+                    for renderer in self.plot3DRenderers:
+                        renderer.show_message(error_html)
                     return
 
                 # Nettoyer les données
                 df_clean = self.df.dropna(subset=required_cols)
                 if len(df_clean) < 3:
                     error_html = "<h2>Erreur 3D</h2><p>Pas assez de données valides pour créer les graphiques 3D (minimum 3 points requis)</p>"
-                    for webview in [self.webView1, self.webView2, self.webView3, self.webView4]:
-                        if hasattr(self, webview.__name__):
-                            webview.setHtml(error_html)
+                    for renderer in self.plot3DRenderers:
+                        renderer.show_message(error_html)
                     return
 
                 # Plot 1: 3D Scatter Depth vs qc vs fs
@@ -1980,8 +2011,7 @@ class MainWindow(QMainWindow):
                     margin=dict(l=40, r=40, t=60, b=40, pad=10),
                     autosize=True
                 )
-                html1 = fig1.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-                self.webView1.setHtml(html1)
+                self.plot3DRenderers[0].render(fig1)
 
                 # Plot 2: 3D Surface plot for qc (version simplifiée sans interpolation)
                 try:
@@ -2009,8 +2039,7 @@ class MainWindow(QMainWindow):
                         margin=dict(l=40, r=40, t=60, b=40, pad=10),
                         autosize=True
                     )
-                    html2 = fig2.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-                    self.webView2.setHtml(html2)
+                    self.plot3DRenderers[1].render(fig2)
 
                 except ImportError:
                     # Fallback sans scipy - utiliser un scatter 3D coloré
@@ -2036,8 +2065,7 @@ class MainWindow(QMainWindow):
                         margin=dict(l=40, r=40, t=60, b=40, pad=10),
                         autosize=True
                     )
-                    html2 = fig2.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-                    self.webView2.setHtml(html2)
+                    self.plot3DRenderers[1].render(fig2)
 
                 except Exception as e:
                     # Fallback en cas d'erreur d'interpolation
@@ -2063,8 +2091,7 @@ class MainWindow(QMainWindow):
                         margin=dict(l=40, r=40, t=60, b=40, pad=10),
                         autosize=True
                     )
-                    html2 = fig2.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-                    self.webView2.setHtml(html2)
+                    self.plot3DRenderers[1].render(fig2)
 
                 # Plot 3: 3D Contour plot
                 fig3 = go.Figure(data=go.Contour(
@@ -2084,8 +2111,7 @@ class MainWindow(QMainWindow):
                     margin=dict(l=60, r=40, t=60, b=60, pad=10),
                     autosize=True
                 )
-                html3 = fig3.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-                self.webView3.setHtml(html3)
+                self.plot3DRenderers[2].render(fig3)
 
                 # Plot 4: 3D Wireframe (version simplifiée)
                 fig4 = go.Figure()
@@ -2112,8 +2138,7 @@ class MainWindow(QMainWindow):
                     margin=dict(l=40, r=40, t=60, b=40, pad=10),
                     autosize=True
                 )
-                html4 = fig4.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-                self.webView4.setHtml(html4)
+                self.plot3DRenderers[3].render(fig4)
 
                 print("✅ Graphiques 3D mis à jour avec succès")
 
@@ -2123,14 +2148,12 @@ class MainWindow(QMainWindow):
                 import traceback
                 traceback.print_exc()
 
-                for webview in [self.webView1, self.webView2, self.webView3, self.webView4]:
-                    if hasattr(self, webview.__name__ if hasattr(webview, '__name__') else 'webView'):
-                        webview.setHtml(error_html)
+                for renderer in self.plot3DRenderers:
+                    renderer.show_message(error_html)
         else:
             no_data_html = "<h1>Aucune donnée chargée</h1><p>Chargez un fichier CPTU pour voir les graphiques 3D</p>"
-            for webview in [self.webView1, self.webView2, self.webView3, self.webView4]:
-                if hasattr(self, webview.__name__ if hasattr(webview, '__name__') else 'webView'):
-                    webview.setHtml(no_data_html)
+            for renderer in self.plot3DRenderers:
+                renderer.show_message(no_data_html)
 
     def refresh3DGraphs(self):
         """Forcer le rafraîchissement des graphiques 3D"""
@@ -2150,6 +2173,11 @@ class MainWindow(QMainWindow):
                     df_analyzed, models, results = analysis_result
                     self.analysis_data = (df_analyzed, models, results)
                     self.analysis_results = self.create_analysis_summary(df_analyzed, results)
+                    if results and 'cache_stats' in results:
+                        last_run = results['cache_stats']['last_run']
+                        reused = sum(1 for status in last_run.values() if status == 'cache')
+                        self.statusBar.showMessage(
+                            f"♻️ Analyse: {reused}/{len(last_run)} étapes réutilisées depuis le cache")
                 else:
                     self.analysis_results = str(analysis_result)
                     self.analysis_data = None
@@ -2207,7 +2235,7 @@ class MainWindow(QMainWindow):
         try:
             if fused_data is None or fused_data.empty:
                 error_html = "<h1>Erreur 2D</h1><p>Aucune donnée fusionnée disponible</p>"
-                self.fusion2DView.setHtml(error_html)
+                self.fusion2DRenderer.show_message(error_html)
                 return
 
             # Créer la figure Plotly 2D
@@ -2331,8 +2359,7 @@ class MainWindow(QMainWindow):
             fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='lightgray')
             
             # Convertir en HTML et afficher
-            html_content = fig.to_html(include_plotlyjs='cdn', full_html=False)
-            self.fusion2DView.setHtml(html_content)
+            self.fusion2DRenderer.render(fig)
             
             # Informations sur la carte 2D
             info_2d = f"Carte 2D créée avec {len(sondages)} sondages:\n"
@@ -2348,7 +2375,7 @@ class MainWindow(QMainWindow):
             
         except Exception as e:
             error_html = f"<h1>Erreur 2D Fusion: {str(e)}</h1>"
-            self.fusion2DView.setHtml(error_html)
+            self.fusion2DRenderer.show_message(error_html)
             print(f"❌ Erreur dans createFused2DVisualization: {e}")
             import traceback
             traceback.print_exc()
@@ -2589,6 +2616,11 @@ class MainWindow(QMainWindow):
                     df_analyzed, models, results = analysis_result
                     self.analysis_data = (df_analyzed, models, results)
                     self.analysis_results = self.create_analysis_summary(df_analyzed, results)
+                    if results and 'cache_stats' in results:
+                        last_run = results['cache_stats']['last_run']
+                        reused = sum(1 for status in last_run.values() if status == 'cache')
+                        self.statusBar.showMessage(
+                            f"♻️ Analyse: {reused}/{len(last_run)} étapes réutilisées depuis le cache")
                 else:
                     self.analysis_results = str(analysis_result)
                     self.analysis_data = None
@@ -3175,47 +3207,56 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Erreur", "Aucun fichier chargé.")
                 return
 
-            # Charger les données individuelles pour chaque fichier
-            individual_data = []
-            parser = CPTParser()
+            # Parser les fichiers en arrière-plan pour ne pas bloquer l'interface
+            self.fusionButton.setEnabled(False)
+            self.fusion2DInfoLabel.setText(f"Chargement de {len(self.fusion_files)} CPTU...")
+            self.fusion2DInfoLabel.setStyleSheet("font-weight: bold; color: #666;")
 
-            for file_path in self.fusion_files:
-                try:
-                    df, message = parser.parse_file(file_path)
-
-                    if df is None or df.empty:
-                        print(f"⚠️ Impossible de parser {os.path.basename(file_path)}: {message}")
-                        continue
+            self.fusion_thread = CPTFusionThread(self.fusion_files, cache_dir=self.parse_cache.cache_dir,
+                                                 sort=False)
+            self.fusion_thread.progress.connect(self.onFusionProgress)
+            self.fusion_thread.completed.connect(self.onFusionCompleted)
+            self.fusion_thread.failed.connect(self.onFusionFailed)
+            self.fusion_thread.start()
 
-                    # Ajouter le nom du sondage
-                    filename = os.path.basename(file_path)
-                    df['Sondage'] = filename
+        except Exception as e:
+            QMessageBox.warning(self, "Erreur", f"Erreur lors de la création des graphiques 2D: {e}")
+            import traceback
+            traceback.print_exc()
 
-                    # Normaliser les noms de colonnes
-                    df = df.rename(columns={'depth': 'Depth', 'qc': 'qc', 'fs': 'fs'})
+    def onFusionProgress(self, done, total, filename, success, message):
+        """Mise à jour de la progression de la fusion"""
+        if success:
+            print(f"✅ {filename}: {message}")
+        else:
+            print(f"⚠️ Impossible de parser {filename}: {message}")
+        self.fusion2DInfoLabel.setText(f"Chargement des CPTU: {done}/{total} ({filename})")
 
-                    individual_data.append(df)
-                    print(f"✅ {filename}: {len(df)} points chargés")
+    def onFusionFailed(self, error):
+        """Erreur pendant la fusion en arrière-plan"""
+        self.fusionButton.setEnabled(True)
+        QMessageBox.warning(self, "Erreur", f"Erreur lors de la création des graphiques 2D: {error}")
 
-                except Exception as e:
-                    print(f"❌ Erreur avec {os.path.basename(file_path)}: {e}")
-                    continue
-
-            if not individual_data:
+    def onFusionCompleted(self, combined_data):
+        """Créer les graphiques une fois tous les fichiers parsés"""
+        self.fusionButton.setEnabled(True)
+        try:
+            if combined_data is None or combined_data.empty:
                 QMessageBox.warning(self, "Erreur", "Aucune donnée valide trouvée dans les fichiers.")
                 return
 
-            # Combiner toutes les données individuelles
-            combined_data = pd.concat(individual_data, ignore_index=True)
-
             # Créer la visualisation 3D de contours pour chaque sondage CPTU
             self.createFused3DVisualization(combined_data)
 
             # Afficher les informations
             info_text = f"Graphiques 3D de contours créés avec succès!\n"
-            info_text += f"• {len(individual_data)} CPTU chargés\n"
+            info_text += f"• {combined_data['Sondage'].nunique()} CPTU chargés\n"
             info_text += f"• {len(combined_data)} points de données totaux\n"
             info_text += f"• Profondeur max: {combined_data['Depth'].max():.1f} m\n"
+            if 'Soil_Type' in combined_data.columns:
+                soil_shares = combined_data['Soil_Type'].value_counts(normalize=True)
+                info_text += "• Sols: " + ", ".join(f"{soil} {share:.0%}" for soil, share in soil_shares.items()
+                                                    if share > 0) + "\n"
 
             self.fusion2DInfoLabel.setText(info_text)
             self.fusion2DInfoLabel.setStyleSheet("font-weight: bold; color: #4CAF50;")
@@ -3228,52 +3269,8 @@ class MainWindow(QMainWindow):
             traceback.print_exc()
 
     def fuseCPTUData(self, file_paths, coordinates):
-        """Fusionner les données CPTU avec les coordonnées"""
-        fused_data = []
-        parser = CPTParser()
-        
-        for file_path in file_paths:
-            try:
-                # Parser le fichier
-                df, message = parser.parse_file(file_path)
-                
-                if df is None or df.empty:
-                    print(f"⚠️ Impossible de parser {os.path.basename(file_path)}: {message}")
-                    continue
-                
-                # Ajouter les coordonnées
-                filename = os.path.basename(file_path)
-                if filename in coordinates:
-                    x, y = coordinates[filename]
-                    df['X'] = x
-                    df['Y'] = y
-                    df['Sondage'] = filename
-                else:
-                    # Coordonnées par défaut si non spécifiées
-                    df['X'] = 0.0
-                    df['Y'] = 0.0
-                    df['Sondage'] = filename
-                
-                # Normaliser les noms de colonnes
-                df = df.rename(columns={'depth': 'Depth', 'qc': 'qc', 'fs': 'fs'})
-                
-                fused_data.append(df)
-                print(f"✅ {filename}: {len(df)} points chargés")
-                
-            except Exception as e:
-                print(f"❌ Erreur avec {os.path.basename(file_path)}: {e}")
-                continue
-        
-        if not fused_data:
-            return pd.DataFrame()
-        
-        # Combiner toutes les données
-        combined_df = pd.concat(fused_data, ignore_index=True)
-        
-        # Trier par coordonnées et profondeur
-        combined_df = combined_df.sort_values(['X', 'Y', 'Depth']).reset_index(drop=True)
-        
-        return combined_df
+        """Fusionner les données CPTU avec les coordonnées et classifier les sols de tous les sondages"""
+        return classify_fused_soundings(fuse_cpt_files(file_paths, coordinates, cache_dir=self.parse_cache.cache_dir))
 
     def loadMultipleCPTUFiles(self):
         """Charge plusieurs fichiers CPTU pour la fusion"""
@@ -3472,7 +3469,7 @@ class MainWindow(QMainWindow):
                 try:
                     # Charger les données CPTU
                     from core.cpt_parser import CPTParser
-                    parser = CPTParser()
+                    parser = CPTParser(cache=self.parse_cache)
                     result = parser.parse_file(file_path)
 
                     # Le parser retourne un tuple (DataFrame, message)
@@ -3975,8 +3972,7 @@ Réponds UNIQUEMENT avec: X=123.45, Y=67.89
                     fig.update_yaxes(title_text="qc (MPa)", row=i, col=j)
 
             # Convertir en HTML et afficher
-            html_content = fig.to_html(include_plotlyjs='cdn', full_html=False, config={'responsive': True})
-            self.fusion2DView.setHtml(html_content)
+            self.fusion2DRenderer.render(fig)
 
             # Activer le bouton d'export
             self.exportFusionPDFButton.setEnabled(True)
@@ -3994,7 +3990,7 @@ Réponds UNIQUEMENT avec: X=123.45, Y=67.89
 
         except Exception as e:
             error_html = f"<h1>Erreur Contours 3D: {str(e)}</h1><p>Vérifiez que les données sont valides.</p>"
-            self.fusion2DView.setHtml(error_html)
+            self.fusion2DRenderer.show_message(error_html)
             print(f"❌ Erreur dans createFused3DVisualization: {e}")
             import traceback
             traceback.print_exc()
@@ -4405,6 +4401,8 @@ Réponds UNIQUEMENT avec: X=123.45, Y=67.89
             QMessageBox.warning(self, "Erreur", f"Erreur lors de l'export individuel: {e}")
 
 if __name__ == '__main__':
+    import multiprocessing
+    multiprocessing.freeze_support()  # Pool de processus de fusion dans l'exécutable Windows
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -0,0 +1,295 @@
+"""
+Couche d'ingestion des données IoT entre le thread MQTT et l'interface
+
+Les messages sont analysés dès leur réception (thread réseau MQTT) et rangés dans un
+tampon circulaire d'échantillons typés. L'interface vide le tampon à fréquence fixe :
+les mises à jour sont regroupées, le journal est rendu par lots et les seuils d'alerte
+sont évalués sur des agrégats de fenêtre glissante plutôt que message par message.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Grandeurs mesurées par les capteurs (colonnes du tampon)
+SENSOR_FIELDS = ("temperature", "pressure", "vibration", "humidity")
+
+# Capacité du tampon d'échantillons et du journal en attente d'affichage
+IOT_BUFFER_CAPACITY = 4096
+IOT_LOG_CAPACITY = 500
+
+# Fréquence de rafraîchissement de l'interface (Hz) et durée de la fenêtre glissante (s)
+IOT_REFRESH_HZ = 4.0
+IOT_WINDOW_SECONDS = 10.0
+
+# Nombre de mesures récentes (latences, durées de rafraîchissement) gardées pour les percentiles
+IOT_METRICS_HISTORY = 10000
+
+
+@dataclass
+class AlertRule:
+    """Seuil évalué sur un agrégat de fenêtre ('mean', 'max', 'min' ou 'last')"""
+    field: str
+    statistic: str
+    above: bool
+    threshold: float
+    message: str
+
+    def triggered(self, aggregates: Dict[str, Dict[str, float]]) -> bool:
+        value = aggregates.get(self.field, {}).get(self.statistic)
+        if value is None or np.isnan(value):
+            return False
+        return value > self.threshold if self.above else value < self.threshold
+
+
+# Seuils de l'application (température et pression moyennes, pic de vibration)
+DEFAULT_ALERT_RULES = [
+    AlertRule("temperature", "mean", True, 35.0,
+              "Température élevée détectée: {value:.1f}°C (moyenne {window:.0f}s) - Risque d'incendie augmenté"),
+    AlertRule("pressure", "mean", False, 1000.0,
+              "Pression basse détectée: {value:.1f} hPa (moyenne {window:.0f}s) - Risque d'explosion augmenté"),
+    AlertRule("vibration", "max", True, 1.5,
+              "Vibration élevée détectée: {value:.2f} (pic {window:.0f}s) - Risque structurel"),
+]
+
+
+@dataclass
+class IngestionUpdate:
+    """Résultat regroupé d'un rafraîchissement de l'interface"""
+    new_samples: int
+    new_messages: int
+    log_lines: List[str]
+    hidden_log_lines: int
+    latest: Dict[str, float]
+    aggregates: Dict[str, Dict[str, float]]
+    alerts: List[str]
+    oldest_received_at: Optional[float] = None  # time.monotonic() du plus ancien message de la mise à jour
+    received_times: np.ndarray = field(default_factory=lambda: np.empty(0))  # Réception des nouveaux échantillons
+    stats: Dict[str, int] = field(default_factory=dict)
+
+
+class IoTIngestionBuffer:
+    """
+    Tampon circulaire thread-safe d'échantillons capteurs
+
+    push() est appelé depuis le thread réseau, drain() depuis le thread de l'interface.
+    Lorsque le tampon est plein, les échantillons les plus anciens sont écrasés et
+    comptés comme perdus s'ils n'avaient pas encore été traités.
+    """
+
+    def __init__(self, capacity=IOT_BUFFER_CAPACITY, log_capacity=IOT_LOG_CAPACITY,
+                 window_seconds=IOT_WINDOW_SECONDS, alert_rules=None):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self.alert_rules = list(DEFAULT_ALERT_RULES if alert_rules is None else alert_rules)
+
+        self._lock = threading.Lock()
+        self._times = np.full(capacity, -np.inf)
+        self._values = np.full((capacity, len(SENSOR_FIELDS)), np.nan)
+        self._written = 0  # Échantillons écrits depuis le début
+        self._drained = 0  # Échantillons déjà remis à l'interface
+        self._messages = 0
+        self._messages_drained = 0
+        self._oldest_pending = None
+        self._log = deque(maxlen=log_capacity)
+        self._active_alerts = set()
+
+        self.dropped_samples = 0
+        self.dropped_log_lines = 0
+
+    def push(self, payload: str, received_at: Optional[float] = None) -> None:
+        """Analyse un message brut et l'ajoute au tampon"""
+        received_at = time.monotonic() if received_at is None else received_at
+        lines = [f"[{time.strftime('%H:%M:%S')}] {payload}"]
+        values = None
+
+        payload = payload.strip()
+        if payload.startswith('{') and payload.endswith('}'):
+            try:
+                data = json.loads(payload)
+                values = [float(data[name]) if name in data else np.nan for name in SENSOR_FIELDS]
+            except (ValueError, TypeError) as e:
+                lines.append(f"  → Erreur d'analyse des données: {e}")
+        else:
+            lines.append("  → Données texte reçues (pas de mise à jour automatique)")
+
+        with self._lock:
+            self._messages += 1
+            if self._oldest_pending is None:
+                self._oldest_pending = received_at
+            if values is not None:
+                slot = self._written % self.capacity
+                if self._written - self._drained >= self.capacity:
+                    self.dropped_samples += 1
+                    self._drained += 1
+                self._times[slot] = received_at
+                self._values[slot] = values
+                self._written += 1
+            overflow = len(self._log) + len(lines) - self._log.maxlen
+            if overflow > 0:
+                self.dropped_log_lines += overflow
+            self._log.extend(lines)
+
+    def window_aggregates(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Moyenne, minimum, maximum, dernière valeur et nombre de mesures par grandeur sur la fenêtre"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            in_window = self._times >= now - self.window_seconds
+            order = np.argsort(self._times[in_window], kind='stable')
+            values = self._values[in_window][order]
+
+        aggregates = {}
+        for column, name in enumerate(SENSOR_FIELDS):
+            series = values[:, column]
+            series = series[~np.isnan(series)]
+            if len(series) == 0:
+                continue
+            aggregates[name] = {
+                'mean': float(series.mean()),
+                'min': float(series.min()),
+                'max': float(series.max()),
+                'last': float(series[-1]),
+                'count': len(series),
+            }
+        return aggregates
+
+    def drain(self, now: Optional[float] = None) -> IngestionUpdate:
+        """Remet à l'interface tout ce qui est arrivé depuis le dernier appel, regroupé"""
+        with self._lock:
+            new_samples = self._written - self._drained
+            slots = np.arange(self._drained, self._written) % self.capacity
+            received_times = self._times[slots].copy()
+            new_messages = self._messages - self._messages_drained
+            self._drained = self._written
+            self._messages_drained = self._messages
+            oldest, self._oldest_pending = self._oldest_pending, None
+            log_lines = list(self._log)
+            self._log.clear()
+            hidden, self.dropped_log_lines = self.dropped_log_lines, 0
+
+        aggregates = self.window_aggregates(now)
+        latest = {name: stats['last'] for name, stats in aggregates.items()}
+
+        # Alertes déclenchées au franchissement du seuil (pas à chaque rafraîchissement)
+        alerts = []
+        for rule in self.alert_rules:
+            key = (rule.field, rule.statistic, rule.above, rule.threshold)
+            if rule.triggered(aggregates):
+                if key not in self._active_alerts:
+                    self._active_alerts.add(key)
+                    value = aggregates[rule.field][rule.statistic]
+                    alerts.append(rule.message.format(value=value, window=self.window_seconds))
+            else:
+                self._active_alerts.discard(key)
+
+        return IngestionUpdate(
+            new_samples=new_samples,
+            new_messages=new_messages,
+            log_lines=log_lines,
+            hidden_log_lines=hidden,
+            latest=latest,
+            aggregates=aggregates,
+            alerts=alerts,
+            oldest_received_at=oldest,
+            received_times=received_times,
+            stats={'received': self._messages, 'samples': self._written, 'dropped_samples': self.dropped_samples},
+        )
+
+
+class RefreshMetrics:
+    """
+    Mesures du chemin ingestion → rafraîchissement de l'interface
+
+    Alimentée à chaque rafraîchissement (RiskSimulator.refresh_iot ou banc iot_replay) :
+    latence de bout en bout des échantillons, durée de traitement et de mise en forme du
+    journal, échantillons et lignes de journal perdus, fréquence des mises à jour.
+
+    Args:
+        history: Nombre de mesures récentes gardées pour les percentiles (None = toutes)
+    """
+
+    def __init__(self, history=IOT_METRICS_HISTORY):
+        self.start = time.monotonic()
+        self.updates = 0
+        self.hidden_log_lines = 0
+        self.stats: Dict[str, int] = {}
+        self.latencies = deque(maxlen=history)  # Secondes
+        self.processing = deque(maxlen=history)
+        self.log_formatting = deque(maxlen=history)
+
+    def record(self, update: IngestionUpdate, tick: float, log_seconds: float = 0.0,
+               done: Optional[float] = None) -> None:
+        """Enregistre une mise à jour traitée entre tick et done (time.monotonic())"""
+        done = time.monotonic() if done is None else done
+        self.updates += 1
+        self.processing.append(done - tick)
+        self.log_formatting.append(log_seconds)
+        self.latencies.extend((done - update.received_times).tolist())
+        self.hidden_log_lines += update.hidden_log_lines
+        self.stats = dict(update.stats)
+
+    def report(self, now: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """Rapport de mesure (durées en ms, fréquences en Hz; None sans mesure)"""
+        elapsed = (time.monotonic() if now is None else now) - self.start
+        latencies = np.asarray(self.latencies) * 1000
+
+        def percentile(q):
+            return float(np.percentile(latencies, q)) if len(latencies) else None
+
+        def mean_ms(values):
+            return float(np.mean(values) * 1000) if values else None
+
+        return {
+            'dropped_samples': self.stats.get('dropped_samples', 0),
+            'dropped_log_lines': self.hidden_log_lines,
+            'ui_updates': self.updates,
+            'ui_update_rate_hz': self.updates / elapsed if elapsed > 0 else None,
+            'update_processing_ms_mean': mean_ms(self.processing),
+            'update_processing_ms_max': float(np.max(self.processing) * 1000) if self.processing else None,
+            'log_formatting_ms_mean': mean_ms(self.log_formatting),
+            'latency_ms_p50': percentile(50),
+            'latency_ms_p95': percentile(95),
+            'latency_ms_p99': percentile(99),
+            'latency_ms_max': float(latencies.max()) if len(latencies) else None,
+        }
+
+
+# Libellés et unités des grandeurs pour le journal
+SENSOR_LABELS = {
+    'temperature': ("Température", "°C"),
+    'pressure': ("Pression", " hPa"),
+    'vibration': ("Vibration", ""),
+    'humidity': ("Humidité", "%"),
+}
+
+
+def apply_to_engine(engine, update: IngestionUpdate) -> List[str]:
+    """
+    Applique les dernières mesures d'une mise à jour aux paramètres du moteur de simulation
+
+    Returns:
+        Description des paramètres modifiés (vide si aucun nouvel échantillon)
+    """
+    if engine is None or not update.new_samples:
+        return []
+    changes = []
+    for name, value in update.latest.items():
+        setattr(engine, name, value)
+        label, unit = SENSOR_LABELS[name]
+        changes.append(f"{label}: {value}{unit}")
+    return changes
+
+
+def format_log(update: IngestionUpdate, changes: List[str]) -> str:
+    """Texte du journal d'une mise à jour (lignes reçues, lignes masquées, paramètres modifiés)"""
+    lines = update.log_lines
+    if update.hidden_log_lines:
+        lines = [f"… {update.hidden_log_lines} ligne(s) non affichée(s) (flux trop rapide)"] + lines
+    if changes:
+        lines = lines + [f"  → {update.new_samples} mesure(s), paramètres mis à jour: " + ", ".join(changes)]
+    return "\n".join(lines)
@@ -0,0 +1,271 @@
+"""
+Rejeu de flux IoT enregistrés et banc de mesure du chemin MQTT → interface → simulation
+
+Les messages (fichier JSON lines enregistré ou flux synthétique) sont publiés à un
+débit configurable, soit vers un broker MQTT réel (l'application écoute comme en
+production), soit vers un broker simulé en mémoire qui appelle le même point d'entrée
+que MQTTThread (IoTIngestionBuffer.push). Dans ce second cas, une boucle au rythme du
+rafraîchissement de l'interface vide le tampon, met à jour le SimulationEngine et
+mesure la latence de bout en bout, les messages perdus et la fréquence de mise à jour.
+Avec un broker réel, seul le débit de publication est mesuré ici : les mêmes mesures
+(RefreshMetrics) sont affichées par l'application dans l'onglet IoT et écrites dans la
+console à la déconnexion.
+
+Exemples :
+    python iot_replay.py --synthetic 20000 --rate 2000 --refresh 4
+    python iot_replay.py capteurs.jsonl --rate 500 --simulate --output rapport.json
+    python iot_replay.py capteurs.jsonl --broker localhost --port 1883 --topic sensors/risk
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+from iot_ingestion import IoTIngestionBuffer, RefreshMetrics, apply_to_engine, format_log, IOT_REFRESH_HZ
+
+# Débit de publication par défaut (messages/s) lorsque l'enregistrement n'est pas horodaté
+DEFAULT_RATE = 100.0
+
+
+def load_recording(path):
+    """
+    Charge un enregistrement : une ligne JSON par message, soit la charge utile seule,
+    soit {"t": secondes depuis le début, "payload": {...}}
+
+    Returns:
+        Liste de (instant relatif ou None, charge utile texte)
+    """
+    messages = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                messages.append((None, line))  # Message texte brut
+                continue
+            if isinstance(record, dict) and 'payload' in record:
+                payload = record['payload']
+                messages.append((record.get('t'), payload if isinstance(payload, str) else json.dumps(payload)))
+            else:
+                messages.append((None, line))
+    return messages
+
+
+def synthetic_stream(n, seed=None):
+    """Flux synthétique de n mesures (dérive lente de la température, pics de vibration)"""
+    rng = np.random.default_rng(seed)
+    temperature = 20 + np.cumsum(rng.normal(0, 0.05, n))
+    pressure = 1013 + np.cumsum(rng.normal(0, 0.1, n))
+    vibration = np.abs(rng.normal(0.2, 0.1, n)) + (rng.random(n) < 0.001) * 2.0
+    humidity = np.clip(50 + np.cumsum(rng.normal(0, 0.05, n)), 0, 100)
+    return [(None, json.dumps({'temperature': round(float(t), 2), 'pressure': round(float(p), 2),
+                               'vibration': round(float(v), 3), 'humidity': round(float(h), 1)}))
+            for t, p, v, h in zip(temperature, pressure, vibration, humidity)]
+
+
+class ReplayMessage:
+    """Message au format de paho-mqtt (attributs topic et payload)"""
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload.encode('utf-8')
+
+
+class InProcessBroker:
+    """Broker simulé : chaque publication appelle directement le callback on_message abonné"""
+
+    def __init__(self):
+        self.on_message = None
+
+    def publish(self, topic, payload):
+        if self.on_message is not None:
+            self.on_message(self, None, ReplayMessage(topic, payload))
+
+
+def _publish_loop(messages, rate, publish, stop_event, sent):
+    """Publie les messages au débit demandé (ou selon leurs instants enregistrés si rate est None)"""
+    start = time.monotonic()
+    for i, (offset, payload) in enumerate(messages):
+        if stop_event.is_set():
+            break
+        target = start + (i / rate if rate else (offset or 0.0))
+        delay = target - time.monotonic()
+        if delay > 0.0005:
+            time.sleep(delay)
+        publish(payload)
+        sent[0] += 1
+
+
+def replay(messages, rate=DEFAULT_RATE, refresh_hz=IOT_REFRESH_HZ, engine=None, simulate=False,
+           topic="sensors/risk", buffer=None):
+    """
+    Rejoue des messages via le broker simulé et mesure le chemin ingestion → rafraîchissement
+
+    Args:
+        messages: Liste de (instant relatif ou None, charge utile)
+        rate: Débit (messages/s); None pour respecter les instants enregistrés
+        refresh_hz: Fréquence de rafraîchissement simulée de l'interface
+        engine: SimulationEngine mis à jour à chaque rafraîchissement (optionnel)
+        simulate: Recalculer simulate_all() à chaque rafraîchissement avec nouvelles mesures
+        buffer: IoTIngestionBuffer (par défaut, un tampon neuf avec les paramètres de l'application)
+
+    Returns:
+        Dictionnaire du rapport de mesure
+    """
+    buffer = IoTIngestionBuffer() if buffer is None else buffer
+    broker = InProcessBroker()
+    # Même traitement que MQTTThread.on_message lorsqu'un tampon est fourni
+    broker.on_message = lambda client, userdata, msg: buffer.push(msg.payload.decode())
+
+    stop_event = threading.Event()
+    sent = [0]
+    publisher = threading.Thread(target=_publish_loop, daemon=True,
+                                 args=(messages, rate, lambda payload: broker.publish(topic, payload),
+                                       stop_event, sent))
+
+    alerts, log_characters = [], 0
+    interval = 1.0 / refresh_hz
+    metrics = RefreshMetrics(history=None)
+    start = metrics.start
+    publisher.start()
+
+    try:
+        next_tick = start
+        while True:
+            finished = not publisher.is_alive()
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0 and not finished:
+                time.sleep(delay)
+
+            # Rafraîchissement de l'interface (équivalent headless de RiskSimulator.refresh_iot)
+            tick = time.monotonic()
+            update = buffer.drain()
+            if update.new_messages or update.alerts:
+                changes = apply_to_engine(engine, update)
+                # Journal mis en forme comme dans refresh_iot (non affiché : taille et durée mesurées)
+                log_start = time.monotonic()
+                log_characters += len(format_log(update, changes))
+                log_seconds = time.monotonic() - log_start
+                if simulate and engine is not None and update.new_samples:
+                    engine.simulate_all("Tous")
+                metrics.record(update, tick, log_seconds)
+                alerts.extend(update.alerts)
+            if finished:
+                break
+    finally:
+        stop_event.set()
+        publisher.join()
+
+    now = time.monotonic()
+    elapsed = now - start
+    stats = buffer.drain().stats
+
+    report = {
+        'messages_sent': sent[0],
+        'messages_received': stats['received'],
+        'samples': stats['samples'],
+        'duration_s': elapsed,
+        'publish_rate_hz': sent[0] / elapsed if elapsed > 0 else None,
+    }
+    report.update(metrics.report(now))
+    report['dropped_samples'] = stats['dropped_samples']
+    report['log_characters'] = log_characters
+    report['alerts'] = alerts
+    return report
+
+
+def publish_to_broker(messages, rate, broker, port, topic):
+    """Publie les messages vers un broker MQTT réel (l'application connectée reçoit le flux)"""
+    import paho.mqtt.client as mqtt
+
+    client = mqtt.Client()
+    client.connect(broker, port, 60)
+    client.loop_start()
+    stop_event = threading.Event()
+    sent = [0]
+    start = time.monotonic()
+    try:
+        _publish_loop(messages, rate, lambda payload: client.publish(topic, payload), stop_event, sent)
+    finally:
+        client.loop_stop()
+        client.disconnect()
+    elapsed = time.monotonic() - start
+    return {'messages_sent': sent[0], 'duration_s': elapsed,
+            'publish_rate_hz': sent[0] / elapsed if elapsed > 0 else None}
+
+
+def _load_engine(map_path):
+    from simulation_engine import SimulationEngine
+    if map_path:
+        from PIL import Image
+        base_map = np.asarray(Image.open(map_path).convert('L'))
+    else:
+        base_map = np.full((480, 640), 128, dtype=np.uint8)
+    return SimulationEngine(base_map)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejeu de flux IoT et mesure du chemin d'ingestion")
+    parser.add_argument('recording', nargs='?', help="Fichier JSON lines enregistré")
+    parser.add_argument('--synthetic', type=int, default=0, help="Nombre de messages synthétiques à générer")
+    parser.add_argument('--seed', type=int, default=None, help="Graine du flux synthétique")
+    parser.add_argument('--rate', type=float, default=None,
+                        help="Débit en messages/s (défaut: instants enregistrés, sinon %g)" % DEFAULT_RATE)
+    parser.add_argument('--loop', type=int, default=1, help="Nombre de répétitions du flux")
+    parser.add_argument('--refresh', type=float, default=IOT_REFRESH_HZ, help="Rafraîchissement de l'interface (Hz)")
+    parser.add_argument('--simulate', action='store_true', help="Recalculer la simulation à chaque rafraîchissement")
+    parser.add_argument('--map', help="Image de carte pour le moteur de simulation")
+    parser.add_argument('--broker', help="Publier vers ce broker MQTT au lieu du broker simulé")
+    parser.add_argument('--port', type=int, default=1883)
+    parser.add_argument('--topic', default="sensors/risk")
+    parser.add_argument('--output', help="Fichier JSON du rapport")
+    args = parser.parse_args(argv)
+
+    if args.recording:
+        messages = load_recording(args.recording)
+    elif args.synthetic > 0:
+        messages = synthetic_stream(args.synthetic, args.seed)
+    else:
+        parser.error("indiquer un enregistrement ou --synthetic N")
+    if not messages:
+        parser.error(f"aucun message à rejouer dans {args.recording}")
+
+    timed = args.rate is None and all(offset is not None for offset, _ in messages)
+    rate = None if timed else (args.rate or DEFAULT_RATE)
+    if args.loop > 1:
+        if timed:
+            span = messages[-1][0] + 1.0 / DEFAULT_RATE
+            messages = [(offset + k * span, payload) for k in range(args.loop) for offset, payload in messages]
+        else:
+            messages = messages * args.loop
+
+    if args.broker:
+        report = publish_to_broker(messages, rate, args.broker, args.port, args.topic)
+    else:
+        engine = _load_engine(args.map) if (args.simulate or args.map) else None
+        report = replay(messages, rate, args.refresh, engine=engine, simulate=args.simulate, topic=args.topic)
+
+    for key, value in report.items():
+        if key == 'alerts':
+            print(f"{key}: {len(value)}")
+        elif isinstance(value, float):
+            print(f"{key}: {value:.2f}")
+        else:
+            print(f"{key}: {value}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Monte Carlo parallèle pour le moteur de simulation des dangers
+
+Les réalisations sont réparties en blocs sur un pool de processus. Chaque bloc a sa
+propre graine dérivée d'une SeedSequence : le résultat ne dépend ni du nombre de
+processus ni de l'ordre d'achèvement des blocs. Les statistiques (moyenne, variance,
+maximum, probabilités de dépassement) sont agrégées en continu (Welford / Chan),
+sans conserver les réalisations.
+
+Le moteur reçu n'est jamais modifié : les blocs calculés dans le processus courant
+utilisent une copie (graine et vent propres), et le dernier vent tiré est renvoyé dans
+le résultat pour que l'appelant l'applique lui-même (ex. sur le thread de l'interface).
+"""
+
+import copy
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation_engine import MC_BATCH_SIZE
+
+# Seuils de risque pour les cartes de probabilité de dépassement
+EXCEEDANCE_THRESHOLDS = (0.5, 0.7, 0.9)
+
+# Taille automatique des blocs : n est découpé en MC_TARGET_CHUNKS blocs d'au moins
+# MC_MIN_CHUNK_SIZE et d'au plus MC_CHUNK_SIZE réalisations. Elle ne dépend que de n (pas du
+# nombre de cœurs), pour que le résultat reste identique d'une machine à l'autre, et les
+# 20 réalisations de l'interface donnent 7 blocs de 3, répartis sur le pool.
+MC_TARGET_CHUNKS = 8
+MC_MIN_CHUNK_SIZE = 2
+MC_CHUNK_SIZE = 16
+
+# Nombre minimal de blocs pour justifier le démarrage d'un pool de processus
+MC_PARALLEL_MIN_CHUNKS = 4
+
+
+def auto_chunk_size(n, target_chunks=MC_TARGET_CHUNKS):
+    """Nombre de réalisations par bloc pour n réalisations"""
+    return int(np.clip(-(-n // target_chunks), MC_MIN_CHUNK_SIZE, MC_CHUNK_SIZE))
+
+
+# État des processus de calcul (moteur reçu une fois par processus)
+_WORKER_STATE = {}
+
+
+class FieldStatistics:
+    """
+    Accumulateur en continu de statistiques par pixel sur des champs (h, w)
+
+    Moyenne et somme des carrés des écarts par l'algorithme de Welford, étendu aux
+    lots et à la fusion d'accumulateurs partiels (Chan et al.).
+    """
+
+    def __init__(self, shape, thresholds=EXCEEDANCE_THRESHOLDS):
+        self.count = 0
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.max = np.full(shape, -np.inf, dtype=np.float32)
+        self.thresholds = tuple(thresholds)
+        self.exceedances = np.zeros((len(self.thresholds),) + tuple(shape), dtype=np.int64)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * (count / total)
+        self.m2 += m2 + delta ** 2 * (self.count * count / total)
+        self.count = total
+
+    def update(self, batch):
+        """Ajoute un lot de réalisations (B, h, w)"""
+        batch = np.asarray(batch)
+        if len(batch) == 0:
+            return
+        batch_mean = batch.mean(axis=0, dtype=np.float64)
+        batch_m2 = ((batch - batch_mean) ** 2).sum(axis=0)
+        self._combine(len(batch), batch_mean, batch_m2)
+        np.maximum(self.max, batch.max(axis=0), out=self.max)
+        for i, threshold in enumerate(self.thresholds):
+            self.exceedances[i] += (batch > threshold).sum(axis=0)
+
+    def merge(self, other):
+        """Fusionne un accumulateur partiel (mêmes dimensions et seuils)"""
+        if other.count == 0:
+            return
+        self._combine(other.count, other.mean, other.m2)
+        np.maximum(self.max, other.max, out=self.max)
+        self.exceedances += other.exceedances
+
+    @property
+    def variance(self):
+        """Variance non biaisée par pixel"""
+        return self.m2 / max(self.count - 1, 1)
+
+    def exceedance_probability(self, threshold):
+        """Probabilité par pixel que le risque dépasse threshold"""
+        return self.exceedances[self.thresholds.index(threshold)] / max(self.count, 1)
+
+    def result(self):
+        """Cartes float32 : 'mean', 'max', 'variance', 'std' et 'exceedance' {seuil: probabilité}"""
+        variance = self.variance.astype(np.float32)
+        return {
+            'count': self.count,
+            'mean': self.mean.astype(np.float32),
+            'max': self.max,
+            'variance': variance,
+            'std': np.sqrt(variance),
+            'exceedance': {t: self.exceedance_probability(t).astype(np.float32) for t in self.thresholds},
+        }
+
+
+def _run_chunk(engine, n, mode, seed, batch_size, thresholds):
+    """Statistiques d'un bloc et dernier vent tiré (engine est une copie propre au calcul)"""
+    engine.rng = np.random.default_rng(seed)
+    stats = FieldStatistics((engine.h, engine.w), thresholds)
+    for batch in engine.realizations(n, mode, batch_size):
+        stats.update(batch)
+    return stats, (engine.wind_x, engine.wind_y)
+
+
+def _init_worker(engine):
+    _WORKER_STATE['engine'] = engine
+
+
+def _worker_chunk(*args):
+    return _run_chunk(_WORKER_STATE['engine'], *args)
+
+
+class MonteCarloRunner:
+    """
+    Exécute n réalisations du moteur et agrège leurs statistiques
+
+    Args:
+        engine: SimulationEngine (copié dans chaque processus, sans ses champs en cache)
+        n: Nombre de réalisations
+        mode: Danger simulé ("Tous", "Fumée", ...)
+        n_jobs: Nombre de processus (1 = calcul dans le processus courant, None = automatique:
+            un par cœur lorsqu'il y a au moins MC_PARALLEL_MIN_CHUNKS blocs)
+        seed: Graine racine (None = aléatoire)
+        thresholds: Seuils des cartes de probabilité de dépassement
+        chunk_size: Nombre de réalisations par bloc distribué (None = auto_chunk_size(n))
+        batch_size: Nombre de réalisations empilées par lot dans un bloc
+    """
+
+    def __init__(self, engine, n=20, mode="Tous", n_jobs=None, seed=None,
+                 thresholds=EXCEEDANCE_THRESHOLDS, chunk_size=None, batch_size=MC_BATCH_SIZE):
+        if n < 1:
+            raise ValueError("n doit être supérieur ou égal à 1")
+        self.engine = engine
+        self.n = n
+        self.mode = mode
+        if chunk_size is None:
+            chunk_size = auto_chunk_size(n)
+        n_chunks = -(-n // chunk_size)
+        if n_jobs is None:
+            n_jobs = min(os.cpu_count() or 1, n_chunks) if n_chunks >= MC_PARALLEL_MIN_CHUNKS else 1
+        self.n_jobs = n_jobs
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.thresholds = tuple(thresholds)
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+
+    def chunks(self):
+        """Blocs (taille, graine), reproductibles pour une graine racine donnée"""
+        sizes = [min(self.chunk_size, self.n - start) for start in range(0, self.n, self.chunk_size)]
+        return list(zip(sizes, self.seed_sequence.spawn(len(sizes))))
+
+    def run(self, progress_callback=None):
+        """
+        Calcule les statistiques des n réalisations
+
+        Args:
+            progress_callback: Appelée avec (réalisations terminées, total) après chaque bloc
+
+        Returns:
+            Dictionnaire de FieldStatistics.result() avec 'last_wind' (wind_x, wind_y), dernier
+            vent tiré par le dernier bloc (identique quel que soit le nombre de processus)
+        """
+        stats = FieldStatistics((self.engine.h, self.engine.w), self.thresholds)
+        chunks = self.chunks()
+        done = 0
+        last_wind = None
+
+        if self.n_jobs == 1 or len(chunks) <= 1:
+            # Copie : le moteur de l'appelant (lu par l'interface) n'est pas modifié par ce thread
+            engine = copy.copy(self.engine)
+            for size, seed in chunks:
+                chunk_stats, last_wind = _run_chunk(engine, size, self.mode, seed, self.batch_size, self.thresholds)
+                stats.merge(chunk_stats)
+                done += size
+                if progress_callback is not None:
+                    progress_callback(done, self.n)
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker,
+                                     initargs=(self.engine,)) as executor:
+                futures = {executor.submit(_worker_chunk, size, self.mode, seed, self.batch_size,
+                                           self.thresholds): i for i, (size, seed) in enumerate(chunks)}
+                # Fusion dans l'ordre des blocs (résultat identique quel que soit l'ordre d'achèvement);
+                # seuls les blocs terminés en avance sont gardés en attente
+                finished, next_chunk = {}, 0
+                for future in as_completed(futures):
+                    index = futures[future]
+                    finished[index] = future.result()
+                    done += chunks[index][0]
+                    while next_chunk in finished:
+                        chunk_stats, last_wind = finished.pop(next_chunk)
+                        stats.merge(chunk_stats)
+                        next_chunk += 1
+                    if progress_callback is not None:
+                        progress_callback(done, self.n)
+
+        result = stats.result()
+        result['last_wind'] = last_wind
+        return result
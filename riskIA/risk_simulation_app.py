@@ -4,15 +4,17 @@ import os
 os.environ['HF_HOME'] = os.path.join(os.path.dirname(__file__), 'models')
 os.environ['TRANSFORMERS_CACHE'] = os.path.join(os.path.dirname(__file__), 'models')
 import json
+import time
 import numpy as np
 import cv2
 from datetime import datetime
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QLabel, QLineEdit,
-    QFileDialog, QVBoxLayout, QHBoxLayout, QTabWidget, QComboBox, QMessageBox, QTextEdit, QCheckBox, QScrollArea
+    QFileDialog, QVBoxLayout, QHBoxLayout, QTabWidget, QComboBox, QMessageBox, QTextEdit, QCheckBox, QScrollArea,
+    QProgressBar, QDoubleSpinBox
 )
 from PyQt6.QtGui import QPixmap, QImage, QDesktopServices
-from PyQt6.QtCore import Qt, QUrl, QThread, pyqtSignal
+from PyQt6.QtCore import Qt, QUrl, QThread, QTimer, pyqtSignal
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 
 import matplotlib.pyplot as plt
@@ -22,7 +24,6 @@ from matplotlib.path import Path
 import matplotlib.patches as mpatches
 
 import plotly.graph_objects as go
-from scipy.ndimage import gaussian_filter
 
 # Pour de meilleurs dessins et rendus
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
@@ -61,17 +62,24 @@ except ImportError:
     MQTT_AVAILABLE = False
     print("Warning: paho-mqtt not available. IoT features disabled.")
 
+# Tampon d'ingestion IoT (mises à jour regroupées, alertes sur fenêtre glissante)
+from iot_ingestion import IoTIngestionBuffer, RefreshMetrics, apply_to_engine, format_log, IOT_REFRESH_HZ
+
+# Nombre maximal de lignes conservées dans le journal IoT affiché
+IOT_LOG_MAX_LINES = 2000
+
 # Thread pour MQTT
 class MQTTThread(QThread):
     data_received = pyqtSignal(str)  # Signal pour données reçues
     alert_triggered = pyqtSignal(str)  # Signal pour alertes
     connection_success = pyqtSignal()  # Signal pour connexion réussie
 
-    def __init__(self, broker, port, topic):
+    def __init__(self, broker, port, topic, buffer=None):
         super().__init__()
         self.broker = broker
         self.port = int(port)
         self.topic = topic
+        self.buffer = buffer  # IoTIngestionBuffer: messages rangés sans passer par la boucle Qt
         self.client = None
         self.running = True
 
@@ -99,6 +107,10 @@ class MQTTThread(QThread):
 
     def on_message(self, client, userdata, msg):
         data = msg.payload.decode()
+        if self.buffer is not None:
+            # Analyse et seuils pris en charge par le tampon, vidé par l'interface à fréquence fixe
+            self.buffer.push(data)
+            return
         self.data_received.emit(data)
         # Vérifier seuils pour alertes
         try:
@@ -285,132 +297,27 @@ def load_image_unicode(path):
 # ===== MOTEUR DE SIMULATION ===========
 # =====================================
 
-class SimulationEngine:
-    def __init__(self, base_map):
-        self.map = base_map.astype(np.float32) / 255.0
-        self.h, self.w = base_map.shape[:2]
-
-        # source centrale (modifiable plus tard)
-        self.src_x = self.w // 2
-        self.src_y = self.h // 2
-
-        # vent
-        self.wind_x = 1.0
-        self.wind_y = 0.3
-
-        # Paramètres IoT (valeurs par défaut)
-        self.temperature = 20.0  # °C
-        self.pressure = 1013.0  # hPa
-        self.vibration = 0.0    # amplitude
-        self.humidity = 50.0    # %
-
-    def simulate_smoke(self):
-        field = np.zeros((self.h, self.w), dtype=np.float32)
-        field[self.src_y, self.src_x] = 1.0
-
-        field = gaussian_filter(field, sigma=40)
-
-        # effet vent
-        field = np.roll(field, int(self.wind_x * 10), axis=1)
-        field = np.roll(field, int(self.wind_y * 10), axis=0)
-
-        return field / (field.max() + 1e-6)
-
-    def simulate_fire(self):
-        base = self.map.copy()
-        noise = np.random.rand(self.h, self.w) * 0.3
-        fire = gaussian_filter(base + noise, sigma=15)
-
-        # renforce autour de la source
-        fire[self.src_y, self.src_x] += 2.0
-        fire = gaussian_filter(fire, sigma=25)
-
-        # Influence de la température IoT
-        temp_factor = max(0.5, min(2.0, self.temperature / 20.0))  # Température normale = 20°C
-        fire *= temp_factor
-
-        return fire / (fire.max() + 1e-6)
-
-    def simulate_electricity(self):
-        # Simuler les risques électriques autour de sources électriques
-        sources = [(self.src_x, self.src_y), (self.src_x + 50, self.src_y), (self.src_x - 50, self.src_y)]
-        field = np.zeros((self.h, self.w), dtype=np.float32)
-
-        for sx, sy in sources:
-            y, x = np.ogrid[:self.h, :self.w]
-            dist = np.sqrt((x - sx)**2 + (y - sy)**2)
-            risk = np.exp(-dist / 30)  # Risque décroissant avec la distance
-            field += risk
-
-        field = gaussian_filter(field, sigma=10)
-        return field / (field.max() + 1e-6)
-
-    def simulate_flood(self):
-        # Simuler les inondations basées sur l'élévation (inversée de la map)
-        elevation = 1 - self.map  # Plus sombre = plus bas
-        # Propagation depuis les bords ou sources d'eau
-        flood_sources = [(0, 0), (0, self.w-1), (self.h-1, 0), (self.h-1, self.w-1)]  # Coins
-        field = np.zeros((self.h, self.w), dtype=np.float32)
-
-        for sx, sy in flood_sources:
-            y, x = np.ogrid[:self.h, :self.w]
-            dist = np.sqrt((x - sx)**2 + (y - sy)**2)
-            flood = np.exp(-dist / 100) * elevation  # Plus d'inondation dans les zones basses
-            field += flood
-
-        field = gaussian_filter(field, sigma=20)
-        return field / (field.max() + 1e-6)
-
-    def simulate_explosion(self):
-        y, x = np.ogrid[:self.h, :self.w]
-        dist = np.sqrt((x - self.src_x)**2 + (y - self.src_y)**2)
-        shock = np.exp(-dist / 60)
-
-        # atténuation par le terrain
-        shock *= (0.5 + 0.5 * self.map)
-
-        # Influence de la pression IoT (pression basse = explosion plus violente)
-        pressure_factor = max(0.5, min(2.0, 1013.0 / self.pressure))  # Pression normale = 1013 hPa
-        shock *= pressure_factor
-
-        return shock / (shock.max() + 1e-6)
-
-    def simulate_all(self, mode="Tous"):
-        if mode == "Fumée":
-            return self.simulate_smoke()
-        elif mode == "Feu":
-            return self.simulate_fire()
-        elif mode == "Électricité":
-            return self.simulate_electricity()
-        elif mode == "Inondation":
-            return self.simulate_flood()
-        elif mode == "Explosion":
-            return self.simulate_explosion()
-        else:
-            s = self.simulate_smoke()
-            f = self.simulate_fire()
-            e = self.simulate_electricity()
-            fl = self.simulate_flood()
-            ex = self.simulate_explosion()
-            combo = 0.2 * s + 0.2 * f + 0.2 * e + 0.2 * fl + 0.2 * ex
-            return combo / (combo.max() + 1e-6)
-
-    def monte_carlo(self, n=20, mode="Tous"):
-        results = []
+# Moteur vectorisé avec champs statiques en cache (voir simulation_engine.py)
+from simulation_engine import SimulationEngine
+from monte_carlo import MonteCarloRunner
 
-        for i in range(n):
-            # petite variation du vent
-            self.wind_x = np.random.uniform(-1, 1)
-            self.wind_y = np.random.uniform(-1, 1)
+# Nombre de réalisations Monte Carlo par lancement
+MC_REALIZATIONS = 20
 
-            sim = self.simulate_all(mode)
-            results.append(sim)
+class MonteCarloThread(QThread):
+    progress = pyqtSignal(int, int)  # Réalisations terminées, total
+    result_ready = pyqtSignal(object)  # Statistiques (moyenne, max, variance, dépassements)
+    error = pyqtSignal(str)
 
-        stack = np.stack(results, axis=0)
-        mean = np.mean(stack, axis=0)
-        worst = np.max(stack, axis=0)
+    def __init__(self, sim_engine, n, mode):
+        super().__init__()
+        self.runner = MonteCarloRunner(sim_engine, n, mode)
 
-        return mean, worst
+    def run(self):
+        try:
+            self.result_ready.emit(self.runner.run(progress_callback=self.progress.emit))
+        except Exception as e:
+            self.error.emit(str(e))
 
 # =====================================
 # ===== WIDGET HEATMAP ================
@@ -463,6 +370,12 @@ class RiskSimulator(QMainWindow):
         self.image_path = None
         self.sim_engine = None
         self.mqtt_thread = None
+        self.mc_thread = None
+        self.mc_result = None  # Statistiques du dernier Monte Carlo
+        self.iot_buffer = None
+        self.iot_metrics = RefreshMetrics()
+        self.iot_timer = QTimer(self)
+        self.iot_timer.timeout.connect(self.refresh_iot)
         self.clip_results = {}  # Pour stocker les résultats de CLIP
         self.ai_analysis_results = {}  # Pour stocker les résultats d'analyse IA
 
@@ -507,8 +420,11 @@ class RiskSimulator(QMainWindow):
         btn_reset = QPushButton("🔄 Réinitialiser")
         btn_reset.clicked.connect(self.reset_app)
 
-        btn_sim = QPushButton("🧪 Lancer 20 simulations")
-        btn_sim.clicked.connect(self.run_simulations)
+        self.btn_sim = QPushButton(f"🧪 Lancer {MC_REALIZATIONS} simulations")
+        self.btn_sim.clicked.connect(self.run_simulations)
+
+        self.mc_progress = QProgressBar()
+        self.mc_progress.setVisible(False)
 
         self.combo = QComboBox()
         self.combo.addItems(["Tous", "Fumée", "Feu", "Électricité", "Inondation", "Explosion"])
@@ -523,7 +439,8 @@ class RiskSimulator(QMainWindow):
         top_layout.addWidget(self.installation_name_input)
         top_layout.addWidget(btn_load)
         top_layout.addWidget(btn_reset)
-        top_layout.addWidget(btn_sim)
+        top_layout.addWidget(self.btn_sim)
+        top_layout.addWidget(self.mc_progress)
         top_layout.addWidget(QLabel("Mode:"))
         top_layout.addWidget(self.combo)
 
@@ -883,6 +800,17 @@ class RiskSimulator(QMainWindow):
         topic_layout.addWidget(self.iot_topic)
         conn_layout.addLayout(topic_layout)
 
+        # Fréquence de rafraîchissement de l'affichage et des paramètres de simulation
+        refresh_layout = QHBoxLayout()
+        refresh_layout.addWidget(QLabel("Rafraîchissement (Hz):"))
+        self.iot_refresh_rate = QDoubleSpinBox()
+        self.iot_refresh_rate.setRange(0.5, 30.0)
+        self.iot_refresh_rate.setSingleStep(0.5)
+        self.iot_refresh_rate.setValue(IOT_REFRESH_HZ)
+        self.iot_refresh_rate.valueChanged.connect(self.set_iot_refresh_rate)
+        refresh_layout.addWidget(self.iot_refresh_rate)
+        conn_layout.addLayout(refresh_layout)
+
         iot_layout.addLayout(conn_layout)
 
         # Boutons
@@ -903,6 +831,12 @@ class RiskSimulator(QMainWindow):
         self.iot_status.setStyleSheet("color: red; font-weight: bold;")
         iot_layout.addWidget(self.iot_status)
 
+        # Mesures du chemin d'ingestion (latence, pertes, fréquence de rafraîchissement)
+        self.iot_metrics_display = QLabel("⏱️ Latence et pertes: en attente de données")
+        self.iot_metrics_display.setStyleSheet("font-size: 11px; color: #555;")
+        self.iot_metrics_display.setWordWrap(True)
+        iot_layout.addWidget(self.iot_metrics_display)
+
         # Paramètres actuels IoT
         params_title = QLabel("📈 PARAMÈTRES IoT ACTUELS (utilisés dans les simulations)")
         params_title.setStyleSheet("font-weight: bold; color: #4682B4;")
@@ -925,6 +859,7 @@ class RiskSimulator(QMainWindow):
         self.iot_data_display = QTextEdit()
         self.iot_data_display.setMaximumHeight(200)
         self.iot_data_display.setPlaceholderText("Données des capteurs apparaîtront ici...")
+        self.iot_data_display.document().setMaximumBlockCount(IOT_LOG_MAX_LINES)
         iot_layout.addWidget(self.iot_data_display)
 
         # Alertes
@@ -1059,11 +994,14 @@ class RiskSimulator(QMainWindow):
             QMessageBox.warning(self, "Erreur", "Remplissez tous les champs MQTT.")
             return
 
-        self.mqtt_thread = MQTTThread(broker, port, topic)
+        self.iot_buffer = IoTIngestionBuffer()
+        self.iot_metrics = RefreshMetrics()
+        self.mqtt_thread = MQTTThread(broker, port, topic, buffer=self.iot_buffer)
         self.mqtt_thread.data_received.connect(self.on_iot_data)
         self.mqtt_thread.alert_triggered.connect(self.on_iot_alert)
         self.mqtt_thread.connection_success.connect(self.on_iot_connected)
         self.mqtt_thread.start()
+        self.set_iot_refresh_rate(self.iot_refresh_rate.value())
 
         self.iot_status.setText("🟡 Connexion en cours...")
         self.iot_status.setStyleSheet("color: orange; font-weight: bold;")
@@ -1074,61 +1012,67 @@ class RiskSimulator(QMainWindow):
         if self.mqtt_thread:
             self.mqtt_thread.stop()
             self.mqtt_thread = None
+        # Dernier rafraîchissement pour les messages encore en attente
+        self.refresh_iot()
+        self.iot_timer.stop()
+        # Rapport de mesure de la session (comparable à celui de iot_replay.py)
+        print("📊 Mesures IoT:", json.dumps(self.iot_metrics.report(), ensure_ascii=False))
         self.iot_status.setText("🔴 Déconnecté")
         self.iot_status.setStyleSheet("color: red; font-weight: bold;")
         self.connect_iot_btn.setEnabled(True)
         self.disconnect_iot_btn.setEnabled(False)
 
     def on_iot_data(self, data):
-        self.iot_data_display.append(f"[{datetime.now().strftime('%H:%M:%S')}] {data}")
-        
-        # Analyser et intégrer les données dans les simulations
-        try:
-            # Essayer de parser comme JSON
-            if data.startswith('{') and data.endswith('}'):
-                import json
-                sensor_data = json.loads(data)
-                
-                # Mettre à jour les paramètres du moteur de simulation
-                if self.sim_engine:
-                    if 'temperature' in sensor_data:
-                        self.sim_engine.temperature = float(sensor_data['temperature'])
-                        self.iot_data_display.append(f"  → Température mise à jour: {self.sim_engine.temperature}°C")
-                    
-                    if 'pressure' in sensor_data:
-                        self.sim_engine.pressure = float(sensor_data['pressure'])
-                        self.iot_data_display.append(f"  → Pression mise à jour: {self.sim_engine.pressure} hPa")
-                    
-                    if 'vibration' in sensor_data:
-                        self.sim_engine.vibration = float(sensor_data['vibration'])
-                        self.iot_data_display.append(f"  → Vibration mise à jour: {self.sim_engine.vibration}")
-                    
-                    if 'humidity' in sensor_data:
-                        self.sim_engine.humidity = float(sensor_data['humidity'])
-                        self.iot_data_display.append(f"  → Humidité mise à jour: {self.sim_engine.humidity}%")
-                    
-                    # Mettre à jour l'affichage des paramètres
-                    self.update_iot_params_display()
-                    
-                    # Vérifier seuils pour alertes
-                    if self.sim_engine.temperature > 35:
-                        self.on_iot_alert(f"Température élevée détectée: {self.sim_engine.temperature}°C - Risque d'incendie augmenté")
-                    
-                    if self.sim_engine.pressure < 1000:
-                        self.on_iot_alert(f"Pression basse détectée: {self.sim_engine.pressure} hPa - Risque d'explosion augmenté")
-                    
-                    if self.sim_engine.vibration > 1.5:
-                        self.on_iot_alert(f"Vibration élevée détectée: {self.sim_engine.vibration} - Risque structurel")
-            
-            else:
-                # Données texte simples
-                self.iot_data_display.append("  → Données texte reçues (pas de mise à jour automatique)")
-                
-        except Exception as e:
-            self.iot_data_display.append(f"  → Erreur d'analyse des données: {e}")
-        
-        # Ici, on pourrait analyser les données et mettre à jour les simulations
-        # Par exemple, ajuster la température dans sim_engine
+        # Message reçu hors du tampon (signal data_received): même chemin d'ingestion
+        if self.iot_buffer is None:
+            self.iot_buffer = IoTIngestionBuffer()
+            self.iot_metrics = RefreshMetrics()
+        self.iot_buffer.push(data)
+        if not self.iot_timer.isActive():
+            self.set_iot_refresh_rate(self.iot_refresh_rate.value())
+
+    def set_iot_refresh_rate(self, hz):
+        self.iot_timer.start(max(1, int(1000 / hz)))
+
+    def refresh_iot(self):
+        """Applique en une fois les messages IoT arrivés depuis le dernier rafraîchissement"""
+        if self.iot_buffer is None:
+            return
+        tick = time.monotonic()
+        update = self.iot_buffer.drain()
+        if update.new_messages == 0 and not update.alerts:
+            return
+
+        # Mettre à jour les paramètres du moteur de simulation avec les dernières mesures
+        changes = apply_to_engine(self.sim_engine, update)
+        if changes:
+            self.update_iot_params_display()
+
+        # Journal rendu par lot
+        log_start = time.monotonic()
+        log_text = format_log(update, changes)
+        if log_text:
+            self.iot_data_display.append(log_text)
+        log_seconds = time.monotonic() - log_start
+
+        # Latence, pertes et fréquence mesurées avant les alertes (boîtes de dialogue bloquantes)
+        self.iot_metrics.record(update, tick, log_seconds)
+        self.update_iot_metrics_display()
+
+        # Seuils évalués sur les agrégats de la fenêtre glissante
+        for alert in update.alerts:
+            self.on_iot_alert(alert)
+
+    def update_iot_metrics_display(self):
+        report = self.iot_metrics.report()
+        if report['latency_ms_p50'] is None:
+            return
+        self.iot_metrics_display.setText(
+            f"⏱️ Latence p50/p95/max: {report['latency_ms_p50']:.0f} / {report['latency_ms_p95']:.0f} / "
+            f"{report['latency_ms_max']:.0f} ms · Rafraîchissements: {report['ui_update_rate_hz']:.1f} Hz "
+            f"({report['update_processing_ms_mean']:.1f} ms) · Mesures perdues: {report['dropped_samples']} · "
+            f"Lignes masquées: {report['dropped_log_lines']}"
+        )
 
     def on_iot_connected(self):
         self.iot_status.setText("🟢 Connecté")
@@ -1153,11 +1097,36 @@ class RiskSimulator(QMainWindow):
         if self.sim_engine is None:
             QMessageBox.warning(self, "Info", "Charge d'abord une image.")
             return
+        if self.mc_thread is not None and self.mc_thread.isRunning():
+            return
 
         logging.info("Lancement des simulations.")
         mode = self.combo.currentText()
 
-        mean, worst = self.sim_engine.monte_carlo(20, mode)
+        # Monte Carlo hors du thread de l'interface (pool de processus si la charge le justifie)
+        self.btn_sim.setEnabled(False)
+        self.mc_progress.setRange(0, MC_REALIZATIONS)
+        self.mc_progress.setValue(0)
+        self.mc_progress.setVisible(True)
+        self.mc_thread = MonteCarloThread(self.sim_engine, MC_REALIZATIONS, mode)
+        self.mc_thread.progress.connect(self.on_simulation_progress)
+        self.mc_thread.result_ready.connect(self.on_simulations_done)
+        self.mc_thread.error.connect(self.on_simulations_error)
+        self.mc_thread.start()
+
+    def on_simulation_progress(self, done, total):
+        self.mc_progress.setRange(0, total)
+        self.mc_progress.setValue(done)
+
+    def on_simulations_done(self, result):
+        self.mc_result = result
+        if self.sim_engine is not None and result.get('last_wind') is not None:
+            # Le moteur garde le dernier vent tiré (appliqué ici, sur le thread de l'interface)
+            self.sim_engine.wind_x, self.sim_engine.wind_y = result['last_wind']
+        self.btn_sim.setEnabled(True)
+        self.mc_progress.setVisible(False)
+        if self.sim_engine is None:
+            return
 
         self.heatmap_widget.show_heatmaps(self.sim_engine)
 
@@ -1165,11 +1134,17 @@ class RiskSimulator(QMainWindow):
 
         self.draw_zone()
 
-        self.generate_3d(worst)
+        self.generate_3d(result['max'])
 
         self.tabs.setCurrentIndex(1)
         logging.info("Simulations terminées.")
 
+    def on_simulations_error(self, message):
+        self.btn_sim.setEnabled(True)
+        self.mc_progress.setVisible(False)
+        logging.error(f"Erreur Monte Carlo: {message}")
+        QMessageBox.critical(self, "Erreur", f"Échec des simulations : {message}")
+
     # ===============================
     def generate_3d(self, data):
         if self.sim_engine is None:
@@ -0,0 +1,281 @@
+"""
+Moteur de simulation des dangers (fumée, feu, électricité, inondation, explosion)
+
+Les champs qui ne dépendent que de la carte et des sources (cartes de distance,
+élévation, champs électrique et d'inondation, noyau de fumée) sont calculés une
+seule fois et mis en cache. Les flous gaussiens de grand rayon sont calculés à un
+niveau réduit de pyramide puis suréchantillonnés. Le Monte Carlo empile les
+variations par lots en float32 sans recalculer les termes invariants.
+"""
+
+import numpy as np
+from scipy.ndimage import gaussian_filter, gaussian_filter1d
+
+HAZARD_MODES = ("Fumée", "Feu", "Électricité", "Inondation", "Explosion")
+
+# Sigma minimal (en pixels) conservé au niveau réduit de la pyramide
+PYRAMID_MIN_SIGMA = 4.0
+
+# Taille minimale (en pixels) du plus petit côté au niveau réduit
+PYRAMID_MIN_SIZE = 16
+
+# Nombre de réalisations Monte Carlo empilées par lot
+MC_BATCH_SIZE = 8
+
+
+def normalize_field(field):
+    """Normalise chaque champ (dernières dimensions) par son maximum"""
+    return field / (field.max(axis=(-2, -1), keepdims=True) + 1e-6)
+
+
+def pyramid_factor(shape, sigma):
+    """Facteur de réduction (puissance de 2) pour flouter avec sigma sans descendre sous PYRAMID_MIN_SIGMA"""
+    factor = 1
+    while sigma / (factor * 2) >= PYRAMID_MIN_SIGMA and min(shape[-2:]) // (factor * 2) >= PYRAMID_MIN_SIZE:
+        factor *= 2
+    return factor
+
+
+def downsample(field, factor):
+    """Réduction par moyenne de blocs factor x factor (bords répliqués)"""
+    if factor == 1:
+        return field
+    h, w = field.shape[-2:]
+    pad_h, pad_w = -h % factor, -w % factor
+    if pad_h or pad_w:
+        pad = [(0, 0)] * (field.ndim - 2) + [(0, pad_h), (0, pad_w)]
+        field = np.pad(field, pad, mode='edge')
+    blocks = field.reshape(field.shape[:-2] + (field.shape[-2] // factor, factor, field.shape[-1] // factor, factor))
+    return blocks.mean(axis=(-3, -1), dtype=np.float32)
+
+
+def _interpolate_axis(field, size, factor, axis):
+    coords = np.clip((np.arange(size) + 0.5) / factor - 0.5, 0, field.shape[axis] - 1)
+    lower = np.floor(coords).astype(np.int64)
+    upper = np.minimum(lower + 1, field.shape[axis] - 1)
+    weight = (coords - lower).astype(np.float32)
+    shape = [1] * field.ndim
+    shape[axis] = size
+    weight = weight.reshape(shape)
+    return np.take(field, lower, axis=axis) * (1 - weight) + np.take(field, upper, axis=axis) * weight
+
+
+def upsample(field, shape, factor):
+    """Suréchantillonnage bilinéaire d'un niveau réduit vers la taille shape (h, w)"""
+    if factor == 1:
+        return field
+    field = _interpolate_axis(field, shape[0], factor, field.ndim - 2)
+    return _interpolate_axis(field, shape[1], factor, field.ndim - 1)
+
+
+def pyramid_blur(field, sigma):
+    """Flou gaussien de field (h, w) ou (B, h, w) calculé au niveau réduit de la pyramide"""
+    field = np.asarray(field, dtype=np.float32)
+    factor = pyramid_factor(field.shape, sigma)
+    small = downsample(field, factor)
+    sigmas = (0,) * (field.ndim - 2) + (sigma / factor, sigma / factor)
+    return upsample(gaussian_filter(small, sigma=sigmas), field.shape[-2:], factor)
+
+
+class SimulationEngine:
+    def __init__(self, base_map, seed=None):
+        self.map = base_map.astype(np.float32) / 255.0
+        self.h, self.w = base_map.shape[:2]
+        self.rng = np.random.default_rng(seed)
+
+        # source centrale (modifiable plus tard)
+        self.src_x = self.w // 2
+        self.src_y = self.h // 2
+
+        # vent
+        self.wind_x = 1.0
+        self.wind_y = 0.3
+
+        # Paramètres IoT (valeurs par défaut)
+        self.temperature = 20.0  # °C
+        self.pressure = 1013.0  # hPa
+        self.vibration = 0.0    # amplitude
+        self.humidity = 50.0    # %
+
+        # Champs statiques (dépendent seulement de la carte et des sources)
+        self._cache = {}
+
+    def clear_cache(self):
+        """Vide les champs statiques (à appeler si la carte est modifiée)"""
+        self._cache.clear()
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def distance_map(self, sx, sy):
+        """Distance euclidienne de chaque pixel à la source (sx, sy), en cache"""
+        def compute():
+            y, x = np.ogrid[:self.h, :self.w]
+            return np.sqrt((x - sx) ** 2 + (y - sy) ** 2).astype(np.float32)
+        return self._cached(('distance', sx, sy), compute)
+
+    def _impulse_blur(self, sx, sy, sigma):
+        """Flou gaussien d'une impulsion unitaire placée en (sx, sy) (noyau séparable, exact)"""
+        def compute():
+            column = np.zeros(self.h, dtype=np.float32)
+            row = np.zeros(self.w, dtype=np.float32)
+            column[sy] = row[sx] = 1.0
+            return np.outer(gaussian_filter1d(column, sigma), gaussian_filter1d(row, sigma))
+        return self._cached(('impulse', sx, sy, sigma), compute)
+
+    # ----- Champs statiques -----
+
+    def _smoke_kernel(self):
+        return self._cached(('smoke', self.src_x, self.src_y),
+                            lambda: normalize_field(self._impulse_blur(self.src_x, self.src_y, 40)))
+
+    def _fire_base(self):
+        # Partie déterministe du feu : flou(flou(carte, 15) + 2 x impulsion, 25) = flou²(carte) + 2 x flou(impulsion)
+        def compute():
+            terrain = pyramid_blur(pyramid_blur(self.map, 15), 25)
+            return terrain + 2.0 * self._impulse_blur(self.src_x, self.src_y, 25)
+        return self._cached(('fire', self.src_x, self.src_y), compute)
+
+    def _electricity_field(self):
+        def compute():
+            sources = [(self.src_x, self.src_y), (self.src_x + 50, self.src_y), (self.src_x - 50, self.src_y)]
+            field = np.zeros((self.h, self.w), dtype=np.float32)
+            for sx, sy in sources:
+                field += np.exp(-self.distance_map(sx, sy) / 30)  # Risque décroissant avec la distance
+            return normalize_field(pyramid_blur(field, 10))
+        return self._cached(('electricity', self.src_x, self.src_y), compute)
+
+    def _flood_field(self):
+        def compute():
+            elevation = 1 - self.map  # Plus sombre = plus bas
+            # Propagation depuis les coins
+            flood_sources = [(0, 0), (0, self.w-1), (self.h-1, 0), (self.h-1, self.w-1)]
+            field = np.zeros((self.h, self.w), dtype=np.float32)
+            for sx, sy in flood_sources:
+                field += np.exp(-self.distance_map(sx, sy) / 100) * elevation  # Plus d'inondation dans les zones basses
+            return normalize_field(pyramid_blur(field, 20))
+        return self._cached('flood', compute)
+
+    def _explosion_shock(self):
+        # Onde de choc atténuée par le terrain
+        return self._cached(('explosion', self.src_x, self.src_y),
+                            lambda: np.exp(-self.distance_map(self.src_x, self.src_y) / 60) * (0.5 + 0.5 * self.map))
+
+    # ----- Champs dépendant des paramètres (lots) -----
+
+    def _smoke_batch(self, wind_x, wind_y):
+        kernel = self._smoke_kernel()
+        # effet vent
+        return np.stack([np.roll(np.roll(kernel, int(wx * 10), axis=1), int(wy * 10), axis=0)
+                         for wx, wy in zip(wind_x, wind_y)])
+
+    def _fire_batch(self, batch_size):
+        # Bruit uniforme [0, 0.3) flouté (15 puis 25 = un flou de sigma combiné), tiré directement au
+        # niveau réduit avec la moyenne et la variance d'une moyenne de blocs du bruit pleine résolution
+        sigma = np.hypot(15, 25)
+        factor = pyramid_factor((self.h, self.w), sigma)
+        small_shape = (batch_size, -(-self.h // factor), -(-self.w // factor))
+        noise = 0.15 + (self.rng.random(small_shape, dtype=np.float32) - 0.5) * (0.3 / factor)
+        noise = gaussian_filter(noise, sigma=(0, sigma / factor, sigma / factor))
+        fire = self._fire_base() + upsample(noise, (self.h, self.w), factor)
+
+        # Influence de la température IoT
+        temp_factor = max(0.5, min(2.0, self.temperature / 20.0))  # Température normale = 20°C
+        return normalize_field(fire * temp_factor)
+
+    def _explosion(self):
+        # Influence de la pression IoT (pression basse = explosion plus violente)
+        pressure_factor = max(0.5, min(2.0, 1013.0 / self.pressure))  # Pression normale = 1013 hPa
+        return normalize_field(self._explosion_shock() * pressure_factor)
+
+    def simulate_batch(self, wind_x, wind_y, mode="Tous"):
+        """
+        Réalisations empilées (B, h, w) en float32 pour des vents (wind_x[i], wind_y[i])
+
+        Les termes invariants (électricité, inondation, explosion, partie déterministe
+        du feu) sont calculés une seule fois pour tout le lot.
+        """
+        wind_x = np.atleast_1d(wind_x)
+        wind_y = np.atleast_1d(wind_y)
+        batch_size = len(wind_x)
+
+        if mode == "Fumée":
+            return self._smoke_batch(wind_x, wind_y)
+        elif mode == "Feu":
+            return self._fire_batch(batch_size)
+        elif mode == "Électricité":
+            return np.repeat(self._electricity_field()[None], batch_size, axis=0)
+        elif mode == "Inondation":
+            return np.repeat(self._flood_field()[None], batch_size, axis=0)
+        elif mode == "Explosion":
+            return np.repeat(self._explosion()[None], batch_size, axis=0)
+        else:
+            static = self._electricity_field() + self._flood_field() + self._explosion()
+            combo = 0.2 * (self._smoke_batch(wind_x, wind_y) + self._fire_batch(batch_size) + static)
+            return normalize_field(combo)
+
+    # ----- API par danger (vent courant) -----
+
+    def simulate_smoke(self):
+        return self.simulate_batch(self.wind_x, self.wind_y, "Fumée")[0]
+
+    def simulate_fire(self):
+        return self.simulate_batch(self.wind_x, self.wind_y, "Feu")[0]
+
+    def simulate_electricity(self):
+        return self._electricity_field().copy()
+
+    def simulate_flood(self):
+        return self._flood_field().copy()
+
+    def simulate_explosion(self):
+        return self._explosion()
+
+    def simulate_all(self, mode="Tous"):
+        return self.simulate_batch(self.wind_x, self.wind_y, mode)[0]
+
+    def realizations(self, n, mode="Tous", batch_size=MC_BATCH_SIZE):
+        """
+        Génère n réalisations avec variation aléatoire du vent, par lots (B, h, w) en float32
+
+        Le moteur garde ensuite le dernier vent tiré, comme la boucle d'origine.
+        """
+        if n < 1:
+            raise ValueError("n doit être supérieur ou égal à 1")
+
+        # petite variation du vent
+        winds = self.rng.uniform(-1, 1, size=(n, 2))
+        for start in range(0, n, batch_size):
+            yield self.simulate_batch(winds[start:start + batch_size, 0], winds[start:start + batch_size, 1], mode)
+        self.wind_x, self.wind_y = float(winds[-1, 0]), float(winds[-1, 1])
+
+    def monte_carlo(self, n=20, mode="Tous", batch_size=MC_BATCH_SIZE):
+        """
+        Moyenne et pire cas de n réalisations (seuls la somme et le maximum courants sont conservés)
+
+        Voir monte_carlo.MonteCarloRunner pour le calcul parallèle avec variance et
+        probabilités de dépassement.
+        """
+        total = np.zeros((self.h, self.w), dtype=np.float64)
+        worst = None
+        for batch in self.realizations(n, mode, batch_size):
+            total += batch.sum(axis=0, dtype=np.float64)
+            batch_max = batch.max(axis=0)
+            worst = batch_max if worst is None else np.maximum(worst, batch_max)
+        return (total / n).astype(np.float32), worst
+
+    def __copy__(self):
+        # Copie pour un calcul hors du thread de l'interface : générateur, vent et dictionnaire
+        # de cache propres (les champs déjà calculés, jamais modifiés, restent partagés)
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone._cache = dict(self._cache)
+        return clone
+
+    def __getstate__(self):
+        # Les champs en cache sont recalculés par le processus qui reçoit le moteur
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Test de non-régression de l'évaluation du risque de liquéfaction (CPT)
+
+Deux sondages de sable saturé (nappe à 2 m, amax = 0.25 g) jusqu'à 15 m :
+un sable dense (qc = 20 MPa) doit être classé FAIBLE, un sable lâche (qc = 3 MPa) ÉLEVÉ.
+"""
+import numpy as np
+import pandas as pd
+
+from tools.analysis_calculator import GeotechnicalAnalysisCalculator
+
+
+def sand_profile(qc):
+    """Sondage de sable homogène, un point tous les 0.5 m"""
+    depth = np.arange(0.5, 15.0, 0.5)
+    return pd.DataFrame({'Depth': depth, 'qc': qc, 'Soil_Class': 'Sand'})
+
+
+def risk_level(cpt_data):
+    results = GeotechnicalAnalysisCalculator()._liquefaction_analysis(cpt_data)
+    print("   " + " | ".join(results["calculations"]))
+    return results["recommendations"][0].strip("*").split(": ")[1]
+
+
+def test_liquefaction_risk_levels():
+    print("🚀 Test du risque de liquéfaction")
+    print("=" * 60)
+
+    print("📊 Sable dense (qc = 20 MPa)")
+    dense = risk_level(sand_profile(20.0))
+    print("📊 Sable lâche saturé (qc = 3 MPa)")
+    loose = risk_level(sand_profile(3.0))
+
+    assert dense == "FAIBLE", f"Sable dense classé {dense}"
+    assert loose == "ÉLEVÉ", f"Sable lâche classé {loose}"
+    print("✅ Test réussi")
+
+
+if __name__ == "__main__":
+    test_liquefaction_risk_levels()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test de la classification des sols d'un jeu fusionné multi-sondages
+
+Trois sondages synthétiques (argile, sable, alternance) sont fusionnés comme par
+core.cpt_fusion.fuse_cpt_files puis classifiés en une passe par classify_fused_soundings :
+le résultat doit être identique à la classification de chaque sondage séparément.
+"""
+import numpy as np
+import pandas as pd
+
+from analysis.geotechnical_analysis import classify_fused_soundings, estimate_soil_type
+from core.cpt_fusion import concat_soundings
+
+SOIL_COLUMNS = ['Soil_Type_Detailed', 'Soil_Class', 'Soil_Color', 'Soil_Type', 'Ic', 'Fr']
+
+
+def create_sounding(rng, qc_range, fs_range, n_points=500):
+    depth = np.linspace(0.1, 20.0, n_points)
+    return pd.DataFrame({
+        'Depth': depth,
+        'qc': rng.uniform(*qc_range, n_points),
+        'fs': rng.uniform(*fs_range, n_points),  # MPa, comme qc
+    })
+
+
+def test_classify_fused_soundings():
+    print("🚀 Test de classification d'un jeu fusionné")
+    print("=" * 60)
+    rng = np.random.default_rng(0)
+    frames = [
+        create_sounding(rng, (0.3, 1.5), (0.02, 0.08)),  # Argile
+        create_sounding(rng, (10, 30), (0.02, 0.15)),    # Sable
+        create_sounding(rng, (0.5, 25), (0.005, 0.2)),   # Alternance
+    ]
+    names = ['CPT1.txt', 'CPT2.txt', 'CPT3.txt']
+    fused = concat_soundings(frames, names)
+
+    classified = classify_fused_soundings(fused)
+    print(f"📊 {len(classified)} points, {classified['Sondage'].nunique()} sondages")
+    print(classified.groupby('Sondage', observed=True)['Soil_Type'].agg(lambda s: s.value_counts().index[0]))
+    assert classified['Soil_Type'].nunique() > 1
+
+    expected = pd.concat([estimate_soil_type(frame) for frame in frames], ignore_index=True)
+    for col in SOIL_COLUMNS:
+        pd.testing.assert_series_equal(classified[col].astype(object), expected[col].astype(object),
+                                       check_names=False)
+    assert isinstance(classified['Sondage'].dtype, pd.CategoricalDtype)
+
+    # Liste de sondages (sans colonne de sondage) et jeux sans mesures exploitables
+    from_list = classify_fused_soundings(frames)
+    pd.testing.assert_series_equal(from_list['Soil_Type'].astype(object), expected['Soil_Type'].astype(object))
+    assert classify_fused_soundings([]).empty
+    assert 'Soil_Type' not in classify_fused_soundings(fused[['Depth', 'qc', 'Sondage']]).columns
+    print("✅ Test réussi")
+
+
+if __name__ == "__main__":
+    test_classify_fused_soundings()
@@ -5,6 +5,7 @@ import re
 from scipy import stats
 from scipy.optimize import curve_fit
 import math
+from analysis.liquefaction import ensure_liquefaction_columns
 
 class GeotechnicalAnalysisCalculator:
     """
@@ -274,11 +275,55 @@ class GeotechnicalAnalysisCalculator:
             "calculations": [],
             "explanations": [],
             "proofs": [],
+            "recommendations": [],
             "sources": [self.references["robertson"]],
             "confidence_level": 0.70
         }
 
-        if 'qc' in cpt_data.columns:
+        if 'qc' in cpt_data.columns and 'Depth' in cpt_data.columns:
+            # Profil complet par profondeur (réutilisé s'il a déjà été calculé par l'analyse)
+            df_liq = ensure_liquefaction_columns(cpt_data)
+            fs = df_liq['FS_Liquefaction'].dropna()
+            liquefiable_ratio = float((fs < 1.0).mean()) if len(fs) > 0 else 0.0
+            fs_min = fs.min() if len(fs) > 0 else float('nan')
+
+            if liquefiable_ratio > 0.2 or fs_min < 0.8:
+                risk_level = "ÉLEVÉ"
+                risk_desc = "Risque de liquéfaction significatif"
+            elif liquefiable_ratio > 0.0 or fs_min < 1.2:
+                risk_level = "MOYEN"
+                risk_desc = "Risque de liquéfaction modéré"
+            else:
+                risk_level = "FAIBLE"
+                risk_desc = "Risque de liquéfaction faible"
+
+            results["calculations"].extend([
+                f"qc minimum = {cpt_data['qc'].min():.1f} MPa",
+                f"qc1N moyen = {df_liq['qc1N'].mean():.1f}",
+                f"CRR moyen = {df_liq['CRR'].mean():.3f}",
+                f"CSR moyen = {df_liq['CSR'].mean():.3f}",
+                f"FS minimum = {fs_min:.2f}",
+                f"Profondeurs avec FS < 1: {liquefiable_ratio:.0%}"
+            ])
+
+            results["explanations"].append(
+                f"Évaluation du risque de liquéfaction selon Robertson et Wride (1998)"
+            )
+
+            results["proofs"].extend([
+                "σ'v calculée par intégration des poids volumiques avec nappe phréatique",
+                "CRR selon Idriss & Boulanger (2008), CSR selon Seed & Idriss (1971)",
+                f"Niveau de risque: {risk_level} basé sur FS minimum = {fs_min:.2f}"
+            ])
+
+            results["recommendations"].extend([
+                f"**Niveau de risque: {risk_level}**",
+                f"{risk_desc}",
+                "Consulter normes sismiques locales pour évaluation complète",
+                "Réaliser analyses dynamiques si nécessaire"
+            ])
+
+        elif 'qc' in cpt_data.columns:
             qc_min = cpt_data['qc'].min()
             qc_mean = cpt_data['qc'].mean()
 
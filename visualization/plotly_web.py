@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Rendu Plotly hors-ligne dans les QWebEngineView
+La page charge une seule fois plotly.js depuis la copie locale du paquet plotly,
+puis chaque mise à jour pousse uniquement la figure (JSON) via Plotly.react
+"""
+
+import os
+import json
+import plotly
+from PySide6.QtCore import QObject, QUrl
+
+# Copie de plotly.js livrée avec le paquet Python plotly (aucun accès réseau)
+PLOTLY_JS_DIR = os.path.join(os.path.dirname(plotly.__file__), 'package_data')
+PLOTLY_JS_PATH = os.path.join(PLOTLY_JS_DIR, 'plotly.min.js')
+
+_SHELL_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="plotly.min.js"></script>
+<style>
+    html, body { margin: 0; height: 100%; }
+    #plot { width: 100%; height: 100%; }
+    #message { display: none; padding: 8px; font-family: sans-serif; }
+</style>
+</head>
+<body>
+<div id="message"></div>
+<div id="plot"></div>
+<script>
+    function renderFigure(figure, config) {
+        document.getElementById('message').style.display = 'none';
+        var plot = document.getElementById('plot');
+        plot.style.display = 'block';
+        Plotly.react(plot, figure.data || [], figure.layout || {}, config);
+    }
+    function showMessage(html) {
+        var plot = document.getElementById('plot');
+        Plotly.purge(plot);
+        plot.style.display = 'none';
+        var message = document.getElementById('message');
+        message.innerHTML = html;
+        message.style.display = 'block';
+    }
+</script>
+</body>
+</html>
+"""
+
+
+class PlotlyWebRenderer(QObject):
+    """
+    Pilote une QWebEngineView affichant des figures Plotly
+
+    La page est chargée au premier rendu; les rendus suivants n'envoient que
+    les données de la figure. Un rendu demandé pendant le chargement est
+    différé jusqu'à la fin de celui-ci (seul le plus récent est conservé).
+    """
+
+    def __init__(self, view, config=None):
+        super().__init__(view)
+        self.view = view
+        self.config = config if config is not None else {'responsive': True}
+        self.offline = os.path.exists(PLOTLY_JS_PATH)
+        self._ready = False
+        self._loading = False
+        self._pending_script = None
+        self.view.loadFinished.connect(self._on_load_finished)
+
+    def render(self, fig):
+        """Affiche une figure Plotly (mise à jour en place si la page est chargée)"""
+        if not self.offline:
+            # plotly.js local introuvable: rendu HTML complet depuis le CDN
+            self._ready = False
+            self.view.setHtml(fig.to_html(include_plotlyjs='cdn', full_html=False, config=self.config))
+            return
+        self._run(f"renderFigure({fig.to_json()}, {json.dumps(self.config)});")
+
+    def show_message(self, html):
+        """Remplace la figure par un message HTML (erreur, absence de données)"""
+        if not self.offline:
+            self._ready = False
+            self.view.setHtml(html)
+            return
+        self._run(f"showMessage({json.dumps(html)});")
+
+    def _run(self, script):
+        if self._ready:
+            self.view.page().runJavaScript(script)
+            return
+        self._pending_script = script
+        if not self._loading:
+            self._loading = True
+            self.view.setHtml(_SHELL_HTML, QUrl.fromLocalFile(PLOTLY_JS_DIR + os.sep))
+
+    def _on_load_finished(self, ok):
+        if not self._loading:
+            # Page chargée par un autre appelant: la coquille Plotly n'est plus en place
+            self._ready = False
+            return
+        self._loading = False
+        self._ready = ok
+        if ok and self._pending_script is not None:
+            script, self._pending_script = self._pending_script, None
+            self.view.page().runJavaScript(script)